@@ -320,7 +320,7 @@ def software_stack():
     import platform
     system, node, release, version, machine, processor = platform.uname()
     # These packages are required
-    import numpy, scipy, netCDF4, pymatgen, apscheduler, pydispatch, yaml
+    import numpy, scipy, netCDF4, pymatgen, apscheduler, yaml
 
     d = collections.OrderedDict([
         ("system", system),
@@ -329,7 +329,6 @@ def software_stack():
         ("scipy", scipy.version.version),
         ("netCDF4", netCDF4.__version__),
         ("apscheduler", apscheduler.version),
-        ("pydispatch", pydispatch.__version__),
         ("yaml", yaml.__version__),
         ("pymatgen", pymatgen.__version__),
     ])
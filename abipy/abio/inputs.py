@@ -22,11 +22,11 @@ from pymatgen.symmetry.bandstructure import HighSymmKpath
 from abipy.tools.numtools import is_diagonal
 from abipy.core.structure import Structure
 from abipy.core.mixins import Has_Structure
-from abipy.core.kpoints import has_timrev_from_kptopt
+from abipy.core.kpoints import has_timrev_from_kptopt, ibz_from_kmesh
 from abipy.abio.variable import InputVariable
 from abipy.abio.abivars import is_abivar, is_anaddb_var
 from abipy.abio.abivars_db import get_abinit_variables, get_anaddb_variables
-from abipy.flowtk import PseudoTable, Pseudo, AbinitTask, AnaddbTask, ParalHintsParser, NetcdfReader
+from abipy.flowtk import PseudoTable, Pseudo, get_pseudo_cache, AbinitTask, AnaddbTask, ParalHintsParser, NetcdfReader
 from abipy.flowtk.abiinspect import yaml_read_irred_perts
 from abipy.flowtk import abiobjects as aobj
 
@@ -445,7 +445,7 @@ class AbinitInput(AbiAbstractInput, MSONable, Has_Structure):
         """
         JSON interface used in pymatgen for easier serialization.
         """
-        pseudos = [Pseudo.from_file(p['filepath']) for p in d['pseudos']]
+        pseudos = get_pseudo_cache().get_pseudos([p['filepath'] for p in d['pseudos']])
         dec = MontyDecoder()
         return cls(d["structure"], pseudos, decorators=dec.process_decoded(d["decorators"]),
                    comment=d["comment"], abi_args=d["abi_args"], tags=d["tags"],
@@ -1726,11 +1726,16 @@ with the Abinit version you are using. Please contact the AbiPy developers.""" %
         except Exception as exc:
             self._handle_task_exception(task, exc)
 
-    def abiget_ibz(self, ngkpt=None, shiftk=None, kptopt=None, workdir=None, manager=None, verbose=0):
+    def abiget_ibz(self, ngkpt=None, shiftk=None, kptopt=None, workdir=None, manager=None, verbose=0,
+                   use_abinit=False):
         """
         This function computes the list of points in the IBZ with the corresponding weights.
         It should be called with an input file that contains all the mandatory variables required by ABINIT.
 
+        By default, the k-points are generated in-process with :func:`ibz_from_kmesh` and Abinit
+        is executed only if the input contains options that are not supported by the python implementation
+        (e.g. explicit symmetries, non-collinear magnetism, multiple shifts that cannot be reduced).
+
         Args:
             ngkpt: Number of divisions for the k-mesh (default None i.e. use ngkpt from self)
             shiftk: List of shifts (default None i.e. use shiftk from self)
@@ -1738,12 +1743,20 @@ with the Abinit version you are using. Please contact the AbiPy developers.""" %
             workdir: Working directory of the fake task used to compute the ibz. Use None for temporary dir.
             manager: |TaskManager| of the task. If None, the manager is initialized from the config file.
             verbose: verbosity level.
+            use_abinit: True if the IBZ should always be computed by Abinit.
 
         Returns:
             `namedtuple` with attributes:
                 points: |numpy-array| with points in the IBZ in reduced coordinates.
                 weights: |numpy-array| with weights of the points.
         """
+        if not use_abinit:
+            try:
+                return self._get_ibz_inprocess(ngkpt=ngkpt, shiftk=shiftk, kptopt=kptopt)
+            except NotImplementedError as exc:
+                if verbose:
+                    print("Cannot compute the IBZ in-process: %s\nInvoking Abinit." % str(exc))
+
         # Avoid modifications in self.
         inp = self.deepcopy()
 
@@ -1777,6 +1790,40 @@ with the Abinit version you are using. Please contact the AbiPy developers.""" %
         except Exception as exc:
             self._handle_task_exception(task, exc)
 
+    def _get_ibz_inprocess(self, ngkpt=None, shiftk=None, kptopt=None):
+        """
+        Compute the IBZ with :func:`ibz_from_kmesh` from the variables in self.
+        Raise NotImplementedError if the input contains options that are not supported.
+        """
+        for vname in ("nsym", "symrel", "tnons", "symafm", "kptrlen", "nqpt"):
+            if np.any(np.array(self.get(vname, 0)) != 0):
+                raise NotImplementedError("Variable %s is not supported" % vname)
+        if self.get("nspden", 1) == 4:
+            raise NotImplementedError("Non-collinear magnetism is not supported")
+        spinat = self.get("spinat")
+        if spinat is not None:
+            spinat = np.reshape(spinat, (-1, 3))
+            if np.any(spinat != spinat[0]):
+                raise NotImplementedError("Inequivalent spinat are not supported")
+
+        kptrlatt = None
+        if ngkpt is None:
+            ngkpt, kptrlatt = self.get("ngkpt"), self.get("kptrlatt")
+        elif self.get("kptrlatt") is not None:
+            raise NotImplementedError("ngkpt is not compatible with kptrlatt")
+        if (ngkpt is None) == (kptrlatt is None):
+            raise NotImplementedError("Input should contain either ngkpt or kptrlatt")
+
+        if shiftk is None:
+            shiftk = np.reshape(self.get("shiftk", [0.5, 0.5, 0.5]), (-1, 3))
+            shiftk = shiftk[:self.get("nshiftk", len(shiftk))]
+        if kptopt is None: kptopt = self.get("kptopt", 1)
+
+        # Use the same default tolerance as Abinit so that the symmetries of slightly distorted
+        # structures are not overestimated.
+        return ibz_from_kmesh(self.structure, ngkpt=ngkpt, shiftk=shiftk, kptopt=kptopt, kptrlatt=kptrlatt,
+                              symprec=self.get("tolsym", 1e-8))
+
     def _handle_task_exception(self, task, prev_exc):
         """
         This method is called when we have executed a temporary task but we encounter
@@ -2,10 +2,12 @@
 Objects used to extract and plot results from output files in text format.
 """
 import os
+import io
 import numpy as np
 import pandas as pd
 
 from collections import OrderedDict
+from collections.abc import Mapping
 from io import StringIO
 from monty.string import is_string, marquee
 from monty.functools import lazy_property
@@ -21,6 +23,94 @@ from abipy.abio.robots import Robot
 from abipy.flowtk import EventsParser, NetcdfReader, GroundStateScfCycle, D2DEScfCycle
 
 
+def _read_text(filepath, start, stop):
+    """
+    Read the bytes in [start, stop) from filepath and return string.
+    Line terminators are translated as done by open in text mode.
+    """
+    with open(filepath, "rb") as fh:
+        fh.seek(start)
+        text = fh.read(stop - start).decode("utf-8", errors="replace")
+
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+# Markers used to index the main output file. Markers starting with a newline must be at the beginning of the line.
+_ABO_MARKERS = OrderedDict([
+    ("version", b"\n.Version"),
+    ("delivered", b"\n.Delivered"),
+    ("proc0", b"\n- Proc."),
+    ("overall", b"\n+Overall time"),
+    ("timer_begin", ("\n" + AbinitTimerParser.BEGIN_TAG).encode()),
+    ("timer_end", ("\n" + AbinitTimerParser.END_TAG).encode()),
+    ("event", b"\n--- !"),
+    ("gs", GroundStateScfCycle.MAGIC.encode()),
+    ("d2de", D2DEScfCycle.MAGIC.encode()),
+    ("dims", b"------------- Echo of variables that govern the present computation"),
+    ("dataset", b"== DATASET"),
+    ("footer", b"== END DATASET(S) "),
+    ("outvars", b" -outvars: echo values of"),
+    ("completed", b" Calculation completed."),
+    ("dryrun", b"debugging mode => will skip driver"),
+])
+
+
+def _iter_abo_markers(fh, blocksize=2**25):
+    """
+    Read the binary file ``fh`` in blocks of ``blocksize`` bytes and
+    yield (kind, offset, line) for each line containing one of the _ABO_MARKERS.
+    offset is the position of the beginning of the line.
+    Lines are yielded in the same order as in the file.
+    """
+    offset = 0
+    while True:
+        block = fh.read(blocksize)
+        if not block: break
+        # Blocks must end with a complete line.
+        if not block.endswith(b"\n"): block += fh.readline()
+
+        # Prepend newline so that markers at the beginning of the line are found in the first line of the block.
+        buf = b"\n" + block
+        found = []
+        for kind, marker in _ABO_MARKERS.items():
+            pos = buf.find(marker)
+            while pos != -1:
+                start = pos + 1 if marker[0] == 10 else buf.rfind(b"\n", 0, pos) + 1
+                found.append((start, kind))
+                pos = buf.find(marker, pos + 1)
+
+        for start, kind in sorted(found):
+            stop = buf.find(b"\n", start)
+            line = buf[start:stop + 1] if stop != -1 else buf[start:]
+            yield kind, offset + start - 1, line
+
+        offset += len(block)
+
+
+class _LazyTextSections(Mapping):
+    """
+    Read-only mapping key --> string with a section of the file.
+    Sections are given in terms of (start, stop) byte offsets and are read on demand.
+    """
+
+    def __init__(self, filepath, spans):
+        self.filepath = filepath
+        self._spans = spans
+
+    def __getitem__(self, key):
+        span = self._spans[key]
+        if is_string(span): return span
+        return _read_text(self.filepath, *span)
+
+    def __iter__(self):
+        return iter(self._spans)
+
+    def __len__(self):
+        return len(self._spans)
+
+
 class AbinitTextFile(TextFile):
     """
     Base class for the ABINIT main output files and log files.
@@ -88,7 +178,12 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
     .. rubric:: Inheritance Diagram
     .. inheritance-diagram:: AbinitOutputFile
     """
-    # TODO: Extract number of errors and warnings.
+    # Magic lines used to locate the different sections in the file.
+    _MAGIC_OUTVARS_START = {
+        "header": " -outvars: echo values of preprocessed input variables --------",
+        "footer": " -outvars: echo values of variables after computation  --------",
+    }
+    _MAGIC_OUTVARS_STOP = "================================================================================"
 
     def __init__(self, filepath):
         super().__init__(filepath)
@@ -97,80 +192,128 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
 
     def _parse(self):
         """
+        Read the file once and build an index with the byte offsets of the different sections.
+        Text is decoded only when the section is requested.
+
         header: String with the input variables
         footer: String with the output variables
-        datasets: Dictionary mapping dataset index to list of strings.
+        datasets: Mapping dataset index --> string with the output of the dataset.
         """
         # Get code version and find magic line signaling that the output file is completed.
         self.version, self.run_completed = None, False
         self.overall_cputime, self.overall_walltime = 0.0, 0.0
         self.proc0_cputime, self.proc0_walltime = 0.0, 0.0
+        self.num_warnings, self.num_comments = 0, 0
+        self.dryrun_mode = False
+
+        # Byte offsets of the sections.
+        header_stop, footer_start, dims_stop = None, None, None
+        dataset_starts = OrderedDict()
+        scf_starts = {"gs": [], "d2de": []}
+        timer_spans, event_offsets = [], []
+        outvars_starts = {"header": None, "footer": None}
+        where, timer_start = "header", None
+
+        with open(self.filepath, "rb") as fh:
+            for kind, start, line in _iter_abo_markers(fh):
+                if kind in ("gs", "d2de"):
+                    if line.lstrip().startswith(_ABO_MARKERS[kind]):
+                        scf_starts[kind].append(start)
+
+                elif kind == "dataset":
+                    # Save dataset number
+                    # == DATASET  1 ==================================================================
+                    where = int(line.replace(b"=", b"").split()[-1])
+                    assert where not in dataset_starts
+                    dataset_starts[where] = start
+                    if header_stop is None: header_stop = start
+
+                elif kind == "footer":
+                    where = "footer"
+                    footer_start = start
+                    if header_stop is None: header_stop = start
+
+                elif kind == "outvars":
+                    if where in outvars_starts and outvars_starts[where] is None:
+                        if self._MAGIC_OUTVARS_START[where].encode() in line:
+                            outvars_starts[where] = start + len(line)
+
+                elif kind == "timer_begin":
+                    timer_start = start
 
-        with open(self.filepath) as fh:
-            for line in fh:
-                if self.version is None and line.startswith(".Version"):
-                    self.version = line.split()[1]
+                elif kind == "timer_end":
+                    if timer_start is not None: timer_spans.append((timer_start, start + len(line)))
+                    timer_start = None
 
-                if line.startswith("- Proc."):
+                elif kind == "event":
+                    # Start of YAML document with Abinit event.
+                    event_offsets.append(start)
+
+                elif kind == "dims":
+                    if dims_stop is None and line.strip().startswith(_ABO_MARKERS["dims"]):
+                        dims_stop = start
+
+                elif kind == "version":
+                    if self.version is None: self.version = line.split()[1].decode()
+
+                elif kind == "proc0":
                     #- Proc.   0 individual time (sec): cpu=         25.5  wall=         26.1
                     tokens = line.split()
                     self.proc0_walltime = float(tokens[-1])
                     self.proc0_cputime = float(tokens[-3])
 
-                if line.startswith("+Overall time"):
+                elif kind == "overall":
                     #+Overall time at end (sec) : cpu=         25.5  wall=         26.1
                     tokens = line.split()
                     self.overall_cputime = float(tokens[-3])
                     self.overall_walltime = float(tokens[-1])
 
-                if " Calculation completed." in line:
+                elif kind == "delivered":
+                    #.Delivered  28 WARNINGs and   0 COMMENTs to log file.
+                    tokens = line.split()
+                    self.num_warnings, self.num_comments = int(tokens[1]), int(tokens[4])
+
+                elif kind == "completed":
                     self.run_completed = True
 
-        # Parse header to get important dimensions and variables
-        self.header, self.footer, self.datasets = [], [], OrderedDict()
-        where = "in_header"
+                elif kind == "dryrun":
+                    # Output files produced in dryrun_mode contain the following line:
+                    # abinit : before driver, prtvol=0, debugging mode => will skip driver
+                    if where == "header": self.dryrun_mode = True
 
-        with open(self.filepath, "rt") as fh:
-            for line in fh:
-                if "== DATASET" in line:
-                    # Save dataset number
-                    # == DATASET  1 ==================================================================
-                    where = int(line.replace("=", "").split()[-1])
-                    assert where not in self.datasets
-                    self.datasets[where] = []
-                elif "== END DATASET(S) " in line:
-                    where = "in_footer"
-
-                if where == "in_header":
-                    self.header.append(line)
-                elif where == "in_footer":
-                    self.footer.append(line)
-                else:
-                    # dataset number --> lines
-                    self.datasets[where].append(line)
+            filesize = fh.tell()
+
+        # Unterminated sections extend up to the end of file.
+        if timer_start is not None: timer_spans.append((timer_start, filesize))
+        if header_stop is None: header_stop = filesize
+
+        self._filesize = filesize
+        self._header_span = (0, header_stop)
+        self._footer_span = (footer_start, filesize) if footer_start is not None else (filesize, filesize)
+        self._scf_starts = scf_starts
+        self._timer_spans = timer_spans
+        self._event_offsets = event_offsets
+        self._outvars_starts = outvars_starts
+        self._dims_stop = dims_stop if dims_stop is not None else filesize
+        # Position used by next_gs_scf_cycle and next_d2de_scf_cycle.
+        self._scf_pos = 0
 
-        self.header = "".join(self.header)
         if self.debug_level: print("header:\n", self.header)
-        # Output files produced in dryrun_mode contain the following line:
-        # abinit : before driver, prtvol=0, debugging mode => will skip driver
-        self.dryrun_mode = "debugging mode => will skip driver" in self.header
         #print("dryrun_mode:", self.dryrun_mode)
 
         #if " jdtset " in self.header: raise NotImplementedError("jdtset is not supported")
         #if " udtset " in self.header: raise NotImplementedError("udtset is not supported")
 
-        self.ndtset = len(self.datasets)
-        if not self.datasets:
+        self.ndtset = len(dataset_starts)
+        if not dataset_starts:
             #raise NotImplementedError("Empty dataset sections.")
             self.ndtset = 1
-            self.datasets[1] = "Empty dataset"
-
-        for key, data in self.datasets.items():
-            if self.debug_level: print("data")
-            self.datasets[key] = "".join(data)
-            if self.debug_level: print(self.datasets[key])
+            self.datasets = _LazyTextSections(self.filepath, OrderedDict([(1, "Empty dataset")]))
+        else:
+            stops = list(dataset_starts.values())[1:] + [self._footer_span[0]]
+            self.datasets = _LazyTextSections(self.filepath,
+                OrderedDict((k, (start, stop)) for (k, start), stop in zip(dataset_starts.items(), stops)))
 
-        self.footer = "".join(self.footer)
         if self.debug_level: print("footer:\n", self.footer)
 
         self.initial_vars_global, self.initial_vars_dataset = self._parse_variables("header")
@@ -182,29 +325,48 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
             else:
                 self.final_vars_global, self.final_vars_dataset = self._parse_variables("footer")
 
+    @lazy_property
+    def header(self):
+        """String with the input variables."""
+        return _read_text(self.filepath, *self._header_span)
+
+    @lazy_property
+    def footer(self):
+        """String with the output variables."""
+        return _read_text(self.filepath, *self._footer_span)
+
+    @property
+    def num_events(self):
+        """Number of Abinit events (YAML documents) reported in the main output file."""
+        return len(self._event_offsets)
+
+    def seek(self, offset, whence=0):
+        """Set the file's current position, like stdio's fseek()."""
+        super().seek(offset, whence)
+        if whence == 0:
+            self._scf_pos = offset
+        elif whence == 1:
+            self._scf_pos += offset
+        else:
+            self._scf_pos = self._filesize + offset
+
     def _parse_variables(self, what):
         vars_global = OrderedDict()
         vars_dataset = OrderedDict([(k, OrderedDict()) for k in self.datasets.keys()])
         #print("keys", vars_dataset.keys())
 
-        lines = getattr(self, what).splitlines()
-        if what == "header":
-            magic_start = " -outvars: echo values of preprocessed input variables --------"
-        elif what == "footer":
-            magic_start = " -outvars: echo values of variables after computation  --------"
-        else:
+        if what not in ("header", "footer"):
             raise ValueError("Invalid value for what: `%s`" % str(what))
 
-        magic_stop = "================================================================================"
-
-        # Select relevant portion with variables.
-        for i, line in enumerate(lines):
-            if magic_start in line:
-                break
-        else:
-            raise ValueError("Cannot find magic_start line: `%s`\nPerhaps this is not an Abinit output file!" % magic_start)
-        lines = lines[i+1:]
+        # Select relevant portion with variables using the offsets computed in _parse.
+        start = self._outvars_starts[what]
+        if start is None:
+            raise ValueError("Cannot find magic_start line: `%s`\nPerhaps this is not an Abinit output file!" %
+                             self._MAGIC_OUTVARS_START[what])
+        stop = self._header_span[1] if what == "header" else self._footer_span[1]
+        lines = _read_text(self.filepath, start, stop).splitlines()
 
+        magic_stop = self._MAGIC_OUTVARS_STOP
         for i, line in enumerate(lines):
             if magic_stop in line:
                 break
@@ -586,64 +748,81 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
         from abipy.tools.numtools import grouper
         dims_dataset, spginfo_dataset = OrderedDict(), OrderedDict()
         inblock = 0
-        with open(self.filepath, "rt") as fh:
-            for line in fh:
-                line = line.strip()
-                if verbose > 1: print("inblock:", inblock, " at line:", line)
-
-                if line.startswith(magic_exit): break
-
-                if (not line or line.startswith("===") or line.startswith("---")
-                    #or line.startswith("P")
-                    or line.startswith("Rough estimation") or line.startswith("PAW method is used")):
-                    continue
-
-                if line.startswith("DATASET") or line.startswith("Symmetries :"):
-                    # Get dataset index, parse space group and lattice info, init new dims dict.
-                    inblock = 1
-                    if line.startswith("Symmetries :"):
-                        # No multidataset
-                        dtindex = 1
-                    else:
-                        tokens = line.split()
-                        dtindex = int(tokens[1])
-
-                    dims_dataset[dtindex] = dims = OrderedDict()
-                    spginfo_dataset[dtindex] = parse_spgline(line)
-                    continue
-
-                if inblock == 1 and line.startswith(magic):
-                    inblock = 2
-                    continue
-
-                if inblock == 2:
-                    # Lines with data.
-                    if line.startswith("For the susceptibility"): continue
-
-                    if line.startswith(memory_pre):
-                        dims["mem_per_proc_mb"] = float(line.replace(memory_pre, "").split()[0])
-                    elif line.startswith(filesizes_pre):
-                        tokens = line.split()
-                        mbpos = [i - 1 for i, t in enumerate(tokens) if t.startswith("Mbytes")]
-                        assert len(mbpos) == 2
-                        dims["wfk_size_mb"] = float(tokens[mbpos[0]])
-                        dims["denpot_size_mb"] = float(tokens[mbpos[1]])
-                    elif line.startswith("Pmy_natom="):
-                        dims.update(my_natom=int(line.replace("Pmy_natom=", "").strip()))
-                        #print("my_natom", dims["my_natom"])
-                    else:
-                        if line and line[0] == "-": line = line[1:]
-                        tokens = grouper(2, line.replace("=", "").split())
-                        if verbose > 1: print("tokens:", tokens)
-                        dims.update([(t[0], int(t[1])) for t in tokens])
+        # Read only the first part of the file (up to magic_exit) using the offset computed in _parse.
+        for line in _read_text(self.filepath, 0, self._dims_stop).splitlines():
+            line = line.strip()
+            if verbose > 1: print("inblock:", inblock, " at line:", line)
+
+            if line.startswith(magic_exit): break
+
+            if (not line or line.startswith("===") or line.startswith("---")
+                #or line.startswith("P")
+                or line.startswith("Rough estimation") or line.startswith("PAW method is used")):
+                continue
 
-            return dims_dataset, spginfo_dataset
+            if line.startswith("DATASET") or line.startswith("Symmetries :"):
+                # Get dataset index, parse space group and lattice info, init new dims dict.
+                inblock = 1
+                if line.startswith("Symmetries :"):
+                    # No multidataset
+                    dtindex = 1
+                else:
+                    tokens = line.split()
+                    dtindex = int(tokens[1])
+
+                dims_dataset[dtindex] = dims = OrderedDict()
+                spginfo_dataset[dtindex] = parse_spgline(line)
+                continue
+
+            if inblock == 1 and line.startswith(magic):
+                inblock = 2
+                continue
+
+            if inblock == 2:
+                # Lines with data.
+                if line.startswith("For the susceptibility"): continue
+
+                if line.startswith(memory_pre):
+                    dims["mem_per_proc_mb"] = float(line.replace(memory_pre, "").split()[0])
+                elif line.startswith(filesizes_pre):
+                    tokens = line.split()
+                    mbpos = [i - 1 for i, t in enumerate(tokens) if t.startswith("Mbytes")]
+                    assert len(mbpos) == 2
+                    dims["wfk_size_mb"] = float(tokens[mbpos[0]])
+                    dims["denpot_size_mb"] = float(tokens[mbpos[1]])
+                elif line.startswith("Pmy_natom="):
+                    dims.update(my_natom=int(line.replace("Pmy_natom=", "").strip()))
+                    #print("my_natom", dims["my_natom"])
+                else:
+                    if line and line[0] == "-": line = line[1:]
+                    tokens = grouper(2, line.replace("=", "").split())
+                    if verbose > 1: print("tokens:", tokens)
+                    dims.update([(t[0], int(t[1])) for t in tokens])
+
+        return dims_dataset, spginfo_dataset
+
+    def _next_scf_cycle(self, kind, cls):
+        """
+        Parse the next SCF cycle of type ``kind`` located after the current position.
+        Use the offsets computed in _parse so that only the text of the cycle is read.
+        """
+        for start in self._scf_starts[kind]:
+            if start >= self._scf_pos:
+                # Cycles cannot overlap so it's safe to move just after the beginning of the section.
+                self._scf_pos = start + 1
+                with open(self.filepath, "rb") as fh:
+                    fh.seek(start)
+                    return cls.from_stream(io.TextIOWrapper(fh, encoding="utf-8", errors="replace"))
+
+        # Not found, emulate a stream that has been consumed.
+        self._scf_pos = self._filesize
+        return None
 
     def next_gs_scf_cycle(self):
         """
         Return the next :class:`GroundStateScfCycle` in the file. None if not found.
         """
-        return GroundStateScfCycle.from_stream(self)
+        return self._next_scf_cycle("gs", GroundStateScfCycle)
 
     def get_all_gs_scf_cycles(self):
         """Return list of :class:`GroundStateScfCycle` objects. Empty list if no entry is found."""
@@ -662,7 +841,7 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
         """
         Return :class:`D2DEScfCycle` with information on the DFPT iterations. None if not found.
         """
-        return D2DEScfCycle.from_stream(self)
+        return self._next_scf_cycle("d2de", D2DEScfCycle)
 
     def get_all_d2de_scf_cycles(self):
         """Return list of :class:`D2DEScfCycle` objects. Empty list if no entry is found."""
@@ -674,6 +853,16 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
             cycles.append(cycle)
         return cycles
 
+    def get_timer(self):
+        """
+        Timer data. Only the TIMER sections found in _parse are read.
+        """
+        timer = AbinitTimerParser()
+        if self._timer_spans:
+            text = "".join(_read_text(self.filepath, start, stop) for start, stop in self._timer_spans)
+            timer.parse_text(text, self.filepath)
+        return timer
+
     def plot(self, tight_layout=True, with_timer=False, show=True):
         """
         Plot GS/DFPT SCF cycles and timer data found in the output file.
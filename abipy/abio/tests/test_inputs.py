@@ -271,6 +271,24 @@ class TestAbinitInput(AbipyTest):
         #new_inp = si2_inp.new_with_structure(super_structure, scdims=scdims)
         #self.abivalidate_input(new_inp)
 
+    def test_abiget_ibz_tolsym(self):
+        """Testing in-process IBZ with slightly distorted structure."""
+        inp = AbinitInput(structure=abidata.cif_file("si.cif"), pseudos=abidata.pseudos("14si.pspnc"))
+        inp.set_kmesh(ngkpt=(4, 4, 4), shiftk=(0, 0, 0))
+        ibz = inp.abiget_ibz()
+
+        # Break the symmetry below the spglib default tolerance but above the Abinit default (tolsym 1e-8).
+        structure = inp.structure.copy()
+        structure.translate_sites([0], [1e-6, 0, 0], frac_coords=False)
+        distorted = inp.new_with_structure(structure)
+        distorted_ibz = distorted.abiget_ibz()
+        assert len(distorted_ibz.points) > len(ibz.points)
+        self.assert_almost_equal(distorted_ibz.weights.sum(), 1.0)
+
+        # Same IBZ as the undistorted structure if tolsym is large enough.
+        distorted["tolsym"] = 1e-5
+        self.assert_almost_equal(distorted.abiget_ibz().points, ibz.points)
+
     def test_abinit_calls(self):
         """Testing AbinitInput methods invoking Abinit."""
         inp_si = AbinitInput(structure=abidata.cif_file("si.cif"), pseudos=abidata.pseudos("14si.pspnc"))
@@ -303,6 +321,12 @@ class TestAbinitInput(AbipyTest):
         ibz = inp_si.abiget_ibz()
         assert np.all(ibz.points == [[ 0.,  0.,  0.], [0.5,  0.,  0.], [0.5, 0.5, 0.]])
         assert np.all(ibz.weights == [0.125,  0.5,  0.375])
+        # In-process IBZ and IBZ computed by Abinit with 4 shifts.
+        inp_4shifts = inp_si.deepcopy()
+        inp_4shifts.set_autokmesh(nksmall=4)
+        ibz, abinit_ibz = inp_4shifts.abiget_ibz(), inp_4shifts.abiget_ibz(use_abinit=True)
+        self.assert_almost_equal(ibz.points, abinit_ibz.points)
+        self.assert_almost_equal(ibz.weights, abinit_ibz.weights)
 
         # This to test what happes with wrong inputs and Abinit errors.
         wrong = inp_si.deepcopy()
@@ -104,12 +104,27 @@ class AbinitOutputTest(AbipyTest):
             assert abo.initial_structure is not None
             assert abo.initial_structure.abi_spacegroup is not None
             assert abo.initial_structure == abo.final_structure
+            assert abo.num_warnings == 28 and abo.num_comments == 0
+
+            # Sections are read on demand from the offsets computed in _parse.
+            assert list(abo.datasets.keys()) == [1, 2, 3]
+            assert abo.datasets[2].startswith("== DATASET  2 ")
+            assert ".Version 8.3.2" in abo.header
+            assert abo.footer.startswith("== END DATASET(S) ")
+            with open(abo_path, "rt") as fh:
+                assert abo.header + "".join(abo.datasets.values()) + abo.footer == fh.read()
+            assert len(abo.get_timer()) == 1
 
             gs_cycle = abo.next_gs_scf_cycle()
             assert gs_cycle is not None
 
             ph_cycle = abo.next_d2de_scf_cycle()
             assert ph_cycle is not None
+            # Next DFPT cycle after the first one, then the GS cycle is not found.
+            assert abo.next_d2de_scf_cycle() is not None
+            assert abo.next_gs_scf_cycle() is None
+            abo.seek(0)
+            assert abo.next_gs_scf_cycle() is not None
 
             if self.has_matplotlib():
                 assert ph_cycle.plot(show=False)
@@ -2,12 +2,30 @@
 This module provides objects for extracting timing data from the ABINIT output files
 It also provides tools to analyze and to visualize the parallel efficiency.
 """
+from io import StringIO
 from abipy.core.mixins import NotebookWriter
 from abipy.flowtk import AbinitTimerParser as _Parser
 
 
 class AbinitTimerParser(_Parser, NotebookWriter):
 
+    def parse_text(self, text, fname):
+        """
+        Parse the TIMER sections contained in string ``text``.
+        Useful if the sections have been already extracted from the file ``fname``
+        e.g. by :class:`AbinitOutputFile`.
+
+        Return: True if success.
+        """
+        try:
+            self._read(StringIO(text), fname)
+        except self.Error as exc:
+            print("Exception while parsing timer sections of file %s:\n%s" % (fname, str(exc)))
+            return False
+
+        self._filenames.append(fname)
+        return True
+
     def yield_figs(self, **kwargs):  # pragma: no cover
         """
         This function *generates* a predefined list of matplotlib figures with minimal input from the user.
@@ -326,12 +326,15 @@ class _Field(Has_Structure):
         else:
             raise visu.Error("Don't know how to export data for visualizer %s" % appname)
 
-    def get_interpolator(self):
+    def get_interpolator(self, method="linear"):
         """
         Return an interpolator object that interpolates periodic functions in real space.
+
+        Args:
+            method: "linear" for trilinear interpolation, "cubic" for tricubic interpolation.
         """
         from abipy.tools.numtools import BlochRegularGridInterpolator
-        return BlochRegularGridInterpolator(self.structure, self.datar)
+        return BlochRegularGridInterpolator(self.structure, self.datar, method=method)
 
     #def fourier_interp(self, new_mesh):
         #intp_datar = self.mesh.fourier_interp(self.datar, new_mesh, inspace="r")
@@ -459,6 +462,9 @@ class _Field(Has_Structure):
         Args:
             rcut_symbol: dictionary mapping chemical element to the radius of the sphere in Angstrom.
                 or number if each element should have the same sphere. If None, covalent radii are used.
+                Values can also be lists (with the same length for all elements) to integrate
+                for several radii in a single call. In this case, the DataFrame contains one row
+                for each (site, radius).
             out: Set it to False to disable output of final results
 
         Return:
@@ -468,51 +474,42 @@ class _Field(Has_Structure):
         if rcut_symbol is None:
             from pymatgen.analysis.molecule_structure_comparator import CovalentRadius
             rcut_symbol = {s: CovalentRadius.radius[s] for s in self.structure.symbol_set}
-            #rcut_symbol = {s: 2 for s in self.structure.symbol_set}
-            #rcut_symbol = {s: 1 for s in self.structure.symbol_set}
         elif duck.is_number_like(rcut_symbol):
             rcut_symbol = {s: float(rcut_symbol) for s in self.structure.symbol_set}
 
-        # Spline bessel integrals.
-        datag = np.reshape(self.datag, (self.nspden, -1))
-        #print("datag[0]", datag[0, 0] * self.structure.volume, datag.shape)
-        gvecs = self.mesh.gvecs
-        gmods = self.mesh.gmods
-        gmax = gmods.max()
-        from abipy.tools import bessel
-        splines = {s: bessel.spline_int_jlqr(0, gmax, rcut_symbol[s]) for s in self.structure.symbol_set}
+        # [natom, nrad] array with radii.
+        radii = [np.atleast_1d(rcut_symbol[site.specie.symbol]) for site in self.structure]
+        if any(len(r) != len(radii[0]) for r in radii):
+            raise ValueError("All the elements in rcut_symbol should have the same number of radii")
+        radii = np.array(radii, dtype=np.float)
+
+        # 4 pi sum_G n(G) e^{iGRo} int_0^{rcut} r**2 j_0(Gr} dr for all components, sites and radii.
+        res = self.mesh.integrate_in_spheres_g(self.datag, self.structure.frac_coords, radii).real
+
+        # Compute densities and magnetization: arrays of shape [natom, nrad].
+        ntot, nup, ndown, mx, my, mz = 6 * (None,)
+        if self.nspinor == 1:
+            if self.nspden == 1:
+                ntot = res[0]
+            elif self.nspden == 2:
+                nup, ndown = res
+                ntot, mz = nup + ndown, nup - ndown
+
+        elif self.nspinor == 2:
+            ntot, mx, my, mz = res
+            nup, ndown = 0.5 * (ntot + mz), 0.5 * (ntot - mz)
 
-        # 4 pi sum_G n(G) e^{iGRo} int_0^{rcut} r**2 j_l(Gr} dr
         rows = []
         for iatom, site in enumerate(self.structure):
-            symbol = site.specie.symbol
-            phases = np.exp(2j * np.pi * np.dot(gvecs, site.frac_coords))
-            fg = datag * phases * splines[symbol](gmods)
-            res_nspden = np.sum(fg, axis=1) * (4 * np.pi)
-            #print("result:", res_nspden, res_nspden.shape, (datag * fg).shape)
-
-            # Compute densities and magnetization.
-            ntot, nup, ndown, mx, my, mz = 6 * (None,)
-            if self.nspinor == 1:
-                res_nspden = res_nspden.real
-                if self.nspden == 1:
-                    ntot = res_nspden[0]
-                elif self.nspden == 2:
-                    nup, ndown = res_nspden
-                    ntot, mz = nup + ndown, nup - ndown
-
-            elif self.nspinor == 2:
-                raise NotImplementedError()
-                #ntot, mx, my, mz = scalvec_from_spinmat(res_nspden)
-                nup, ndown = 0.5 * (ntot + mz), 0.5 * (ntot - mz)
-
-            # Fill DataFrame row.
-            rows.append(OrderedDict([
-                ("iatom", iatom), ("symbol", symbol),
-                ("ntot", ntot), ("nup", nup), ("ndown", ndown),
-                ("mx", mx), ("my", my), ("mz", mz),
-                ("rsph_ang", rcut_symbol[symbol]), ("frac_coords", site.frac_coords),
-            ]))
+            for irad, rsph in enumerate(radii[iatom]):
+                # Fill DataFrame row.
+                get = lambda a: a[iatom, irad] if a is not None else None
+                rows.append(OrderedDict([
+                    ("iatom", iatom), ("symbol", site.specie.symbol),
+                    ("ntot", get(ntot)), ("nup", get(nup)), ("ndown", get(ndown)),
+                    ("mx", get(mx)), ("my", get(my)), ("mz", get(mz)),
+                    ("rsph_ang", rsph), ("frac_coords", site.frac_coords),
+                ]))
 
         import pandas as pd
         df = pd.DataFrame(rows, columns=list(rows[0].keys()))
@@ -950,7 +947,9 @@ class Density(_DensityField):
 
         chgcar = Chgcar(Poscar(self.structure), data_dict)
         if filename is not None:
-            chgcar.write_file(filename)
+            from abipy.iotools.chgcar import chgcar_write
+            with open(filename, mode="wt") as fh:
+                chgcar_write(fh, self.structure, data_dict)
 
         return chgcar
 
@@ -1106,6 +1105,23 @@ class FieldReader(ETSF_Reader):
     #    """Read potential data. Return :class:`Vks1Potential` object."""
     #    return self.read_denpot(varname=field_cls.netcdf_name, field_cls=field_cls)
 
+    def read_datar_view(self, varname=None):
+        """
+        Return a :class:`DatarNcView` giving slice-by-slice access to the datar array
+        of the field stored in the netcdf file. If varname is None, the first field
+        variable found in the file is used.
+        """
+        if varname is None:
+            found = [field_cls for field_cls in all_subclasses(_Field)
+                     if field_cls.netcdf_name in self.rootgrp.variables]
+            if not found or len(found) > 1:
+                raise ValueError("Found `%s` fields in file: %s" % (str(found), self.path))
+            field_cls = found[0]
+        else:
+            field_cls = [c for c in all_subclasses(_Field) if c.netcdf_name == varname][0]
+
+        return DatarNcView(self.rootgrp.variables[field_cls.netcdf_name], self.read_den_dims(), field_cls)
+
     def read_denpot(self, varname, field_cls):
         """
         Factory function to read den/pot data from netcdf_ files and instantiate :class:`_Field` objects.
@@ -1174,3 +1190,74 @@ class FieldReader(ETSF_Reader):
             return field_cls(dims.nspinor, dims.nsppol, dims.nspden, datar, structure, iorder="f")
         else:
             raise NotImplementedError("cplex %s not coded" % cplex)
+
+
+class DatarNcView(object):
+    """
+    Read-only view of the ``datar`` array of a field stored in a netcdf file.
+    Slices are read from file on demand and returned with the AbiPy conventions used by
+    :meth:`FieldReader.read_denpot` i.e. datar[nspden, nx, ny, nz] in C-order, up/down components
+    for spin-polarized densities and data in Angstrom units.
+    Used to export large fields to file without loading the full array in memory e.g.::
+
+        with FieldReader("out_DEN.nc") as r:
+            with open("den.xsf", "wt") as fh:
+                xsf.xsf_write_data(fh, r.read_structure(), r.read_datar_view())
+    """
+
+    def __init__(self, ncvar, dims, field_cls, ispden=None):
+        """
+        Args:
+            ncvar: netcdf variable with shape [nspden, nfft3, nfft2, nfft1, cplex]
+            dims: dimensions returned by :meth:`FieldReader.read_den_dims`.
+            field_cls: Subclass of _Field associated to the variable.
+            ispden: If not None, the view is restricted to this component and has shape [nx, ny, nz]
+        """
+        self.ncvar, self.dims, self.field_cls, self.ispden = ncvar, dims, field_cls, ispden
+        if dims.nspinor != 1 or ncvar.shape[-1] != 1:
+            raise NotImplementedError("nspinor %s, cplex %s not coded" % (dims.nspinor, ncvar.shape[-1]))
+        self.dtype = np.dtype(np.float)
+
+        # If Density: store rho_up, rho_down instead of rho_total, rho_up.
+        self._updown = dims.nspden == 2 and issubclass(field_cls, _DensityField)
+
+        # Structure uses Angstrom. Abinit uses Bohr.
+        self._fact = 1.0
+        if issubclass(field_cls, _DensityField):
+            self._fact = 1 / pmgu.bohr_to_angstrom ** 3
+        if issubclass(field_cls, _PotentialField):
+            self._fact = pmgu.Ha_to_eV / pmgu.bohr_to_angstrom ** 3
+
+    @property
+    def shape(self):
+        """Shape of the array: [nspden, nx, ny, nz] or [nx, ny, nz] if the view has a fixed ispden."""
+        shape = (self.dims.nfft1, self.dims.nfft2, self.dims.nfft3)
+        return shape if self.ispden is not None else (self.dims.nspden,) + shape
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def component(self, ispden):
+        """Return a view of the ``ispden`` component."""
+        return self.__class__(self.ncvar, self.dims, self.field_cls, ispden=ispden)
+
+    def __getitem__(self, key):
+        key = list(key) if isinstance(key, tuple) else [key]
+        if Ellipsis in key: raise ValueError("Ellipsis is not supported")
+        key = key + [slice(None)] * (self.ndim - len(key))
+        if self.ispden is not None: key = [self.ispden] + key
+        isp, kx, ky, kz = key
+
+        # netcdf arrays are in Fortran order: (nspden, n3, n2, n1, cplex)
+        if self._updown:
+            raw = np.asarray(self.ncvar[:, kz, ky, kx, 0])
+            raw = np.array([raw[1], raw[0] - raw[1]])[isp]
+        else:
+            raw = np.asarray(self.ncvar[isp, kz, ky, kx, 0])
+
+        # Reverse the order of the spatial axes that have not been removed by integer indexing.
+        nspatial = sum(1 for k in (kx, ky, kz) if isinstance(k, slice))
+        axes = list(range(raw.ndim - nspatial)) + list(range(raw.ndim - 1, raw.ndim - nspatial - 1, -1))
+
+        return np.transpose(raw, axes) * self._fact
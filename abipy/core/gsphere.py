@@ -65,11 +65,16 @@ class GSphere(collections.abc.Sequence):
         return the index of the G-vector ``gvec`` in self.
         Raises: `ValueError` if the value is not present.
         """
-        gvec = np.asarray(gvec)
-        for i, g in enumerate(self):
-            if np.all(g == gvec):
-                return i
-        else:
+        # Use dictionary gvec --> index built on first call instead of linear search.
+        try:
+            g2index = self._g2index
+        except AttributeError:
+            # Iterate in reverse order so that the first occurrence is stored.
+            g2index = self._g2index = {tuple(g): i for i, g in reversed(list(enumerate(self.gvecs.tolist())))}
+
+        try:
+            return g2index[tuple(np.reshape(gvec, 3).tolist())]
+        except (KeyError, ValueError):
             raise ValueError("Cannot find %s in Gsphere" % str(gvec))
 
     def count(self, gvec):
@@ -1,6 +1,7 @@
 # coding: utf-8
 """This module defines objects describing the sampling of the Brillouin Zone."""
 import collections
+import hashlib
 import json
 import sys
 import time
@@ -34,6 +35,7 @@ __all__ = [
     "IrredZone",
     "rc_list",
     "kmesh_from_mpdivs",
+    "ibz_from_kmesh",
     "Ktables",
     "find_points_along_path",
 ]
@@ -299,6 +301,155 @@ def kptopt2str(kptopt, verbose=0):
     return t[0] if verbose == 0 else t[0] + "\n" + t[1]
 
 
+# Cache used by ibz_from_kmesh. Maps hash(structure, mesh parameters) --> (points, weights)
+_IBZ_CACHE = collections.OrderedDict()
+_IBZ_CACHE_MAXSIZE = 128
+
+# Abinit replaces the 4 shifts of the FCC sampling (nshiftk=4, ngkpt = n n n) with a single shift
+# and the non-diagonal kptrlatt: n * _FCC_KPTRLATT
+_FCC_KPTRLATT = np.array([[1, -1, 1], [-1, 1, 1], [-1, -1, 1]])
+_FCC_SHIFT_DIFFS = np.array([[0, 0.5, 0.5], [0.5, 0, 0.5], [0.5, 0.5, 0]])
+
+
+def _reduce_kptrlatt_shiftk(kptrlatt, shiftk):
+    """
+    Return (kptrlatt, shift) with a single shift describing the same set of k-points.
+    Raise NotImplementedError if the multiple shifts cannot be reduced.
+    """
+    if len(shiftk) == 1:
+        return kptrlatt, shiftk[0]
+
+    n = kptrlatt[0, 0]
+    if len(shiftk) == 4 and is_diagonal(kptrlatt) and np.all(np.diag(kptrlatt) == n):
+        diffs = (shiftk[1:] - shiftk[0]) % 1
+        if all(np.any(np.all(np.abs(_FCC_SHIFT_DIFFS - d) < 1e-8, axis=1)) for d in diffs) and \
+           len(np.unique(np.round(diffs, 8), axis=0)) == 3:
+            return n * _FCC_KPTRLATT, np.dot(_FCC_KPTRLATT, shiftk[0]) % 1
+
+    raise NotImplementedError("Cannot reduce the multiple shifts:\n%s\nto a single shift" % str(shiftk))
+
+
+def _kmesh_from_kptrlatt(kptrlatt, shift):
+    """
+    Generate the k-points of the lattice ``kptrlatt`` with ``shift`` in the same order as Abinit.
+    Points are wrapped to ]-1/2, 1/2].
+    """
+    klatt = np.linalg.inv(kptrlatt)
+    # kptrlatt @ kpt = c + shift with kpt in [0, 1[ gives the range of the integer coordinates c.
+    cmin = np.floor(np.minimum(kptrlatt, 0).sum(axis=1) - shift).astype(np.int)
+    cmax = np.ceil(np.maximum(kptrlatt, 0).sum(axis=1) - shift).astype(np.int)
+    c3, c2, c1 = np.meshgrid(*[np.arange(cmin[i], cmax[i] + 1) for i in (2, 1, 0)], indexing="ij")
+    coords = np.stack([c1.ravel(), c2.ravel(), c3.ravel()], axis=1) + shift
+    kpts = np.dot(coords, klatt.T)
+    kpts = kpts[np.all((kpts >= -1e-10) & (kpts <= 1 - 1e-10), axis=1)]
+
+    nkbz = int(round(abs(np.linalg.det(kptrlatt))))
+    if len(kpts) != nkbz:
+        raise RuntimeError("Generated %d k-points while det(kptrlatt) is %d" % (len(kpts), nkbz))
+
+    return kpts - np.ceil(kpts - 0.5 - 1e-8)
+
+
+def _kpoints_keys(kpts, ndiv=10**6):
+    """Integer keys associated to the reduced coordinates wrapped to [0, 1[."""
+    ik = np.rint((kpts % 1) * ndiv).astype(np.int64) % ndiv
+    return (ik[..., 0] * ndiv + ik[..., 1]) * ndiv + ik[..., 2]
+
+
+def ibz_from_kmesh(structure, ngkpt=None, shiftk=(0.5, 0.5, 0.5), kptopt=1, kptrlatt=None,
+                   symprec=1e-5, angle_tolerance=5, use_cache=True):
+    """
+    Compute the k-points in the IBZ and the corresponding weights without calling Abinit.
+    The k-points are generated and reduced following the conventions used by Abinit
+    (order of the points in the full mesh, choice of the representative, wrapping to ]-1/2, 1/2])
+    so that the output coincides with the one produced by ``abinit`` with ``prtkpt -2``.
+
+    Args:
+        structure: |Structure| object. The Abinit symmetries stored in ``structure.abi_spacegroup``
+            are used if available else the symmetry operations are computed with spglib.
+        ngkpt: Number of divisions for the k-mesh. Incompatible with ``kptrlatt``.
+        shiftk: List of shifts.
+        kptopt: Option for k-point generation (1, 2, 3, 4 are supported).
+        kptrlatt: [3, 3] matrix defining the k-mesh. Incompatible with ``ngkpt``.
+        symprec: Tolerance for symmetry finding passed to spglib.
+        angle_tolerance: Angle tolerance for symmetry finding passed to spglib.
+        use_cache: True if results should be cached.
+
+    Returns:
+        `namedtuple` with attributes:
+            points: |numpy-array| with points in the IBZ in reduced coordinates.
+            weights: |numpy-array| with weights of the points.
+
+    Raise:
+        `NotImplementedError` if the options are not supported e.g. multiple shifts that
+        cannot be reduced to a single shift or ``kptopt`` <= 0.
+    """
+    if (ngkpt is None) == (kptrlatt is None):
+        raise ValueError("Either ngkpt or kptrlatt must be specified.")
+    kptopt = int(kptopt)
+    if kptopt not in (1, 2, 3, 4):
+        raise NotImplementedError("kptopt %s is not supported" % kptopt)
+
+    kptrlatt = np.diag(np.reshape(ngkpt, 3)) if kptrlatt is None else np.reshape(kptrlatt, (3, 3))
+    kptrlatt = np.array(kptrlatt, dtype=np.int)
+    if abs(np.linalg.det(kptrlatt)) < 0.5 or (is_diagonal(kptrlatt) and np.any(np.diag(kptrlatt) <= 0)):
+        raise NotImplementedError("Invalid k-mesh with kptrlatt:\n%s" % str(kptrlatt))
+    shiftk = np.reshape(np.array(shiftk, dtype=np.float), (-1, 3))
+
+    abispg = getattr(structure, "abi_spacegroup", None)
+    md5 = hashlib.md5()
+    for arr in (structure.lattice.matrix, structure.frac_coords, structure.atomic_numbers,
+                kptrlatt, shiftk, [kptopt, symprec, angle_tolerance]):
+        md5.update(np.ascontiguousarray(np.round(arr, 10), dtype=np.float).tobytes())
+    if abispg is not None:
+        md5.update(np.ascontiguousarray(abispg.symrel, dtype=np.float).tobytes())
+    key = md5.hexdigest()
+
+    ibz = collections.namedtuple("ibz", "points weights")
+    if use_cache and key in _IBZ_CACHE:
+        _IBZ_CACHE.move_to_end(key)
+        points, weights = _IBZ_CACHE[key]
+        return ibz(points=points.copy(), weights=weights.copy())
+
+    if kptopt in (1, 4):
+        if abispg is not None:
+            symrel = np.array([o.rot_r for o in abispg.symmops(time_sign=+1, afm_sign=+1)])
+        else:
+            from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+            spga = SpacegroupAnalyzer(structure, symprec=symprec, angle_tolerance=angle_tolerance)
+            symrel = spga.get_symmetry_dataset()["rotations"]
+    else:
+        symrel = np.eye(3, dtype=np.int)[None]
+    has_timrev = has_timrev_from_kptopt(kptopt)
+
+    kptrlatt, shift = _reduce_kptrlatt_shiftk(kptrlatt, shiftk)
+    kbz = _kmesh_from_kptrlatt(kptrlatt, shift)
+    nkbz = len(kbz)
+
+    # Each point is represented by the point of its star with the smallest index in the full mesh.
+    keys = _kpoints_keys(kbz)
+    sort_idx = np.argsort(keys, kind="stable")
+    sorted_keys = keys[sort_idx]
+    rep = np.arange(nkbz)
+    symrecs = [np.rint(np.linalg.inv(s).T).astype(np.int) for s in symrel]
+    if has_timrev: symrecs += [-s for s in symrecs]
+    for symrec in symrecs:
+        rot_keys = _kpoints_keys(np.dot(kbz, symrec.T))
+        pos = np.minimum(np.searchsorted(sorted_keys, rot_keys), nkbz - 1)
+        found = sorted_keys[pos] == rot_keys
+        rep[found] = np.minimum(rep[found], sort_idx[pos[found]])
+
+    irred, counts = np.unique(rep, return_counts=True)
+    points, weights = kbz[irred], counts / nkbz
+
+    if use_cache:
+        _IBZ_CACHE[key] = (points, weights)
+        if len(_IBZ_CACHE) > _IBZ_CACHE_MAXSIZE:
+            _IBZ_CACHE.popitem(last=False)
+
+    return ibz(points=points.copy(), weights=weights.copy())
+
+
 def map_kpoints(other_kpoints, other_lattice, ref_lattice, ref_kpoints, ref_symrecs, has_timrev):
     """
     Build mapping between a list of k-points in reduced coordinates (``other_kpoints``)
@@ -1407,13 +1558,16 @@ class IrredZone(KpointList):
     @classmethod
     def from_ngkpt(cls, structure, ngkpt, shiftk, kptopt=1, verbose=0):
         """
-        Build an IrredZone object from (ngkpt, shift) by calling Abinit
-        to get the list of irreducible k-points.
+        Build an IrredZone object from (ngkpt, shift). The irreducible k-points are computed
+        with :func:`ibz_from_kmesh`, Abinit is called only if the options are not supported.
         """
-        from abipy.abio.factories import gs_input
-        from abipy.data.hgh_pseudos import HGH_TABLE
-        gsinp = gs_input(structure, HGH_TABLE, spin_mode="unpolarized")
-        ibz = gsinp.abiget_ibz(ngkpt=ngkpt, shiftk=shiftk, kptopt=kptopt, verbose=verbose)
+        try:
+            ibz = ibz_from_kmesh(structure, ngkpt=ngkpt, shiftk=shiftk, kptopt=kptopt)
+        except NotImplementedError:
+            from abipy.abio.factories import gs_input
+            from abipy.data.hgh_pseudos import HGH_TABLE
+            gsinp = gs_input(structure, HGH_TABLE, spin_mode="unpolarized")
+            ibz = gsinp.abiget_ibz(ngkpt=ngkpt, shiftk=shiftk, kptopt=kptopt, verbose=verbose, use_abinit=True)
         ksampling = KSamplingInfo.from_mpdivs(ngkpt, shiftk, kptopt)
 
         return cls(structure.reciprocal_lattice, ibz.points, weights=ibz.weights,
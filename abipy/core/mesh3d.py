@@ -282,6 +282,14 @@ class Mesh3D(object):
         else:
             raise NotImplementedError("ndim < 3 are not supported")
 
+    @lazy_property
+    def gvecs_axes(self):
+        """
+        Tuple of three integer arrays with the reduced components of the G-vectors
+        along the three axes of the FFT box (FFT ordering).
+        """
+        return tuple(np.rint(fftfreq(n) * n).astype(np.int) for n in self.shape)
+
     @lazy_property
     def gvecs(self):
         """
@@ -294,31 +302,77 @@ class Mesh3D(object):
             These vectors differ from the gvecs stored in |GSphere| that
             are k-centered and enclosed by a sphere whose radius is defined by ecut.
         """
-        gx_list = np.rint(fftfreq(self.nx) * self.nx)
-        gy_list = np.rint(fftfreq(self.ny) * self.ny)
-        gz_list = np.rint(fftfreq(self.nz) * self.nz)
-        #print(gz_list, gy_list, gx_list)
-
+        gx, gy, gz = np.meshgrid(*self.gvecs_axes, indexing="ij")
         gvecs = np.empty((self.size, 3), dtype=np.int)
-
-        idx = -1
-        for gx in gx_list:
-            for gy in gy_list:
-                for gz in gz_list:
-                    idx += 1
-                    gvecs[idx, :] = gx, gy, gz
+        gvecs[:, 0] = gx.ravel()
+        gvecs[:, 1] = gy.ravel()
+        gvecs[:, 2] = gz.ravel()
 
         return gvecs
 
     @lazy_property
     def gmods(self):
         """[ng] |numpy-array| with :math:`|G|`"""
+        # |G|^2 = g^T gmet g computed by broadcasting the G-components along the three axes.
         gmet = np.dot(self.inv_vectors.T, self.inv_vectors)
-        gmods = np.empty(self.size)
-        for i, g in enumerate(self.gvecs):
-            gmods[i] = np.dot(g, np.dot(gmet, g))
+        gx, gy, gz = self.gvecs_axes
+        gx, gy, gz = gx[:, None, None], gy[None, :, None], gz[None, None, :]
+        gmods = (gmet[0, 0] * gx**2 + gmet[1, 1] * gy**2 + gmet[2, 2] * gz**2 +
+                 2 * (gmet[0, 1] * gx * gy + gmet[0, 2] * gx * gz + gmet[1, 2] * gy * gz))
 
-        return 2 * np.pi * np.sqrt(gmods)
+        return 2 * np.pi * np.sqrt(np.abs(gmods.ravel()))
+
+    def integrate_in_spheres_g(self, datag, frac_coords, radii, atom_chunk=64):
+        r"""
+        Integrate functions given in G-space inside spheres centered on ``frac_coords``:
+
+            4 \pi \sum_G f(G) e^{i G.R} \int_0^{r_c} r^2 j_0(|G|r) dr
+
+        The structure factor e^{iG.R} is separable so the phases are computed along the three
+        axes of the FFT box and contracted with f(G) with a matrix-matrix product
+        over all the spheres with the same radius.
+
+        Args:
+            datag: [ndt, nx, ny, nz] array in G-space (e.g. output of fft_r2g).
+                All the ndt components (spins, spinor components) are integrated simultaneously.
+            frac_coords: [natom, 3] array with the centers of the spheres in reduced coordinates.
+            radii: [natom] or [natom, nrad] array with the radii of the spheres (units of self.vectors).
+            atom_chunk: Max number of spheres treated in a single matrix product. Bounds memory.
+
+        Return:
+            Complex array of shape [ndt, natom] if radii is a 1d array else [ndt, natom, nrad].
+        """
+        from abipy.tools.bessel import int_r2j0qr
+        datag = self.reshape(datag)
+        ndt = len(datag)
+        nx, ny, nz = self.shape
+        frac_coords = np.reshape(frac_coords, (-1, 3))
+        natom = len(frac_coords)
+        radii = np.asarray(radii, dtype=np.float)
+        squeeze = radii.ndim == 1
+        radii = np.reshape(radii, (natom, -1))
+
+        # Separable structure factors: [ng_axis, natom] arrays.
+        gx, gy, gz = self.gvecs_axes
+        phx = np.exp(2j * np.pi * np.outer(gx, frac_coords[:, 0]))
+        phy = np.exp(2j * np.pi * np.outer(gy, frac_coords[:, 1]))
+        phz = np.exp(2j * np.pi * np.outer(gz, frac_coords[:, 2]))
+        gmods = np.reshape(self.gmods, self.shape)
+
+        out = np.zeros((ndt, natom, radii.shape[1]), dtype=np.complex)
+        for rcut in np.unique(radii):
+            # Radial kernel for this radius multiplied by f(G).
+            fg = np.reshape(datag * int_r2j0qr(gmods, rcut), (ndt * nx * ny, nz))
+            iatoms, irads = np.nonzero(radii == rcut)
+            for start in range(0, len(iatoms), atom_chunk):
+                ia, ir = iatoms[start:start + atom_chunk], irads[start:start + atom_chunk]
+                # Contract z with GEMM, then y and x.
+                tmp = np.reshape(np.dot(fg, phz[:, ia]), (ndt, nx, ny, len(ia)))
+                tmp = np.einsum("dxya,ya->dxa", tmp, phy[:, ia])
+                out[:, ia, ir] = np.einsum("dxa,xa->da", tmp, phx[:, ia])
+
+        out *= 4 * np.pi
+        return out[..., 0] if squeeze else out
 
     #@lazy_property
     #def gmax(self)
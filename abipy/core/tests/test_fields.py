@@ -103,6 +103,18 @@ class TestScalarField(AbipyTest):
             same_si_den = r.read_field()
             assert np.all(same_si_den.datar == si_den.datar)
 
+            # Slice-by-slice access to datar.
+            view = r.read_datar_view()
+            assert view.shape == si_den.datar.shape
+            self.assert_almost_equal(view[0, :, :, 3], si_den.datar[0, :, :, 3])
+            self.assert_almost_equal(view.component(0)[2], si_den.datar[0, 2])
+            from io import StringIO
+            from abipy.iotools import xsf
+            s1, s2 = StringIO(), StringIO()
+            xsf.xsf_write_data(s1, si_den.structure, si_den.datar)
+            xsf.xsf_write_data(s2, si_den.structure, view)
+            assert s1.getvalue() == s2.getvalue()
+
         ne = 8
         assert ne == nelect_file
         self.assert_almost_equal(si_den.get_nelect(), ne)
@@ -131,6 +143,10 @@ class TestScalarField(AbipyTest):
         self.assert_almost_equal(df["ntot"].values, 2 * [2.010537])
         self.assert_almost_equal(df["rsph_ang"].values, 2 * [1.11])
         df = si_den.integrate_in_spheres(rcut_symbol=2, out=False)
+        df_multi = si_den.integrate_in_spheres(rcut_symbol={"Si": [1.11, 2]}, out=False)
+        assert len(df_multi) == 4
+        self.assert_almost_equal(df_multi["ntot"].values[::2], 2 * [2.010537])
+        self.assert_almost_equal(df_multi["ntot"].values[1::2], df["ntot"].values)
 
         if self.has_matplotlib():
             assert si_den.plot_line(0, 1, num=1000, show=False)
@@ -9,7 +9,7 @@ from pymatgen.core.lattice import Lattice
 from abipy import abilab
 from abipy.core.kpoints import (wrap_to_ws, wrap_to_bz, issamek, Kpoint, KpointList, IrredZone, Kpath, KpointsReader,
     has_timrev_from_kptopt, KSamplingInfo, as_kpoints, rc_list, kmesh_from_mpdivs, map_grid2ibz,
-    set_atol_kdiff, set_spglib_tols, kpath_from_bounds_and_ndivsm, build_segments)  #Ktables,
+    set_atol_kdiff, set_spglib_tols, kpath_from_bounds_and_ndivsm, build_segments, ibz_from_kmesh)  #Ktables,
 from abipy.core.testing import AbipyTest
 
 
@@ -592,6 +592,51 @@ class TestKsamplingInfo(AbipyTest):
         assert not ksi_none.is_path
 
 
+class TestIbzFromKmesh(AbipyTest):
+
+    def test_ibz_from_kmesh(self):
+        """Testing ibz_from_kmesh with the IBZ produced by Abinit."""
+        from abipy.iotools import ETSF_Reader
+        # Diagonal meshes, shifted meshes, 4 shifts converted to non-diagonal kptrlatt, kptopt 3.
+        for basename in ("si_scf_GSR.nc", "ni_666k_GSR.nc", "mgb2_kmesh181818_FATBANDS.nc",
+                         "sio2_DEN.nc", "si_444_MDF.nc", "tw90_4o_DS3_ABIWAN.nc"):
+            path = abidata.ref_file(basename)
+            structure = abilab.Structure.from_file(path)
+            assert structure.abi_spacegroup is not None
+            with ETSF_Reader(path) as r:
+                kptopt = int(r.read_value("kptopt"))
+                kptrlatt = r.read_value("kptrlatt_orig", default=None)
+                shiftk = r.read_value("shiftk_orig", default=None)
+                if kptrlatt is None: kptrlatt = r.read_value("kptrlatt")
+                if shiftk is None: shiftk = r.read_value("shiftk")
+                ref_points = r.read_value("reduced_coordinates_of_kpoints")
+                ref_weights = r.read_value("kpoint_weights")
+
+            # Use Abinit symmetries and then spglib.
+            spglib_structure = structure.copy()
+            spglib_structure.set_abi_spacegroup(None)
+            for s in (structure, spglib_structure):
+                ibz = ibz_from_kmesh(s, kptrlatt=kptrlatt, shiftk=shiftk, kptopt=kptopt, use_cache=False)
+                self.assert_almost_equal(ibz.points, ref_points, decimal=6)
+                self.assert_almost_equal(ibz.weights, ref_weights)
+
+        # Cached results are not affected by modifications of the output.
+        structure = abilab.Structure.from_file(abidata.cif_file("si.cif"))
+        ibz = ibz_from_kmesh(structure, ngkpt=(2, 2, 2), shiftk=(0, 0, 0))
+        self.assert_equal(ibz.points, [[0, 0, 0], [0.5, 0, 0], [0.5, 0.5, 0]])
+        self.assert_equal(ibz.weights, [0.125, 0.5, 0.375])
+        ibz.points[:] = 0
+        self.assert_equal(ibz_from_kmesh(structure, ngkpt=(2, 2, 2), shiftk=(0, 0, 0)).points[1], [0.5, 0, 0])
+        assert len(ibz_from_kmesh(structure, ngkpt=(2, 2, 2), shiftk=(0, 0, 0), kptopt=3).points) == 8
+
+        with self.assertRaises(ValueError):
+            ibz_from_kmesh(structure, shiftk=(0, 0, 0))
+        with self.assertRaises(NotImplementedError):
+            ibz_from_kmesh(structure, ngkpt=(2, 2, 2), shiftk=(0, 0, 0), kptopt=-2)
+        with self.assertRaises(NotImplementedError):
+            ibz_from_kmesh(structure, ngkpt=(2, 2, 2), shiftk=[[0, 0, 0], [0.5, 0.5, 0.5]])
+
+
 class TestKmappingTools(AbipyTest):
 
     def setUp(self):
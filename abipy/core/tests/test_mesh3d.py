@@ -32,6 +32,8 @@ class TestMesh3D(AbipyTest):
 
         gmods = mesh_444.gmods
         assert gmods.shape == mesh_444.size
+        gx, gy, gz = mesh_444.gvecs_axes
+        self.assert_equal(gx, [0, 1, -2, -1])
 
         assert gmods[0] == 0
         self.assert_almost_equal(gmods[1], 2 * np.pi)
@@ -98,6 +100,30 @@ class TestMesh3D(AbipyTest):
                 int_g = fg[..., 0, 0, 0]
                 self.assert_almost_equal(int_r, int_g)
 
+    def test_integrate_in_spheres_g(self):
+        """Testing integration inside spheres with mesh3d"""
+        from abipy.tools.bessel import int_r2j0qr
+        rprimd = np.reshape([0, 2.7, 2.7, 2.7, 0, 2.7, 2.7, 2.7, 0.], (3, 3))
+        mesh = Mesh3D((12, 10, 8), rprimd)
+        np.random.seed(2)
+        datag = mesh.crandom(extra_dims=(4,))
+        frac_coords = np.random.rand(5, 3)
+        radii = np.array([[1.0, 1.5], [1.2, 1.0], [1.0, 1.5], [0.7, 0.8], [1.1, 1.1]])
+
+        values = mesh.integrate_in_spheres_g(datag, frac_coords, radii, atom_chunk=2)
+        assert values.shape == (4, 5, 2)
+
+        # Compare with brute-force sum over G-vectors.
+        fg = np.reshape(datag, (4, -1))
+        for iatom, fcoords in enumerate(frac_coords):
+            phases = np.exp(2j * np.pi * np.dot(mesh.gvecs, fcoords))
+            for irad, rcut in enumerate(radii[iatom]):
+                ref = 4 * np.pi * np.sum(fg * phases * int_r2j0qr(mesh.gmods, rcut), axis=1)
+                self.assert_almost_equal(values[:, iatom, irad], ref)
+
+        values = mesh.integrate_in_spheres_g(datag, frac_coords, radii[:, 0])
+        assert values.shape == (4, 5)
+
     #def test_trilinear_interp(self):
     #    rprimd = np.array([1.,0,0, 0,1,0, 0,0,1])
     #    rprimd.shape = (3,3)
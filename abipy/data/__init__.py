@@ -7,7 +7,7 @@ Preferred way to import the module is via the import syntax:
 import os
 
 from abipy.core.structure import Structure
-from abipy.flowtk import Pseudo, PseudoTable
+from abipy.flowtk import PseudoTable, get_pseudo_cache
 from abipy.data.ucells import structure_from_ucell
 
 
@@ -78,13 +78,12 @@ pseudo_dir = _PSEUDOS_DIRPATH
 def pseudo(filename):
     """Returns a `Pseudo` object."""
     filepath = os.path.join(_PSEUDOS_DIRPATH, filename)
-    return Pseudo.from_file(filepath)
+    return get_pseudo_cache().get_pseudo(filepath)
 
 
 def pseudos(*filenames):
     """Returns a PseudoTable constructed from the input filenames  located in tests/data/pseudos."""
-    pseudos = list(map(pseudo, filenames))
-    return PseudoTable(pseudos)
+    return PseudoTable([os.path.join(_PSEUDOS_DIRPATH, f) for f in filenames])
 
 
 def var_file(filename):
@@ -15,7 +15,7 @@ from monty.functools import lazy_property
 from abipy.core.kpoints import Kpath, IrredZone, KSamplingInfo
 from abipy.core.mixins import AbinitNcFile, Has_Structure, NotebookWriter
 from abipy.abio.inputs import AnaddbInput
-from abipy.dfpt.phonons import PhononBands, PhononBandsPlotter, PhononDos, match_eigenvectors, get_dyn_mat_eigenvec
+from abipy.dfpt.phonons import PhononBands, PhononBandsPlotter, PhononDos, match_eigenvectors_batch, get_dyn_mat_eigenvec
 from abipy.dfpt.ddb import DdbFile
 from abipy.iotools import ETSF_Reader
 from abipy.tools.plotting import add_fig_kwargs, get_ax_fig_plt, get_axarray_fig_plt, set_axlims
@@ -972,9 +972,8 @@ def calculate_gruns_finite_differences(phfreqs, eig, iv0, volume, dv):
         for i in range(nvols):
             if i == iv0:
                 continue
-            for iq in range(phfreqs.shape[1]):
-                ind = match_eigenvectors(eig[iv0, iq], eig[i, iq])
-                phfreqs[i, iq] = phfreqs[i, iq][ind]
+            ind = match_eigenvectors_batch(eig[iv0], eig[i])
+            phfreqs[i] = np.take_along_axis(phfreqs[i], ind, axis=-1)
 
     acc = nvols - 1
     g = np.zeros_like(phfreqs[0])
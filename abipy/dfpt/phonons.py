@@ -5,6 +5,7 @@ import itertools
 import pickle
 import os
 import json
+import hashlib
 import warnings
 import abipy.core.abinit_units as abu
 
@@ -26,7 +27,7 @@ from abipy.iotools import ETSF_Reader
 from abipy.tools import duck
 from abipy.tools.numtools import gaussian, sort_and_groupby
 from abipy.tools.plotting import add_fig_kwargs, get_ax_fig_plt, set_axlims, get_axarray_fig_plt, set_visible, set_ax_xylabels
-from .phtk import match_eigenvectors, get_dyn_mat_eigenvec, open_file_phononwebsite, NonAnalyticalPh
+from .phtk import match_eigenvectors_batch, get_dyn_mat_eigenvec, open_file_phononwebsite, NonAnalyticalPh
 
 __all__ = [
     "PhononBands",
@@ -36,6 +37,7 @@ __all__ = [
     "PhononDosPlotter",
     "PhdosReader",
     "PhdosFile",
+    "harmonic_thermo_from_doses",
 ]
 
 
@@ -1323,32 +1325,38 @@ See also <https://forum.abinit.org/viewtopic.php?f=10&t=545>
             # before. This should avoid exchange of lines due to degeneracies.
             # The code will assume that there is a high symmetry point if the points are not collinear (change in the
             # direction in the path).
-            def collinear(a, b, c):
-                v1 = [b[0] - a[0], b[1] - a[1], b[2] - a[2]]
-                v2 = [c[0] - a[0], c[1] - a[1], c[2] - a[2]]
-                d = [v1, v2, [1, 1, 1]]
-                return np.isclose(np.linalg.det(d), 0, atol=1e-5)
-
+            # The reference point of each q-point is computed first so that all the overlaps of a block
+            # are obtained with a single call to match_eigenvectors_batch. Only the composition of the
+            # permutations is done sequentially.
             for i, displ in enumerate(self.split_phdispl_cart):
                 eigenvectors = get_dyn_mat_eigenvec(displ, self.structure, amu=self.amu)
-                ind_block = np.zeros((len(displ), self.num_branches), dtype=np.int)
+                nq = len(displ)
+                ind_block = np.zeros((nq, self.num_branches), dtype=np.int)
+
+                qpts = np.asarray(self.split_qpoints[i])
+                ref = np.arange(-1, nq - 1)
+                if nq > 2:
+                    d = np.ones((nq - 2, 3, 3))
+                    d[:, 0] = qpts[1:-1] - qpts[:-2]
+                    d[:, 1] = qpts[2:] - qpts[:-2]
+                    collinear = np.isclose(np.linalg.det(d), 0, atol=1e-5)
+                    ref[2:] = np.where(collinear, ref[2:], ref[2:] - 1)
+
                 # if it's not the first block, match the first two points with the last of the previous block.
                 # Should give a match in case of LO-TO splitting
                 if i == 0:
+                    matches = match_eigenvectors_batch(eigenvectors[ref[1:]], eigenvectors[1:])
                     ind_block[0] = range(self.num_branches)
-                    match = match_eigenvectors(eigenvectors[0], eigenvectors[1])
-                    ind_block[1] = [match[m] for m in ind_block[0]]
+                    ind_block[1] = matches[0]
+                    shift = 1
                 else:
-                    match = match_eigenvectors(last_eigenvectors, eigenvectors[0])
-                    ind_block[0] = [match[m] for m in split_matched_indices[-1][-2]]
-                    match = match_eigenvectors(last_eigenvectors, eigenvectors[1])
-                    ind_block[1] = [match[m] for m in split_matched_indices[-1][-2]]
-                for j in range(2, len(displ)):
-                    k = j-1
-                    if not collinear(self.split_qpoints[i][j-2], self.split_qpoints[i][j-1], self.split_qpoints[i][j]):
-                        k = j-2
-                    match = match_eigenvectors(eigenvectors[k], eigenvectors[j])
-                    ind_block[j] = [match[m] for m in ind_block[k]]
+                    v1s = np.concatenate([np.array([last_eigenvectors, last_eigenvectors]), eigenvectors[ref[2:]]])
+                    matches = match_eigenvectors_batch(v1s, eigenvectors)
+                    ind_block[0] = matches[0][split_matched_indices[-1][-2]]
+                    ind_block[1] = matches[1][split_matched_indices[-1][-2]]
+                    shift = 0
+                for j in range(2, nq):
+                    ind_block[j] = matches[j - shift][ind_block[ref[j]]]
 
                 split_matched_indices.append(ind_block)
                 last_eigenvectors = eigenvectors[-2]
@@ -2781,6 +2789,20 @@ class PhononDos(Function1D):
 
         return fig
 
+    def get_harmonic_thermo(self, tstart=5, tstop=300, num=50):
+        """
+        Compute all the thermodynamic properties in the harmonic approximation at once.
+        Results are cached so that the different ``get_*`` methods do not recompute the occupation factors.
+
+        Args:
+            tstart: The starting value (in Kelvin) of the temperature mesh.
+            tstop: The end value (in Kelvin) of the mesh.
+            num (int): optional Number of samples to generate. Default is 50.
+
+        Return: namedtuple with arrays of shape (1, num). See :func:`harmonic_thermo_from_doses`.
+        """
+        return harmonic_thermo_from_doses([self], np.linspace(tstart, tstop, num=num))
+
     def get_internal_energy(self, tstart=5, tstop=300, num=50):
         """
         Returns the internal energy, in eV, in the harmonic approximation for different temperatures
@@ -2793,22 +2815,8 @@ class PhononDos(Function1D):
 
         Return: |Function1D| object with U(T) + ZPE.
         """
-        tmesh = np.linspace(tstart, tstop, num=num)
-        w, gw = self.mesh[self.iw0:], self.values[self.iw0:]
-        if w[0] < 1e-12:
-            w, gw = self.mesh[self.iw0+1:], self.values[self.iw0+1:]
-        coth = lambda x: 1.0 / np.tanh(x)
-
-        vals = np.empty(len(tmesh))
-        for it, temp in enumerate(tmesh):
-            if temp == 0:
-                vals[it] = self.zero_point_energy
-            else:
-                wd2kt = w / (2 * abu.kb_eVK * temp)
-                vals[it] = 0.5 * np.trapz(w * coth(wd2kt) * gw, x=w)
-            #print(vals[it])
-
-        return Function1D(tmesh, vals)
+        thermo = self.get_harmonic_thermo(tstart=tstart, tstop=tstop, num=num)
+        return Function1D(thermo.tmesh, thermo.internal_energy[0])
 
     def get_entropy(self, tstart=5, tstop=300, num=50):
         """
@@ -2821,21 +2829,8 @@ class PhononDos(Function1D):
 
         Return: |Function1D| object with S(T).
         """
-        tmesh = np.linspace(tstart, tstop, num=num)
-        w, gw = self.mesh[self.iw0:], self.values[self.iw0:]
-        if w[0] < 1e-12:
-            w, gw = self.mesh[self.iw0+1:], self.values[self.iw0+1:]
-        coth = lambda x: 1.0 / np.tanh(x)
-
-        vals = np.empty(len(tmesh))
-        for it, temp in enumerate(tmesh):
-            if temp == 0:
-                vals[it] = 0
-            else:
-                wd2kt = w / (2 * abu.kb_eVK * temp)
-                vals[it] = np.trapz((wd2kt * coth(wd2kt) - np.log(2 * np.sinh(wd2kt))) * gw, x=w)
-
-        return Function1D(tmesh, abu.kb_eVK * vals)
+        thermo = self.get_harmonic_thermo(tstart=tstart, tstop=tstop, num=num)
+        return Function1D(thermo.tmesh, thermo.entropy[0])
 
     def get_free_energy(self, tstart=5, tstop=300, num=50):
         """
@@ -2849,10 +2844,8 @@ class PhononDos(Function1D):
 
         Return: |Function1D| object with F(T) = U(T) + ZPE - T x S(T)
         """
-        uz = self.get_internal_energy(tstart=tstart, tstop=tstop, num=num)
-        s = self.get_entropy(tstart=tstart, tstop=tstop, num=num)
-
-        return Function1D(uz.mesh, uz.values - s.mesh * s.values)
+        thermo = self.get_harmonic_thermo(tstart=tstart, tstop=tstop, num=num)
+        return Function1D(thermo.tmesh, thermo.free_energy[0])
 
     def get_cv(self, tstart=5, tstop=300, num=50):
         """
@@ -2866,21 +2859,8 @@ class PhononDos(Function1D):
 
         Return: |Function1D| object with C_v(T).
         """
-        tmesh = np.linspace(tstart, tstop, num=num)
-        w, gw = self.mesh[self.iw0:], self.values[self.iw0:]
-        if w[0] < 1e-12:
-            w, gw = self.mesh[self.iw0+1:], self.values[self.iw0+1:]
-        csch2 = lambda x: 1.0 / (np.sinh(x) ** 2)
-
-        vals = np.empty(len(tmesh))
-        for it, temp in enumerate(tmesh):
-            if temp == 0:
-                vals[it] = 0
-            else:
-                wd2kt = w / (2 * abu.kb_eVK * temp)
-                vals[it] = np.trapz(wd2kt ** 2 * csch2(wd2kt) * gw, x=w)
-
-        return Function1D(tmesh, abu.kb_eVK * vals)
+        thermo = self.get_harmonic_thermo(tstart=tstart, tstop=tstop, num=num)
+        return Function1D(thermo.tmesh, thermo.cv[0])
 
     @add_fig_kwargs
     def plot_harmonic_thermo(self, tstart=5, tstop=300, num=50, units="eV", formula_units=None,
@@ -2965,6 +2945,139 @@ class PhononDos(Function1D):
         return self.debye_temp/nsites**(1/3)
 
 
+# Cache for harmonic_thermo_from_doses.
+# The key is the md5 of the DOS and of the temperature mesh so that objects with the same content share the results.
+_HARMONIC_THERMO_CACHE = OrderedDict()
+_HARMONIC_THERMO_CACHE_MAXSIZE = 256
+_HARMONIC_THERMO_NAMES = ("internal_energy", "entropy", "free_energy", "cv")
+
+
+def _harmonic_thermo_key(phdos, tmesh):
+    """Hash computed from the content of the DOS and the temperature mesh."""
+    md5 = hashlib.md5()
+    for arr in (phdos.mesh, phdos.values, tmesh):
+        md5.update(np.ascontiguousarray(arr, dtype=np.float).tobytes())
+    return md5.hexdigest()
+
+
+def _harmonic_thermo_integrands(w, beta):
+    """
+    Integrands for U, S and C_v for frequencies ``w`` (eV) and inverse temperatures ``beta`` (1/eV) > 0.
+    Written in terms of exp(-w beta) so that no overflow occurs at low temperature.
+    """
+    x = 0.5 * w * beta
+    emx = np.exp(-2 * x)
+    # 1 - exp(-2x), accurate also for small x.
+    one_m_emx = -np.expm1(-2 * x)
+    coth = (1 + emx) / one_m_emx
+    u = 0.5 * w * coth
+    # x coth(x) - log(2 sinh(x))
+    s = 2 * x * emx / one_m_emx - np.log(one_m_emx)
+    # x^2 / sinh^2(x)
+    cv = 4 * x ** 2 * emx / one_m_emx ** 2
+    return u, s, cv
+
+
+def harmonic_thermo_from_doses(doses, tmesh, max_chunk_mb=32, use_cache=True):
+    """
+    Compute the thermodynamic properties in the harmonic approximation for a list of phonon DOSes
+    (e.g. the DOSes computed at different volumes) and a list of temperatures.
+    The integrals over frequencies are computed for all the DOSes and all the temperatures with
+    array operations that share the occupation factors.
+    Results are cached using the content of the DOS and of the temperature mesh as key.
+
+    Args:
+        doses: List of |PhononDos| objects.
+        tmesh: List of temperatures in Kelvin (>= 0).
+        max_chunk_mb: Temperatures are processed in chunks so that the temporary arrays do not exceed this size in Mb.
+        use_cache: False to ignore the cache.
+
+    Return: namedtuple with the following attributes::
+
+        tmesh: numpy array with the temperatures. Shape (ntemp).
+        internal_energy: internal energy in eV, zero point energy included. Shape (ndos, ntemp).
+        entropy: entropy in eV/K. Shape (ndos, ntemp).
+        free_energy: free energy in eV, zero point energy included. Shape (ndos, ntemp).
+        cv: constant-volume specific heat in eV/K. Shape (ndos, ntemp).
+        zpe: zero point energy in eV. Shape (ndos).
+    """
+    tmesh = np.array(tmesh, dtype=np.float)
+    if np.any(tmesh < 0):
+        raise ValueError("Temperatures should be >= 0 but got: %s" % str(tmesh))
+
+    ndos, ntemp = len(doses), len(tmesh)
+    res = {name: np.empty((ndos, ntemp)) for name in _HARMONIC_THERMO_NAMES}
+    zpe = np.empty(ndos)
+
+    # Get results from cache and find the DOSes that should be computed.
+    todo = []
+    for idos, phdos in enumerate(doses):
+        key = _harmonic_thermo_key(phdos, tmesh)
+        cached = _HARMONIC_THERMO_CACHE.get(key) if use_cache else None
+        if cached is not None:
+            _HARMONIC_THERMO_CACHE.move_to_end(key)
+            for name in _HARMONIC_THERMO_NAMES:
+                res[name][idos] = cached[name]
+            zpe[idos] = cached["zpe"]
+        else:
+            todo.append((idos, key, phdos))
+
+    if todo:
+        # Stack the positive part of the DOSes. Meshes with different sizes are padded with
+        # the last frequency and zero weight so that the padded points do not contribute.
+        meshes, weights = [], []
+        for _, _, phdos in todo:
+            iw0 = phdos.iw0
+            w, gw = phdos.mesh[iw0:], phdos.values[iw0:]
+            if w[0] < 1e-12:
+                w, gw = phdos.mesh[iw0+1:], phdos.values[iw0+1:]
+            # Trapezoidal weights so that the integral reduces to a dot product.
+            dw = np.diff(w)
+            wtrap = np.zeros(len(w))
+            wtrap[:-1] += 0.5 * dw
+            wtrap[1:] += 0.5 * dw
+            meshes.append(w)
+            weights.append(wtrap * gw)
+
+        nw = max(len(w) for w in meshes)
+        w_stack = np.empty((len(todo), nw))
+        wts_stack = np.zeros((len(todo), nw))
+        for i, (w, wts) in enumerate(zip(meshes, weights)):
+            w_stack[i, :len(w)] = w
+            w_stack[i, len(w):] = w[-1]
+            wts_stack[i, :len(w)] = wts
+
+        # T = 0 is treated separately: U = ZPE, S = 0, C_v = 0
+        zpe_todo = np.array([float(phdos.zero_point_energy) for _, _, phdos in todo])
+        u, s, cv = (np.zeros((len(todo), ntemp)) for i in range(3))
+        u[:, tmesh == 0] = zpe_todo[:, None]
+
+        itemps = np.flatnonzero(tmesh > 0)
+        # Each chunk allocates ~6 temporary arrays of shape (ndos, tchunk, nw)
+        tchunk = max(1, int(max_chunk_mb * 1024 ** 2 / (6 * 8 * len(todo) * nw)))
+        for start in range(0, len(itemps), tchunk):
+            its = itemps[start:start + tchunk]
+            beta = 1.0 / (abu.kb_eVK * tmesh[its])
+            u_int, s_int, cv_int = _harmonic_thermo_integrands(w_stack[:, None, :], beta[None, :, None])
+            u[:, its] = np.einsum("dtw,dw->dt", u_int, wts_stack)
+            s[:, its] = abu.kb_eVK * np.einsum("dtw,dw->dt", s_int, wts_stack)
+            cv[:, its] = abu.kb_eVK * np.einsum("dtw,dw->dt", cv_int, wts_stack)
+
+        f = u - tmesh * s
+        for i, (idos, key, _) in enumerate(todo):
+            entry = dict(internal_energy=u[i].copy(), entropy=s[i].copy(), free_energy=f[i].copy(),
+                         cv=cv[i].copy(), zpe=zpe_todo[i])
+            for name in _HARMONIC_THERMO_NAMES:
+                res[name][idos] = entry[name]
+            zpe[idos] = entry["zpe"]
+            if use_cache:
+                _HARMONIC_THERMO_CACHE[key] = entry
+                if len(_HARMONIC_THERMO_CACHE) > _HARMONIC_THERMO_CACHE_MAXSIZE:
+                    _HARMONIC_THERMO_CACHE.popitem(last=False)
+
+    return dict2namedtuple(tmesh=tmesh, zpe=zpe, **res)
+
+
 class PhdosReader(ETSF_Reader):
     """
     This object reads data from the PHDOS.nc file produced by anaddb.
@@ -4259,14 +4372,15 @@ class PhononDosPlotter(NotebookWriter):
         # don't show the last ax if num_plots is odd.
         if num_plots % ncols != 0: ax_mat[-1, -1].axis("off")
 
+        # Compute all thermodynamic quantities for all the DOSes at once.
+        thermo = harmonic_thermo_from_doses(list(self._phdoses_dict.values()), np.linspace(tstart, tstop, num=num))
+
         for iax, (qname, ax) in enumerate(zip(quantities, ax_mat.flat)):
-            for i, (label, phdos) in enumerate(self._phdoses_dict.items()):
-                # Compute thermodynamic quantity associated to qname.
-                f1d = getattr(phdos, "get_" + qname)(tstart=tstart, tstop=tstop, num=num)
-                ys = f1d.values
-                if formula_units != 1: ys /= formula_units
+            for i, label in enumerate(self._phdoses_dict.keys()):
+                ys = getattr(thermo, qname)[i]
+                if formula_units != 1: ys = ys / formula_units
                 if units == "Jmol": ys = ys * abu.e_Cb * abu.Avogadro
-                ax.plot(f1d.mesh, ys, label=label)
+                ax.plot(thermo.tmesh, ys, label=label)
 
             ax.set_title(qname, fontsize=fontsize)
             ax.grid(True)
@@ -64,11 +64,17 @@ def match_eigenvectors(v1, v2):
     Given two list of vectors, returns the pair matching based on the complex scalar product.
     Returns the indices of the second list that match the vectors of the first list in ascending order.
     """
-    prod = np.absolute(np.dot(v1, v2.transpose().conjugate()))
+    return match_eigenvectors_batch(np.asarray(v1)[None], np.asarray(v2)[None])[0]
 
-    indices = np.zeros(len(v1), dtype=np.int)
-    missing_v1 = [True] * len(v1)
-    missing_v2 = [True] * len(v1)
+
+def _match_overlaps(prod):
+    """
+    Greedy assignment: pairs are selected in descending order of the overlap ``prod[i, j]``
+    skipping the rows and columns that have already been assigned.
+    """
+    indices = np.zeros(len(prod), dtype=np.int)
+    missing_v1 = [True] * len(prod)
+    missing_v2 = [True] * len(prod)
     for m in reversed(np.argsort(prod, axis=None)):
         i, j = np.unravel_index(m, prod.shape)
         if missing_v1[i] and missing_v2[j]:
@@ -76,12 +82,64 @@ def match_eigenvectors(v1, v2):
             missing_v1[i] = missing_v2[j] = False
             if not any(missing_v1):
                 if any(missing_v2):
-                    raise RuntimeError('Something went wrong in matching vectors: {} {}'.format(v1, v2))
+                    raise RuntimeError('Something went wrong in matching vectors. Overlaps: {}'.format(prod))
                 break
 
     return indices
 
 
+def match_eigenvectors_batch(v1s, v2s, deg_tol=1e-6, max_chunk_mb=64):
+    """
+    Vectorized version of :func:`match_eigenvectors` for a stack of pairs of eigenvector sets.
+
+    The overlaps of all the pairs are computed with a single contraction (in chunks of at most
+    ``max_chunk_mb`` MB). When the largest overlap of each row is unique (larger than the second one
+    by more than ``deg_tol``) and the row maxima form a permutation, the greedy assignment reduces to
+    the argmax of the rows, hence the solver is called only for the pairs with (quasi-)degenerate
+    or crossing branches. The result is the same as the one obtained by calling :func:`match_eigenvectors`
+    for each pair.
+
+    Args:
+        v1s: Complex array of shape [npairs, nvec, ndim] with the first set of vectors of each pair.
+        v2s: Complex array of shape [npairs, nvec, ndim] with the second set of vectors of each pair.
+        deg_tol: Tolerance on the difference between the two largest overlaps of a row
+            below which the fast path is not used.
+        max_chunk_mb: Max size in MB of the overlap matrices computed in a single contraction.
+
+    Return:
+        Integer array of shape [npairs, nvec] with the indices of the vectors of ``v2s[p]``
+        matching the vectors of ``v1s[p]``.
+    """
+    v1s, v2s = np.asarray(v1s), np.asarray(v2s)
+    if v1s.shape != v2s.shape or v1s.ndim != 3:
+        raise ValueError("Expecting two arrays with shape [npairs, nvec, ndim] but got %s and %s" % (
+            str(v1s.shape), str(v2s.shape)))
+
+    npairs, nvec = v1s.shape[:2]
+    indices = np.empty((npairs, nvec), dtype=np.int)
+    if npairs == 0: return indices
+    if nvec == 1:
+        indices[:] = 0
+        return indices
+
+    chunk = max(1, int(max_chunk_mb * 1024 ** 2 / (16 * nvec ** 2)))
+    for start in range(0, npairs, chunk):
+        stop = min(start + chunk, npairs)
+        prods = np.abs(np.matmul(v1s[start:stop], v2s[start:stop].conj().swapaxes(-1, -2)))
+
+        # Fast path: unique row maxima forming a permutation.
+        top2 = -np.partition(-prods, 1, axis=-1)[..., :2]
+        best = np.argmax(prods, axis=-1)
+        is_perm = np.all(np.sort(best, axis=-1) == np.arange(nvec), axis=-1)
+        ok = is_perm & np.all(top2[..., 0] - top2[..., 1] > deg_tol, axis=-1)
+        indices[start:stop][ok] = best[ok]
+
+        for p in np.where(~ok)[0]:
+            indices[start + p] = _match_overlaps(prods[p])
+
+    return indices
+
+
 class NonAnalyticalPh(Has_Structure):
     """
     Phonon data at gamma including non analytical contributions
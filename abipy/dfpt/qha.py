@@ -2,17 +2,18 @@
 import numpy as np
 import os
 import abc
+import collections
 import abipy.core.abinit_units as abu
 
 from scipy.interpolate import UnivariateSpline
 from monty.collections import dict2namedtuple
 from monty.functools import lazy_property
-from pymatgen.analysis.eos import EOS
+from pymatgen.analysis.eos import EOS, EOSError, PolynomialEOS
 from abipy.core.func1d import Function1D
 from abipy.tools.plotting import add_fig_kwargs, get_ax_fig_plt, get_axarray_fig_plt
 from abipy.electrons.gsr import GsrFile
 from abipy.dfpt.ddb import DdbFile
-from abipy.dfpt.phonons import PhononBandsPlotter, PhononDos, PhdosFile
+from abipy.dfpt.phonons import PhononBandsPlotter, PhononDos, PhdosFile, harmonic_thermo_from_doses
 from abipy.dfpt.gruneisen import GrunsNcFile
 
 
@@ -23,6 +24,8 @@ class AbstractQHA(metaclass=abc.ABCMeta):
     generate an instance of phonopy.qha.QHA. These can be used to obtain other quantities and plots.
     Does not include electronic entropic contributions for metals.
     """
+    # Max number of results of fit_energies stored in the cache (the least recently used are removed first).
+    FIT_CACHE_MAXSIZE = 16
 
     def __init__(self, structures, energies, eos_name='vinet', pressure=0):
         """
@@ -39,6 +42,8 @@ class AbstractQHA(metaclass=abc.ABCMeta):
 
         self.volumes = np.array([s.volume for s in structures])
         self.iv0 = np.argmin(energies)
+        # LRU cache for the results of fit_energies.
+        self._fit_cache = collections.OrderedDict()
 
     def fit_energies(self, tstart=0, tstop=800, num=100):
         """
@@ -57,9 +62,17 @@ class AbstractQHA(metaclass=abc.ABCMeta):
                     eos chosen. Contains the fit for the energies at the different temperatures.
                 min_en: numpy array with the minimum energies for the list of temperatures
                 min_vol: numpy array with the minimum volumes for the list of temperatures
+                b0: numpy array with the bulk modulus in eV/Ang^3 for the list of temperatures
                 temp: numpy array with the temperatures considered
 
+        The last FIT_CACHE_MAXSIZE results are cached so that the derived quantities (thermal expansion, V(T) ...)
+        do not repeat the fit.
         """
+        key = (self.eos._eos_name, self.pressure, tstart, tstop, num)
+        if key in self._fit_cache:
+            self._fit_cache.move_to_end(key)
+            return self._fit_cache[key]
+
         tmesh = np.linspace(tstart, tstop, num)
 
         # array with phonon energies and shape (n_vol, n_temp)
@@ -68,13 +81,22 @@ class AbstractQHA(metaclass=abc.ABCMeta):
         tot_en = self.energies[np.newaxis, :].T + ph_energies + self.volumes[np.newaxis, :].T * self.pressure / abu.eVA3_GPa
 
         # list of fits objects, one for each temperature
-        fits = [self.eos.fit(self.volumes, e) for e in tot_en.T]
-
-        # list of minimum volumes and energies, one for each temperature
-        min_volumes = np.array([fit.v0 for fit in fits])
-        min_energies = np.array([fit.e0 for fit in fits])
-
-        return dict2namedtuple(tot_en=tot_en, fits=fits, min_en=min_energies, min_vol=min_volumes, temp=tmesh)
+        if issubclass(self.eos.model, PolynomialEOS):
+            fits = [self.eos.fit(self.volumes, e) for e in tot_en.T]
+            params = np.array([fit._params for fit in fits])
+        else:
+            # Fit all the temperatures at once.
+            params = fit_eos_batch(self.eos._eos_name, self.volumes, tot_en)
+            fits = [_eos_from_params(self.eos.model, self.volumes, e, p) for e, p in zip(tot_en.T, params)]
+
+        # e0, b0, b1, v0
+        min_volumes, min_energies, b0 = params[:, 3].copy(), params[:, 0].copy(), params[:, 1].copy()
+
+        f = dict2namedtuple(tot_en=tot_en, fits=fits, min_en=min_energies, min_vol=min_volumes, b0=b0, temp=tmesh)
+        self._fit_cache[key] = f
+        if len(self._fit_cache) > self.FIT_CACHE_MAXSIZE:
+            self._fit_cache.popitem(last=False)
+        return f
 
     @abc.abstractmethod
     def get_vib_free_energies(self, tstart=0, tstop=800, num=100):
@@ -129,6 +151,10 @@ class AbstractQHA(metaclass=abc.ABCMeta):
         """
         self.eos = EOS(eos_name)
 
+    def clear_fit_cache(self):
+        """Remove the results of the EOS fits stored in the internal cache."""
+        self._fit_cache.clear()
+
     @add_fig_kwargs
     def plot_energies(self, tstart=0, tstop=800, num=10, ax=None, **kwargs):
         """
@@ -510,12 +536,7 @@ class QHA(AbstractQHA):
         Returns:
             A numpy array of `num` values of the vibrational contribution to the free energy
         """
-        f = np.zeros((self.nvols, num))
-
-        for i, dos in enumerate(self.doses):
-            f[i] = dos.get_free_energy(tstart, tstop, num).values
-
-        return f
+        return harmonic_thermo_from_doses(self.doses, np.linspace(tstart, tstop, num)).free_energy
 
     def get_thermodynamic_properties(self, tstart=0, tstop=800, num=100):
         """
@@ -535,21 +556,10 @@ class QHA(AbstractQHA):
                 entropy: entropy, in eV/K. Shape (nvols, num).
                 zpe: zero point energy in eV. Shape (nvols).
         """
-        tmesh = np.linspace(tstart, tstop, num)
-        cv = np.zeros((self.nvols, num))
-        free_energy = np.zeros((self.nvols, num))
-        entropy = np.zeros((self.nvols, num))
-        internal_energy = np.zeros((self.nvols, num))
-        zpe = np.zeros(self.nvols)
+        thermo = harmonic_thermo_from_doses(self.doses, np.linspace(tstart, tstop, num))
 
-        for i, d in enumerate(self.doses):
-            cv[i] = d.get_cv(tstart, tstop, num).values
-            free_energy[i] = d.get_free_energy(tstart, tstop, num).values
-            entropy[i] = d.get_entropy(tstart, tstop, num).values
-            zpe[i] = d.zero_point_energy
-
-        return dict2namedtuple(tmesh=tmesh, cv=cv, free_energy=free_energy, entropy=entropy,
-                               zpe=zpe)
+        return dict2namedtuple(tmesh=thermo.tmesh, cv=thermo.cv, free_energy=thermo.free_energy,
+                               entropy=thermo.entropy, zpe=thermo.zpe)
 
 
 class QHA3PF(AbstractQHA):
@@ -624,23 +634,13 @@ class QHA3PF(AbstractQHA):
                 entropy: entropy, in eV/K. Shape (nvols, num).
                 zpe: zero point energy in eV. Shape (nvols).
         """
-        tmesh = np.linspace(tstart, tstop, num)
-        cv = self._get_thermodynamic_prop("cv", tstart, tstop, num)
-        free_energy = self._get_thermodynamic_prop("free_energy", tstart, tstop, num)
-        entropy = self._get_thermodynamic_prop("entropy", tstart, tstop, num)
-        zpe = np.zeros(self.nvols)
+        thermo = harmonic_thermo_from_doses(self.doses, np.linspace(tstart, tstop, num))
 
-        for i, dos in zip(self.ind_doses, self.doses):
-            zpe[i] = dos.zero_point_energy
-
-        dos_vols = self.volumes[self.ind_doses]
-        missing_vols = self.volumes[self._ind_energy_only]
-
-        fit_params = np.polyfit(dos_vols, zpe[self.ind_doses], self.fit_degree)
-        zpe[self._ind_energy_only] = np.poly1d(fit_params)(missing_vols)
-
-        return dict2namedtuple(tmesh=tmesh, cv=cv, free_energy=free_energy, entropy=entropy,
-                               zpe=zpe)
+        return dict2namedtuple(tmesh=thermo.tmesh,
+                               cv=self._fit_missing_vols(thermo.cv),
+                               free_energy=self._fit_missing_vols(thermo.free_energy),
+                               entropy=self._fit_missing_vols(thermo.entropy),
+                               zpe=self._fit_missing_vols(thermo.zpe[:, None])[:, 0])
 
     def _get_thermodynamic_prop(self, name, tstart, tstop, num):
         """
@@ -657,20 +657,26 @@ class QHA3PF(AbstractQHA):
             Numpy array with the values of the thermodynamic properties at the different
             volumes with size (nvols, num).
         """
-        prop_doses = np.array([getattr(dos, "get_" + name)(tstart, tstop, num).values for dos in self.doses])
+        if name == "c_v": name = "cv"
+        thermo = harmonic_thermo_from_doses(self.doses, np.linspace(tstart, tstop, num))
 
-        p = np.zeros((self.nvols, num))
+        return self._fit_missing_vols(getattr(thermo, name))
 
-        for i, prop_dos in zip(self.ind_doses, prop_doses):
-            p[i] = prop_dos
+    def _fit_missing_vols(self, prop_doses):
+        """
+        Build (nvols, num) array from the (ndoses, num) values computed with the phonon DOS.
+        Values at the volumes without DOS are obtained with a polynomial fit performed
+        for all the temperatures at once.
+        """
+        p = np.zeros((self.nvols, prop_doses.shape[1]))
+        p[self.ind_doses] = prop_doses
 
         dos_vols = self.volumes[self.ind_doses]
         missing_vols = self.volumes[self._ind_energy_only]
 
-        # generate fit objects from the known dos values
-        for i_temp in range(num):
-            fit_params = np.polyfit(dos_vols, prop_doses[:, i_temp], self.fit_degree)
-            p[self._ind_energy_only, i_temp] = np.poly1d(fit_params)(missing_vols)
+        # polyfit accepts 2D arrays: one set of coefficients for each column (temperature).
+        fit_params = np.polyfit(dos_vols, prop_doses, self.fit_degree)
+        p[self._ind_energy_only] = np.dot(np.vander(missing_vols, self.fit_degree + 1), fit_params)
 
         return p
 
@@ -841,6 +847,123 @@ class QHA3P(AbstractQHA):
         return f
 
 
+def _eos_from_params(model, volumes, energies, params):
+    """Build pymatgen EOS object of class ``model`` from the fitted parameters (e0, b0, b1, v0)."""
+    eos_fit = model(volumes, energies)
+    eos_fit._params = eos_fit.eos_params = np.array(params)
+    return eos_fit
+
+
+def _eos_levmar(func, volumes, energies, params, maxiter, tol):
+    """
+    Vectorized Levenberg-Marquardt algorithm for the EOS ``func``.
+
+    Args:
+        energies: (nsets, nvols) array.
+        params: (nsets, 4) array with initial guess.
+
+    Return: (params, converged) where converged is a boolean array with shape (nsets).
+    """
+    params = params.copy()
+    nsets = len(params)
+    lam = np.full(nsets, 1e-3)
+    done = np.zeros(nsets, dtype=np.bool)
+
+    with np.errstate(all="ignore"):
+        cost = np.sum((energies - func(volumes, params)) ** 2, axis=1)
+        for it in range(maxiter):
+            act = np.flatnonzero(~done)
+            if not len(act): break
+            p, e = params[act], energies[act]
+            f0 = func(volumes, p)
+            res = e - f0
+
+            # Jacobian with forward differences for all the active sets. Shape (nact, nvols, 4)
+            steps = 1e-7 * np.maximum(np.abs(p), 1e-6)
+            jac = np.empty(res.shape + (4,))
+            for j in range(4):
+                dp = p.copy()
+                dp[:, j] += steps[:, j]
+                jac[..., j] = (func(volumes, dp) - f0) / steps[:, j, None]
+
+            jtj = np.einsum("svi,svj->sij", jac, jac)
+            jtr = np.einsum("svi,sv->si", jac, res)
+            amat = jtj + lam[act, None, None] * np.einsum("sii->si", jtj)[:, :, None] * np.eye(4)
+            try:
+                delta = np.linalg.solve(amat, jtr[..., None])[..., 0]
+            except np.linalg.LinAlgError:
+                delta = np.array([np.linalg.lstsq(m, r, rcond=None)[0] for m, r in zip(amat, jtr)])
+
+            new = p + delta
+            new_cost = np.sum((e - func(volumes, new)) ** 2, axis=1)
+            ok = np.isfinite(new_cost) & (new_cost <= cost[act])
+
+            # Converged if the relative change of the cost or of the parameters is negligible.
+            conv = ok & ((cost[act] - new_cost <= tol * cost[act]) |
+                         np.all(np.abs(delta) <= 1e-10 * np.abs(p), axis=1))
+            params[act[ok]] = new[ok]
+            cost[act[ok]] = new_cost[ok]
+            lam[act] = np.where(ok, lam[act] / 10, lam[act] * 10)
+            done[act[conv]] = True
+            # No further progress is possible if the damping is too large.
+            done[act[lam[act] > 1e16]] = True
+
+    converged = done & (lam <= 1e16) & np.isfinite(cost) & np.all(np.isfinite(params), axis=1)
+    return params, converged
+
+
+def fit_eos_batch(eos_name, volumes, energies, maxiter=200, tol=1e-12):
+    """
+    Fit E(V) with the equation of state ``eos_name`` for multiple sets of energies at once
+    e.g. the total free energies at different temperatures.
+    The nonlinear least squares problems are solved simultaneously with a vectorized Levenberg-Marquardt
+    algorithm starting from a quadratic fit as in pymatgen. Sets that do not converge are restarted
+    from the parameters of the closest converged set (warm start).
+
+    Args:
+        eos_name: Name of the EOS. See pymatgen.analysis.eos.EOS. Polynomial EOS are not supported.
+        volumes: (nvols) array with the volumes in Ang^3.
+        energies: (nvols, nsets) array with the energies in eV.
+        maxiter: Max number of iterations.
+        tol: Relative tolerance on the sum of squared residuals.
+
+    Return:
+        (nsets, 4) array with the (e0, b0, b1, v0) parameters.
+    """
+    model = EOS(eos_name).model
+    if issubclass(model, PolynomialEOS):
+        raise ValueError("Batched fit is not supported for polynomial EOS: %s" % eos_name)
+
+    volumes = np.asarray(volumes, dtype=np.float)
+    energies = np.reshape(np.asarray(energies, dtype=np.float), (len(volumes), -1))
+    # pymatgen models unpack the parameters with tuple(params) hence (4, nsets, 1) arrays can be used.
+    func = lambda v, p: model._func(None, v[None, :], p.T[:, :, None])
+
+    # Initial guess from quadratic fit for all the sets.
+    a, b, c = np.polyfit(volumes, energies, 2)
+    v0 = -b / (2 * a)
+    if np.any(v0 <= volumes.min()) or np.any(v0 >= volumes.max()):
+        raise EOSError("The minimum volume of a fitted parabola is not in the input volumes\n.")
+    params = np.array([a * v0 ** 2 + b * v0 + c, 2 * a * v0, np.full(len(v0), 4.0), v0]).T
+
+    ene = energies.T
+    params, converged = _eos_levmar(func, volumes, ene, params, maxiter, tol)
+
+    if not np.all(converged):
+        # Warm start from the parameters of the closest converged set.
+        iconv = np.flatnonzero(converged)
+        if not len(iconv):
+            raise EOSError("Optimal parameters not found")
+        for i in np.flatnonzero(~converged):
+            j = iconv[np.argmin(np.abs(iconv - i))]
+            p, ok = _eos_levmar(func, volumes, ene[i:i+1], params[j:j+1], maxiter, tol)
+            if not ok[0]:
+                raise EOSError("Optimal parameters not found for set %d" % i)
+            params[i] = p[0]
+
+    return params
+
+
 def get_free_energy(w, weights, t):
     """
     Calculates the free energy in eV from the phonon frequencies on a regular grid.
@@ -9,8 +9,9 @@ import abipy.core.abinit_units as abu
 
 from abipy import abilab
 from abipy.dfpt.phonons import (PhononBands, PhononDos, PhdosFile, phbands_gridplot,
-        PhononBandsPlotter, PhononDosPlotter, dataframe_from_phbands)
+        PhononBandsPlotter, PhononDosPlotter, dataframe_from_phbands, harmonic_thermo_from_doses)
 from abipy.dfpt.ddb import DdbFile
+from abipy.dfpt.phtk import match_eigenvectors, match_eigenvectors_batch, _match_overlaps
 from abipy.core.testing import AbipyTest
 
 test_dir = os.path.join(os.path.dirname(__file__), "..", "..", 'test_files')
@@ -393,6 +394,22 @@ class PhononDosTest(AbipyTest):
         f = phdos.get_free_energy()
         self.assert_almost_equal(f.values, (u - s.mesh * s.values).values)
 
+        # All the quantities computed at once for multiple DOSes (results are cached).
+        thermo = harmonic_thermo_from_doses([phdos, phdos], [0, 5, 300])
+        assert thermo.cv.shape == (2, 3) and thermo.zpe.shape == (2,)
+        self.assert_almost_equal(thermo.internal_energy[1, [1, 2]], u.values[[0, -1]])
+        self.assert_almost_equal(thermo.entropy[0, [1, 2]], s.values[[0, -1]])
+        self.assert_almost_equal(thermo.cv[1, [1, 2]], cv.values[[0, -1]])
+        self.assert_almost_equal(thermo.internal_energy[:, 0], phdos.zero_point_energy)
+        assert np.all(thermo.entropy[:, 0] == 0) and np.all(thermo.cv[:, 0] == 0)
+        nocache = harmonic_thermo_from_doses([phdos], [0, 5, 300], max_chunk_mb=0, use_cache=False)
+        self.assert_almost_equal(nocache.free_energy[0], thermo.free_energy[0])
+        # Low temperatures do not produce overflows.
+        thermo = harmonic_thermo_from_doses([phdos], np.linspace(0, 1, 11))
+        assert np.all(np.isfinite(thermo.free_energy)) and np.all(np.isfinite(thermo.entropy))
+        with self.assertRaises(ValueError):
+            harmonic_thermo_from_doses([phdos], [-1, 10])
+
         self.assertAlmostEqual(phdos.debye_temp, 469.01524830328606)
         self.assertAlmostEqual(phdos.get_acoustic_debye_temp(len(ncfile.structure)), 372.2576492728813)
 
@@ -505,3 +522,44 @@ class NonAnalyticalPhTest(AbipyTest):
             assert phbands.non_anal_directions is not None
             assert phbands.non_anal_phdispl_cart is not None
             assert phbands.non_anal_dyn_mat_eigenvect is not None
+
+
+class MatchEigenvectorsTest(AbipyTest):
+
+    def test_match_eigenvectors_batch(self):
+        """Testing batched matching of eigenvectors."""
+        rng = np.random.RandomState(7)
+        nvec, npairs = 12, 20
+
+        def random_unitary(n):
+            q, _ = np.linalg.qr(rng.randn(n, n) + 1j * rng.randn(n, n))
+            return q
+
+        # Small rotations of a random basis followed by a random permutation of the vectors.
+        v1s = np.array([random_unitary(nvec) for p in range(npairs)])
+        perms = np.array([rng.permutation(nvec) for p in range(npairs)])
+        v2s = np.array([np.dot(np.eye(nvec) + 0.05 * rng.randn(nvec, nvec), v)
+                        for v in v1s])
+        v2s = np.array([v[perm] for v, perm in zip(v2s, perms)])
+
+        indices = match_eigenvectors_batch(v1s, v2s, max_chunk_mb=1e-3)
+        assert indices.shape == (npairs, nvec)
+        for p in range(npairs):
+            # v1s[p][i] is mapped to v2s[p][j] with perm[j] == i
+            self.assert_equal(perms[p][indices[p]], np.arange(nvec))
+            ref = _match_overlaps(np.abs(np.dot(v1s[p], v2s[p].T.conj())))
+            self.assert_equal(indices[p], ref)
+            self.assert_equal(match_eigenvectors(v1s[p], v2s[p]), ref)
+
+        # Degenerate vectors: rotation inside a degenerate subspace. The fast path
+        # cannot be used and the result must coincide with the greedy assignment.
+        v1 = np.eye(4, dtype=np.complex)
+        v2 = np.eye(4, dtype=np.complex)
+        c = np.sqrt(0.5)
+        v2[:2, :2] = [[c, c], [-c, c]]
+        ref = _match_overlaps(np.abs(np.dot(v1, v2.T.conj())))
+        self.assert_equal(match_eigenvectors_batch(v1[None], v2[None])[0], ref)
+        assert sorted(ref) == [0, 1, 2, 3]
+
+        with self.assertRaises(ValueError):
+            match_eigenvectors_batch(v1s, v2s[:, :-1])
@@ -1,9 +1,11 @@
 """Tests for frozen_phonons"""
 import os
 import warnings
+import numpy as np
 import abipy.data as abidata
 
-from abipy.dfpt.qha import QHA, QHA3PF, QHA3P, QHAQmeshAnalyzer
+from pymatgen.analysis.eos import EOS, Vinet
+from abipy.dfpt.qha import QHA, QHA3PF, QHA3P, QHAQmeshAnalyzer, fit_eos_batch
 from abipy.dfpt.phonons import PhononBands
 from abipy.core.testing import AbipyTest
 
@@ -30,6 +32,16 @@ class QhaTest(AbipyTest):
         f = qha.fit_energies(tstart=0, tstop=300, num=3)
         self.assertArrayEqual(f.tot_en.shape, (len(self.strains), 3))
         self.assertAlmostEqual(f.min_en[0], -230.15471148501612, places=5)
+        assert qha.fit_energies(tstart=0, tstop=300, num=3) is f
+        self.assertArrayEqual(f.b0, [fit.b0 for fit in f.fits])
+        self.assert_almost_equal(f.fits[1].func(f.min_vol[1]), f.min_en[1])
+        qha.clear_fit_cache()
+        assert qha.fit_energies(tstart=0, tstop=300, num=3) is not f
+
+        # The cache is bounded.
+        for t in range(qha.FIT_CACHE_MAXSIZE + 5):
+            qha.fit_energies(tstart=t, tstop=t, num=1)
+        assert len(qha._fit_cache) == qha.FIT_CACHE_MAXSIZE
 
         self.assertEqual(qha.eos._eos_name, "vinet")
         qha.set_eos("murnaghan")
@@ -59,6 +71,29 @@ class QhaTest(AbipyTest):
         with self.assertRaises(RuntimeError):
             QHA.from_files(self.gsr_paths[0:2], self.dos_paths[0:1])
 
+    def test_fit_eos_batch(self):
+        """Testing batched EOS fit."""
+        # Synthetic E(V) curves generated with Vinet EOS with parameters depending on the set index.
+        volumes = np.linspace(38, 44, 7)
+        nsets = 20
+        true_params = np.array([[-230 + 0.01 * i, 0.6 - 0.005 * i, 4.2, 40.8 + 0.02 * i] for i in range(nsets)])
+        energies = np.array([Vinet(volumes, None)._func(volumes, p) for p in true_params]).T
+        params = fit_eos_batch("vinet", volumes, energies)
+        assert params.shape == (nsets, 4)
+        self.assert_almost_equal(params, true_params, decimal=5)
+
+        rng = np.random.RandomState(3)
+        energies += 1e-4 * rng.uniform(size=energies.shape)
+        for eos_name in ("vinet", "murnaghan", "birch_murnaghan"):
+            params = fit_eos_batch(eos_name, volumes, energies)
+            for i in (0, nsets - 1):
+                fit = EOS(eos_name).fit(volumes, energies[:, i])
+                self.assert_almost_equal(params[i, [0, 3]], [fit.e0, fit.v0], decimal=4)
+                self.assert_almost_equal(params[i, 1], fit.b0, decimal=3)
+
+        with self.assertRaises(ValueError):
+            fit_eos_batch("deltafactor", volumes, energies)
+
     def test_phonopy_object(self):
         """Testing QHA phonopy object."""
         self.skip_if_not_phonopy()
@@ -78,8 +78,7 @@ class HistFile(AbinitNcFile, NotebookWriter):
     @lazy_property
     def final_pressure(self):
         """Final pressure in Gpa."""
-        cart_stress_tensors, pressures = self.reader.read_cart_stress_tensors()
-        return pressures[-1]
+        return self.reader.read_step(-1).pressures[0]
 
     #@lazy_property
     #def final_max_force(self):
@@ -88,18 +87,8 @@ class HistFile(AbinitNcFile, NotebookWriter):
         """
         Return |AttrDict| with stats on the forces at the given ``step``.
         """
-        # [time, natom, 3]
-        var = self.reader.read_variable("fcart")
-        forces = units.ArrayWithUnit(var[step], "Ha bohr^-1").to("eV ang^-1")
-        fmods = np.array([np.linalg.norm(force) for force in forces])
-
-        return AttrDict(
-            fmin=fmods.min(),
-            fmax=fmods.max(),
-            fmean=fmods.mean(),
-            fstd=fmods.std(),
-            drift=np.linalg.norm(forces.sum(axis=0)),
-        )
+        fstats = self.reader.read_step(step).fstats
+        return AttrDict({k: float(v[0]) for k, v in fstats.items()})
 
     def to_string(self, verbose=0, title=None):
         """String representation."""
@@ -123,9 +112,9 @@ class HistFile(AbinitNcFile, NotebookWriter):
         #an.get_percentage_bond_dist_changes(max_radius=3.0)
         app("")
 
-        cart_stress_tensors, pressures = self.reader.read_cart_stress_tensors()
-        app("Stress tensor (Cartesian coordinates in GPa):\n%s" % cart_stress_tensors[-1])
-        app("Pressure: %.3f [GPa]" % pressures[-1])
+        last = self.reader.read_step(-1)
+        app("Stress tensor (Cartesian coordinates in GPa):\n%s" % last.cart_stress_tensors[0])
+        app("Pressure: %.3f [GPa]" % last.pressures[0])
 
         return "\n".join(lines)
 
@@ -139,20 +128,87 @@ class HistFile(AbinitNcFile, NotebookWriter):
         """Step indices."""
         return list(range(self.num_steps))
 
-    @property
+    @lazy_property
+    def trajectory(self):
+        """
+        :class:`HistTrajectory` with the positions, lattices, forces and stresses at the different steps.
+        Note that all the steps are loaded in memory. Use :meth:`iter_steps` for long trajectories.
+        """
+        return self.reader.read_trajectory()
+
+    def iter_steps(self, start=0, stop=None, stride=1, chunk=1000):
+        """
+        Iterate over the steps in range(start, stop, stride) and yield :class:`HistTrajectory` objects
+        with at most ``chunk`` steps. See :meth:`HistReader.iter_steps`.
+        """
+        return self.reader.iter_steps(start=start, stop=stop, stride=stride, chunk=chunk)
+
+    def accumulate(self, accumulators, start=0, stop=None, stride=1, chunk=1000):
+        """
+        Read the trajectory in chunks and pass each chunk to the accumulators.
+        Memory is bounded by the size of the chunk (plus the memory required by the accumulators).
+
+        Args:
+            accumulators: :class:`HistAccumulator` or list of accumulators
+                e.g. :class:`RunningAverages`, :class:`MsdAccumulator`, :class:`RdfAccumulator`.
+            start, stop, stride: Analyze the steps in range(start, stop, stride).
+            chunk: Number of steps read from file in a single call.
+
+        Return:
+            List with the results of the accumulators (single object if ``accumulators`` is not a list).
+        """
+        is_list = isinstance(accumulators, (list, tuple))
+        accumulators = accumulators if is_list else [accumulators]
+        for traj in self.iter_steps(start=start, stop=stop, stride=stride, chunk=chunk):
+            for acc in accumulators:
+                acc.add_chunk(traj)
+
+        results = [acc.get_results() for acc in accumulators]
+        return results if is_list else results[0]
+
+    def get_running_averages(self, names=("etotals", "pressures", "volumes"), window=None, **kwargs):
+        """
+        Compute running averages of the quantities in ``names`` (attributes of :class:`HistTrajectory`)
+        by reading the trajectory in chunks. See :class:`RunningAverages` for the meaning of the arguments.
+        kwargs are passed to :meth:`accumulate`.
+        """
+        return self.accumulate(RunningAverages(names=names, window=window), **kwargs)
+
+    def get_msd(self, atom_indices=None, **kwargs):
+        """
+        Compute the mean square displacement by reading the trajectory in chunks.
+        See :class:`MsdAccumulator` for the meaning of the arguments. kwargs are passed to :meth:`accumulate`.
+        """
+        return self.accumulate(MsdAccumulator(atom_indices=atom_indices), **kwargs)
+
+    def get_rdf(self, rmax=6.0, nbins=200, **kwargs):
+        """
+        Compute the radial distribution function by reading the trajectory in chunks.
+        See :class:`RdfAccumulator` for the meaning of the arguments. kwargs are passed to :meth:`accumulate`.
+        """
+        return self.accumulate(RdfAccumulator(rmax=rmax, nbins=nbins), **kwargs)
+
+    @lazy_property
     def initial_structure(self):
         """The initial |Structure|."""
-        return self.structures[0]
+        return self.reader.read_step(0).get_structure(0)
 
-    @property
+    @lazy_property
     def final_structure(self):
         """The |Structure| of the last iteration."""
-        return self.structures[-1]
+        return self.reader.read_step(-1).get_structure(0)
 
     @lazy_property
     def structures(self):
-        """List of |Structure| objects at the different steps."""
-        return self.reader.read_all_structures()
+        """
+        List of |Structure| objects at the different steps.
+        Note that building all the structures is expensive for long trajectories.
+        Use :attr:`trajectory` to access the data in array form.
+        """
+        # Reuse initial_structure and final_structure so that the objects are shared.
+        if self.num_steps == 1: return [self.initial_structure]
+        return ([self.initial_structure] + self.trajectory.get_structures(range(1, self.num_steps - 1)) +
+                [self.final_structure])
 
     @lazy_property
     def etotals(self):
@@ -165,22 +221,27 @@ class HistFile(AbinitNcFile, NotebookWriter):
         """
         return RelaxationAnalyzer(self.initial_structure, self.final_structure)
 
-    def to_xdatcar(self, filepath=None, groupby_type=True, to_unit_cell=False, **kwargs):
+    def to_xdatcar(self, filepath=None, groupby_type=True, to_unit_cell=False, start=0, stop=None, stride=1,
+                   **kwargs):
         """
         Return Xdatcar pymatgen object. See write_xdatcar for the meaning of arguments.
 
         Args:
             to_unit_cell (bool): Whether to translate sites into the unit cell.
+            start, stop, stride: Use only the steps in range(start, stop, stride).
             kwargs: keywords arguments passed to Xdatcar constructor.
         """
         filepath = self.write_xdatcar(filepath=filepath, groupby_type=groupby_type,
-                                      to_unit_cell=to_unit_cell, overwrite=True)
+                                      to_unit_cell=to_unit_cell, overwrite=True,
+                                      start=start, stop=stop, stride=stride)
         from pymatgen.io.vasp.outputs import Xdatcar
         return Xdatcar(filepath, **kwargs)
 
-    def write_xdatcar(self, filepath="XDATCAR", groupby_type=True, overwrite=False, to_unit_cell=False):
+    def write_xdatcar(self, filepath="XDATCAR", groupby_type=True, overwrite=False, to_unit_cell=False,
+                      start=0, stop=None, stride=1, chunk=1000):
         """
         Write Xdatcar file with unit cell and atomic positions to file ``filepath``.
+        The steps are read from file in chunks so that memory does not depend on the length of the trajectory.
 
         Args:
             filepath: Xdatcar filename. If None, a temporary file is created.
@@ -190,6 +251,9 @@ class HistFile(AbinitNcFile, NotebookWriter):
                 if the atoms in the structure are not grouped by type.
             overwrite: raise RuntimeError, if False and filepath exists.
             to_unit_cell (bool): Whether to translate sites into the unit cell.
+            start, stop, stride: Write only the steps in range(start, stop, stride).
+                The unit cell is taken from the first step written to file.
+            chunk: Number of steps read from file in a single call.
 
         Return:
             path to Xdatcar file.
@@ -201,14 +265,7 @@ class HistFile(AbinitNcFile, NotebookWriter):
             fd, filepath = tempfile.mkstemp(text=True, suffix="_XDATCAR")
 
         # int typat[natom], double znucl[npsp]
-        # NB: typat is double in the HIST.nc file
-        typat = self.reader.read_value("typat").astype(int)
-        znucl = self.reader.read_value("znucl")
-        ntypat = self.reader.read_dimvalue("ntypat")
-        num_pseudos = self.reader.read_dimvalue("npsp")
-        if num_pseudos != ntypat:
-            raise NotImplementedError("Alchemical mixing is not supported, num_pseudos != ntypat")
-        #print("znucl:", znucl, "\ntypat:", typat)
+        znucl, typat = self.reader.znucl_typat
 
         symb2pos = OrderedDict()
         symbols_atom = []
@@ -227,12 +284,16 @@ class HistFile(AbinitNcFile, NotebookWriter):
                 group_ids.extend(pos_list)
             group_ids = np.array(group_ids, dtype=np.int)
 
-        comment = " %s\n" % self.initial_structure.formula
+        steps = range(self.num_steps)[start:stop:stride]
+        if not steps:
+            raise ValueError("Empty list of steps for start: %s, stop: %s, stride: %s" % (start, stop, stride))
+        first = self.reader.read_step(steps[0])
+        comment = " %s\n" % first.get_structure(0).formula
         with open(filepath, "wt") as fh:
             # comment line  + scaling factor set to 1.0
             fh.write(comment)
             fh.write("1.0\n")
-            for vec in self.initial_structure.lattice.matrix:
+            for vec in first.lattice_matrices[0]:
                 fh.write("%.12f %.12f %.12f\n" % (vec[0], vec[1], vec[2]))
             if not groupby_type:
                 fh.write(" ".join(symbols_atom) + "\n")
@@ -242,15 +303,8 @@ class HistFile(AbinitNcFile, NotebookWriter):
                 fh.write(" ".join(str(len(p)) for p in symb2pos.values()) + "\n")
 
             # Write atomic positions in reduced coordinates.
-            xred_list = self.reader.read_value("xred")
-            if to_unit_cell:
-                xred_list = xred_list % 1
-
-            for step in range(self.num_steps):
-                fh.write("Direct configuration= %d\n" % (step + 1))
-                frac_coords = xred_list[step, group_ids]
-                for fs in frac_coords:
-                    fh.write("%.12f %.12f %.12f\n" % (fs[0], fs[1], fs[2]))
+            for traj in self.reader.iter_steps(start=start, stop=stop, stride=stride, chunk=chunk):
+                traj.write_xdatcar_steps(fh, group_ids=group_ids, to_unit_cell=to_unit_cell)
 
         return filepath
 
@@ -299,7 +353,7 @@ class HistFile(AbinitNcFile, NotebookWriter):
             mark = kwargs.pop("marker", None)
             markers = ["o", "^", "v"] if mark is None else 3 * [mark]
             for i, label in enumerate(["a", "b", "c"]):
-                ax.plot(self.steps, [s.lattice.abc[i] for s in self.structures], label=label,
+                ax.plot(self.steps, self.trajectory.abc[:, i], label=label,
                         marker=markers[i], **kwargs)
             ax.set_ylabel("abc (A)")
 
@@ -309,7 +363,7 @@ class HistFile(AbinitNcFile, NotebookWriter):
             if marker is None:
                 marker = {"a": "o", "b": "^", "c": "v"}[what]
             label = kwargs.pop("label", what)
-            ax.plot(self.steps, [s.lattice.abc[i] for s in self.structures], label=label,
+            ax.plot(self.steps, self.trajectory.abc[:, i], label=label,
                     marker=marker, **kwargs)
             ax.set_ylabel('%s (A)' % what)
 
@@ -318,7 +372,7 @@ class HistFile(AbinitNcFile, NotebookWriter):
             mark = kwargs.pop("marker", None)
             markers = ["o", "^", "v"] if mark is None else 3 * [mark]
             for i, label in enumerate(["alpha", "beta", "gamma"]):
-                ax.plot(self.steps, [s.lattice.angles[i] for s in self.structures], label=label,
+                ax.plot(self.steps, self.trajectory.angles[:, i], label=label,
                         marker=markers[i], **kwargs)
             ax.set_ylabel(r"$\alpha\beta\gamma$ (degree)")
 
@@ -329,39 +383,29 @@ class HistFile(AbinitNcFile, NotebookWriter):
                 marker = {"alpha": "o", "beta": "^", "gamma": "v"}[what]
 
             label = kwargs.pop("label", what)
-            ax.plot(self.steps, [s.lattice.angles[i] for s in self.structures], label=label,
+            ax.plot(self.steps, self.trajectory.angles[:, i], label=label,
                     marker=marker, **kwargs)
             ax.set_ylabel(r"$\%s$ (degree)" % what)
 
         elif what == "volume":
             marker = kwargs.pop("marker", "o")
-            ax.plot(self.steps, [s.lattice.volume for s in self.structures], marker=marker, **kwargs)
+            ax.plot(self.steps, self.trajectory.volumes, marker=marker, **kwargs)
             ax.set_ylabel(r'$V\, (A^3)$')
 
         elif what == "pressure":
-            stress_cart_tensors, pressures = self.reader.read_cart_stress_tensors()
             marker = kwargs.pop("marker", "o")
             label = kwargs.pop("label", "P")
-            ax.plot(self.steps, pressures, label=label, marker=marker, **kwargs)
+            ax.plot(self.steps, self.trajectory.pressures, label=label, marker=marker, **kwargs)
             ax.set_ylabel('P (GPa)')
 
         elif what == "forces":
-            forces_hist = self.reader.read_cart_forces()
-            fmin_steps, fmax_steps, fmean_steps, fstd_steps = [], [], [], []
-            for step in range(self.num_steps):
-                forces = forces_hist[step]
-                fmods = np.sqrt([np.dot(force, force) for force in forces])
-                fmean_steps.append(fmods.mean())
-                fstd_steps.append(fmods.std())
-                fmin_steps.append(fmods.min())
-                fmax_steps.append(fmods.max())
-
+            fstats = self.trajectory.fstats
             mark = kwargs.pop("marker", None)
             markers = ["o", "^", "v", "X"] if mark is None else 4 * [mark]
-            ax.plot(self.steps, fmin_steps, label="min |F|", marker=markers[0], **kwargs)
-            ax.plot(self.steps, fmax_steps, label="max |F|", marker=markers[1], **kwargs)
-            ax.plot(self.steps, fmean_steps, label="mean |F|", marker=markers[2], **kwargs)
-            ax.plot(self.steps, fstd_steps, label="std |F|", marker=markers[3], **kwargs)
+            ax.plot(self.steps, fstats.fmin, label="min |F|", marker=markers[0], **kwargs)
+            ax.plot(self.steps, fstats.fmax, label="max |F|", marker=markers[1], **kwargs)
+            ax.plot(self.steps, fstats.fmean, label="mean |F|", marker=markers[2], **kwargs)
+            ax.plot(self.steps, fstats.fstd, label="std |F|", marker=markers[3], **kwargs)
             label = "std |F"
             ax.set_ylabel('F stats (eV/A)')
 
@@ -730,6 +774,360 @@ class HistRobot(Robot):
         return self._write_nb_nbpath(nb, nbpath)
 
 
+class HistTrajectory(object):
+    """
+    Columnar representation of the trajectory stored in a HIST.nc_ file.
+    All the quantities are stored in |numpy-array| objects with the step index as first dimension
+    and the derived quantities (lattice parameters, volumes, statistics on forces ...) are computed
+    for all the steps at once. |Structure| objects are only built on request with :meth:`get_structure`.
+
+    .. attribute:: xred
+
+        [nstep, natom, 3] array with reduced coordinates.
+
+    .. attribute:: rprimd
+
+        [nstep, 3, 3] array with the lattice vectors in Bohr (Abinit convention: one vector per row).
+
+    .. attribute:: cart_forces
+
+        [nstep, natom, 3] array with cartesian forces in eV/Ang.
+
+    .. attribute:: cart_stress_tensors
+
+        [nstep, 3, 3] array with the stress tensors in cartesian coordinates in GPa.
+
+    .. attribute:: etotals
+
+        [nstep] array with total energies in eV.
+    """
+
+    def __init__(self, xred, rprimd, cart_forces, cart_stress_tensors, etotals, znucl, typat, steps=None):
+        self.xred = np.asarray(xred)
+        self.rprimd = np.asarray(rprimd)
+        self.cart_forces = np.asarray(cart_forces)
+        self.cart_stress_tensors = np.asarray(cart_stress_tensors)
+        self.etotals = np.asarray(etotals)
+        self.znucl, self.typat = np.asarray(znucl), np.asarray(typat, dtype=np.int)
+        # Indices of the steps in the HIST file.
+        self.steps = np.arange(len(self.xred)) if steps is None else np.asarray(steps)
+
+    def __len__(self):
+        return len(self.xred)
+
+    @property
+    def num_steps(self):
+        """Number of steps in the trajectory."""
+        return len(self.xred)
+
+    @property
+    def natom(self):
+        """Number of atoms."""
+        return self.xred.shape[1]
+
+    @lazy_property
+    def lattice_matrices(self):
+        """[nstep, 3, 3] array with the lattice vectors in Angstrom."""
+        return self.rprimd * units.bohr_to_ang
+
+    @lazy_property
+    def abc(self):
+        """[nstep, 3] array with the lattice parameters in Angstrom."""
+        return np.linalg.norm(self.lattice_matrices, axis=2)
+
+    @lazy_property
+    def angles(self):
+        """[nstep, 3] array with the lattice angles (alpha, beta, gamma) in degrees."""
+        m, abc = self.lattice_matrices, self.abc
+        angles = np.empty((self.num_steps, 3))
+        for i, (j, k) in enumerate(((1, 2), (2, 0), (0, 1))):
+            cos = np.einsum("sx,sx->s", m[:, j], m[:, k]) / (abc[:, j] * abc[:, k])
+            angles[:, i] = np.degrees(np.arccos(np.clip(cos, -1, 1)))
+        return angles
+
+    @lazy_property
+    def volumes(self):
+        """[nstep] array with the volume of the unit cell in Angstrom^3."""
+        return np.abs(np.linalg.det(self.lattice_matrices))
+
+    @lazy_property
+    def xcart(self):
+        """[nstep, natom, 3] array with cartesian coordinates in Angstrom."""
+        return np.einsum("sai,sij->saj", self.xred, self.lattice_matrices)
+
+    @lazy_property
+    def pressures(self):
+        """[nstep] array with pressures in GPa."""
+        return -np.trace(self.cart_stress_tensors, axis1=1, axis2=2) / 3
+
+    @lazy_property
+    def fmods(self):
+        """[nstep, natom] array with the modulus of the forces in eV/Ang."""
+        return np.linalg.norm(self.cart_forces, axis=2)
+
+    @lazy_property
+    def fstats(self):
+        """
+        |AttrDict| with [nstep] arrays with statistics on the forces (eV/Ang):
+        fmin, fmax, fmean, fstd and drift (modulus of the total force).
+        """
+        fmods = self.fmods
+        return AttrDict(
+            fmin=fmods.min(axis=1),
+            fmax=fmods.max(axis=1),
+            fmean=fmods.mean(axis=1),
+            fstd=fmods.std(axis=1),
+            drift=np.linalg.norm(self.cart_forces.sum(axis=1), axis=1),
+        )
+
+    def get_structure(self, step):
+        """
+        Build and return the |Structure| at the given ``step`` (index in the trajectory).
+        Cartesian forces are stored in the "cartesian_forces" site property.
+        """
+        structure = Structure.from_abivars(
+            xred=self.xred[step],
+            rprim=self.rprimd[step],
+            acell=3 * [1.0],
+            znucl=self.znucl,
+            typat=self.typat,
+        )
+        structure.add_site_property("cartesian_forces", self.cart_forces[step])
+        return structure
+
+    def get_structures(self, steps=None):
+        """Return list of |Structure| objects for the given list of steps (default: all steps)."""
+        steps = range(self.num_steps) if steps is None else steps
+        return [self.get_structure(step) for step in steps]
+
+    def write_xdatcar_steps(self, fh, group_ids=None, to_unit_cell=False, chunk_steps=1024):
+        """
+        Write the atomic positions in reduced coordinates of all the steps to the XDATCAR file ``fh``.
+        Configurations are numbered with the index of the step in the HIST file + 1.
+
+        Args:
+            fh: File-like object.
+            group_ids: Order of the atoms in output. None to use the same order as in the HIST file.
+            to_unit_cell (bool): Whether to translate sites into the unit cell.
+            chunk_steps: Number of steps formatted in a single operation.
+        """
+        natom = self.natom
+        group_ids = np.arange(natom) if group_ids is None else group_ids
+        step_fmt = "Direct configuration= %d\n" + natom * "%.12f %.12f %.12f\n"
+
+        for ss in range(0, self.num_steps, chunk_steps):
+            xred = self.xred[ss:ss + chunk_steps][:, group_ids]
+            if to_unit_cell: xred = xred % 1
+            nsteps = len(xred)
+            rows = np.empty((nsteps, 1 + 3 * natom))
+            rows[:, 0] = self.steps[ss:ss + chunk_steps] + 1
+            rows[:, 1:] = np.reshape(xred, (nsteps, -1))
+            fh.write((step_fmt * nsteps) % tuple(rows.ravel().tolist()))
+
+
+class HistAccumulator(object):
+    """
+    Base class for objects accumulating quantities over the chunks of steps
+    produced by :meth:`HistReader.iter_steps`. Subclasses must implement ``add_chunk``
+    that receives a :class:`HistTrajectory` with consecutive steps and ``get_results``.
+    """
+
+    def add_chunk(self, traj):
+        """Accumulate the steps in the :class:`HistTrajectory` ``traj``."""
+        raise NotImplementedError("Subclass should implement add_chunk")
+
+    def get_results(self):
+        """Return the final results."""
+        raise NotImplementedError("Subclass should implement get_results")
+
+
+class RunningAverages(HistAccumulator):
+    """
+    Running averages of quantities defined for each step e.g. energies, pressures, volumes, lattice parameters.
+
+    Results: |AttrDict| name --> |AttrDict| with:
+
+        steps: Indices of the steps.
+        running: Running average at the different steps. If window is None, this is the cumulative average
+            over all the previous steps else the average over the last ``window`` steps
+            (fewer steps are used at the beginning of the trajectory).
+        mean, std: Mean and standard deviation over all the steps.
+    """
+
+    def __init__(self, names=("etotals", "pressures", "volumes"), window=None):
+        """
+        Args:
+            names: List with the names of the :class:`HistTrajectory` attributes to average.
+            window: Number of steps used to compute the moving average. None for cumulative averages.
+        """
+        self.names = list_strings(names)
+        if window is not None and window <= 0:
+            raise ValueError("window should be > 0 while it is: %s" % window)
+        self.window = window
+        self._steps = []
+        self._running = {name: [] for name in self.names}
+        # Number of values, mean and sum of the squares of the differences from the mean.
+        self._count = 0
+        self._mean = {name: 0.0 for name in self.names}
+        self._m2 = {name: 0.0 for name in self.names}
+        # Last window - 1 values of the previous chunk.
+        self._tail = {name: None for name in self.names}
+
+    def add_chunk(self, traj):
+        n = len(traj)
+        if n == 0: return
+        self._steps.append(traj.steps)
+
+        for name in self.names:
+            values = np.asarray(getattr(traj, name), dtype=np.float)
+            if self.window is None:
+                counts = np.arange(self._count + 1, self._count + n + 1).reshape((-1,) + (1,) * (values.ndim - 1))
+                csum = self._mean[name] * self._count + np.cumsum(values, axis=0)
+                self._running[name].append(csum / counts)
+            else:
+                tail = self._tail[name]
+                vals = values if tail is None else np.concatenate((tail, values))
+                ntail = len(vals) - n
+                cs = np.concatenate((np.zeros((1,) + values.shape[1:]), np.cumsum(vals, axis=0)))
+                iend = np.arange(ntail, len(vals)) + 1
+                ibeg = np.maximum(iend - self.window, 0)
+                counts = (iend - ibeg).reshape((-1,) + (1,) * (values.ndim - 1))
+                self._running[name].append((cs[iend] - cs[ibeg]) / counts)
+                self._tail[name] = vals[max(len(vals) - self.window + 1, 0):]
+
+            # Merge mean and m2 of the chunk with the previous values (parallel algorithm).
+            mean_b, m2_b = values.mean(axis=0), ((values - values.mean(axis=0)) ** 2).sum(axis=0)
+            na, ntot = self._count, self._count + n
+            delta = mean_b - self._mean[name]
+            self._m2[name] = self._m2[name] + m2_b + delta ** 2 * na * n / ntot
+            self._mean[name] = self._mean[name] + delta * n / ntot
+
+        self._count += n
+
+    def get_results(self):
+        if self._count == 0:
+            raise ValueError("No step has been accumulated!")
+        steps = np.concatenate(self._steps)
+        return AttrDict({name: AttrDict(
+            steps=steps,
+            running=np.concatenate(self._running[name]),
+            mean=self._mean[name],
+            std=np.sqrt(self._m2[name] / self._count),
+            ) for name in self.names})
+
+
+class MsdAccumulator(HistAccumulator):
+    """
+    Mean square displacement (Ang^2) with respect to the first step.
+    Periodic jumps are removed by assuming that atoms move less than half unit cell
+    between two consecutive steps (in reduced coordinates). Displacements in reduced coordinates
+    are converted to cartesian coordinates with the lattice of the current step.
+
+    Results: |AttrDict| with:
+
+        steps: Indices of the steps.
+        msd: [nstep] array with the MSD averaged over atoms.
+        msd_atom: [nstep, natom] array with the MSD of the individual atoms (if ``per_atom``)
+    """
+
+    def __init__(self, atom_indices=None, per_atom=False):
+        """
+        Args:
+            atom_indices: List of atom indices. None for all atoms.
+            per_atom: True if the MSD of the individual atoms should be stored.
+        """
+        self.atom_indices = atom_indices
+        self.per_atom = per_atom
+        self._last_xred, self._disp = None, None
+        self._steps, self._msd, self._msd_atom = [], [], []
+
+    def add_chunk(self, traj):
+        if len(traj) == 0: return
+        xred = traj.xred if self.atom_indices is None else traj.xred[:, self.atom_indices]
+        if self._last_xred is None:
+            self._last_xred, self._disp = xred[0], np.zeros(xred.shape[1:])
+
+        # Unwrapped displacements in reduced coordinates.
+        dred = np.diff(np.concatenate((self._last_xred[None], xred)), axis=0)
+        dred -= np.rint(dred)
+        disp = self._disp + np.cumsum(dred, axis=0)
+        self._last_xred, self._disp = xred[-1], disp[-1]
+
+        dcart = np.einsum("sai,sij->saj", disp, traj.lattice_matrices)
+        msd_atom = np.sum(dcart ** 2, axis=2)
+        self._steps.append(traj.steps)
+        self._msd.append(msd_atom.mean(axis=1))
+        if self.per_atom: self._msd_atom.append(msd_atom)
+
+    def get_results(self):
+        if not self._steps:
+            raise ValueError("No step has been accumulated!")
+        return AttrDict(
+            steps=np.concatenate(self._steps),
+            msd=np.concatenate(self._msd),
+            msd_atom=np.concatenate(self._msd_atom) if self.per_atom else None,
+        )
+
+
+class RdfAccumulator(HistAccumulator):
+    """
+    Radial distribution function g(r) averaged over the steps.
+    All the periodic images within ``rmax`` are taken into account so that rmax can be larger than
+    half the size of the unit cell.
+
+    Results: |AttrDict| with:
+
+        rmesh: [nbins] array with the center of the bins in Ang.
+        gr: [nbins] array with g(r).
+        num_steps: Number of steps used to compute the average.
+    """
+
+    def __init__(self, rmax=6.0, nbins=200):
+        """
+        Args:
+            rmax: Max distance in Ang.
+            nbins: Number of bins for the histogram.
+        """
+        self.rmax, self.nbins = float(rmax), int(nbins)
+        self.edges = np.linspace(0, self.rmax, self.nbins + 1)
+        self._hist = np.zeros(self.nbins)
+        self._num_steps = 0
+
+    def add_chunk(self, traj):
+        for xred, latt in zip(traj.xred, traj.lattice_matrices):
+            natom = len(xred)
+            volume = abs(np.linalg.det(latt))
+            # Number of images needed along each direction from the distance between lattice planes.
+            widths = volume / np.linalg.norm(np.cross(latt[[1, 2, 0]], latt[[2, 0, 1]]), axis=1)
+            nimg = np.floor(self.rmax / widths + 0.5).astype(np.int)
+            shifts = np.array(np.meshgrid(*[np.arange(-n, n + 1) for n in nimg], indexing="ij")).reshape(3, -1).T
+
+            # Loop over blocks of atoms to limit the memory for the [nblock, natom, nshift, 3] array.
+            counts = np.zeros(self.nbins)
+            block = max(1, 2 ** 20 // (natom * len(shifts)))
+            for ia in range(0, natom, block):
+                dred = xred[None, :, :] - xred[ia:ia + block, None, :]
+                dred -= np.rint(dred)
+                dcart = np.dot(dred[:, :, None, :] + shifts[None, None, :, :], latt)
+                dists = np.sqrt(np.sum(dcart ** 2, axis=-1)).ravel()
+                dists = dists[(dists > 1e-8) & (dists < self.rmax)]
+                counts += np.histogram(dists, bins=self.edges)[0]
+
+            # Normalize with the number of pairs expected for an ideal gas with density natom / volume.
+            self._hist += counts * volume / natom ** 2
+            self._num_steps += 1
+
+    def get_results(self):
+        if self._num_steps == 0:
+            raise ValueError("No step has been accumulated!")
+        shell_volumes = 4 * np.pi / 3 * (self.edges[1:] ** 3 - self.edges[:-1] ** 3)
+        return AttrDict(
+            rmesh=0.5 * (self.edges[1:] + self.edges[:-1]),
+            gr=self._hist / (self._num_steps * shell_volumes),
+            num_steps=self._num_steps,
+        )
+
+
 class HistReader(ETSF_Reader):
     """
     This object reads data from the HIST file.
@@ -749,36 +1147,66 @@ class HistReader(ETSF_Reader):
         """Number of atoms un the unit cell."""
         return self.read_dimvalue("natom")
 
-    def read_all_structures(self):
-        """Return the list of structures at the different iteration steps."""
-        rprimd_list = self.read_value("rprimd")
-        xred_list = self.read_value("xred")
-
+    @lazy_property
+    def znucl_typat(self):
+        """Tuple with znucl[npsp] and typat[natom]. NB: typat is double in the HIST.nc file."""
         # Alchemical mixing is not supported.
         num_pseudos = self.read_dimvalue("npsp")
         ntypat = self.read_dimvalue("ntypat")
         if num_pseudos != ntypat:
             raise NotImplementedError("Alchemical mixing is not supported, num_pseudos != ntypat")
 
-        znucl, typat = self.read_value("znucl"), self.read_value("typat").astype(int)
-        #print(znucl.dtype, typat)
-        cart_forces_step = self.read_cart_forces(unit="eV ang^-1")
-
-        structures = []
-        #print("typat", type(typat))
-        for step in range(self.num_steps):
-            s = Structure.from_abivars(
-                xred=xred_list[step],
-                rprim=rprimd_list[step],
-                acell=3 * [1.0],
-                # FIXME ntypat, typat, znucl are missing!
-                znucl=znucl,
-                typat=typat,
-            )
-            s.add_site_property("cartesian_forces", cart_forces_step[step])
-            structures.append(s)
-
-        return structures
+        return self.read_value("znucl"), self.read_value("typat").astype(int)
+
+    def read_trajectory(self, start=0, stop=None, stride=1):
+        """
+        Read the steps in range(start, stop, stride) and return a :class:`HistTrajectory` object.
+        Negative indices are supported with the same meaning as in python slices.
+        Read all the steps if called without arguments.
+        """
+        start, stop, stride = slice(start, stop, stride).indices(self.num_steps)
+        sl = slice(start, stop, stride)
+
+        def read(varname):
+            return np.asarray(self.read_variable(varname)[sl])
+
+        znucl, typat = self.znucl_typat
+        cart_stress_tensors, _ = cart_stress_tensors_from_strten(read("strten"))
+
+        return HistTrajectory(
+            xred=read("xred"),
+            rprimd=read("rprimd"),
+            cart_forces=units.ArrayWithUnit(read("fcart"), "Ha bohr^-1").to("eV ang^-1"),
+            cart_stress_tensors=cart_stress_tensors,
+            etotals=units.EnergyArray(read("etotal"), "Ha").to("eV"),
+            znucl=znucl,
+            typat=typat,
+            steps=np.arange(start, stop, stride),
+        )
+
+    def read_step(self, step):
+        """
+        Read a single ``step`` (negative values are allowed) and return a :class:`HistTrajectory`.
+        """
+        step = range(self.num_steps)[step]
+        return self.read_trajectory(start=step, stop=step + 1)
+
+    def iter_steps(self, start=0, stop=None, stride=1, chunk=1000):
+        """
+        Iterate over the steps in range(start, stop, stride) and yield :class:`HistTrajectory` objects
+        with at most ``chunk`` steps. Only one chunk is kept in memory so that this method can be used
+        to analyze trajectories that do not fit into memory.
+        The indices of the steps in the file are available in the ``steps`` attribute of the chunk.
+        """
+        if chunk <= 0 or stride <= 0:
+            raise ValueError("chunk and stride should be > 0 while they are: %s, %s" % (chunk, stride))
+        start, stop, stride = slice(start, stop, stride).indices(self.num_steps)
+        for first in range(start, stop, chunk * stride):
+            yield self.read_trajectory(start=first, stop=min(first + chunk * stride, stop), stride=stride)
+
+    def read_all_structures(self):
+        """Return the list of structures at the different iteration steps."""
+        return self.read_trajectory().get_structures()
 
     def read_eterms(self, unit="eV"):
         """|AttrDict| with the decomposition of the total energy in units ``unit``"""
@@ -809,18 +1237,24 @@ class HistReader(ETSF_Reader):
         """
         # Abinit stores 6 unique components of this symmetric 3x3 tensor:
         # Given in order (1,1), (2,2), (3,3), (3,2), (3,1), (2,1).
-        c = self.read_value("strten")
-        tensors = np.empty((self.num_steps, 3, 3), dtype=np.float)
-
-        for step in range(self.num_steps):
-            for i in range(3): tensors[step, i,i] = c[step, i]
-            for p, (i, j) in enumerate(((2,1), (2,0), (1,0))):
-                tensors[step, i,j] = c[step, 3+p]
-                tensors[step, j,i] = c[step, 3+p]
+        return cart_stress_tensors_from_strten(self.read_value("strten"))
 
-        tensors *= abu.HaBohr3_GPa
-        pressures = np.empty(self.num_steps)
-        for step, tensor in enumerate(tensors):
-            pressures[step] = - tensor.trace() / 3
 
-        return tensors, pressures
+def cart_stress_tensors_from_strten(strten):
+    """
+    Convert the [nstep, 6] array with the stress tensors in Voigt notation in Ha/Bohr^3 (Abinit ordering).
+    Return the stress tensors (nstep x 3 x 3) in cartesian coordinates (GPa) and the array with pressures in GPa.
+    """
+    # Abinit stores 6 unique components of this symmetric 3x3 tensor:
+    # Given in order (1,1), (2,2), (3,3), (3,2), (3,1), (2,1).
+    c = np.reshape(strten, (-1, 6))
+    tensors = np.empty((len(c), 3, 3), dtype=np.float)
+    for i in range(3): tensors[:, i, i] = c[:, i]
+    for p, (i, j) in enumerate(((2, 1), (2, 0), (1, 0))):
+        tensors[:, i, j] = c[:, 3 + p]
+        tensors[:, j, i] = c[:, 3 + p]
+
+    tensors *= abu.HaBohr3_GPa
+    pressures = -np.trace(tensors, axis1=1, axis2=2) / 3
+
+    return tensors, pressures
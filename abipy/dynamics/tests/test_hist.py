@@ -1,11 +1,46 @@
 """"Tests for HIST.nc files."""
+import numpy as np
 import abipy.data as abidata
+
+from pymatgen.core.units import bohr_to_ang
 from abipy import abilab
 from abipy.core.testing import AbipyTest
 from abipy.dynamics.hist import HistFile, HistRobot
 import abipy.core.abinit_units as abu
 
 
+def write_synthetic_hist(filepath, xred, rprimd, typat, znucl):
+    """
+    Write a minimal HIST.nc file with the trajectory given by xred[nstep, natom, 3]
+    and rprimd[nstep, 3, 3] (Bohr). Forces, energies and stresses are filled with deterministic values.
+    """
+    import netCDF4
+    nstep, natom = xred.shape[:2]
+    with netCDF4.Dataset(filepath, mode="w") as nc:
+        nc.createDimension("natom", natom)
+        nc.createDimension("ntypat", len(znucl))
+        nc.createDimension("npsp", len(znucl))
+        nc.createDimension("xyz", 3)
+        nc.createDimension("time", None)
+        nc.createDimension("six", 6)
+        nc.createVariable("typat", "f8", ("natom",))[:] = typat
+        nc.createVariable("znucl", "f8", ("npsp",))[:] = znucl
+        steps = np.arange(nstep, dtype=np.float)
+        fcart = np.sin(np.arange(nstep * natom * 3)).reshape(nstep, natom, 3)
+        for name, dims, values in [
+            ("xred", ("time", "natom", "xyz"), xred),
+            ("xcart", ("time", "natom", "xyz"), np.einsum("sai,sij->saj", xred, rprimd)),
+            ("fcart", ("time", "natom", "xyz"), fcart),
+            ("fred", ("time", "natom", "xyz"), fcart),
+            ("rprimd", ("time", "xyz", "xyz"), rprimd),
+            ("etotal", ("time",), -10 + np.cos(steps)),
+            ("ekin", ("time",), np.zeros(nstep)),
+            ("entropy", ("time",), np.zeros(nstep)),
+            ("strten", ("time", "six"), 1e-5 * np.cos(np.arange(nstep * 6)).reshape(nstep, 6)),
+        ]:
+            nc.createVariable(name, "f8", dims)[:] = values
+
+
 class HistFileTest(AbipyTest):
 
     def test_hist_api(self):
@@ -84,6 +119,95 @@ class HistFileTest(AbipyTest):
 
         hist.close()
 
+    def test_hist_trajectory(self):
+        """Testing HistTrajectory."""
+        with HistFile(abidata.ref_file("sic_relax_HIST.nc")) as hist:
+            traj = hist.trajectory
+            assert len(traj) == hist.num_steps and traj.natom == 2
+            assert traj.xred.shape == (hist.num_steps, 2, 3)
+            structures = hist.structures
+            self.assert_almost_equal(traj.abc, [s.lattice.abc for s in structures])
+            self.assert_almost_equal(traj.angles, [s.lattice.angles for s in structures])
+            self.assert_almost_equal(traj.volumes, [s.volume for s in structures])
+            self.assert_almost_equal(traj.xcart, [s.cart_coords for s in structures])
+            self.assert_almost_equal(traj.pressures[-1], hist.final_pressure)
+            self.assert_almost_equal(traj.get_structure(-1).frac_coords, hist.final_structure.frac_coords)
+
+            cart_stress_tensors, pressures = hist.reader.read_cart_stress_tensors()
+            self.assert_almost_equal(traj.cart_stress_tensors, cart_stress_tensors)
+            self.assert_almost_equal(traj.pressures, pressures)
+
+            forces = hist.reader.read_cart_forces()
+            for step in (0, -1):
+                fstats = hist.get_fstats_dict(step)
+                fmods = [np.linalg.norm(f) for f in forces[step]]
+                self.assert_almost_equal(fstats.fmax, max(fmods))
+                self.assert_almost_equal(fstats.drift, np.linalg.norm(np.sum(forces[step], axis=0)))
+
+    def test_hist_streaming(self):
+        """Testing windowed access to synthetic HIST files."""
+        from abipy.dynamics.hist import RunningAverages, MsdAccumulator, RdfAccumulator
+        # Simple cubic lattice with 2x2x2 atoms moving with constant velocity
+        # along x so that they cross the boundaries of the cell.
+        nstep, acell = 53, 8.0
+        sc = np.array([[i, j, k] for i in range(2) for j in range(2) for k in range(2)], dtype=np.float) / 2
+        vel = 0.035
+        xred = np.array([(sc + [vel * t, 0, 0]) % 1 for t in range(nstep)])
+        rprimd = np.array(nstep * [acell * np.eye(3)])
+        filepath = self.get_tmpname(suffix="_HIST.nc")
+        write_synthetic_hist(filepath, xred, rprimd, typat=8 * [1], znucl=[14])
+
+        with HistFile(filepath) as hist:
+            assert hist.num_steps == nstep
+            traj = hist.trajectory
+            self.assert_equal(traj.steps, np.arange(nstep))
+            self.assert_almost_equal(traj.xred, xred)
+            self.assert_almost_equal(hist.final_structure.frac_coords, xred[-1])
+
+            # Chunks must reproduce the full trajectory.
+            for stride, chunk in [(1, 10), (3, 4), (7, 100)]:
+                chunks = list(hist.iter_steps(start=2, stride=stride, chunk=chunk))
+                assert all(len(c) <= chunk for c in chunks)
+                self.assert_equal(np.concatenate([c.steps for c in chunks]), np.arange(2, nstep, stride))
+                self.assert_almost_equal(np.concatenate([c.etotals for c in chunks]), traj.etotals[2::stride])
+                self.assert_almost_equal(np.concatenate([c.pressures for c in chunks]), traj.pressures[2::stride])
+            with self.assertRaises(ValueError):
+                list(hist.iter_steps(chunk=0))
+
+            # Running averages.
+            avg = hist.get_running_averages(names=["etotals", "abc"], chunk=7)
+            etotals = traj.etotals
+            self.assert_almost_equal(avg.etotals.running, np.cumsum(etotals) / np.arange(1, nstep + 1))
+            self.assert_almost_equal(avg.etotals.mean, etotals.mean())
+            self.assert_almost_equal(avg.etotals.std, etotals.std())
+            assert avg.abc.running.shape == (nstep, 3)
+            window = 5
+            avg = hist.accumulate(RunningAverages(names="etotals", window=window), chunk=3)
+            ref = [etotals[max(0, i - window + 1):i + 1].mean() for i in range(nstep)]
+            self.assert_almost_equal(avg.etotals.running, ref)
+
+            # MSD of atoms moving with constant velocity (periodic jumps must be removed).
+            msd = hist.get_msd(chunk=4)
+            self.assert_almost_equal(msd.msd, (vel * np.arange(nstep) * acell * bohr_to_ang) ** 2)
+            msd, rdf = hist.accumulate([MsdAccumulator(atom_indices=[0, 1], per_atom=True),
+                                        RdfAccumulator(rmax=2 * acell * bohr_to_ang, nbins=50)],
+                                       stride=2, chunk=5)
+            assert msd.msd_atom.shape == (len(range(0, nstep, 2)), 2)
+            assert rdf.num_steps == len(range(0, nstep, 2))
+
+            # Simple cubic lattice: 6 first neighbours at a/2, 12 at a/sqrt(2) (cumulative number).
+            rho = 8 / (acell * bohr_to_ang) ** 3
+            edges = np.linspace(0, 2 * acell * bohr_to_ang, 51)
+            ncum = np.cumsum(rho * rdf.gr * 4 * np.pi / 3 * (edges[1:] ** 3 - edges[:-1] ** 3))
+            nn = acell * bohr_to_ang / 2
+            self.assert_almost_equal(ncum[np.searchsorted(edges, 1.1 * nn) - 1], 6)
+            self.assert_almost_equal(ncum[np.searchsorted(edges, 1.1 * nn * np.sqrt(2)) - 1], 18)
+
+            # Stride-subsampled XDATCAR.
+            xdatcar = hist.to_xdatcar(filepath=None, start=1, stride=5)
+            assert len(xdatcar.structures) == len(range(1, nstep, 5))
+            self.assert_almost_equal(xdatcar.structures[-1].frac_coords, xred[range(1, nstep, 5)[-1]])
+
     def test_hist_robot(self):
         """Test HistRobot."""
         filepath = abidata.ref_file("sic_relax_HIST.nc")
@@ -30,6 +30,7 @@ logger = logging.getLogger(__name__)
 
 __all__ = [
     "QPState",
+    "QPTable",
     "SigresFile",
     "SigresRobot",
 ]
@@ -308,51 +309,12 @@ class QPList(list):
             fermie = fermi
             warnings.warn("fermi keyword argument have been renamed fermie. Old arg will be removed in version 0.4")
 
-        fields = QPState.get_fields_for_plot(with_fields, exclude_fields)
-        if not fields: return None
-
-        num_plots, ncols, nrows = len(fields), 1, 1
-        if num_plots > 1:
-            ncols = 2
-            nrows = (num_plots // ncols) + (num_plots % ncols)
-
-        # Build grid of plots.
-        ax_list, fig, plt = get_axarray_fig_plt(ax_list, nrows=nrows, ncols=ncols,
-                                                sharex=True, sharey=sharey, squeeze=False)
-        ax_list = np.array(ax_list).ravel()
-
         # Get qplist and sort it.
         qps = self if self.is_e0sorted else self.sort_by_e0()
-        e0mesh = qps.get_e0mesh()
-        xlabel = r"$\epsilon_{KS}\;(eV)$"
-        #print("fermie", fermie)
-        if fermie is not None:
-            xlabel = r"$\epsilon_{KS}-\epsilon_F\;(eV)$"
-            e0mesh -= fermie
-
-        kw_linestyle = kwargs.pop("linestyle", "o")
-        kw_color = kwargs.pop("color", None)
-        kw_label = kwargs.pop("label", None)
-
-        for ii, (field, ax) in enumerate(zip(fields, ax_list)):
-            irow, icol = divmod(ii, ncols)
-            ax.grid(True)
-            if irow == nrows - 1:
-                ax.set_xlabel(xlabel)
-            ax.set_ylabel(field, fontsize=fontsize)
-            yy = qps.get_field(field)
-
-            # TODO real and imag?
-            ax.plot(e0mesh, yy.real, kw_linestyle, color=kw_color, label=kw_label, **kwargs)
-            set_axlims(ax, xlims, "x")
 
-        if kw_label:
-            ax_list[0].legend(loc="best", fontsize=fontsize, shadow=True)
-
-        # Get around a bug in matplotlib
-        if num_plots % ncols != 0: ax_list[-1].axis('off')
-
-        return fig
+        return _plot_qpfields_vs_e0(qps.get_e0mesh(), qps.get_field, with_fields=with_fields,
+                                    exclude_fields=exclude_fields, fermie=fermie, ax_list=ax_list,
+                                    sharey=sharey, xlims=xlims, fontsize=fontsize, **kwargs)
 
     def build_scissors(self, domains, bounds=None, k=3, plot=False, **kwargs):
         """
@@ -383,71 +345,348 @@ class QPList(list):
         """
         # Sort QP corrections according to the initial KS energy.
         qps = self.sort_by_e0()
-        e0mesh, qpcorrs = qps.get_e0mesh(), qps.get_qpeme0()
-
-        # Check domains.
-        domains = np.atleast_2d(domains)
-        dsize, dflat = domains.size, domains.ravel()
-
-        for idx, v in enumerate(dflat):
-            if idx == 0 and v > e0mesh[0]:
-                raise ValueError("min(e0mesh) %s is not included in domains" % e0mesh[0])
-            if idx == dsize-1 and v < e0mesh[-1]:
-                raise ValueError("max(e0mesh) %s is not included in domains" % e0mesh[-1])
-            if idx != dsize-1 and dflat[idx] > dflat[idx+1]:
-                raise ValueError("domain boundaries should be given in increasing order.")
-            if idx == dsize-1 and dflat[idx] < dflat[idx-1]:
-                raise ValueError("domain boundaries should be given in increasing order.")
-
-        # Create the sub_domains and the spline functions in each subdomain.
-        func_list, residues = [], []
-
-        if len(domains) == 2:
-            #print('forcing extremal point on the scissor')
-            ndom = 0
+
+        return _build_scissors(qps.get_e0mesh(), qps.get_qpeme0(), domains,
+                               bounds=bounds, k=k, plot=plot, **kwargs)
+
+
+def _plot_qpfields_vs_e0(e0mesh, get_field, with_fields="all", exclude_fields=None, fermie=None,
+                         ax_list=None, sharey=False, xlims=None, fontsize=12, **kwargs):
+    """
+    Plot QP fields as function of the initial KS energy. Used by :class:`QPList` and :class:`QPTable`.
+
+    Args:
+        e0mesh: KS energies sorted in ascending order.
+        get_field: Callable receiving the name of the field and returning the array
+            with the values ordered as ``e0mesh``.
+
+    See :meth:`QPList.plot_qps_vs_e0` for the meaning of the other arguments.
+
+    Returns: |matplotlib-Figure|
+    """
+    fields = QPState.get_fields_for_plot(with_fields, exclude_fields)
+    if not fields: return None
+
+    num_plots, ncols, nrows = len(fields), 1, 1
+    if num_plots > 1:
+        ncols = 2
+        nrows = (num_plots // ncols) + (num_plots % ncols)
+
+    # Build grid of plots.
+    ax_list, fig, plt = get_axarray_fig_plt(ax_list, nrows=nrows, ncols=ncols,
+                                            sharex=True, sharey=sharey, squeeze=False)
+    ax_list = np.array(ax_list).ravel()
+
+    e0mesh = np.array(e0mesh)
+    xlabel = r"$\epsilon_{KS}\;(eV)$"
+    #print("fermie", fermie)
+    if fermie is not None:
+        xlabel = r"$\epsilon_{KS}-\epsilon_F\;(eV)$"
+        e0mesh -= fermie
+
+    kw_linestyle = kwargs.pop("linestyle", "o")
+    kw_color = kwargs.pop("color", None)
+    kw_label = kwargs.pop("label", None)
+
+    for ii, (field, ax) in enumerate(zip(fields, ax_list)):
+        irow, icol = divmod(ii, ncols)
+        ax.grid(True)
+        if irow == nrows - 1:
+            ax.set_xlabel(xlabel)
+        ax.set_ylabel(field, fontsize=fontsize)
+        yy = get_field(field)
+
+        # TODO real and imag?
+        ax.plot(e0mesh, yy.real, kw_linestyle, color=kw_color, label=kw_label, **kwargs)
+        set_axlims(ax, xlims, "x")
+
+    if kw_label:
+        ax_list[0].legend(loc="best", fontsize=fontsize, shadow=True)
+
+    # Get around a bug in matplotlib
+    if num_plots % ncols != 0: ax_list[-1].axis('off')
+
+    return fig
+
+
+def _build_scissors(e0mesh, qpcorrs, domains, bounds=None, k=3, plot=False, **kwargs):
+    """
+    Construct a :class:`Scissors` operator by interpolating the QP corrections ``qpcorrs``
+    as function of the initial energies ``e0mesh`` (sorted in ascending order).
+    See :meth:`QPList.build_scissors` for the meaning of the other arguments.
+    """
+    # Check domains.
+    domains = np.atleast_2d(domains)
+    dsize, dflat = domains.size, domains.ravel()
+
+    for idx, v in enumerate(dflat):
+        if idx == 0 and v > e0mesh[0]:
+            raise ValueError("min(e0mesh) %s is not included in domains" % e0mesh[0])
+        if idx == dsize-1 and v < e0mesh[-1]:
+            raise ValueError("max(e0mesh) %s is not included in domains" % e0mesh[-1])
+        if idx != dsize-1 and dflat[idx] > dflat[idx+1]:
+            raise ValueError("domain boundaries should be given in increasing order.")
+        if idx == dsize-1 and dflat[idx] < dflat[idx-1]:
+            raise ValueError("domain boundaries should be given in increasing order.")
+
+    # Create the sub_domains and the spline functions in each subdomain.
+    func_list, residues = [], []
+
+    if len(domains) == 2:
+        #print('forcing extremal point on the scissor')
+        ndom = 0
+    else:
+        ndom = 99
+
+    for dom in domains[:]:
+        ndom += 1
+        low, high = dom[0], dom[1]
+        start, stop = find_ge(e0mesh, low), find_le(e0mesh, high)
+
+        dom_e0 = e0mesh[start:stop+1]
+        dom_corr = qpcorrs[start:stop+1]
+
+        # todo check if the number of non degenerate data points > k
+        from scipy.interpolate import UnivariateSpline
+        w = len(dom_e0)*[1]
+        if ndom == 1:
+            w[-1] = 1000
+        elif ndom == 2:
+            w[0] = 1000
         else:
-            ndom = 99
+            w = None
+        f = UnivariateSpline(dom_e0, dom_corr, w=w, bbox=[None, None], k=k, s=None)
+        func_list.append(f)
+        residues.append(f.get_residual())
 
+    # Build the scissors operator.
+    sciss = Scissors(func_list, domains, residues, bounds)
+
+    # Compare fit with input data.
+    if plot:
+        title = kwargs.pop("title", None)
+        import matplotlib.pyplot as plt
+        plt.plot(e0mesh, qpcorrs, 'o', label="input data")
+        if title: plt.suptitle(title)
         for dom in domains[:]:
-            ndom += 1
-            low, high = dom[0], dom[1]
-            start, stop = find_ge(e0mesh, low), find_le(e0mesh, high)
-
-            dom_e0 = e0mesh[start:stop+1]
-            dom_corr = qpcorrs[start:stop+1]
-
-            # todo check if the number of non degenerate data points > k
-            from scipy.interpolate import UnivariateSpline
-            w = len(dom_e0)*[1]
-            if ndom == 1:
-                w[-1] = 1000
-            elif ndom == 2:
-                w[0] = 1000
+            plt.plot(2*[dom[0]], [min(qpcorrs), max(qpcorrs)])
+            plt.plot(2*[dom[1]], [min(qpcorrs), max(qpcorrs)])
+        intp_qpc = [sciss.apply(e0) for e0 in e0mesh]
+        plt.plot(e0mesh, intp_qpc, label="scissor")
+        plt.legend(bbox_to_anchor=(0.9, 0.2))
+        plt.show()
+
+    # Return the object.
+    return sciss
+
+
+class QPTable(object):
+    """
+    Columnar container with the QP results for all the (spin, kcalc, band) stored in the SIGRES file.
+    Each quantity is stored in an array indexed by [spin, ikcalc, ibc] where ikcalc is the index
+    of the k-point in the list of GW k-points and ``ibc = band - gwbstart_sk[spin, ikcalc]``.
+    Entries with ``band >= gwbstop_sk[spin, ikcalc]`` are filled with NaN. Energies are in eV.
+    :class:`QPState` objects are created only on request.
+    """
+    # Quantities stored as arrays. Note the same order as in QPState.
+    array_fields = ("e0", "qpe", "qpe_diago", "vxcme", "sigxme", "sigcmee0", "vUme", "ze0")
+
+    # Complex quantities whose real part is returned if ignore_imag.
+    complex_fields = ("qpe", "qpe_diago", "sigcmee0", "ze0")
+
+    def __init__(self, gwkpoints, gwk2ibz, gwbstart_sk, gwbstop_sk, **arrays):
+        """
+        Args:
+            gwkpoints: |KpointList| with the k-points where QP corrections have been calculated.
+            gwk2ibz: [nkcalc] array with the index of the GW k-points in the IBZ.
+            gwbstart_sk, gwbstop_sk: [nsppol, nkcalc] arrays with the first and last+1 band computed.
+            arrays: [nsppol, nkcalc, max_nbcalc] arrays with the quantities listed in ``array_fields``.
+        """
+        self.gwkpoints = gwkpoints
+        self.gwk2ibz = np.asarray(gwk2ibz, dtype=np.int)
+        self.gwbstart_sk, self.gwbstop_sk = gwbstart_sk, gwbstop_sk
+        self.nsppol, self.nkcalc = gwbstart_sk.shape
+
+        for field in self.array_fields:
+            setattr(self, field, arrays.pop(field))
+        if arrays:
+            raise ValueError("Unknown arrays: %s" % str(list(arrays.keys())))
+
+    @classmethod
+    def from_sigres_arrays(cls, gwkpoints, gwk2ibz, gwbstart_sk, gwbstop_sk, min_gwbstart,
+                           eigens, egw, en_qp_diago, vxcme, sigxme, sigcmee0, vUme, ze0):
+        """
+        Build the table from the arrays stored in the SIGRES file.
+
+        Args:
+            eigens, egw, en_qp_diago: [nsppol, nkibz, mband] arrays with KS energies,
+                QP energies (complex) and QP energies obtained by diagonalizing the self-energy.
+            vxcme, sigxme, sigcmee0, vUme, ze0: [nsppol, nkibz, nbgw] arrays with the
+                matrix elements indexed by ``band - min_gwbstart``.
+
+        See :meth:`__init__` for the meaning of the other arguments.
+        """
+        gwk2ibz = np.asarray(gwk2ibz, dtype=np.int)
+        nsppol, nkcalc = gwbstart_sk.shape
+        nbcalc_sk = gwbstop_sk - gwbstart_sk
+        ibcs = np.arange(nbcalc_sk.max())
+
+        # Global band index for each entry of the table and mask for the valid entries.
+        bands = gwbstart_sk[:, :, None] + ibcs[None, None, :]
+        valid = ibcs[None, None, :] < nbcalc_sk[:, :, None]
+        spins = np.broadcast_to(np.arange(nsppol)[:, None, None], bands.shape)
+        ikibz = np.broadcast_to(gwk2ibz[None, :, None], bands.shape)
+
+        def gather(values, shift=0):
+            b = np.clip(bands - shift, 0, values.shape[-1] - 1)
+            out = values[spins, ikibz, b]
+            if np.iscomplexobj(out):
+                out[~valid] = np.nan + 1j * np.nan
             else:
-                w = None
-            f = UnivariateSpline(dom_e0, dom_corr, w=w, bbox=[None, None], k=k, s=None)
-            func_list.append(f)
-            residues.append(f.get_residual())
-
-        # Build the scissors operator.
-        sciss = Scissors(func_list, domains, residues, bounds)
-
-        # Compare fit with input data.
-        if plot:
-            title = kwargs.pop("title", None)
-            import matplotlib.pyplot as plt
-            plt.plot(e0mesh, qpcorrs, 'o', label="input data")
-            if title: plt.suptitle(title)
-            for dom in domains[:]:
-                plt.plot(2*[dom[0]], [min(qpcorrs), max(qpcorrs)])
-                plt.plot(2*[dom[1]], [min(qpcorrs), max(qpcorrs)])
-            intp_qpc = [sciss.apply(e0) for e0 in e0mesh]
-            plt.plot(e0mesh, intp_qpc, label="scissor")
-            plt.legend(bbox_to_anchor=(0.9, 0.2))
-            plt.show()
-
-        # Return the object.
-        return sciss
+                out = out.astype(np.float)
+                out[~valid] = np.nan
+            return out
+
+        return cls(gwkpoints, gwk2ibz, gwbstart_sk, gwbstop_sk,
+                   e0=gather(eigens), qpe=gather(egw), qpe_diago=gather(en_qp_diago),
+                   # Matrix elements are shifted by min_gwbstart (see fortran code that allocates with mdbgw)
+                   vxcme=gather(vxcme, min_gwbstart), sigxme=gather(sigxme, min_gwbstart),
+                   sigcmee0=gather(sigcmee0, min_gwbstart), vUme=gather(vUme, min_gwbstart),
+                   ze0=gather(ze0, min_gwbstart))
+
+    def get_state_indices(self, sk_list=None):
+        """
+        Return tuple of arrays (spins, ikcalcs, ibcs) with the indices of the states in the table
+        for the list of (spin, ikcalc) tuples ``sk_list``. None for all spins and k-points.
+        States are ordered by spin, k-point and band.
+        """
+        if sk_list is None:
+            sk_list = [(spin, ikc) for spin in range(self.nsppol) for ikc in range(self.nkcalc)]
+
+        nb_list = [self.gwbstop_sk[spin, ikc] - self.gwbstart_sk[spin, ikc] for spin, ikc in sk_list]
+        spins = np.repeat([spin for spin, _ in sk_list], nb_list).astype(np.int)
+        ikcs = np.repeat([ikc for _, ikc in sk_list], nb_list).astype(np.int)
+        ibcs = np.concatenate([np.arange(nb) for nb in nb_list]).astype(np.int)
+
+        return spins, ikcs, ibcs
+
+    def get_field(self, field, spin=None, ignore_imag=False):
+        """
+        |numpy-array| with the values of ``field`` for all the states of the given ``spin``
+        (all spins if None), ordered by spin, k-point and band.
+        Accepts the fields of :class:`QPState` as well as "qpeme0", "re_qpe" and "imag_qpe".
+        """
+        idx = self.get_state_indices(None if spin is None else [(spin, ikc) for ikc in range(self.nkcalc)])
+        spins, ikcs, ibcs = idx
+
+        if field == "spin":
+            return spins
+        elif field == "band":
+            return self.gwbstart_sk[spins, ikcs] + ibcs
+        elif field == "kpoint":
+            return np.array([self.gwkpoints[ikc] for ikc in ikcs], dtype=object)
+        elif field == "qpeme0":
+            values = self.qpe[idx] - self.e0[idx]
+        elif field == "re_qpe":
+            return self.qpe[idx].real
+        elif field == "imag_qpe":
+            return self.qpe[idx].imag
+        else:
+            values = getattr(self, field)[idx]
+
+        return values.real if ignore_imag else values
+
+    def get_qp(self, spin, ikc, band, ignore_imag=False):
+        """
+        Build and return :class:`QPState` for the given (spin, ikc, band).
+        ikc is the index of the k-point in gwkpoints. NB: band is a global index i.e. unshifted.
+        Only real part is returned if ``ignore_imag``.
+        """
+        ibc = band - self.gwbstart_sk[spin, ikc]
+
+        def ri(field):
+            a = getattr(self, field)[spin, ikc, ibc]
+            return np.real(a) if ignore_imag and field in self.complex_fields else a
+
+        return QPState(spin=spin, kpoint=self.gwkpoints[ikc], band=band,
+                       **{field: ri(field) for field in self.array_fields})
+
+    def get_qplist_sk(self, spin, ikc, ignore_imag=False):
+        """Return :class:`QPList` with the states for the given spin and k-point index."""
+        return QPList([self.get_qp(spin, ikc, band, ignore_imag=ignore_imag)
+                      for band in range(self.gwbstart_sk[spin, ikc], self.gwbstop_sk[spin, ikc])])
+
+    def get_qplist_spin(self, ignore_imag=False):
+        """Return tuple with ``nsppol`` :class:`QPList` objects with all the states."""
+        return tuple(QPList([self.get_qp(spin, ikc, band, ignore_imag=ignore_imag)
+                             for ikc in range(self.nkcalc)
+                             for band in range(self.gwbstart_sk[spin, ikc], self.gwbstop_sk[spin, ikc])])
+                     for spin in range(self.nsppol))
+
+    def get_dataframe(self, sk_list=None, index=None, ignore_imag=False, params=None):
+        """
+        Build |pandas-DataFrame| with the QP results. The dataframe has the same columns
+        as :meth:`QPState.as_dict` and one row for each state.
+
+        Args:
+            sk_list: List of (spin, ikcalc) tuples. None for all spins and k-points.
+            index: Value used for the index of the rows. If None, the band index is used.
+            ignore_imag: Only real part is returned if ``ignore_imag``.
+            params: Optional (Ordered) dictionary with extra parameters added to each row.
+        """
+        spins, ikcs, ibcs = idx = self.get_state_indices(sk_list)
+        bands = self.gwbstart_sk[spins, ikcs] + ibcs
+
+        od = OrderedDict()
+        od["spin"] = spins
+        od["kpoint"] = np.array([self.gwkpoints[ikc] for ikc in ikcs], dtype=object)
+        od["band"] = bands
+        for field in self.array_fields:
+            values = getattr(self, field)[idx]
+            od[field] = values.real if ignore_imag and field in self.complex_fields else values
+        od["qpeme0"] = od["qpe"] - od["e0"]
+        if params is not None: od.update(params)
+
+        index = len(bands) * [index] if index is not None else bands
+        return pd.DataFrame(od, index=index)
+
+    def get_e0sorted(self, spin):
+        """
+        Return (e0mesh, perm) where e0mesh are the KS energies for the given spin sorted
+        in ascending order and perm the permutation used to sort the states returned by :meth:`get_field`.
+        """
+        e0 = self.get_field("e0", spin=spin)
+        # Stable sort to have the same order as QPList.sort_by_e0
+        perm = np.argsort(e0, kind="mergesort")
+        return e0[perm], perm
+
+    @add_fig_kwargs
+    def plot_qps_vs_e0(self, spin, with_fields="all", exclude_fields=None, fermie=None,
+                       ax_list=None, sharey=False, xlims=None, fontsize=12, **kwargs):
+        """
+        Plot the QP results for the given spin as function of the initial KS energy.
+        Same meaning of the arguments as in :meth:`QPList.plot_qps_vs_e0`.
+
+        Returns: |matplotlib-Figure|
+        """
+        e0mesh, perm = self.get_e0sorted(spin)
+
+        return _plot_qpfields_vs_e0(e0mesh, lambda field: self.get_field(field, spin=spin)[perm],
+                                    with_fields=with_fields, exclude_fields=exclude_fields, fermie=fermie,
+                                    ax_list=ax_list, sharey=sharey, xlims=xlims, fontsize=fontsize, **kwargs)
+
+    def build_scissors(self, spin, domains, bounds=None, k=3, plot=False, **kwargs):
+        """
+        Construct a scissors operator by interpolating the QP corrections for the given spin
+        as function of the initial energies E0.
+        Same meaning of the arguments as in :meth:`QPList.build_scissors`.
+
+        Return: instance of :class:`Scissors` operator
+        """
+        e0mesh, perm = self.get_e0sorted(spin)
+        qpcorrs = self.get_field("qpeme0", spin=spin)[perm]
+
+        return _build_scissors(e0mesh, qpcorrs, domains, bounds=bounds, k=k, plot=plot, **kwargs)
 
 
 class SelfEnergy(object):
@@ -617,8 +856,6 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
 
         self._ebands = ebands = reader.ks_bands
 
-        qplist_spin = self.qplist_spin
-
         # TODO handle the case in which nkptgw < nkibz
         self.qpgaps = reader.read_qpgaps()
         self.qpenes = reader.read_qpenes()
@@ -635,19 +872,15 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
         Used to prepare plots of KS bands with markers.
         """
         # Each marker is a list of tuple(x, y, value)
-        x, y, s = [], [], []
+        # Note that ebands.kpoints is the IBZ hence ik is given by gwk2ibz.
+        table = self.qp_table
+        _, ikcs, _ = table.get_state_indices()
+        x = table.gwk2ibz[ikcs]
+        y = table.get_field("e0")
+        # Handle complex quantities
+        s = table.get_field(qpattr).real
 
-        for spin in range(self.nsppol):
-            for qp in self.qplist_spin[spin]:
-                ik = self.ebands.kpoints.index(qp.kpoint)
-                x.append(ik)
-                y.append(qp.e0)
-                size = getattr(qp, qpattr)
-                # Handle complex quantities
-                if np.iscomplex(size): size = size.real
-                s.append(size)
-
-        return Marker(*(x, y, s))
+        return Marker(*(list(x), list(y), list(s)))
 
     @lazy_property
     def params(self):
@@ -716,6 +949,11 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
         """True if file contains spectral function data."""
         return self.reader.has_spfunc
 
+    @property
+    def qp_table(self):
+        """:class:`QPTable` with the QP results for all the (spin, kpoint, band)."""
+        return self.reader.qp_table
+
     @lazy_property
     def qplist_spin(self):
         """Tuple of :class:`QPList` objects indexed by spin."""
@@ -867,8 +1105,9 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
         ax.set_xticks(xs)
         ax.set_xticklabels(tick_labels, fontdict=None, rotation=30, minor=False, size="x-small")
 
+        gwk2ibz = self.reader.gwk2ibz
         for spin in range(self.nsppol):
-            qp_gaps, ks_gaps = map(np.array, zip(*[self.get_qpgap(spin, kgw, with_ksgap=True) for kgw in self.gwkpoints]))
+            qp_gaps, ks_gaps = self.qpgaps[spin, gwk2ibz], self.ksgaps[spin, gwk2ibz]
             if not plot_qpmks:
                 # Plot QP gaps
                 ax.plot(xs, qp_gaps, marker=self.marker_spin[spin],
@@ -920,7 +1159,7 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
         # Because qplist does not have the fermi level.
         fermie = self.ebands.get_e0(e0) if e0 is not None else None
         for spin in range(self.nsppol):
-            fig = self.qplist_spin[spin].plot_qps_vs_e0(
+            fig = self.qp_table.plot_qps_vs_e0(spin,
                 with_fields=with_fields, exclude_fields=exclude_fields, fermie=fermie,
                 xlims=xlims, sharey=sharey, ax_list=ax_list, fontsize=fontsize,
                 marker=self.marker_spin[spin], show=False, **kwargs)
@@ -1078,13 +1317,7 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
         Args:
             ignore_imag: Only real part is returned if ``ignore_imag``.
         """
-        df_list = []
-        for spin in range(self.nsppol):
-            for gwkpoint in self.gwkpoints:
-                df_sk = self.get_dataframe_sk(spin, gwkpoint, ignore_imag=ignore_imag)
-                df_list.append(df_sk)
-
-        return pd.concat(df_list)
+        return self.qp_table.get_dataframe(ignore_imag=ignore_imag, params=self.params)
 
     # FIXME: To maintain previous interface.
     to_dataframe = get_dataframe
@@ -1097,22 +1330,10 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
             ignore_imag: Only real part is returned if ``ignore_imag``.
             with_params: True to include convergence paramenters.
         """
-        rows, bands = [], []
-        # bstart and bstop depends on kpoint.
+        # Add other entries that may be useful when comparing different calculations.
         ik_gw = self.reader.gwkpt2seqindex(kpoint)
-        for band in range(self.gwbstart_sk[spin, ik_gw], self.gwbstop_sk[spin, ik_gw]):
-            bands.append(band)
-            # Build dictionary with the QP results.
-            qpstate = self.reader.read_qp(spin, kpoint, band, ignore_imag=ignore_imag)
-            d = qpstate.as_dict()
-            # Add other entries that may be useful when comparing different calculations.
-            if with_params:
-                d.update(self.params)
-            rows.append(d)
-
-        import pandas as pd
-        index = len(bands) * [index] if index is not None else bands
-        return pd.DataFrame(rows, index=index, columns=list(rows[0].keys()))
+        return self.qp_table.get_dataframe(sk_list=[(spin, ik_gw)], index=index, ignore_imag=ignore_imag,
+                                           params=self.params if with_params else None)
 
     #def plot_matrix_elements(self, mel_name, spin, kpoint, *args, **kwargs):
     #   matrix = self.reader.read_mel(mel_name, spin, kpoint):
@@ -1221,10 +1442,8 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
         # Note there's no guarantee that the gwkpoints and the corrections have the same k-point index.
         # Be careful because the order of the k-points and the band range stored in the SIGRES file may differ ...
         qpdata = np.empty(egw_rarr.shape)
-        for gwk in self.gwkpoints:
-            ik_ibz = self.reader.kpt2fileindex(gwk)
-            for spin in range(self.nsppol):
-                qpdata[spin, ik_ibz, :] = egw_rarr[spin, ik_ibz, :]
+        gwk2ibz = self.reader.gwk2ibz
+        qpdata[:, gwk2ibz, :] = egw_rarr[:, gwk2ibz, :]
 
         # Build interpolator for QP corrections.
         from abipy.core.skw import SkwInterpolator
@@ -1516,6 +1735,9 @@ class SigresReader(ETSF_Reader):
         for kpoint in self.gwkpoints:
             kpoint.set_name(self.structure.findname_in_hsym_stars(kpoint))
 
+        # Index of the GW k-points in the IBZ (arrays in the netcdf file are dimensioned with nkibz).
+        self.gwk2ibz = np.array([self.ibz.index(kpoint) for kpoint in self.gwkpoints], dtype=np.int)
+
         # minbnd[nkptgw,nsppol] gives the minimum band index computed
         # Note conversion between Fortran and python convention.
         self.gwbstart_sk = self.read_value("minbnd") - 1
@@ -1593,6 +1815,17 @@ class SigresReader(ETSF_Reader):
     def read_redc_gwkpoints(self):
         return self.read_value("kptgw")
 
+    @lazy_property
+    def qp_table(self):
+        """:class:`QPTable` with the QP results for all the (spin, kpoint, band) stored in the file."""
+        return self.read_qp_table()
+
+    def read_qp_table(self):
+        """Build and return :class:`QPTable` from the arrays stored in the file."""
+        return QPTable.from_sigres_arrays(self.gwkpoints, self.gwk2ibz, self.gwbstart_sk, self.gwbstop_sk,
+                                          self.min_gwbstart, self.ks_bands.eigens, self._egw, self._en_qp_diago,
+                                          self._vxcme, self._sigxme, self._sigcmee0, self._vUme, self._ze0)
+
     def read_allqps(self, ignore_imag=False):
         """
         Return list with ``nsppol`` items. Each item is a :class:`QPList` with the QP results
@@ -1600,18 +1833,7 @@ class SigresReader(ETSF_Reader):
         Args:
             ignore_imag: Only real part is returned if ``ignore_imag``.
         """
-        qps_spin = self.nsppol * [None]
-
-        for spin in range(self.nsppol):
-            qps = []
-            for gwkpoint in self.gwkpoints:
-                ik = self.gwkpt2seqindex(gwkpoint)
-                for band in range(self.gwbstart_sk[spin, ik], self.gwbstop_sk[spin, ik]):
-                    qps.append(self.read_qp(spin, gwkpoint, band, ignore_imag=ignore_imag))
-
-            qps_spin[spin] = QPList(qps)
-
-        return tuple(qps_spin)
+        return self.qp_table.get_qplist_spin(ignore_imag=ignore_imag)
 
     def read_qplist_sk(self, spin, kpoint, ignore_imag=False):
         """
@@ -1620,11 +1842,7 @@ class SigresReader(ETSF_Reader):
         Args:
             ignore_imag: Only real part is returned if ``ignore_imag``.
         """
-        ik = self.gwkpt2seqindex(kpoint)
-        bstart, bstop = self.gwbstart_sk[spin, ik], self.gwbstop_sk[spin, ik]
-
-        return QPList([self.read_qp(spin, kpoint, band, ignore_imag=ignore_imag)
-                      for band in range(bstart, bstop)])
+        return self.qp_table.get_qplist_sk(spin, self.gwkpt2seqindex(kpoint), ignore_imag=ignore_imag)
 
     #def read_qpene(self, spin, kpoint, band)
 
@@ -1635,28 +1853,16 @@ class SigresReader(ETSF_Reader):
         """
         Return :class`QPState` for the given (spin, kpoint, band).
         Only real part is returned if ``ignore_imag``.
+
+        Raise:
+            `ValueError` if kpoint is not in the list of GW k-points.
         """
         ik_file = self.kpt2fileindex(kpoint)
-        # Must shift band index (see fortran code that allocates with mdbgw)
-        ib_gw = band - self.min_gwbstart
+        ikc = np.flatnonzero(self.gwk2ibz == ik_file)
+        if not len(ikc):
+            raise ValueError("K-point %s is not in the list of GW k-points" % repr(kpoint))
 
-        def ri(a):
-            return np.real(a) if ignore_imag else a
-
-        return QPState(
-            spin=spin,
-            kpoint=kpoint,
-            band=band,
-            e0=self.read_e0(spin, ik_file, band),
-            qpe=ri(self._egw[spin, ik_file, band]),
-            qpe_diago=ri(self._en_qp_diago[spin, ik_file, band]),
-            # Note ib_gw index.
-            vxcme=self._vxcme[spin, ik_file, ib_gw],
-            sigxme=self._sigxme[spin, ik_file, ib_gw],
-            sigcmee0=ri(self._sigcmee0[spin, ik_file, ib_gw]),
-            vUme=self._vUme[spin, ik_file, ib_gw],
-            ze0=ri(self._ze0[spin, ik_file, ib_gw]),
-        )
+        return self.qp_table.get_qp(spin, ikc[0], band, ignore_imag=ignore_imag)
 
     def read_qpgaps(self):
         """Read the QP gaps. Returns [nsppol, nkibz] array with QP gaps in eV."""
@@ -3,6 +3,7 @@
 import numpy as np
 import pymatgen.core.units as pmgu
 
+from collections import OrderedDict
 from monty.string import marquee
 from monty.inspect import all_subclasses
 from monty.termcolor import cprint
@@ -302,6 +303,27 @@ class ScrReader(ETSF_Reader):
         if nfound > 1:
             raise RuntimeError("Find multiple netcdf arrays (%s) in netcdf file!" % str(netcdf_names))
 
+        # Caches for the q-point indices and the G-spheres (one per q-point).
+        self._kindex_cache = {}
+        self._gspheres = {}
+
+    @lazy_property
+    def gvecs(self):
+        """[ng, 3] array with the reduced coordinates of the G-vectors of the screening matrices."""
+        var = self.rootgrp.variables["reduced_coordinates_plane_waves_dielectric_function"]
+        # Use ik=0 because the basis set is not k-dependent (only the first q-point is written).
+        return np.array(var[0, :], dtype=np.int)
+
+    @lazy_property
+    def ecuteps(self):
+        """
+        Cutoff energy in Hartree of the screening matrices.
+        Not stored in the file so it is estimated from the max kinetic energy of the G-vectors at q = 0.
+        """
+        # Reciprocal lattice in Angstrom^-1 --> Bohr^-1
+        gcart = np.dot(self.gvecs, self.structure.reciprocal_lattice.matrix) * pmgu.bohr_to_ang
+        return 0.5 * np.max(np.sum(gcart ** 2, axis=1))
+
     def read_params(self):
         """
         Read the most important parameters used to compute the screening i.e.
@@ -374,27 +396,75 @@ class ScrReader(ETSF_Reader):
         """
         Read data at the given k-point and return an instance of ``cls`` where
         ``cls`` is a subclass of :class:`_AwggMatrix`
+
+        .. warning::
+
+            The full [nw, ng, ng] matrix is loaded in memory.
+            Use :meth:`read_wggmat_view` to access blocks or slices of large matrices.
         """
         cls = _AwggMatrix.class_from_netcdf_name(self.netcdf_name) if cls is None else cls
+        view = self.read_wggmat_view(kpoint, spin1=spin1, spin2=spin2)
 
-        var = self.rootgrp.variables["reduced_coordinates_plane_waves_dielectric_function"]
-        # Use ik=0 because the basis set is not k-dependent.
-        ik0 = 0
-        gvecs = var[ik0, :]
-        #print("gvecs", gvecs)
+        return cls(self.wpoints, view.gsphere, view[:], inord="C")
 
+    def read_wggmat_view(self, kpoint, spin1=0, spin2=0, block_size=256, max_cache_mb=64):
+        """
+        Return :class:`WggNcView` giving access to the matrix at the given k-point without loading it in memory.
+
+        Args:
+            kpoint: |Kpoint| object, reduced coordinates or index of the q-point.
+            block_size: Number of G-vectors in the blocks stored in the cache.
+            max_cache_mb: Max size in Mb of the cache with the decoded blocks.
+        """
         kpoint, ik = self.find_kpoint_fileindex(kpoint)
 
-        # FIXME ecuteps is missing
-        # TODO: Gpshere.find is very slow if we don't take advantage of shells
-        ecuteps = 2
-        gsphere = GSphere(ecuteps, self.structure.reciprocal_lattice, kpoint, gvecs)
+        return WggNcView(self.rootgrp.variables[self.netcdf_name], ik, self.wpoints, self.get_gsphere(ik),
+                         spin1=spin1, spin2=spin2, block_size=block_size, max_cache_mb=max_cache_mb)
+
+    def read_ppmodel(self, model="godby", wplasma=None, kpoints=None, rhoggp=None, spin1=0, spin2=0):
+        """
+        Fit a plasmon-pole model for all the q-points in the file (or for the given list of q-points).
+        Only the frequencies required by the model are read from file.
+
+        Args:
+            model: "godby" for :class:`GodbyNeeds`, "hybertsen" for :class:`HybertsenLouie`.
+            wplasma: Plasma frequency in Hartree. See :meth:`InverseDielectricFunction.get_ppmodel`.
+            kpoints: List of q-points (|Kpoint|, reduced coordinates or indices). None for all q-points.
+            rhoggp: [ng, ng] array with rho(G - G') / rho(0). Used only for Hybertsen-Louie.
 
-        # Exchange spin due to F --> C
-        values = self.rootgrp.variables[self.netcdf_name][ik, :, spin2, spin1, :, :, :]
-        wggmat = values[:, :, :, 0] + 1j * values[:, :, :, 1]
+        Return: :class:`PlasmonPoleModel` whose parameters have shape [nq, ng, ng].
+        """
+        if self.netcdf_name != "inverse_dielectric_function":
+            raise NotImplementedError("Plasmon-pole models require the inverse dielectric function")
+
+        ppm_cls = PlasmonPoleModel.class_from_name(model)
+        kpoints = range(len(self.kpoints)) if kpoints is None else kpoints
+        ik_list = [self.find_kpoint_fileindex(k)[1] for k in kpoints]
+        views = [self.read_wggmat_view(ik, spin1=spin1, spin2=spin2) for ik in ik_list]
+        kpoints = KpointList(self.structure.reciprocal_lattice, [self.kpoints[ik].frac_coords for ik in ik_list])
+
+        if ppm_cls is GodbyNeeds:
+            iw0, iwp, wplasma = GodbyNeeds.find_wpoints(self.wpoints, wplasma)
+            em1_w0 = np.array([view[iw0] for view in views])
+            em1_wp = np.array([view[iwp] for view in views])
+            return GodbyNeeds.from_em1_values(em1_w0, em1_wp, wplasma, kpoint=kpoints)
+        else:
+            iw0 = PlasmonPoleModel.find_w0(self.wpoints)
+            em1_w0 = np.array([view[iw0] for view in views])
+            qpg = np.array([np.dot(k.frac_coords + self.gvecs, self.structure.reciprocal_lattice.matrix)
+                           for k in kpoints])
+            return HybertsenLouie.from_em1_values(em1_w0, wplasma, qpg, rhoggp=rhoggp, kpoint=kpoints)
 
-        return cls(self.wpoints, gsphere, wggmat, inord="F")
+    def get_gsphere(self, kpoint):
+        """
+        Return |GSphere| for the given k-point. The object is cached so that the G-vector
+        index of the sphere is built only once per q-point.
+        """
+        kpoint, ik = self.find_kpoint_fileindex(kpoint)
+        if ik not in self._gspheres:
+            self._gspheres[ik] = GSphere(self.ecuteps, self.structure.reciprocal_lattice, kpoint, self.gvecs)
+
+        return self._gspheres[ik]
 
     def find_kpoint_fileindex(self, kpoint):
         """
@@ -404,7 +474,11 @@ class ScrReader(ETSF_Reader):
         if duck.is_intlike(kpoint):
             ik = int(kpoint)
         else:
-            ik = self.kpoints.index(kpoint)
+            # Cache the index to avoid the linear search in the list of k-points.
+            key = tuple(np.ravel(getattr(kpoint, "frac_coords", kpoint)).tolist())
+            ik = self._kindex_cache.get(key)
+            if ik is None:
+                ik = self._kindex_cache[key] = self.kpoints.index(kpoint)
 
         return self.kpoints[ik], ik
 
@@ -417,6 +491,161 @@ class ScrReader(ETSF_Reader):
         return values[:, 0] + 1j * values[:, 1]
 
 
+class WggNcView(object):
+    """
+    Read-only view of the [nw, ng, ng] matrix stored in the SCR/SUS file for a given q-point and spin.
+    Data are read from the netcdf variable on demand and returned with the C convention
+    used by :class:`_AwggMatrix` i.e. ``view[iw, ig1, ig2]``.
+
+    Blocks of G-vectors read with :meth:`read_gblock` are stored in a LRU cache whose size is bounded
+    by ``max_cache_mb`` so that matrices with a large number of G-vectors can be inspected
+    without loading the full array e.g.::
+
+        with ScrReader("out_SCR.nc") as r:
+            view = r.read_wggmat_view(kpoint=0)
+            diag = view.read_diagonal()
+            head = view[:, 0, 0]
+    """
+
+    def __init__(self, ncvar, ik, wpoints, gsphere, spin1=0, spin2=0, block_size=256, max_cache_mb=64):
+        """
+        Args:
+            ncvar: netcdf variable with shape [nq, nw, nsppol, nsppol, ng, ng, 2].
+            ik: Index of the q-point in the netcdf file.
+            wpoints: Complex frequency points in Hartree.
+            gsphere: |GSphere| with G-vectors and k-point object.
+            block_size: Number of G-vectors in the blocks stored in the cache.
+            max_cache_mb: Max size in Mb of the cache with the decoded blocks.
+        """
+        self.ncvar, self.ik = ncvar, ik
+        self.wpoints, self.gsphere = wpoints, gsphere
+        self.spin1, self.spin2 = spin1, spin2
+        if block_size <= 0:
+            raise ValueError("block_size should be > 0 but got %s" % block_size)
+        self.block_size = int(block_size)
+        self.max_cache_bytes = int(max_cache_mb * 1024 ** 2)
+
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self.hits, self.misses = 0, 0
+
+    @property
+    def nw(self):
+        """Total number of frequencies."""
+        return len(self.wpoints)
+
+    @property
+    def ng(self):
+        """Number of G-vectors."""
+        return len(self.gsphere)
+
+    @property
+    def shape(self):
+        """Shape of the matrix: (nw, ng, ng)."""
+        return (self.nw, self.ng, self.ng)
+
+    @property
+    def nblocks(self):
+        """Number of G-blocks along one dimension of the matrix."""
+        return (self.ng + self.block_size - 1) // self.block_size
+
+    def gindex(self, gvec):
+        """Index of gvec in the G-sphere. Accepts integer or reduced coordinates."""
+        if duck.is_intlike(gvec): return int(gvec)
+        return self.gsphere.index(gvec)
+
+    def __getitem__(self, key):
+        """
+        Read data from file. Accepts integers and slices for the (iw, ig1, ig2) indices.
+        """
+        key = list(key) if isinstance(key, tuple) else [key]
+        if Ellipsis in key: raise ValueError("Ellipsis is not supported")
+        if len(key) > 3: raise IndexError("Too many indices: %s" % str(key))
+        iw, ig1, ig2 = key + [slice(None)] * (3 - len(key))
+
+        # Exchange spin and G indices due to F --> C
+        values = np.asarray(self.ncvar[self.ik, iw, self.spin2, self.spin1, ig2, ig1, :])
+        values = values[..., 0] + 1j * values[..., 1]
+
+        # Swap the G axes if both are still present.
+        if isinstance(ig1, slice) and isinstance(ig2, slice):
+            values = np.ascontiguousarray(np.swapaxes(values, -1, -2))
+
+        return values
+
+    def read_wslice(self, gvec1, gvec2=None):
+        """Return [nw] array with the frequency dependence of the (G1, G2) matrix element."""
+        ig1 = self.gindex(gvec1)
+        ig2 = ig1 if gvec2 is None else self.gindex(gvec2)
+        return self[:, ig1, ig2]
+
+    def read_window(self, wstart, wstop):
+        """Return [wstop - wstart, ng, ng] array with the matrix for the frequencies in [wstart, wstop)."""
+        return self[wstart:wstop]
+
+    def read_gblock(self, ib1, ib2, wslice=None):
+        """
+        Return the block (ib1, ib2) of the matrix i.e. the entries with
+        ``ig1`` in [ib1 * block_size, (ib1 + 1) * block_size) and similarly for ``ig2``.
+        Blocks are stored in a bounded LRU cache. The array must be considered read-only.
+
+        Args:
+            ib1, ib2: Block indices.
+            wslice: Slice object selecting the frequencies. None for all frequencies.
+        """
+        wslice = slice(None) if wslice is None else wslice
+        key = (ib1, ib2, wslice.start, wslice.stop, wslice.step)
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        self.misses += 1
+        bs = self.block_size
+        block = self[wslice, ib1 * bs:(ib1 + 1) * bs, ib2 * bs:(ib2 + 1) * bs]
+
+        # Add new block and remove the least recently used ones if the cache is full.
+        if block.nbytes <= self.max_cache_bytes:
+            self._cache[key] = block
+            self._cache_bytes += block.nbytes
+            while self._cache_bytes > self.max_cache_bytes:
+                _, old = self._cache.popitem(last=False)
+                self._cache_bytes -= old.nbytes
+
+        return block
+
+    def iter_gblocks(self, wslice=None):
+        """
+        Iterate over the G-blocks of the matrix.
+        Yields (g1_slice, g2_slice, block) where block has shape [nw, len(g1_slice), len(g2_slice)].
+        """
+        bs = self.block_size
+        for ib1 in range(self.nblocks):
+            for ib2 in range(self.nblocks):
+                yield (slice(ib1 * bs, min((ib1 + 1) * bs, self.ng)),
+                       slice(ib2 * bs, min((ib2 + 1) * bs, self.ng)),
+                       self.read_gblock(ib1, ib2, wslice=wslice))
+
+    def read_diagonal(self, wslice=None):
+        """
+        Return [nw, ng] array with the diagonal G1 == G2 of the matrix.
+        Only the diagonal blocks are read from file.
+        """
+        diags = [np.diagonal(self.read_gblock(ib, ib, wslice=wslice), axis1=-2, axis2=-1)
+                 for ib in range(self.nblocks)]
+        return np.concatenate(diags, axis=-1)
+
+    def cache_info(self):
+        """|AttrDict| with info on the cache of decoded blocks."""
+        return AttrDict(hits=self.hits, misses=self.misses, nblocks=len(self._cache),
+                        nbytes=self._cache_bytes, max_nbytes=self.max_cache_bytes)
+
+    def clear_cache(self):
+        """Remove all the blocks from the cache."""
+        self._cache.clear()
+        self._cache_bytes = 0
+
+
 class _AwggMatrix(object):
     r"""
     Base class for two-point functions expressed in reciprocal space
@@ -450,8 +679,7 @@ class _AwggMatrix(object):
 
         if inord.lower() == "f":
             # Fortran to C.
-            for iw, _ in enumerate(wpoints):
-                self.wggmat[iw] = self.wggmat[iw].T.copy()
+            self.wggmat = np.ascontiguousarray(np.swapaxes(self.wggmat, 1, 2))
 
         for i in (1, 2):
             assert len(gsphere) == wggmat.shape[-i]
@@ -689,150 +917,313 @@ class InverseDielectricFunction(_AwggMatrix):
     netcdf_name = "inverse_dielectric_function"
     latex_name = r"\epsilon^{-1}"
 
-    #def _add_ppmodel(self, ppm):
-    #    """
-    #    Add a :class:`PPModel` object to the internal list. Return ppm.
-    #    """
-    #    if not hasattr(self, "ppmodels"): self.ppmodels = []
-    #    self.ppmodels.append(ppm)
-    #    return ppm
-
-    #def build_godby_needs_ppmodel(self, wplasma):
-    #    ppm = GodbyNeeds.from_em1(self, wplasma)
-    #    return self._add_ppmodel(ppm)
-
-    #@add_fig_kwargs
-    #def plot_with_ppmodels(self, gvec1, gvec2=None, waxis="real", cplx_mode="re",
-    #                       zcut=0.1/pmgu.Ha_to_eV, **kwargs):
-    #    """
-    #    Args:
-    #        gvec1, gvec2:
-    #        waxis: "real" to plot along the real axis, "imag" for the imaginary axis.
-    #        cplx_mode: string defining the data to print.
-    #           Possible choices are (case-insensitive): `re` for the real part
-    #           "im" for the imaginary part, "abs" for the absolute value.
-    #           "angle" will display the phase of the complex number in radians.
-    #           Options can be concatenated with "-" e.g. "re-im"
-    #        zcut: Small shift along the imaginary axis to avoid poles. 0.1 eV is the Abinit default.
-    #        ax: matplotlib :class:`Axes` or None if a new figure should be created.
-
-    #    Returns:
-    #        matplotlib figure.
-    #    """
-    #    # Select the (G,G') indices to plot.
-    #    ig1 = self.gindex(gvec1)
-    #    ig2 = ig1 if gvec2 is None else self.gindex(gvec2)
-
-    #    ax, fig, plt = get_ax_fig_plt(ax=None)
-
-    #    self.plot_freq(gvec1, gvec2=gvec2, waxis=waxis, cplx_mode=cplx_mode, ax=ax, show=False)
-
-    #    # Compute em1 from the ppmodel on the same grid used for self.
-    #    omegas = {"real": self.real_wpoints, "imag": self.imag_wpoints}[waxis]
-
-    #    # Get y-limits of the ab-initio em1 to zoom-in the interesting region
-    #    ymin_em1, ymax_em1 = ax.get_ylim()
-
-    #    for ppm in self.ppmodels:
-    #        em1_ppm = ppm.eval_em1(omegas, zcut)
-    #        em1_ppm.plot_freq(ig1, gvec2=ig2, waxis=waxis, cplx_mode=cplx_mode,
-    #                          ax=ax, linestyle="--", show=False)
-
-    #    ax.set_ylim(ymin_em1, ymax_em1)
-
-    #    return fig
-
-
-#class PPModel(metaclas=abc.ABCMeta):
-#    """
-#    Abstract base class for Plasmonpole models.
-#    """
-#
-#    #@abc.abstractmethod
-#    #def from_em1(cls, em1):
-#    #    """Compute the plasmon-pole parameters from the inverse dielectric function."""
-#
-#    @abc.abstractmethod
-#    def eval_em1(self, omegas, zcut):
-#        """Compute the plasmon-pole model at frequency omega (Ha units)."""
-#
-#
-#class GodbyNeeds(PPModel):
-#
-#    def __init__(self, gsphere, omegatw, bigomegatwsq):
-#        r"""
-#        bigomegatwsq(:)
-#        Plasmon pole parameters $\tilde\Omega^2_{G Gp}(q)$.
-#
-#        omegatw(:)
-#        omegatw(nqibz)%value(npwc,dm2_otq)
-#        Plasmon pole parameters $\tilde\omega_{G Gp}(q)$.
-#        """
-#        self.gsphere = gsphere
-#        self.kpoint = gsphere.kpoint
-#        self.omegatw = omegatw
-#        self.bigomegatwsq = bigomegatwsq
-#
-#        self.ng = len(gsphere)
-#        assert len(omegatw) == len(bigomegatwsq)
-#        assert len(omegatw) == len(gsphere)
-#
-#    @classmethod
-#    def from_em1(cls, em1, wplasma):
-#        # Find omega=0 and the second imaginary frequency to fit the ppm parameters.
-#        iw0 = -1; iw1 = -1
-#        for i, w in enumerate(em1.wpoints):
-#            if np.abs(w) <= 1e-6: iw0 = i
-#            if np.abs(w - 1j*wplasma) <= 1e-6: iw1 = i
-#        if iw0 == -1:
-#            raise ValueError("Cannot find omega=0 in em1")
-#        if iw1 == -1:
-#            raise ValueError("Cannot find second imaginary frequency at %s in em1!" % wplasma)
-#
-#        w0gg = em1.wggmat[iw0, :, :]
-#        w1gg = em1.wggmat[iw1, :, :]
-#
-#        aa = w0gg - np.eye(em1.ng)
-#        diff = w0gg - w1gg
-#        ratio = aa / diff
-#        omegatwsq = (ratio - 1.0) * (wplasma ** 2)
-#
-#        # If omega-twiddle-squared is negative,set omega-twiddle-squared to 1.0 (a reasonable way of treating
-#        # such terms, in which epsilon**-1 was originally increasing along this part of the imaginary axis)
-#        # (note: originally these terms were ignored in Sigma; this was changed on 6 March 1990.)
-#        #if (REAL(omegatwsq) <= 0.0) omegatwsq=one
-#        omegatwsq[np.where(omegatwsq.real <= 0.0)] = 1.0
-#        #
-#        # Get omega-twiddle
-#        # * Neglect the imag part (if any) in omega-twiddle-squared
-#        #omegatw(ig,igp)=SQRT(REAL(omegatwsq))
-#        #omegatw = np.sqrt(omegatwsq)
-#        omegatw = np.sqrt(omegatwsq.real)
-#        #omegatw = omegatw + 7j * pmgu.eV_to_Ha
-#
-#        bigomegatwsq = -aa * omegatw**2
-#
-#        return cls(em1.gsphere, omegatw, bigomegatwsq)
-#
-#    def eval_em1(self, omegas, zcut):
-#        omegas = np.array(omegas)
-#
-#        wggmat = np.empty((len(omegas), self.ng, self.ng), dtype=np.complex)
-#        for i, w in enumerate(omegas):
-#            # Add shift but only along the real axis.
-#            delta = 0.0 if w.imag != 0 else 1j * zcut
-#            den = w**2 - np.real((self.omegatw - delta)**2)
-#            em1gg = np.eye(self.ng) + self.bigomegatwsq / den
-#            #arg = (w - self.omegatw.real) / (0.01 * pmgu.eV_to_Ha)
-#            #em1gg = em1gg * (1 - np.exp(-arg**2))
-#            wggmat[i] = em1gg
-#
-#        return InverseDielectricFunction(self.kpoint, omegas, self.gsphere, wggmat)
-#
-#    @add_fig_kwargs
-#    def plot_ggparams(self, **kwargs):
-#        plotter = ArrayPlotter(*[
-#            (r"$\tilde\omega_{G G'}$", self.omegatw),
-#            (r"$\tilde\Omega^2_{G, G'}$", self.bigomegatwsq)])
-#
-#        return plotter.plot(show=False, **kwargs)
+    def get_ppmodel(self, model="godby", wplasma=None, rhoggp=None):
+        """
+        Fit a plasmon-pole model to the inverse dielectric function.
+
+        Args:
+            model: "godby" for :class:`GodbyNeeds`, "hybertsen" for :class:`HybertsenLouie`.
+            wplasma: Plasma frequency in Hartree. For Godby-Needs, the model is fitted at w = 0 and w = i wplasma.
+                If None, the first imaginary frequency is used. Required by Hybertsen-Louie.
+            rhoggp: [ng, ng] array with rho(G - G') / rho(0). Used only for Hybertsen-Louie.
+                If None, the homogeneous electron gas (identity matrix) is assumed.
+
+        Return: :class:`PlasmonPoleModel` instance.
+        """
+        ppm_cls = PlasmonPoleModel.class_from_name(model)
+        if ppm_cls is GodbyNeeds:
+            iw0, iwp, wplasma = GodbyNeeds.find_wpoints(self.wpoints, wplasma)
+            return GodbyNeeds.from_em1_values(self.wggmat[iw0], self.wggmat[iwp], wplasma, kpoint=self.kpoint)
+        else:
+            iw0 = PlasmonPoleModel.find_w0(self.wpoints)
+            lattice = self.gsphere.lattice
+            qpg = np.dot(self.gsphere.kpoint.frac_coords + self.gsphere.gvecs, getattr(lattice, "matrix", lattice))
+            return HybertsenLouie.from_em1_values(self.wggmat[iw0], wplasma, qpg,
+                                                  rhoggp=rhoggp, kpoint=self.kpoint)
+
+    @add_fig_kwargs
+    def plot_with_ppmodel(self, ppm, gvec1, gvec2=None, waxis="real", cplx_mode="re",
+                          zcut=0.1 / pmgu.Ha_to_eV, ax=None, **kwargs):
+        """
+        Compare the ab-initio inverse dielectric function with a plasmon-pole model.
+
+        Args:
+            ppm: :class:`PlasmonPoleModel` e.g. the object returned by :meth:`get_ppmodel`.
+            gvec1, gvec2: G-vectors or indices. If gvec2 is None, gvec2 = gvec1.
+            waxis: "real" to plot along the real axis, "imag" for the imaginary axis.
+            cplx_mode: string defining the data to print. See :meth:`plot_freq`.
+            zcut: Small shift along the imaginary axis to avoid poles. 0.1 eV is the Abinit default.
+            ax: |matplotlib-Axes| or None if a new figure should be created.
+
+        Returns: |matplotlib-Figure|
+        """
+        ig1 = self.gindex(gvec1)
+        ig2 = ig1 if gvec2 is None else self.gindex(gvec2)
+
+        ax, fig, plt = get_ax_fig_plt(ax=ax)
+        self.plot_freq(ig1, gvec2=ig2, waxis=waxis, cplx_mode=cplx_mode, ax=ax, show=False)
+
+        # Get y-limits of the ab-initio em1 to zoom-in the interesting region
+        ymin_em1, ymax_em1 = ax.get_ylim()
+
+        # Compute em1 from the ppmodel on the same grid used for self.
+        if waxis == "real":
+            omegas, xx = self.real_wpoints, np.real(self.real_wpoints) * pmgu.Ha_to_eV
+        else:
+            omegas, xx = self.imag_wpoints, np.imag(self.imag_wpoints) * pmgu.Ha_to_eV
+        if len(omegas) == 0: return fig
+
+        yy = ppm.eval_em1(omegas, zcut=zcut)[..., ig1, ig2]
+        for c in cplx_mode.lower().split("-"):
+            ax.plot(xx, data_from_cplx_mode(c, yy), color=_COLOR_CMODE[c], linestyle="--",
+                    label="%s %s" % (ppm.name, self.latex_label(c)))
+
+        ax.set_ylim(ymin_em1, ymax_em1)
+        ax.legend(loc="best", shadow=True)
+
+        return fig
+
+
+class PlasmonPoleModel(object):
+    r"""
+    Base class for plasmon-pole models of the inverse dielectric function:
+
+    .. math::
+
+        \epsilon^{-1}_{GG'}(\omega) = \delta_{GG'} + \frac{\tilde\Omega^2_{GG'}}{\omega^2 - \tilde\omega^2_{GG'}}
+
+    The parameters are stored in arrays of shape [..., ng, ng] so that the model can describe
+    multiple q-points at once (e.g. [nq, ng, ng] arrays produced by :meth:`ScrReader.read_ppmodel`).
+    All the operations are performed simultaneously for all the (G, G') pairs.
+    Frequencies are in Hartree.
+
+    This class is not supposed to be instantiated directly.
+    """
+    name = "PlasmonPoleModel"
+    aliases = ()
+
+    def __init__(self, omegatw, bigomegatwsq, kpoint=None):
+        r"""
+        Args:
+            omegatw: [..., ng, ng] real array with the plasmon-pole frequencies :math:`\tilde\omega_{GG'}`.
+            bigomegatwsq: [..., ng, ng] complex array with :math:`\tilde\Omega^2_{GG'}`.
+            kpoint: q-point or list of q-points associated to the leading dimension (optional).
+        """
+        self.omegatw = np.asarray(omegatw)
+        self.bigomegatwsq = np.asarray(bigomegatwsq)
+        self.kpoint = kpoint
+        if self.omegatw.shape != self.bigomegatwsq.shape:
+            raise ValueError("Incompatible shapes: %s, %s" % (self.omegatw.shape, self.bigomegatwsq.shape))
+
+    @classmethod
+    def class_from_name(cls, name):
+        """Return the subclass associated to the given name (case-insensitive)."""
+        name = name.lower()
+        for subclass in all_subclasses(cls):
+            if name == subclass.name.lower() or name in subclass.aliases:
+                return subclass
+
+        raise ValueError("Cannot find plasmon-pole model associated to `%s`" % str(name))
+
+    @staticmethod
+    def find_w0(wpoints, atol=1e-6):
+        """Return the index of the zero frequency in wpoints."""
+        iw0 = np.flatnonzero(np.abs(wpoints) <= atol)
+        if not len(iw0):
+            raise ValueError("Cannot find omega=0 in wpoints: %s" % str(wpoints))
+        return iw0[0]
+
+    @staticmethod
+    def _fix_poles(omegatwsq, aa):
+        r"""
+        Compute :math:`\tilde\omega` and :math:`\tilde\Omega^2` from :math:`\tilde\omega^2` and
+        ``aa`` = :math:`\epsilon^{-1}(\omega=0) - \delta`.
+
+        If omega-twiddle-squared is negative (or undefined), set omega-twiddle-squared to 1.0 (a reasonable way
+        of treating such terms, in which epsilon**-1 was originally increasing along this part of the imaginary axis).
+        The imaginary part (if any) of omega-twiddle-squared is neglected.
+        The static limit is always reproduced since bigomegatwsq = - aa * omegatw ** 2
+        """
+        omegatwsq = np.array(omegatwsq)
+        with np.errstate(invalid="ignore"):
+            invalid = ~np.isfinite(omegatwsq) | (omegatwsq.real <= 0.0)
+        omegatwsq[invalid] = 1.0
+        omegatw = np.sqrt(omegatwsq.real)
+
+        return omegatw, -aa * omegatw ** 2
+
+    @property
+    def ng(self):
+        """Number of G-vectors."""
+        return self.omegatw.shape[-1]
+
+    def __str__(self):
+        return self.to_string()
+
+    def to_string(self, verbose=0):
+        """String representation."""
+        lines = []; app = lines.append
+        app(marquee(self.name, mark="="))
+        app("Shape of the parameters: %s" % str(self.omegatw.shape))
+        app("Plasmon-pole frequencies: min %.3f, max %.3f (eV)" % (
+            self.omegatw.min() * pmgu.Ha_to_eV, self.omegatw.max() * pmgu.Ha_to_eV))
+
+        return "\n".join(lines)
+
+    def eval_em1(self, omegas, zcut=0.1 / pmgu.Ha_to_eV, chunk_size=None):
+        """
+        Evaluate the model at the frequencies ``omegas`` (Ha units, real or purely imaginary).
+
+        Args:
+            omegas: List of frequencies.
+            zcut: Small shift along the imaginary axis added to the real frequencies to avoid poles.
+            chunk_size: If not None, the matrix is computed in blocks of ``chunk_size`` rows
+                to reduce the memory required by the temporary arrays.
+
+        Return: [..., nw, ng, ng] complex array.
+        """
+        omegas = np.atleast_1d(np.asarray(omegas, dtype=np.complex))
+        # Add shift but only along the real axis.
+        shifts = np.where(omegas.imag == 0, 1j * zcut, 0)
+        w2 = (omegas ** 2)[:, None, None]
+        shifts = shifts[:, None, None]
+
+        ng = self.ng
+        lead = self.omegatw.shape[:-2]
+        out = np.empty(lead + (len(omegas), ng, ng), dtype=np.complex)
+        eye = np.eye(ng)
+
+        step = ng if chunk_size is None else max(int(chunk_size), 1)
+        for start in range(0, ng, step):
+            rows = slice(start, start + step)
+            omegatw = self.omegatw[..., None, rows, :]
+            bigomegatwsq = self.bigomegatwsq[..., None, rows, :]
+            out[..., rows, :] = eye[rows] + bigomegatwsq / (w2 - (omegatw - shifts) ** 2)
+
+        return out
+
+    def get_abs_errors(self, omegas, wggmat, zcut=0.1 / pmgu.Ha_to_eV, chunk_size=None):
+        """
+        Compare the model with the ab-initio inverse dielectric function.
+
+        Args:
+            omegas: [nw] frequencies in Ha.
+            wggmat: [..., nw, ng, ng] array with the ab-initio values.
+
+        Return: [..., nw] array with the max absolute error over the (G, G') pairs.
+        """
+        em1 = self.eval_em1(omegas, zcut=zcut, chunk_size=chunk_size)
+        return np.abs(em1 - wggmat).max(axis=(-2, -1))
+
+    @add_fig_kwargs
+    def plot_ggparams(self, iq=None, **kwargs):
+        """
+        Plot the plasmon-pole parameters with matplotlib imshow.
+
+        Args:
+            iq: Index of the q-point. Required if the model contains multiple q-points.
+
+        Returns: |matplotlib-Figure|
+        """
+        omegatw, bigomegatwsq = self.omegatw, self.bigomegatwsq
+        if iq is not None:
+            omegatw, bigomegatwsq = omegatw[iq], bigomegatwsq[iq]
+
+        plotter = ArrayPlotter(*[
+            (r"$\tilde\omega_{G G'}$", omegatw),
+            (r"$\tilde\Omega^2_{G, G'}$", np.abs(bigomegatwsq))])
+
+        return plotter.plot(show=False, **kwargs)
+
+
+class GodbyNeeds(PlasmonPoleModel):
+    """
+    Godby-Needs plasmon-pole model: the parameters are obtained by fitting
+    the inverse dielectric function at w = 0 and at w = i wplasma.
+
+    .. rubric:: Inheritance Diagram
+    .. inheritance-diagram:: GodbyNeeds
+    """
+    name = "GodbyNeeds"
+    aliases = ("godby", "gn")
+
+    @staticmethod
+    def find_wpoints(wpoints, wplasma=None, atol=1e-6):
+        """
+        Return (iw0, iwp, wplasma) where iw0 is the index of w = 0 and iwp the index of w = i wplasma.
+        If wplasma is None, the first imaginary frequency is used.
+        """
+        iw0 = PlasmonPoleModel.find_w0(wpoints, atol=atol)
+        wpoints = np.asarray(wpoints)
+        if wplasma is None:
+            iwp = np.flatnonzero(wpoints.imag > atol)
+        else:
+            iwp = np.flatnonzero(np.abs(wpoints - 1j * wplasma) <= atol)
+        if not len(iwp):
+            raise ValueError("Cannot find imaginary frequency %s in wpoints:\n%s" % (wplasma, str(wpoints)))
+
+        iwp = iwp[0]
+        return iw0, iwp, wpoints[iwp].imag
+
+    @classmethod
+    def from_em1_values(cls, em1_w0, em1_wp, wplasma, kpoint=None):
+        """
+        Build the model from the inverse dielectric function at w = 0 and at w = i wplasma.
+
+        Args:
+            em1_w0, em1_wp: [..., ng, ng] arrays with em1(w=0) and em1(w=i wplasma).
+            wplasma: Imaginary frequency (Ha) used for the fit.
+        """
+        em1_w0, em1_wp = np.asarray(em1_w0), np.asarray(em1_wp)
+        aa = em1_w0 - np.eye(em1_w0.shape[-1])
+        diff = em1_w0 - em1_wp
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            omegatwsq = (aa / diff - 1.0) * (wplasma ** 2)
+
+        omegatw, bigomegatwsq = cls._fix_poles(omegatwsq, aa)
+        return cls(omegatw, bigomegatwsq, kpoint=kpoint)
+
+
+class HybertsenLouie(PlasmonPoleModel):
+    r"""
+    Hybertsen-Louie plasmon-pole model. The parameters are obtained from the static
+    inverse dielectric function and the generalized f-sum rule:
+
+    .. math::
+
+        \tilde\Omega^2_{GG'} = \omega_p^2 \frac{(q+G)\cdot(q+G')}{|q+G|^2} \frac{\rho(G-G')}{\rho(0)}
+
+    .. rubric:: Inheritance Diagram
+    .. inheritance-diagram:: HybertsenLouie
+    """
+    name = "HybertsenLouie"
+    aliases = ("hybertsen", "hl")
+
+    @classmethod
+    def from_em1_values(cls, em1_w0, wplasma, qpg, rhoggp=None, kpoint=None):
+        """
+        Build the model from the static inverse dielectric function.
+
+        Args:
+            em1_w0: [..., ng, ng] array with em1(w=0).
+            wplasma: Plasma frequency in Ha.
+            qpg: [..., ng, 3] array with the cartesian coordinates of q + G (any unit).
+            rhoggp: [ng, ng] array with rho(G - G') / rho(0). None for the homogeneous electron gas.
+        """
+        if wplasma is None:
+            raise ValueError("Hybertsen-Louie model requires the plasma frequency")
+        em1_w0, qpg = np.asarray(em1_w0), np.asarray(qpg)
+        ng = em1_w0.shape[-1]
+        rhoggp = np.eye(ng) if rhoggp is None else np.asarray(rhoggp)
+        aa = em1_w0 - np.eye(ng)
+
+        # Entries with q + G = 0 are undefined and are treated as negative omegatwsq.
+        qdotq = np.einsum("...ik,...jk->...ij", qpg, qpg)
+        q2 = np.einsum("...ii->...i", qdotq)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bigomegatwsq = (wplasma ** 2) * qdotq / q2[..., :, None] * rhoggp
+            omegatwsq = bigomegatwsq / (-aa)
+
+        omegatw, bigomegatwsq = cls._fix_poles(omegatwsq, aa)
+        return cls(omegatw, bigomegatwsq, kpoint=kpoint)
@@ -145,6 +145,63 @@ class TestSigresFile(AbipyTest):
 
         sigres.close()
 
+    def test_qp_table(self):
+        """Testing QPTable built from SIGRES file."""
+        with abilab.abiopen(abidata.ref_file("QPSC_SIGRES.nc")) as sigres:
+            table = sigres.qp_table
+            assert isinstance(table, QPTable)
+            assert table.nsppol == sigres.nsppol and table.nkcalc == sigres.nkcalc
+            self.assert_equal(table.gwk2ibz, [sigres.ibz.index(k) for k in sigres.gwkpoints])
+
+            # Compare with the QPState objects built from the netcdf arrays.
+            reader = sigres.reader
+            for spin in range(sigres.nsppol):
+                for ikc, kpoint in enumerate(sigres.gwkpoints):
+                    ik_ibz = table.gwk2ibz[ikc]
+                    qplist = sigres.get_qplist(spin, kpoint)
+                    assert len(qplist) == table.gwbstop_sk[spin, ikc] - table.gwbstart_sk[spin, ikc]
+                    for qp in qplist:
+                        assert qp.kpoint is sigres.gwkpoints[ikc]
+                        ib_gw = qp.band - reader.min_gwbstart
+                        assert qp.e0 == reader.ks_bands.eigens[spin, ik_ibz, qp.band]
+                        assert qp.qpe == reader._egw[spin, ik_ibz, qp.band]
+                        assert qp.sigxme == reader._sigxme[spin, ik_ibz, ib_gw]
+                        assert qp.ze0 == reader._ze0[spin, ik_ibz, ib_gw]
+                        assert qp == table.get_qp(spin, ikc, qp.band)
+
+            qplist = sigres.qplist_spin[0]
+            self.assert_equal(table.get_field("e0", spin=0), qplist.get_field("e0"))
+            self.assert_equal(table.get_field("qpeme0", spin=0), qplist.get_field("qpeme0"))
+            self.assert_equal(table.get_field("re_qpe", spin=0), qplist.get_field("re_qpe"))
+
+            # Fields sorted by e0 must be consistent with QPList.sort_by_e0
+            e0mesh, perm = table.get_e0sorted(spin=0)
+            qpl_e0sort = qplist.sort_by_e0()
+            self.assert_equal(e0mesh, qpl_e0sort.get_e0mesh())
+            self.assert_equal(table.get_field("band", spin=0)[perm], qpl_e0sort.get_field("band"))
+
+            # Dataframe from table must be equal to the one built from QPState objects.
+            df = sigres.get_dataframe(ignore_imag=True)
+            assert len(df) == len(table.get_field("e0"))
+            df_sk = sigres.get_dataframe_sk(spin=0, kpoint=1, index="foo")
+            assert np.all(df_sk.index == "foo")
+            ref_rows = [qp.as_dict() for qp in sigres.get_qplist(0, 1)]
+            for key in ("band", "e0", "qpe", "qpe_diago", "vxcme", "sigxme", "sigcmee0", "vUme", "ze0", "qpeme0"):
+                self.assert_equal(df_sk[key].values, [d[key] for d in ref_rows])
+
+            # Scissors from arrays and from QPList must agree.
+            dom = [[e0mesh[0] - 1, e0mesh[-1] + 1]]
+            sciss_table = table.build_scissors(0, dom, k=1)
+            sciss_qpl = qplist.build_scissors(dom, k=1)
+            for e in e0mesh:
+                assert sciss_table.apply(e) == sciss_qpl.apply(e)
+
+            marker = sigres.get_marker("ze0")
+            self.assert_equal(marker.x, table.gwk2ibz[table.get_state_indices()[1]])
+
+            if self.has_matplotlib():
+                assert table.plot_qps_vs_e0(spin=0, with_fields=["qpeme0", "ze0"], fermie=sigres.ebands.fermie, show=False)
+
     def test_sigres_with_spectral_function(self):
         """Test methods to plot spectral function from SIGRES."""
         filepath = abidata.ref_file("al_g0w0_sigmaw_SIGRES.nc")
@@ -7,7 +7,8 @@ import abipy.data as abidata
 
 from abipy.core.gsphere import GSphere
 from abipy.core.testing import AbipyTest
-from abipy.electrons.scr import _AwggMatrix, ScrFile, InverseDielectricFunction
+from abipy.electrons.scr import (_AwggMatrix, ScrFile, InverseDielectricFunction, PlasmonPoleModel,
+    GodbyNeeds, HybertsenLouie)
 
 
 class AwggMatTest(AbipyTest):
@@ -54,6 +55,66 @@ class AwggMatTest(AbipyTest):
             assert f.plot_freq(gvec1=[0, 0, 0], gvec2=[1, 0, 0], waxis="imag", cplx_mode="re-im", show=False)
 
 
+class PlasmonPoleTest(AbipyTest):
+
+    def test_ppmodels_with_drude_matrices(self):
+        """Testing plasmon-pole models with synthetic Drude-like matrices."""
+        assert PlasmonPoleModel.class_from_name("godby") is GodbyNeeds
+        assert PlasmonPoleModel.class_from_name("HybertsenLouie") is HybertsenLouie
+        with self.assertRaises(ValueError):
+            PlasmonPoleModel.class_from_name("foobar")
+
+        # em1_GG'(w) = delta_GG' + Omega^2 / (w^2 - omegatw^2) with Omega^2 = - aa omegatw^2
+        # for nq = 3 q-points and ng = 5.
+        nq, ng = 3, 5
+        rng = np.random.RandomState(7)
+        omegatw = rng.uniform(0.3, 1.5, size=(nq, ng, ng))
+        aa = -rng.uniform(0.01, 0.5, size=(nq, ng, ng))
+        bigomegatwsq = -aa * omegatw ** 2
+        ref = PlasmonPoleModel(omegatw, bigomegatwsq, kpoint=None)
+        assert ref.ng == ng
+        str(ref)
+
+        wpoints = np.array([0, 0.5, 1.0, 0.2j, 0.7j, 1.5j])
+        wggmat = ref.eval_em1(wpoints, zcut=0)
+        assert wggmat.shape == (nq, len(wpoints), ng, ng)
+        self.assert_almost_equal(wggmat[:, 0], np.eye(ng) + aa)
+        self.assert_equal(ref.eval_em1(wpoints, chunk_size=2), ref.eval_em1(wpoints))
+
+        # Godby-Needs fit at w = 0 and w = i 0.7 recovers the model at all the frequencies.
+        iw0, iwp, wplasma = GodbyNeeds.find_wpoints(wpoints, wplasma=0.7)
+        assert iw0 == 0 and iwp == 4 and wplasma == 0.7
+        assert GodbyNeeds.find_wpoints(wpoints)[1] == 3
+        with self.assertRaises(ValueError):
+            GodbyNeeds.find_wpoints(wpoints, wplasma=0.3)
+
+        gn = GodbyNeeds.from_em1_values(wggmat[:, iw0], wggmat[:, iwp], wplasma)
+        self.assert_almost_equal(gn.omegatw, omegatw)
+        self.assert_almost_equal(gn.bigomegatwsq, bigomegatwsq)
+        assert np.all(gn.get_abs_errors(wpoints, wggmat, zcut=0) < 1e-10)
+        self.assert_almost_equal(gn.eval_em1(wpoints, zcut=0, chunk_size=3), wggmat)
+
+        # Increasing em1 along the imaginary axis gives negative omegatwsq --> omegatw = 1 Ha.
+        em1_wp = wggmat[:, iwp].copy()
+        em1_wp[0, 1, 2] = 2 * wggmat[0, iw0, 1, 2] - wggmat[0, iwp, 1, 2]
+        gn = GodbyNeeds.from_em1_values(wggmat[:, iw0], em1_wp, wplasma)
+        assert gn.omegatw[0, 1, 2] == 1.0
+        self.assert_almost_equal(gn.eval_em1([0], zcut=0)[..., 0, :, :], wggmat[:, iw0])
+
+        # Hybertsen-Louie with the homogeneous electron gas: Omega^2_GG = wplasma^2.
+        qpg = rng.uniform(-1, 1, size=(nq, ng, 3))
+        em1_w0 = np.eye(ng) + aa * np.eye(ng)
+        hl = HybertsenLouie.from_em1_values(em1_w0, 0.7, qpg)
+        assert hl.omegatw.shape == (nq, ng, ng)
+        self.assert_almost_equal(np.diagonal(hl.bigomegatwsq, axis1=1, axis2=2), 0.49)
+        self.assert_almost_equal(hl.eval_em1([0], zcut=0)[..., 0, :, :], em1_w0)
+        with self.assertRaises(ValueError):
+            HybertsenLouie.from_em1_values(em1_w0, None, qpg)
+
+        if self.has_matplotlib():
+            assert gn.plot_ggparams(iq=0, show=False)
+
+
 class ScrFileTest(AbipyTest):
 
     def test_scrfile(self):
@@ -111,7 +172,56 @@ class ScrFileTest(AbipyTest):
             for cplx_mode in ("re", "im", "abs", "angle"):
                 str(em1.latex_label(cplx_mode))
 
+            # Test out-of-core access with small blocks and a cache that can store only two full blocks.
+            reader = ncfile.reader
+            assert reader.get_gsphere(kpoint) is em1.gsphere
+            assert reader.ecuteps > 0
+            view = reader.read_wggmat_view(kpoint, block_size=4, max_cache_mb=2 * 4 * 4 * 35 * 16 / 1024**2)
+            assert view.shape == em1.wggmat.shape and view.nblocks == 3
+            self.assert_equal(view[:], em1.wggmat)
+            self.assert_equal(view[3], em1.wggmat[3])
+            self.assert_equal(view[:, 1, 2:7], em1.wggmat[:, 1, 2:7])
+            self.assert_equal(view.read_window(2, 5), em1.wggmat[2:5])
+            self.assert_equal(view.read_wslice([0, 0, -1], 3), em1.wggmat[:, 2, 3])
+            self.assert_equal(view.read_wslice(0), reader.read_wslice(kpoint, ig1=0, ig2=0))
+            self.assert_equal(view.read_diagonal(), np.diagonal(em1.wggmat, axis1=1, axis2=2))
+            self.assert_equal(view.read_diagonal(wslice=slice(30, None)),
+                              np.diagonal(em1.wggmat[30:], axis1=1, axis2=2))
+
+            for g1, g2, block in view.iter_gblocks():
+                self.assert_equal(block, em1.wggmat[:, g1, g2])
+            info = view.cache_info()
+            assert 0 < info.nblocks < view.nblocks ** 2 and info.nbytes <= info.max_nbytes
+            view.read_gblock(2, 2)
+            assert view.cache_info().hits == info.hits + 1
+            view.clear_cache()
+            assert view.cache_info().nblocks == 0
+            with self.assertRaises(ValueError):
+                reader.read_wggmat_view(kpoint, block_size=0)
+
+            # Plasmon-pole models for all the q-points.
+            ppm = reader.read_ppmodel("godby")
+            assert ppm.omegatw.shape == (len(ncfile.kpoints), ncfile.ng, ncfile.ng)
+            assert len(ppm.kpoint) == len(ncfile.kpoints)
+            iw0, iwp, wplasma = GodbyNeeds.find_wpoints(ncfile.wpoints)
+            iq = ncfile.kpoints.index(kpoint)
+            self.assert_almost_equal(ppm.eval_em1([0], zcut=0)[iq, 0], em1.wggmat[iw0])
+            em1_ppm = em1.get_ppmodel("godby")
+            self.assert_almost_equal(em1_ppm.omegatw, ppm.omegatw[iq])
+            # em1(i wp) is reproduced for the diagonal elements with a valid pole
+            # (the imaginary part of omegatwsq is neglected for the off-diagonal terms).
+            valid = np.diagonal(em1_ppm.omegatw) != 1.0
+            assert np.any(valid)
+            em1_wp = np.diagonal(em1_ppm.eval_em1([1j * wplasma])[0])
+            self.assert_almost_equal(em1_wp[valid], np.diagonal(em1.wggmat[iwp])[valid])
+            ppm = reader.read_ppmodel("hybertsen", wplasma=0.5, kpoints=[kpoint])
+            assert ppm.omegatw.shape == (1, ncfile.ng, ncfile.ng)
+            self.assert_almost_equal(ppm.eval_em1([0], zcut=0)[0, 0], em1.wggmat[iw0])
+            self.assert_almost_equal(em1.get_ppmodel("hl", wplasma=0.5).omegatw, ppm.omegatw[0])
+
             if self.has_matplotlib():
+                assert em1.plot_with_ppmodel(em1_ppm, gvec1=0, waxis="imag", show=False)
+                assert em1.plot_with_ppmodel(em1_ppm, gvec1=1, gvec2=0, cplx_mode="re-im", show=False)
                 # ncfile plot methods
                 assert ncfile.plot_emacro(show=False)
                 assert ncfile.ebands.plot(show=False)
@@ -19,6 +19,57 @@ from abipy.electrons.ebands import ElectronsReader, RobotWithEbands
 from abipy.eph.common import glr_frohlich, EPH_WTOL
 
 
+def get_phfactors(phfreqs_ha, eph_wtol=EPH_WTOL):
+    """
+    Return array with the 1 / sqrt(2 w_nu) factors used to convert the e-ph matrix elements
+    to the phonon representation. Modes with frequency below ``eph_wtol`` have zero factor.
+    """
+    phfreqs_ha = np.asarray(phfreqs_ha)
+    factors = np.zeros(phfreqs_ha.shape)
+    mask = phfreqs_ha > eph_wtol
+    factors[mask] = 1.0 / np.sqrt(2.0 * phfreqs_ha[mask])
+    return factors
+
+
+def gkq_atm2nu(gkq_atm, phfreqs_ha, phdispl_red, eph_wtol=EPH_WTOL, out=None):
+    r"""
+    Transform the e-ph matrix elements from the atomic representation (idir, iatom) to the phonon representation:
+
+    .. math::
+
+        g_{mn\nu} = \frac{1}{\sqrt{2\omega_\nu}} \sum_{\kappa\alpha} e_{\nu, \kappa\alpha}\, g_{mn, \kappa\alpha}
+
+    with a single contraction over the modes for all the leading dimensions.
+
+    Args:
+        gkq_atm: [..., 3 * natom, ...] complex array with the matrix elements in the atomic representation.
+            The perturbation index is the third-last dimension e.g. (nsppol, nkpt, 3*natom, mband, mband).
+        phfreqs_ha: (3 * natom) array with phonon frequencies in Ha.
+        phdispl_red: (3 * natom, 3 * natom) complex array with the phonon displacements in reduced coordinates.
+        eph_wtol: Matrix elements of modes with frequency below eph_wtol are set to zero.
+        out: Optional output array with the same shape as gkq_atm.
+
+    Return: complex array with the same shape as ``gkq_atm``.
+    """
+    # Precompute e_{nu, kappa alpha} / sqrt(2 w_nu) (zero for acoustic modes at Gamma)
+    dmat = phdispl_red * get_phfactors(phfreqs_ha, eph_wtol=eph_wtol)[:, None]
+    gkq_atm = np.asarray(gkq_atm)
+
+    # Merge band indices so that the contraction is done with a single (batched) matrix-matrix product.
+    shape = gkq_atm.shape
+    g = np.reshape(gkq_atm, shape[:-2] + (-1,))
+    res = np.einsum("nm,...mb->...nb", dmat, g, optimize=True)
+    if out is None:
+        return np.reshape(res, shape)
+    out[...] = np.reshape(res, shape)
+    return out
+
+
+def _find_degenerate_bands(eigens, band, tol_deg):
+    """Return the indices of the states whose energy differs from eigens[band] by less than tol_deg."""
+    return np.flatnonzero(np.abs(eigens - eigens[band]) <= tol_deg)
+
+
 class GkqFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, NotebookWriter):
 
     @classmethod
@@ -119,13 +170,15 @@ class GkqFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, Notebo
         """(spin, nkpt, mband) array with eigenvalues on the k+q grid in eV."""
         return self.reader.read_value("eigenvalues_kq") * abu.Ha_eV
 
-    def read_all_gkq(self, mode="phonon"):
+    def read_all_gkq(self, mode="phonon", kchunk=None):
         """
         Read all eph matrix stored on disk.
 
         Args:
             mode: "phonon" if for eph matrix elements in phonon representation,
                   "atom" for perturbation along (idir, iatom).
+            kchunk: Number of k-points read and transformed at once in phonon mode.
+                None to read the full array. Use it to bound the memory required by the temporary arrays.
 
         Return: (nsppol, nkpt, 3*natom, mband, mband) complex array.
         """
@@ -136,54 +189,37 @@ class GkqFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, Notebo
         # Fortran array on disk has shape:
         # nctkarr_t('gkq', "dp", &
         # 'complex, max_number_of_states, max_number_of_states, number_of_phonon_modes, number_of_kpoints, number_of_spins')
-        gkq_atm = self.reader.read_value("gkq", cmode="c")
-        if mode == "atom": return gkq_atm
+        if mode == "atom":
+            return self.reader.read_value("gkq", cmode="c")
 
         # Convert from atomic to phonon representation.
-        # May use np.einsum for better efficiency but oh well!
-        nband = gkq_atm.shape[-1]
-        nb2 = nband ** 2
-        assert nband == gkq_atm.shape[-2] and nband == self.ebands.nband
-        natom = len(self.structure)
-        natom3 = natom * 3
-        phfreqs_ha, phdispl_red = self.phfreqs_ha, self.phdispl_red
-        gkq_nu = np.empty_like(gkq_atm)
-        cwork = np.empty((natom3, nb2), dtype=np.complex)
-        for spin in range(self.ebands.nsppol):
-            for ik in range(self.ebands.nkpt):
-                g = np.reshape(gkq_atm[spin, ik], (-1, nb2))
-                for nu in range(natom3):
-                    if phfreqs_ha[nu] > EPH_WTOL:
-                        cwork[nu] = np.dot(phdispl_red[nu], g) / np.sqrt(2.0 * phfreqs_ha[nu])
-                    else:
-                        cwork[nu] = 0.0
-                gkq_nu[spin, ik] = np.reshape(cwork, (natom3, nband, nband))
+        return self.reader.read_gkq_nu(self.phfreqs_ha, self.phdispl_red, kchunk=kchunk)
 
-        return gkq_nu
+    def get_averaged_gkq2(self, spin, ik, band_k, band_kq, mode="phonon", tol_deg=1e-3, eph_wtol=EPH_WTOL):
+        """
+        Compute |g|^2 averaged over the states that are degenerate with band_k at k
+        and with band_kq at k+q.
 
-    #def get_averaged_gkq(self, spin, ik, band_k, band_kq, tol_deg=1e-3):
-    #    natom3 = len(self.structure) * 3
-    #    e_k = self.ebands.eigens[spin, ik, band_k])
-    #    e_kq = self.eigens_kq[spin, ik, band_kq]
-    #    e_k, ndeg_k, bids_k = _find_deg(spin, ik, self.ebands.eigens)
-    #    e_kq, ndeg_kq, bids_kq = _find_deg(spin, ik, self.eigens_kq)
-    #
-    #    gkq2_nu = np.zeros(natom3))
-    #    ncvar = abifile.reader.read_variable("gkq")
-    #    for ib_k in bids_k:
-    #
-    #       for ib_kq in bids_kq:
-    #           gkq_atm = ncvar[spin, ik, :, ib_k, ib_kq]
-    #           gkq_atm = gkq_atm[:, 0] + 1j * gkq_atm[:, 1]
-    #
-    #           # Transform the gkk matrix elements from (atom, red_direction) basis to phonon-mode basis.
-    #           gkq_nu = np.zeros(natom3), dtype=np.complex)
-    #           for nu in range(natom3):
-    #               if self.phfreqs_ha[nu] < eph_wtol: continue
-    #               gkq_nu[nu] = np.dot(self.phdispl_red[nu], gkq_atm) / np.sqrt(2.0 * self.phfreqs_ha[nu])
-    #        gkq2_nu += np.abs(gkq_nu[nu]) ** 2
-    #
-    #    return np.sqrt(gkq2_nu)
+        Args:
+            spin: Spin index.
+            ik: Index of the k-point.
+            band_k: Band index of the k state (starts at 0)
+            band_kq: Band index of the k+q state (starts at 0)
+            mode: "phonon" or "atom". See :meth:`read_all_gkq`.
+            tol_deg: Tolerance in eV used to detect degenerate states.
+            eph_wtol: Matrix elements of modes with frequency below eph_wtol are set to zero.
+                Used only if mode == "phonon".
+
+        Return: (3 * natom) array with the averaged |g|^2
+        """
+        bids_k = _find_degenerate_bands(self.ebands.eigens[spin, ik], band_k, tol_deg)
+        bids_kq = _find_degenerate_bands(self.eigens_kq[spin, ik], band_kq, tol_deg)
+
+        gkq = self.reader.read_gkq_sk(spin, ik)[:, bids_k][:, :, bids_kq]
+        if mode == "phonon":
+            gkq = gkq_atm2nu(gkq, self.phfreqs_ha, self.phdispl_red, eph_wtol=eph_wtol)
+
+        return np.mean(np.abs(gkq) ** 2, axis=(1, 2))
 
     @add_fig_kwargs
     def plot(self, mode="phonon", with_glr=True, fontsize=8, colormap="viridis", sharey=True, **kwargs):
@@ -205,12 +241,7 @@ class GkqFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, Notebo
 
         # Compute e_{k+q} - e_k for all possible (b, b')
         ediffs = np.empty_like(gkq)
-        for spin in range(self.ebands.nsppol):
-            for ik in range(self.ebands.nkpt):
-                for ib_kq in range(self.ebands.mband):
-                    for ib_k in range(self.ebands.mband):
-                        ed = np.abs(self.eigens_kq[spin, ik, ib_kq] - self.ebands.eigens[spin, ik, ib_k])
-                        ediffs[spin, ik, :, ib_k, ib_kq] = ed
+        ediffs[...] = np.abs(self.eigens_kq[:, :, None, None, :] - self.ebands.eigens[:, :, None, :, None])
 
         if with_glr and mode == "phonon":
             # Add horizontal bar with matrix elements computed from Verdi's model (only G = 0, \delta_nm in bands).
@@ -372,6 +403,44 @@ class GkqReader(ElectronsReader):
     .. inheritance-diagram:: GkqReader
     """
 
+    def read_gkq_sk(self, spin, ik):
+        """(3*natom, mband, mband) complex array with the matrix elements in the atomic representation."""
+        var = self.read_variable("gkq")
+        values = var[spin, ik]
+        return values[..., 0] + 1j * values[..., 1]
+
+    def read_gkq_nu(self, phfreqs_ha, phdispl_red, kchunk=None, eph_wtol=EPH_WTOL):
+        """
+        Read the e-ph matrix elements and transform them to the phonon representation.
+
+        Args:
+            phfreqs_ha: (3 * natom) array with phonon frequencies in Ha.
+            phdispl_red: (3 * natom, 3 * natom) complex array with the phonon displacements in reduced coordinates.
+            kchunk: Number of k-points read and transformed at once. None to read the full array.
+                The memory required by the temporary arrays scales linearly with kchunk.
+            eph_wtol: Matrix elements of modes with frequency below eph_wtol are set to zero.
+
+        Return: (nsppol, nkpt, 3*natom, mband, mband) complex array.
+        """
+        if kchunk is None:
+            return gkq_atm2nu(self.read_value("gkq", cmode="c"), phfreqs_ha, phdispl_red, eph_wtol=eph_wtol)
+
+        kchunk = int(kchunk)
+        if kchunk <= 0:
+            raise ValueError("kchunk should be > 0 but got: %s" % kchunk)
+
+        var = self.read_variable("gkq")
+        nsppol, nkpt = var.shape[:2]
+        gkq_nu = np.empty(var.shape[:-1], dtype=np.complex)
+        for spin in range(nsppol):
+            for start in range(0, nkpt, kchunk):
+                ks = slice(start, min(start + kchunk, nkpt))
+                values = var[spin, ks]
+                gkq_atm2nu(values[..., 0] + 1j * values[..., 1], phfreqs_ha, phdispl_red,
+                           eph_wtol=eph_wtol, out=gkq_nu[spin, ks])
+
+        return gkq_nu
+
 
 class GkqRobot(Robot, RobotWithEbands):
     """
@@ -404,7 +473,7 @@ class GkqRobot(Robot, RobotWithEbands):
 
     @add_fig_kwargs
     def plot_gkq2_qpath(self, band_kq, band_k, kpoint=0, with_glr=False, qdamp=None, nu_list=None, # spherical_average=False,
-                        ax=None, fontsize=8, eph_wtol=EPH_WTOL, **kwargs):
+                        ax=None, fontsize=8, eph_wtol=EPH_WTOL, tol_deg=None, **kwargs):
         r"""
         Plot the magnitude of the electron-phonon matrix elements <k+q, band_kq| Delta_{q\nu} V |k, band_k>
         for a given set of (band_kq, band, k) as a function of the q-point.
@@ -418,6 +487,7 @@ class GkqRobot(Robot, RobotWithEbands):
             nu_list: List of phonons modes to be selected (starts at 0). None to select all modes.
             ax: |matplotlib-Axes| or None if a new figure should be created.
             fontsize: Label and title fontsize.
+            tol_deg: If not None, |g| is averaged over the states that are degenerate within tol_deg (eV).
 
         Return: |matplotlib-Figure|
         """
@@ -436,7 +506,6 @@ class GkqRobot(Robot, RobotWithEbands):
         gkq_snuq = np.empty((nsppol, natom3, nqpt), dtype=np.complex)
         if with_glr: gkq_lr = np.empty((nsppol, natom3, nqpt), dtype=np.complex)
 
-        # TODO: Should take into account possible degeneracies in k and kq...
         xticks, xlabels = [], []
         for iq, abifile in enumerate(self.abifiles):
             qpoint = abifile.qpoint
@@ -448,16 +517,16 @@ class GkqRobot(Robot, RobotWithEbands):
                 xlabels.append(name)
 
             phfreqs_ha, phdispl_red = abifile.phfreqs_ha, abifile.phdispl_red
-            ncvar = abifile.reader.read_variable("gkq")
-            for spin in range(nsppol):
-                gkq_atm = ncvar[spin, ik, :, band_k, band_kq]
-                gkq_atm = gkq_atm[:, 0] + 1j * gkq_atm[:, 1]
-
+            if tol_deg is not None:
+                for spin in range(nsppol):
+                    gkq_snuq[spin, :, iq] = np.sqrt(abifile.get_averaged_gkq2(spin, ik, band_k, band_kq,
+                                                                              tol_deg=tol_deg, eph_wtol=eph_wtol))
+            else:
                 # Transform the gkk matrix elements from (atom, red_direction) basis to phonon-mode basis.
-                gkq_snuq[spin, :, iq] = 0.0
-                for nu in range(natom3):
-                    if phfreqs_ha[nu] < eph_wtol: continue
-                    gkq_snuq[spin, nu, iq] = np.dot(phdispl_red[nu], gkq_atm) / np.sqrt(2.0 * phfreqs_ha[nu])
+                gkq_atm = abifile.reader.read_variable("gkq")[:, ik, :, band_k, band_kq]
+                gkq_atm = gkq_atm[..., 0] + 1j * gkq_atm[..., 1]
+                gkq_snuq[:, :, iq] = gkq_atm2nu(gkq_atm[..., None, None], phfreqs_ha, phdispl_red,
+                                                eph_wtol=eph_wtol)[..., 0, 0]
 
             if with_glr:
                 # Compute long range part with (simplified) generalized Frohlich model.
@@ -31,6 +31,7 @@ from abipy.eph.common import BaseEphReader
 __all__ = [
     "QpTempState",
     "QpTempList",
+    "QpTempTable",
     "EphSelfEnergy",
     "SigEPhFile",
     "SigEPhRobot",
@@ -440,6 +441,111 @@ class QpTempList(list):
         return fig
 
 
+class QpTempTable(object):
+    """
+    Columnar container with the QP results for all the (spin, kcalc, band, temperature) stored in the SIGEPH file.
+    Each netcdf variable is read only once and stored in arrays indexed by [spin, ikcalc, ibc, itemp]
+    where ``ibc = band - bstart_sk[spin, ikcalc]``. Energies are in eV.
+    :class:`QpTempState` objects are created only on request.
+    """
+
+    def __init__(self, sigma_kpoints, tmesh, bstart_sk, bstop_sk, e0, qpe, ze0, fan0, dw, qpe_oms):
+        """
+        Args:
+            sigma_kpoints: |KpointList| with the k-points in the self-energy.
+            tmesh: Temperature mesh in Kelvin.
+            bstart_sk, bstop_sk: [nsppol, nkcalc] arrays with the first and last+1 band computed.
+            e0: [nsppol, nkcalc, max_nbcalc] array with KS energies.
+            qpe: [nsppol, nkcalc, max_nbcalc, ntemp] complex array with QP energies (linearized equation).
+            ze0: [nsppol, nkcalc, max_nbcalc, ntemp] array with renormalization factors at e0.
+            fan0: [nsppol, nkcalc, max_nbcalc, ntemp] complex array with the Fan term at e0.
+            dw: [nsppol, nkcalc, max_nbcalc, ntemp] array with the Debye-Waller term.
+            qpe_oms: [nsppol, nkcalc, max_nbcalc, ntemp] array with on-the-mass-shell QP energies.
+        """
+        self.sigma_kpoints = sigma_kpoints
+        self.tmesh = tmesh
+        self.bstart_sk, self.bstop_sk = bstart_sk, bstop_sk
+        self.e0, self.qpe, self.ze0, self.fan0, self.dw, self.qpe_oms = e0, qpe, ze0, fan0, dw, qpe_oms
+        self.nsppol, self.nkcalc = bstart_sk.shape
+
+    @property
+    def ntemp(self):
+        """Number of temperatures."""
+        return len(self.tmesh)
+
+    def get_qp(self, spin, ikc, band, ignore_imag=False):
+        """
+        Build and return :class:`QpTempState` for the given (spin, ikc, band).
+        ikc is the index of the k-point in sigma_kpoints. NB: band is a global index i.e. unshifted.
+        Only real part is returned if ``ignore_imag``.
+        """
+        ibc = band - self.bstart_sk[spin, ikc]
+
+        def ri(a):
+            return np.real(a) if ignore_imag else a
+
+        return QpTempState(spin=spin, kpoint=self.sigma_kpoints[ikc], band=band, tmesh=self.tmesh,
+                           e0=self.e0[spin, ikc, ibc], qpe=ri(self.qpe[spin, ikc, ibc]),
+                           ze0=self.ze0[spin, ikc, ibc], fan0=ri(self.fan0[spin, ikc, ibc]),
+                           dw=self.dw[spin, ikc, ibc], qpe_oms=self.qpe_oms[spin, ikc, ibc])
+
+    def get_qplist_sk(self, spin, ikc, ignore_imag=False):
+        """Return :class:`QpTempList` with the states for the given spin and k-point index."""
+        return QpTempList([self.get_qp(spin, ikc, band, ignore_imag=ignore_imag)
+                           for band in range(self.bstart_sk[spin, ikc], self.bstop_sk[spin, ikc])])
+
+    def get_qplist_spin(self, ignore_imag=False):
+        """Return tuple with ``nsppol`` :class:`QpTempList` objects with all the states."""
+        return tuple(QpTempList([self.get_qp(spin, ikc, band, ignore_imag=ignore_imag)
+                                 for ikc in range(self.nkcalc)
+                                 for band in range(self.bstart_sk[spin, ikc], self.bstop_sk[spin, ikc])])
+                     for spin in range(self.nsppol))
+
+    def get_dataframe(self, sk_list=None, itemp=None, with_spin=True, params=None, ignore_imag=False):
+        """
+        Build |pandas-DataFrame| with the QP results. The dataframe has the same columns as the one
+        produced by :meth:`QpTempState.get_dataframe` and one row for each (state, temperature).
+
+        Args:
+            sk_list: List of (spin, ikc) tuples. None for all spins and k-points.
+            itemp: Temperature index, if None all temperatures are returned.
+            with_spin: False if spin index is not wanted.
+            params: Optional (Ordered) dictionary with extra parameters.
+            ignore_imag: Only real part is used if ``ignore_imag``.
+        """
+        if sk_list is None:
+            sk_list = [(spin, ikc) for spin in range(self.nsppol) for ikc in range(self.nkcalc)]
+
+        # Build the indices of the states in the [nsppol, nkcalc, max_nbcalc] arrays.
+        nb_list = [self.bstop_sk[spin, ikc] - self.bstart_sk[spin, ikc] for spin, ikc in sk_list]
+        spins = np.repeat([spin for spin, _ in sk_list], nb_list).astype(np.int)
+        ikcs = np.repeat([ikc for _, ikc in sk_list], nb_list).astype(np.int)
+        ibcs = np.concatenate([np.arange(nb) for nb in nb_list]).astype(np.int)
+        idx = (spins, ikcs, ibcs)
+        nstates, ntemp = len(spins), self.ntemp
+
+        e0, qpe, fan0, dw = self.e0[idx], self.qpe[idx], self.fan0[idx], self.dw[idx]
+        if ignore_imag: qpe, fan0 = qpe.real, fan0.real
+
+        od = OrderedDict()
+        if with_spin: od["spin"] = np.repeat(spins, ntemp)
+        od["band"] = np.repeat(self.bstart_sk[spins, ikcs] + ibcs, ntemp)
+        od["e0"] = np.repeat(e0, ntemp)
+        od["re_qpe"] = qpe.real.ravel()
+        od["qpeme0"] = (qpe - e0[:, None]).real.ravel()
+        od["re_sig0"] = (fan0.real + dw).ravel()
+        od["imag_sig0"] = fan0.imag.ravel()
+        od["ze0"] = self.ze0[idx].ravel()
+        od["re_fan0"] = fan0.real.ravel()
+        od["dw"] = dw.ravel()
+        od["tmesh"] = np.tile(self.tmesh, nstates)
+        if params is not None: od.update(params)
+
+        df = pd.DataFrame(od, index=np.tile(np.arange(ntemp), nstates))
+        if itemp is not None: df = df[df["tmesh"] == self.tmesh[itemp]]
+        return df
+
+
 class EphSelfEnergy(object):
     r"""
     Electron self-energy due to phonon interaction :math:`\Sigma_{nk}(\omega,T)`
@@ -1156,14 +1262,10 @@ class SigEPhFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
             with_params: False to exclude calculation parameters from the dataframe.
             ignore_imag: only real part is returned if ``ignore_imag``.
         """
-        df_list = []; app = df_list.append
         with_spin = self.nsppol == 2 if with_spin == "auto" else with_spin
-        for spin in range(self.nsppol):
-            for ikc, kpoint in enumerate(self.sigma_kpoints):
-                app(self.get_dataframe_sk(spin, ikc, itemp=itemp, with_params=with_params,
-                    with_spin=with_spin, ignore_imag=ignore_imag))
-
-        return pd.concat(df_list)
+        return self.reader.qp_table.get_dataframe(itemp=itemp, with_spin=with_spin,
+                                                  params=self.params if with_params else None,
+                                                  ignore_imag=ignore_imag)
 
     def get_dirgaps_dataframe(self, kpoint, itemp=None, spin=0, with_params=False):
         """
@@ -1178,17 +1280,15 @@ class SigEPhFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
         ikc = self.sigkpt2index(kpoint)
         it_list = list(range(self.ntemp)) if itemp is None else [int(itemp)]
 
-        rows = []
-        for it in it_list:
-            d = dict(T=self.tmesh[it],
-                     ks_gap=self.ks_dirgaps[spin, ikc],
-                     qp_gap=self.qp_dirgaps_t[spin, ikc, it],
-                     otms_gap=self.qp_dirgaps_otms_t[spin, ikc, it])
-
-            if with_params: d.update(self.params)
-            rows.append(d)
+        od = OrderedDict([
+            ("T", self.tmesh[it_list]),
+            ("ks_gap", np.full(len(it_list), self.ks_dirgaps[spin, ikc])),
+            ("qp_gap", self.qp_dirgaps_t[spin, ikc, it_list]),
+            ("otms_gap", self.qp_dirgaps_otms_t[spin, ikc, it_list]),
+        ])
+        if with_params: od.update(self.params)
 
-        return pd.DataFrame(rows)
+        return pd.DataFrame(od)
 
     def get_dataframe_sk(self, spin, kpoint, itemp=None, index=None,
                          with_params=False, with_spin="auto", ignore_imag=False):
@@ -1206,16 +1306,10 @@ class SigEPhFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
         """
         ikc = self.sigkpt2index(kpoint)
         with_spin = self.nsppol == 2 if with_spin == "auto" else with_spin
-        rows = []
-        for band in range(self.bstart_sk[spin, ikc], self.bstop_sk[spin, ikc]):
-            # Read QP data.
-            qp = self.reader.read_qp(spin, ikc, band, ignore_imag=ignore_imag)
-            # Convert to dataframe and add other entries useful when comparing different calculations.
-            rows.append(qp.get_dataframe(with_spin=with_spin, params=self.params if with_params else None))
-
-        df = pd.concat(rows)
-        if itemp is not None: df = df[df["tmesh"] == self.tmesh[itemp]]
-        return df
+        # Add other entries useful when comparing different calculations.
+        return self.reader.qp_table.get_dataframe(sk_list=[(spin, ikc)], itemp=itemp, with_spin=with_spin,
+                                                  params=self.params if with_params else None,
+                                                  ignore_imag=ignore_imag)
 
     def get_linewidth_dos(self, method="gaussian", e0="fermie", step=0.1, width=0.2):
         """
@@ -1245,16 +1339,16 @@ class SigEPhFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
 
         # get dos
         if method == "gaussian":
+            qpt = self.reader.qp_table
             dos = np.zeros((ntemp,self.nsppol,nw))
             for spin in range(self.nsppol):
                 for i, ik in enumerate(self.kcalc2ibz):
                     weight = ebands.kpoints.weights[ik]
-                    for band in range(self.bstart_sk[spin, i], self.bstop_sk[spin, i]):
-                        qp = self.reader.read_qp(spin,i,band)
-                        e0 = qp.e0
-                        for it in range(ntemp):
-                            linewidth = abs(qp.fan0.imag[it])
-                            dos[it,spin] += weight * linewidth * gaussian(mesh, width, center=e0)
+                    nb = self.bstop_sk[spin, i] - self.bstart_sk[spin, i]
+                    # [nb, ntemp] linewidths and [nb, nw] gaussians.
+                    linewidths = np.abs(qpt.fan0[spin, i, :nb].imag)
+                    gauss = gaussian(mesh, width, center=qpt.e0[spin, i, :nb, None])
+                    dos[:, spin] += weight * np.dot(linewidths.T, gauss)
         else:
             raise NotImplementedError("Method %s is not supported" % method)
 
@@ -2366,10 +2460,7 @@ class SigEPhRobot(Robot, RobotWithEbands):
 
         df_list = []; app = df_list.append
         for label, ncfile in self.items():
-            for spin in range(ncfile.nsppol):
-                for ikc, kpoint in enumerate(ncfile.sigma_kpoints):
-                    app(ncfile.get_dataframe_sk(spin, ikc, with_params=with_params,
-                        with_spin=with_spin, ignore_imag=ignore_imag))
+            app(ncfile.get_dataframe(with_params=with_params, with_spin=with_spin, ignore_imag=ignore_imag))
 
         return pd.concat(df_list)
 
@@ -3244,10 +3335,48 @@ class SigmaPhReader(BaseEphReader):
             ignore_imag: Only real part is returned if ``ignore_imag``.
         """
         ikc = self.sigkpt2index(kpoint)
-        bstart, bstop = self.bstart_sk[spin, ikc], self.bstop_sk[spin, ikc]
+        return self.qp_table.get_qplist_sk(spin, ikc, ignore_imag=ignore_imag)
+
+    @lazy_property
+    def qp_table(self):
+        """:class:`QpTempTable` with the QP results for all the states. Cached."""
+        return self.read_qp_table()
+
+    def read_qp_table(self):
+        """
+        Read the QP results for all the (spin, kcalc, band, temperature) and return :class:`QpTempTable`.
+        Each netcdf variable is read only once.
+        """
+        # (Complex) QP energies computed with the dynamic formalism.
+        # nctkarr_t("qp_enes", "dp", "two, ntemp, max_nbcalc, nkcalc, nsppol")
+        qpe = self.read_value("qp_enes", cmode="c") * abu.Ha_eV
+
+        # On-the-mass-shell QP energies.
+        # nctkarr_t("qpoms_enes", "dp", "two, ntemp, max_nbcalc, nkcalc, nsppol")
+        var = self.read_value("qpoms_enes", default=None)
+        if var is None:
+            #cprint("Reading old deprecated sigeph file!", "yellow")
+            var = self.read_value("qpadb_enes")
+        qpe_oms = var[..., 0] * abu.Ha_eV
+
+        # Debye-Waller term (static).
+        # nctkarr_t("dw_vals", "dp", "ntemp, max_nbcalc, nkcalc, nsppol"),
+        dw = self.read_value("dw_vals") * abu.Ha_eV
+
+        # Sigma_eph(omega=eKS, kT, band, ikcalc, spin)
+        # nctkarr_t("vals_e0ks", "dp", "two, ntemp, max_nbcalc, nkcalc, nsppol")
+        # TODO: Add Fan0 instead of computing Sigma - DW?
+        sigc = self.read_value("vals_e0ks", cmode="c") * abu.Ha_eV
+        fan0 = sigc - dw
+
+        # nctkarr_t("ks_enes", "dp", "max_nbcalc, nkcalc, nsppol")
+        e0 = self.read_value("ks_enes") * abu.Ha_eV
+
+        # nctkarr_t("ze0_vals", "dp", "ntemp, max_nbcalc, nkcalc, nsppol")
+        ze0 = self.read_value("ze0_vals")
 
-        return QpTempList([self.read_qp(spin, ikc, band, ignore_imag=ignore_imag)
-                           for band in range(bstart, bstop)])
+        return QpTempTable(self.sigma_kpoints, self.tmesh, self.bstart_sk, self.bstop_sk,
+                           e0=e0, qpe=qpe, ze0=ze0, fan0=fan0, dw=dw, qpe_oms=qpe_oms)
 
     def read_sigeph_skb(self, spin, kpoint, band):
         """
@@ -3346,45 +3475,7 @@ class SigmaPhReader(BaseEphReader):
         Only real part is returned if ``ignore_imag``.
         """
         spin, ikc, ibc, kpoint = self.get_sigma_skb_kpoint(spin, kpoint, band)
-
-        def ri(a):
-            return np.real(a) if ignore_imag else a
-
-        # (Complex) QP energies computed with the dynamic formalism.
-        # nctkarr_t("qp_enes", "dp", "two, ntemp, max_nbcalc, nkcalc, nsppol")
-        var = self.read_variable("qp_enes")
-        qpe = (var[spin, ikc, ibc, :, 0] + 1j * var[spin, ikc, ibc, :, 1]) * abu.Ha_eV
-
-        # On-the-mass-shell QP energies.
-        # nctkarr_t("qpoms_enes", "dp", "two, ntemp, max_nbcalc, nkcalc, nsppol")
-        try:
-            var = self.read_variable("qpoms_enes")
-        except Exception:
-            #cprint("Reading old deprecated sigeph file!", "yellow")
-            var = self.read_variable("qpadb_enes")
-
-        qpe_oms = var[spin, ikc, ibc, :, 0] * abu.Ha_eV
-
-        # Debye-Waller term (static).
-        # nctkarr_t("dw_vals", "dp", "ntemp, max_nbcalc, nkcalc, nsppol"),
-        var = self.read_variable("dw_vals")
-        dw = var[spin, ikc, ibc, :] * abu.Ha_eV
-
-        # Sigma_eph(omega=eKS, kT, band, ikcalc, spin)
-        # nctkarr_t("vals_e0ks", "dp", "two, ntemp, max_nbcalc, nkcalc, nsppol")
-        # TODO: Add Fan0 instead of computing Sigma - DW?
-        var = self.read_variable("vals_e0ks")
-        sigc = (var[spin, ikc, ibc, :, 0] + 1j * var[spin, ikc, ibc, :, 1]) * abu.Ha_eV
-        fan0 = sigc - dw
-
-        # nctkarr_t("ks_enes", "dp", "max_nbcalc, nkcalc, nsppol")
-        e0 = self.read_variable("ks_enes")[spin, ikc, ibc] * abu.Ha_eV
-
-        # nctkarr_t("ze0_vals", "dp", "ntemp, max_nbcalc, nkcalc, nsppol")
-        ze0 = self.read_variable("ze0_vals")[spin, ikc, ibc]
-
-        return QpTempState(spin=spin, kpoint=kpoint, band=band, tmesh=self.tmesh,
-                           e0=e0, qpe=ri(qpe), ze0=ze0, fan0=ri(fan0), dw=dw, qpe_oms=qpe_oms)
+        return self.qp_table.get_qp(spin, ikc, band, ignore_imag=ignore_imag)
 
     def read_allqps(self, ignore_imag=False):
         """
@@ -3393,14 +3484,4 @@ class SigmaPhReader(BaseEphReader):
         Args:
             ignore_imag: Only real part is returned if ``ignore_imag``.
         """
-        qps_spin = self.nsppol * [None]
-
-        # TODO: Try to optimize this part.
-        for spin in range(self.nsppol):
-            qps = []
-            for ikc, kpoint in enumerate(self.sigma_kpoints):
-                for band in range(self.bstart_sk[spin, ikc], self.bstop_sk[spin, ikc]):
-                    qps.append(self.read_qp(spin, ikc, band, ignore_imag=ignore_imag))
-            qps_spin[spin] = QpTempList(qps)
-
-        return tuple(qps_spin)
+        return self.qp_table.get_qplist_spin(ignore_imag=ignore_imag)
@@ -0,0 +1,61 @@
+# coding: utf-8
+"""Tests for gkq module."""
+import numpy as np
+import netCDF4
+
+from abipy.core.testing import AbipyTest
+from abipy.eph.gkq import GkqReader, gkq_atm2nu, get_phfactors
+
+
+def _gkq_atm2nu_loop(gkq_atm, phfreqs_ha, phdispl_red, eph_wtol):
+    """Reference implementation with explicit loops over spin, k-points and modes."""
+    nsppol, nkpt, natom3, nband = gkq_atm.shape[:4]
+    gkq_nu = np.zeros_like(gkq_atm)
+    for spin in range(nsppol):
+        for ik in range(nkpt):
+            g = np.reshape(gkq_atm[spin, ik], (natom3, -1))
+            for nu in range(natom3):
+                if phfreqs_ha[nu] > eph_wtol:
+                    gkq_nu[spin, ik, nu] = np.reshape(np.dot(phdispl_red[nu], g) / np.sqrt(2.0 * phfreqs_ha[nu]),
+                                                      (nband, nband))
+    return gkq_nu
+
+
+class GkqTest(AbipyTest):
+
+    def test_gkq_atm2nu(self):
+        """Testing transformation of gkq to the phonon representation."""
+        rng = np.random.RandomState(1)
+        nsppol, nkpt, natom3, nband = 2, 7, 6, 4
+        shape = (nsppol, nkpt, natom3, nband, nband)
+        gkq_atm = rng.normal(size=shape) + 1j * rng.normal(size=shape)
+        phfreqs_ha = np.array([0, 1e-8, 1e-7, 1e-3, 2e-3, 4e-3])
+        phdispl_red = rng.normal(size=(natom3, natom3)) + 1j * rng.normal(size=(natom3, natom3))
+
+        factors = get_phfactors(phfreqs_ha, eph_wtol=1e-6)
+        assert np.all(factors[:3] == 0)
+        self.assert_almost_equal(factors[3:], 1 / np.sqrt(2 * phfreqs_ha[3:]))
+
+        ref = _gkq_atm2nu_loop(gkq_atm, phfreqs_ha, phdispl_red, eph_wtol=1e-6)
+        gkq_nu = gkq_atm2nu(gkq_atm, phfreqs_ha, phdispl_red, eph_wtol=1e-6)
+        self.assert_almost_equal(gkq_nu, ref)
+        out = np.empty_like(gkq_atm[1])
+        assert gkq_atm2nu(gkq_atm[1], phfreqs_ha, phdispl_red, eph_wtol=1e-6, out=out) is out
+        self.assert_almost_equal(out, ref[1])
+
+        # Read gkq from a netcdf file with the same layout as the GKQ.nc file
+        filepath = self.get_tmpname(suffix="_GKQ.nc")
+        with netCDF4.Dataset(filepath, mode="w") as root:
+            for name, dim in zip(["number_of_spins", "number_of_kpoints", "number_of_phonon_modes",
+                                  "max_number_of_states", "complex"], shape[:4] + (2,)):
+                root.createDimension(name, dim)
+            var = root.createVariable("gkq", "f8", ("number_of_spins", "number_of_kpoints", "number_of_phonon_modes",
+                                                   "max_number_of_states", "max_number_of_states", "complex"))
+            var[:] = np.stack([gkq_atm.real, gkq_atm.imag], axis=-1)
+
+        with GkqReader(filepath) as reader:
+            self.assert_almost_equal(reader.read_gkq_sk(1, 3), gkq_atm[1, 3])
+            for kchunk in (None, 1, 3, nkpt + 1):
+                self.assert_almost_equal(reader.read_gkq_nu(phfreqs_ha, phdispl_red, kchunk=kchunk, eph_wtol=1e-6), ref)
+            with self.assertRaises(ValueError):
+                reader.read_gkq_nu(phfreqs_ha, phdispl_red, kchunk=0)
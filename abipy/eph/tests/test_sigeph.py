@@ -87,6 +87,23 @@ class SigEPhFileTest(AbipyTest):
         data = sigeph.get_dataframe()
         assert "ze0" in data
 
+        # The columnar table should give the same results as the QpTempState objects.
+        qpt = sigeph.reader.qp_table
+        assert qpt.qpe.shape == (sigeph.nsppol, sigeph.nkcalc, 8, sigeph.ntemp)
+        qp = qpt.get_qp(spin=0, ikc=1, band=3)
+        self.assert_equal(qp.qpe, qpt.qpe[0, 1, 3])
+        assert qp.kpoint == [0.5, 0, 0]
+        data_skb = data.iloc[(sigeph.nbcalc_sk[0, 0] + 3) * sigeph.ntemp:][:sigeph.ntemp]
+        ref = qp.get_dataframe(with_spin=False, params=sigeph.params)
+        self.assert_equal(data_skb.values, ref.values)
+        assert list(data.columns) == list(ref.columns)
+        data_real = sigeph.get_dataframe(ignore_imag=True)
+        assert np.all(data_real["imag_sig0"] == 0)
+        self.assert_equal(data_real["re_qpe"].values, data["re_qpe"].values)
+        dirgaps = sigeph.get_dirgaps_dataframe(kpoint=0, itemp=1)
+        assert len(dirgaps) == 1
+        self.assert_almost_equal(dirgaps["qp_gap"].values, sigeph.qp_dirgaps_t[0, 0, 1])
+
         if self.has_matplotlib():
             # Test sigeph plot methods.
             assert sigeph.plot_qpgaps_t(show=False)
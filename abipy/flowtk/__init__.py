@@ -4,7 +4,7 @@ import tempfile
 
 from monty.termcolor import cprint
 from pymatgen.io.abinit.abiobjects import *
-from pymatgen.io.abinit.pseudos import Pseudo, PseudoTable, PseudoParser
+from .pseudos import Pseudo, PseudoTable, PseudoParser, get_pseudo_cache
 from pymatgen.io.abinit.netcdf import NetcdfReader
 from .launcher import PyFlowScheduler, PyLauncher
 from .qadapters import show_qparams, all_qtypes
@@ -76,7 +76,7 @@ def flow_main(main):  # pragma: no cover
 
             if options.abivalidate:
                 print("Validating flow input files...")
-                isok, errors = flow.abivalidate_inputs()
+                isok, errors = flow.abivalidate_inputs(cache=True)
                 if not isok:
                     for e in errors:
                         if e.retcode == 0: continue
@@ -0,0 +1,391 @@
+# coding: utf-8
+"""
+Tools to archive the directory of a |Flow| in tar.gz format.
+
+The tar stream is split into chunks that are compressed independently by a pool of threads
+and concatenated in the output file. The result is a valid multi-member gzip file that can be
+extracted with tar, gzip or the python tarfile module.
+A JSON manifest with the size, the modification time and the md5 of the archived files
+is written next to the archive. The manifest can be used to produce incremental archives
+with the files that have been created or modified after the previous archive.
+"""
+import os
+import stat
+import time
+import json
+import zlib
+import hashlib
+import tarfile
+import collections
+
+from concurrent.futures import ThreadPoolExecutor
+from monty.string import is_string, list_strings
+from pymatgen.core.units import Memory
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__all__ = [
+    "ParallelGzipWriter",
+    "FlowArchiver",
+]
+
+
+class ParallelGzipWriter(object):
+    """
+    Write-only file-like object that compresses data in gzip format with a pool of threads.
+
+    The data is split into chunks of ``chunksize`` bytes. Each chunk is compressed independently
+    and written as a gzip member so that the members can be produced in parallel
+    (zlib releases the GIL). Members are written to disk in the same order as the input.
+
+    .. code-block:: python
+
+        with ParallelGzipWriter("foo.gz", nprocs=4) as gz:
+            gz.write(data)
+    """
+
+    def __init__(self, filepath, nprocs=None, compresslevel=6, chunksize=4 * 1024**2):
+        """
+        Args:
+            filepath: Path of the gzip file.
+            nprocs: Number of threads used for the compression. None to use all the CPUs.
+            compresslevel: Compression level from 1 (fastest) to 9 (best compression).
+            chunksize: Number of uncompressed bytes in each gzip member.
+        """
+        self.filepath = filepath
+        self.nprocs = nprocs or os.cpu_count() or 1
+        self.compresslevel = compresslevel
+        self.chunksize = int(chunksize)
+
+        self._fh = open(filepath, "wb")
+        self._executor = ThreadPoolExecutor(max_workers=self.nprocs)
+        # Futures of the members being compressed, in file order.
+        self._pending = collections.deque()
+        self._buf = bytearray()
+        self._pos = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def tell(self):
+        """Number of uncompressed bytes written so far."""
+        return self._pos
+
+    def write(self, data):
+        """Write bytes. Return the number of bytes written."""
+        self._buf += data
+        self._pos += len(data)
+        while len(self._buf) >= self.chunksize:
+            self._submit(bytes(self._buf[:self.chunksize]))
+            del self._buf[:self.chunksize]
+        return len(data)
+
+    def _compress(self, data):
+        """Compress data into a gzip member (wbits=31 adds the gzip header and trailer)."""
+        compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def _submit(self, data):
+        self._pending.append(self._executor.submit(self._compress, data))
+        # Bound the memory: at most two chunks per thread are kept in memory.
+        while len(self._pending) > 2 * self.nprocs:
+            self._fh.write(self._pending.popleft().result())
+
+    def close(self):
+        """Compress the remaining data and close the file."""
+        if self.closed: return
+        try:
+            if self._buf:
+                self._submit(bytes(self._buf))
+                self._buf = bytearray()
+            while self._pending:
+                self._fh.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown()
+            self._fh.close()
+            self.closed = True
+
+
+class _HashingReader(object):
+    """Wraps a file object opened in binary mode and computes the md5 of the data read."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.md5 = hashlib.md5()
+
+    def read(self, size=-1):
+        data = self.fh.read(size)
+        self.md5.update(data)
+        return data
+
+
+def md5sum(filepath, blocksize=2**20):
+    """Return the md5 of the file in hexadecimal format."""
+    md5 = hashlib.md5()
+    with open(filepath, "rb") as fh:
+        for block in iter(lambda: fh.read(blocksize), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def load_manifest(filepath):
+    """Read the manifest written by |FlowArchiver|. Return dictionary."""
+    with open(filepath, "rt") as fh:
+        return json.load(fh)
+
+
+def _archive_base(name):
+    """Remove the tar.gz extension from name."""
+    for ext in (".tar.gz", ".tgz"):
+        if name.endswith(ext): return name[:-len(ext)]
+    return name
+
+
+_Entry = collections.namedtuple("_Entry", "path arcname st isdir")
+
+
+class FlowArchiver(object):
+    """
+    Build tar.gz archives of a directory tree without changing the current working directory.
+
+    The names of the members are relative to the parent of ``workdir`` and symbolic links are not archived.
+    Each call to ``make_archives`` writes a manifest ``name.manifest.json`` with the entries:
+
+        arcname --> {"size": bytes, "mtime": modification time, "md5": md5 of the file, "archive": name}
+
+    where archive is the basename of the tarball containing the most recent version of the file.
+    If a previous manifest is passed via ``since``, files with the same size and modification time
+    (or the same md5) are not archived again and the entries are copied from the old manifest.
+    """
+
+    def __init__(self, workdir, max_filesize=None, exclude_exts=None, exclude_dirs=None,
+                 nprocs=None, compresslevel=6, verbose=0, **kwargs):
+        """
+        Args:
+            workdir: Directory to archive.
+            max_filesize (int or string with unit): a file is included in the tar file if its size <= max_filesize
+                Can be specified in bytes e.g. `max_files=1024` or with a string with unit e.g. `max_filesize="1 Mb"`.
+                No check is done if max_filesize is None.
+            exclude_exts: List of file extensions to be excluded from the tar file.
+            exclude_dirs: List of directory basenames to be excluded.
+            nprocs: Number of threads used for the compression. None to use all the CPUs.
+            compresslevel: gzip compression level.
+            verbose (int): Verbosity level.
+            kwargs: keyword arguments passed to the :class:`TarFile` constructor.
+        """
+        self.workdir = os.path.abspath(workdir)
+        self.root = os.path.dirname(self.workdir)
+
+        if max_filesize is not None:
+            max_filesize = int(Memory.from_string(max_filesize).to("byte")) if is_string(max_filesize) else \
+                int(max_filesize)
+        self.max_filesize = max_filesize
+
+        if exclude_exts:
+            # Add/remove ".nc" so that we can simply pass "GSR" instead of "GSR.nc"
+            # Moreover this trick allows one to treat WFK.nc and WFK file on the same footing.
+            exts = []
+            for e in list_strings(exclude_exts):
+                exts.append(e)
+                if e.endswith(".nc"):
+                    exts.append(e.replace(".nc", ""))
+                else:
+                    exts.append(e + ".nc")
+            exclude_exts = tuple(exts)
+        self.exclude_exts = exclude_exts
+        self.exclude_dirs = set(list_strings(exclude_dirs)) if exclude_dirs else set()
+
+        self.nprocs = nprocs
+        self.compresslevel = compresslevel
+        self.verbose = verbose
+        self.tar_kwargs = kwargs
+        self._names = {}
+
+    def _owner(self, st):
+        """Return (uname, gname) from stat. Lookups are cached."""
+        key = (st.st_uid, st.st_gid)
+        if key not in self._names:
+            uname = gname = ""
+            try:
+                import pwd
+                uname = pwd.getpwuid(st.st_uid)[0]
+            except (ImportError, KeyError):
+                pass
+            try:
+                import grp
+                gname = grp.getgrgid(st.st_gid)[0]
+            except (ImportError, KeyError):
+                pass
+            self._names[key] = (uname, gname)
+
+        return self._names[key]
+
+    def _excluded_ext(self, basename):
+        if self.exclude_exts and basename.endswith(self.exclude_exts):
+            if self.verbose: print("Excluding %s due to extension" % basename)
+            return True
+        return False
+
+    def _arcname(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def iter_entries(self, topdir, prune=()):
+        """
+        Yield `_Entry` for the directories and the regular files in topdir.
+        Only one stat per entry. The directories in ``prune`` are skipped.
+        """
+        topdir = os.path.abspath(topdir)
+        prune = set(os.path.abspath(p) for p in prune)
+        if os.path.basename(topdir) in self.exclude_dirs or self._excluded_ext(os.path.basename(topdir)):
+            return
+
+        stack = [(topdir, os.stat(topdir))]
+        while stack:
+            dirpath, dirstat = stack.pop()
+            yield _Entry(dirpath, self._arcname(dirpath), dirstat, True)
+            try:
+                entries = sorted(os.scandir(dirpath), key=lambda e: e.name)
+            except OSError as exc:
+                logger.warning("Cannot list directory %s: %s" % (dirpath, str(exc)))
+                continue
+
+            subdirs = []
+            for entry in entries:
+                # Skip links.
+                if entry.is_symlink():
+                    if self.verbose: print("Excluding link: %s" % entry.path)
+                    continue
+                if self._excluded_ext(entry.name): continue
+
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in self.exclude_dirs:
+                        if self.verbose: print("Excluding %s due to exclude_dirs" % entry.path)
+                        continue
+                    if entry.path in prune: continue
+                    try:
+                        subdirs.append((entry.path, entry.stat(follow_symlinks=False)))
+                    except OSError:
+                        continue
+
+                elif entry.is_file(follow_symlinks=False):
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        # File removed in the meantime.
+                        continue
+                    # Check size in bytes
+                    if self.max_filesize is not None and st.st_size > self.max_filesize:
+                        if self.verbose: print("Excluding %s due to max_filesize" % entry.path)
+                        continue
+                    yield _Entry(entry.path, self._arcname(entry.path), st, False)
+
+            # Depth-first traversal in alphabetical order.
+            stack.extend(reversed(subdirs))
+
+    def _select(self, entries, old_files, new_files):
+        """
+        Compare entries with the old manifest. Fill new_files with the unchanged entries.
+        Return list of entries that must be archived.
+        """
+        todo = []
+        for e in entries:
+            old = old_files.get(e.arcname)
+            if old is None:
+                todo.append(e)
+            elif e.isdir:
+                new_files[e.arcname] = old
+            elif old["size"] == e.st.st_size:
+                if old["mtime"] == e.st.st_mtime or old["md5"] == md5sum(e.path):
+                    new_files[e.arcname] = dict(old, mtime=e.st.st_mtime)
+                else:
+                    todo.append(e)
+            else:
+                todo.append(e)
+
+        return todo
+
+    def _write_archive(self, path, entries, new_files):
+        """Write the tar.gz file ``path`` with entries. Add the new entries to new_files."""
+        archive = os.path.basename(path)
+        with ParallelGzipWriter(path, nprocs=self.nprocs, compresslevel=self.compresslevel) as gz:
+            with tarfile.open(fileobj=gz, mode="w", **self.tar_kwargs) as tar:
+                for e in entries:
+                    st = e.st
+                    tarinfo = tarfile.TarInfo(e.arcname)
+                    tarinfo.mode = stat.S_IMODE(st.st_mode)
+                    tarinfo.uid, tarinfo.gid = st.st_uid, st.st_gid
+                    tarinfo.uname, tarinfo.gname = self._owner(st)
+                    tarinfo.mtime = st.st_mtime
+
+                    if e.isdir:
+                        tarinfo.type = tarfile.DIRTYPE
+                        tar.addfile(tarinfo)
+                        new_files[e.arcname] = dict(size=0, mtime=st.st_mtime, md5=None, archive=archive)
+                        continue
+
+                    tarinfo.type = tarfile.REGTYPE
+                    tarinfo.size = st.st_size
+                    try:
+                        fh = open(e.path, "rb")
+                    except OSError:
+                        # File removed in the meantime.
+                        continue
+                    with fh:
+                        reader = _HashingReader(fh)
+                        tar.addfile(tarinfo, reader)
+
+                    new_files[e.arcname] = dict(size=st.st_size, mtime=st.st_mtime,
+                                                md5=reader.md5.hexdigest(), archive=archive)
+
+    def make_archives(self, name, since=None, shards=None, extra_files=None):
+        """
+        Archive the directory.
+
+        Args:
+            name: Path of the tar.gz file.
+            since: Path of the manifest written by a previous call. Only new or modified files are archived.
+            shards: Dictionary label --> directory inside workdir. The files of each directory are written
+                in a separated archive: ``name-label.tar.gz``. Shards without new files are not written.
+            extra_files: List of files outside workdir added to the main archive e.g. the python script.
+
+        Returns: (paths, manifest_path) where paths is the list with the archives that have been written.
+        """
+        base = _archive_base(name)
+        old_files = load_manifest(since)["files"] if since is not None else {}
+        shards = collections.OrderedDict() if shards is None else collections.OrderedDict(shards)
+
+        # List of (path, entries) with the main archive first.
+        main_entries = list(self.iter_entries(self.workdir, prune=shards.values()))
+        for filepath in list_strings(extra_files) if extra_files else []:
+            if not os.path.isfile(filepath): continue
+            st = os.stat(filepath)
+            arcname = os.path.abspath(filepath).replace(os.sep, "/").lstrip("/")
+            main_entries.append(_Entry(filepath, arcname, st, False))
+
+        jobs = [(name, main_entries)]
+        for label, dirpath in shards.items():
+            jobs.append(("%s-%s.tar.gz" % (base, label), list(self.iter_entries(dirpath))))
+
+        new_files, paths = {}, []
+        for i, (path, entries) in enumerate(jobs):
+            todo = self._select(entries, old_files, new_files)
+            if i > 0 and not todo: continue
+            start = time.time()
+            self._write_archive(path, todo, new_files)
+            paths.append(path)
+            if self.verbose:
+                print("Wrote %s with %d entries in %.2f [s]" % (path, len(todo), time.time() - start))
+
+        manifest_path = base + ".manifest.json"
+        manifest = dict(workdir=self.workdir, created=time.time(), since=since,
+                        archives=[os.path.basename(p) for p in paths], files=new_files)
+        with open(manifest_path, "wt") as fh:
+            json.dump(manifest, fh)
+
+        return paths, manifest_path
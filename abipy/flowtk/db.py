@@ -3,44 +3,38 @@
 # Distributed under the terms of the MIT License.
 """
 Objects and helper function used to store the results in a MongoDb database
+or in a local SQLite file with JSON documents.
 """
+import os
+import abc
+import json
 import collections
 import copy
 
+from concurrent.futures import ProcessPoolExecutor
+from monty.json import jsanitize
 from .utils import as_bool
 
 
-#def mongo_getattr(rec, key):
-#    """
-#    Get value from dict using MongoDB dot-separated path semantics.
-#    For example:
-#
-#    >>> assert mongo_getattr({'a': {'b': 1}, 'x': 2}, 'a.b') == 1
-#    >>> assert mongo_getattr({'a': {'b': 1}, 'x': 2}, 'x') == 2
-#    >>> assert mongo_getattr({'a': {'b': 1}, 'x': 2}, 'a.b.c') is None
-#
-#    :param rec: mongodb document
-#    :param key: path to mongo value
-#    :param default: default to return if not found
-#    :return: value, potentially nested, or default if not found
-#    :raise: AttributeError, if record is not a dict or key is not found.
-#    """
-#    if not isinstance(rec, collections..abc.Mapping):
-#        raise AttributeError('input record must act like a dict')
-#    if not rec:
-#        raise AttributeError('Empty dict')
-#
-#    if not '.' in key:
-#        return rec.get(key)
-#
-#    for key_part in key.split('.'):
-#        if not isinstance(rec, collections.abc.Mapping):
-#            raise AttributeError('not a mapping for rec_part %s' % key_part)
-#        if not key_part in rec:
-#            raise AttributeError('key %s not in dict %s' % key)
-#        rec = rec[key_part]
-#
-#    return rec
+def mongo_getattr(rec, key):
+    """
+    Get value from dict using MongoDB dot-separated path semantics.
+    For example:
+
+    >>> assert mongo_getattr({'a': {'b': 1}, 'x': 2}, 'a.b') == 1
+    >>> assert mongo_getattr({'a': {'b': 1}, 'x': 2}, 'x') == 2
+
+    :param rec: mongodb document
+    :param key: path to mongo value
+    :return: value, potentially nested.
+    :raise: KeyError, if key is not found.
+    """
+    for key_part in key.split('.'):
+        if not isinstance(rec, collections.abc.Mapping) or key_part not in rec:
+            raise KeyError("key %s not in document" % key)
+        rec = rec[key_part]
+
+    return rec
 
 
 def scan_nestdict(d, key):
@@ -96,6 +90,8 @@ class DBConnector(object):
      port:        # port e.g. 8080 (default None)
      user:        # user name (default None)
      password:    # password for authentication (default None)
+     backend:     # mongodb or sqlite (default mongodb)
+     path:        # Path of the SQLite file used by the sqlite backend (default abinit.sqlite)
      """
 
     def __init__(self, **kwargs):
@@ -110,6 +106,11 @@ class DBConnector(object):
         self.port = kwargs.pop("port", None)
         self.user = kwargs.pop("user", None)
         self.password = kwargs.pop("password", None)
+        self.backend = kwargs.pop("backend", "mongodb")
+        self.path = os.path.expanduser(kwargs.pop("path", "abinit.sqlite"))
+
+        if self.backend not in ("mongodb", "sqlite"):
+            raise ValueError("Invalid backend: `%s`. Use mongodb or sqlite" % self.backend)
 
         if kwargs:
             raise ValueError("Found invalid keywords in the database section:\n %s" % kwargs.keys())
@@ -142,25 +143,268 @@ class DBConnector(object):
         """
         from pymongo import MongoClient
 
+        client_kwargs = {}
         if self.host and self.port:
-            client = MongoClient(host=self.config.host, port=self.config.port)
-        else:
-            client = MongoClient()
-        db = client[self.dbname]
+            client_kwargs.update(host=self.host, port=self.port)
 
         # Authenticate if needed
         if self.user and self.password:
-            db.autenticate(self.user, password=self.password)
+            client_kwargs.update(username=self.user, password=self.password, authSource=self.dbname)
+
+        client = MongoClient(**client_kwargs)
+        return client[self.dbname][self.collection]
+
+    def get_store(self):
+        """
+        Return the :class:`DocumentStore` associated to the connector.
+        The name of the collection is used as table name by the sqlite backend.
+        """
+        if self.backend == "sqlite":
+            return SQLiteStore(self.path, table=self.collection)
+
+        return MongoStore(self.get_collection())
+
+
+class DocumentStore(metaclass=abc.ABCMeta):
+    """
+    Abstract base class for the backends used to store JSON documents with MongoDB-like semantics.
+    Documents are identified by the `_id` key and inserted in batches with :meth:`upsert_many`.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @abc.abstractmethod
+    def upsert_many(self, docs):
+        """
+        Insert the list of documents. Documents with the same `_id` are replaced.
+        Return the number of documents written.
+        """
+
+    @abc.abstractmethod
+    def find(self, query=None):
+        """
+        Return the list of documents matching the query.
+        query is a dictionary mapping dot-separated keys to values (equality match).
+        """
+
+    def find_one(self, query=None):
+        """Return the first document matching the query. None if not found."""
+        docs = self.find(query)
+        return docs[0] if docs else None
+
+    @abc.abstractmethod
+    def count(self):
+        """Number of documents in the store."""
+
+    def close(self):
+        """Release the resources."""
+
+
+class MongoStore(DocumentStore):
+    """
+    :class:`DocumentStore` backed by a MongoDB collection. Documents are written with unordered bulk upserts.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def upsert_many(self, docs):
+        from pymongo import ReplaceOne
+        if not docs: return 0
+        requests = [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs]
+        self.collection.bulk_write(requests, ordered=False)
+        return len(docs)
+
+    def find(self, query=None):
+        return list(self.collection.find(query or {}))
+
+    def count(self):
+        return self.collection.count_documents({})
+
+
+class SQLiteStore(DocumentStore):
+    """
+    :class:`DocumentStore` storing JSON documents in a SQLite file.
+    Useful for offline usage and for testing purposes as it does not require a MongoDB server.
+    Queries are executed in python and support only equality matches.
+
+    Args:
+        path: Path of the SQLite file. Use ":memory:" for an in-memory database.
+        table: Name of the table.
+    """
+
+    def __init__(self, path, table="results"):
+        import sqlite3
+        if not table.isidentifier():
+            raise ValueError("Invalid table name: `%s`" % table)
+        self.path, self.table = path, table
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS %s (_id TEXT PRIMARY KEY, doc TEXT NOT NULL)" % table)
+        self.conn.commit()
+
+    def upsert_many(self, docs):
+        # As in Mongo, the last document wins if the same _id appears more than once in the batch.
+        id2doc = collections.OrderedDict((str(doc["_id"]), doc) for doc in docs)
+        rows = [(json.dumps(doc), _id) for _id, doc in id2doc.items()]
+        # A single transaction per batch. Replaced documents keep their position in the table.
+        # UPDATE + INSERT OR IGNORE instead of UPSERT that requires SQLite >= 3.24.
+        with self.conn:
+            self.conn.executemany("UPDATE %s SET doc = ? WHERE _id = ?" % self.table, rows)
+            self.conn.executemany("INSERT OR IGNORE INTO %s (doc, _id) VALUES (?, ?)" % self.table, rows)
+        return len(docs)
+
+    def find(self, query=None):
+        query = query or {}
+        if any(key.startswith("$") for key in query):
+            raise ValueError("Query operators are not supported by SQLiteStore: %s" % list(query.keys()))
+
+        if list(query.keys()) == ["_id"]:
+            cursor = self.conn.execute("SELECT doc FROM %s WHERE _id = ?" % self.table, (str(query["_id"]),))
+        else:
+            cursor = self.conn.execute("SELECT doc FROM %s ORDER BY rowid" % self.table)
+
+        docs = []
+        for (s,) in cursor:
+            doc = json.loads(s)
+            if all(_match(doc, key, value) for key, value in query.items()):
+                docs.append(doc)
+        return docs
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM %s" % self.table).fetchone()[0]
 
-        return db[self.collection]
+    def close(self):
+        self.conn.close()
 
 
-if __name__ == "__main__":
-    connector = DBConnector()
-    print(connector.get_collection())
-    #connector.set_collection_name("foo")
-    print(connector)
-    print(connector.get_collection())
+def _match(doc, key, value):
+    try:
+        return mongo_getattr(doc, key) == value
+    except KeyError:
+        return value is None
+
+
+def get_file_summaries(task):
+    """
+    Return dictionary with a small summary of the GSR and DDB files produced by the task.
+    Files that are not present or cannot be read are ignored.
+    """
+    summaries = {}
+    gsr_path = task.outdir.has_abiext("GSR.nc")
+    if gsr_path:
+        try:
+            from abipy.electrons.gsr import GsrFile
+            with GsrFile(gsr_path) as gsr:
+                d = dict(energy=float(gsr.energy), energy_per_atom=float(gsr.energy_per_atom),
+                         fermie=float(gsr.ebands.fermie), formula=gsr.structure.formula,
+                         natom=len(gsr.structure), volume=float(gsr.structure.volume), params=dict(gsr.params))
+                try:
+                    d.update(pressure=float(gsr.pressure), max_force=float(gsr.max_force))
+                except Exception:
+                    # GS run without forces and stresses.
+                    pass
+                summaries["gsr"] = d
+        except Exception as exc:
+            summaries["gsr"] = dict(error=str(exc))
+
+    ddb_path = task.outdir.has_abiext("DDB")
+    if ddb_path:
+        try:
+            from abipy.dfpt.ddb import DdbFile
+            with DdbFile(ddb_path) as ddb:
+                summaries["ddb"] = dict(params=dict(ddb.params), total_energy=ddb.total_energy,
+                                        qpoints=ddb.qpoints.frac_coords.tolist(), formula=ddb.structure.formula)
+        except Exception as exc:
+            summaries["ddb"] = dict(error=str(exc))
+
+    return jsanitize(summaries)
+
+
+def task_to_document(task, flow_id):
+    """
+    Build the JSON document with the results of a task.
+    The document is identified by `flow_id:pos_str` e.g. "/path/to/flow:w0_t1".
+    Raises the exception raised by `task.get_results` if the results cannot be computed.
+    """
+    doc = jsanitize(dict(task.get_results()))
+    doc.update(_id="%s:%s" % (flow_id, task.pos_str), flow_id=flow_id, node_key=task.pos_str,
+               summary=get_file_summaries(task))
+    return doc
+
+
+def _tasks_to_documents(tasks, flow_id):
+    """
+    Return list of documents and dict mapping the node_id of the tasks that failed to the error message.
+    """
+    docs, errors = [], {}
+    for task in tasks:
+        try:
+            docs.append(task_to_document(task, flow_id))
+        except Exception as exc:
+            errors[task.node_id] = "%s: %s" % (exc.__class__.__name__, str(exc))
+    return docs, errors
+
+
+# Tasks of the flow loaded by the processes of the pool: workdir --> {node_id: task}
+_EXPORT_NID2TASK = {}
+
+
+def _export_chunk(nids, flow_id, workdir):
+    # The flow is loaded from the pickle file at the first call (ProcessPoolExecutor
+    # does not support initializer in py3.6).
+    nid2task = _EXPORT_NID2TASK.get(workdir)
+    if nid2task is None:
+        from .flows import Flow
+        flow = Flow.pickle_load(workdir, spectator_mode=True)
+        nid2task = _EXPORT_NID2TASK[workdir] = {task.node_id: task for task in flow.iflat_tasks()}
+    return _tasks_to_documents([nid2task[nid] for nid in nids], flow_id)
+
+
+def export_tasks(flow, tasks, store, max_workers=1, batch_size=500):
+    """
+    Extract the results of the tasks and write them to the store with batched upserts.
+
+    Args:
+        flow: |Flow| containing the tasks.
+        tasks: List of tasks.
+        store: :class:`DocumentStore`.
+        max_workers: Number of processes used to extract the results.
+            Each process loads the flow from the pickle file so the flow must be saved before calling this function.
+            None to use os.cpu_count().
+        batch_size: Number of documents per upsert.
+
+    Return: (num_docs, errors) where errors is a dictionary mapping node_id to the error message.
+    """
+    flow_id = flow.workdir
+    num_docs, errors, batch = 0, {}, []
+
+    def flush(docs, force=False):
+        nonlocal num_docs, batch
+        batch.extend(docs)
+        while len(batch) >= batch_size or (force and batch):
+            num_docs += store.upsert_many(batch[:batch_size])
+            batch = batch[batch_size:]
+
+    max_workers = max_workers or os.cpu_count()
+    if max_workers == 1 or len(tasks) < 2 * batch_size:
+        for start in range(0, len(tasks), batch_size):
+            docs, errs = _tasks_to_documents(tasks[start:start + batch_size], flow_id)
+            errors.update(errs)
+            flush(docs)
+    else:
+        nids = [task.node_id for task in tasks]
+        # Small chunks to balance the load, large enough to amortize the IPC.
+        chunksize = max(1, min(batch_size, len(nids) // (4 * max_workers)))
+        chunks = [nids[i:i + chunksize] for i in range(0, len(nids), chunksize)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for docs, errs in executor.map(_export_chunk, chunks, [flow_id] * len(chunks),
+                                           [flow.workdir] * len(chunks)):
+                errors.update(errs)
+                flush(docs)
 
-    #import unittest
-    #unittest.main()
+    flush([], force=True)
+    return num_docs, errors
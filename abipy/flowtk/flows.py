@@ -16,7 +16,6 @@ import numpy as np
 from io import StringIO
 from pprint import pprint
 from tabulate import tabulate
-from pydispatch import dispatcher
 from collections import OrderedDict
 from monty.collections import dict2namedtuple
 from monty.string import list_strings, is_string, make_banner
@@ -27,16 +26,16 @@ from monty.termcolor import cprint, colored, cprint_map, get_terminal_size
 from monty.inspect import find_top_pyfile
 from monty.json import MSONable
 from pymatgen.util.serialization import pmg_pickle_load, pmg_pickle_dump, pmg_serialize
-from pymatgen.core.units import Memory
 from pymatgen.util.io_utils import AtomicFile
 from abipy.tools.plotting import add_fig_kwargs, get_ax_fig_plt
 from abipy.tools.printing import print_dataframe
 from abipy.flowtk import wrappers
-from .nodes import Status, Node, NodeError, NodeResults, Dependency, GarbageCollector, check_spectator
-from .tasks import ScfTask, TaskManager, FixQueueCriticalError
-from .utils import File, Directory, Editor
+from .nodes import Status, Node, NodeError, NodeResults, Dependency, GarbageCollector, EventBus, check_spectator
+from .tasks import ScfTask, AbinitTask, TaskManager, FixQueueCriticalError
+from .utils import File, Directory, Editor, BuildPlan
 from .works import NodeContainer, Work, BandStructureWork, PhononWork, BecWork, G0W0Work, QptdmWork, DteWork
 from .events import EventsParser
+from .profiling import phase, count
 
 __author__ = "Matteo Giantomassi"
 __copyright__ = "Copyright 2013, The Materials Project"
@@ -67,6 +66,84 @@ def as_set(obj):
         return set(obj)
 
 
+# Checksums of the inputs that have been successfully validated by Abinit.
+_ABIVALIDATE_CACHE = os.path.join(os.path.expanduser("~"), ".abinit", "abipy", "abivalidate_cache.json")
+# Max number of entries kept in the cache file (the oldest entries are removed first).
+_ABIVALIDATE_CACHE_MAXSIZE = 100000
+
+
+def _abinit_exec_id(manager, executable="abinit"):
+    """
+    String identifying the Abinit executable run by the shell manager associated to ``manager``:
+    path, size and modification time. The executable is resolved in the environment of the job script
+    (modules, shell_env, pre_run ...) so that validations performed with a different executable are not reused.
+    None if the executable cannot be found.
+    """
+    import subprocess
+    qad = manager.to_shell_manager(mpi_procs=1).qadapter
+    with tempfile.TemporaryDirectory() as tmpdir:
+        script = qad.get_script_str(job_name="abinit_exec_id", launch_dir=tmpdir,
+                                    executable=["command -v %s" % executable],
+                                    qout_path=os.path.join(tmpdir, "qout"), qerr_path=os.path.join(tmpdir, "qerr"))
+        try:
+            out = subprocess.run(["/bin/bash", "-c", script], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                 universal_newlines=True, timeout=60).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    lines = out.strip().splitlines()
+    path = lines[-1].strip() if lines else ""
+    if not os.path.isabs(path) or not os.path.isfile(path): return None
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    return "%s %d %d" % (path, stat.st_size, stat.st_mtime_ns)
+
+
+def _abivalidate_key(inp, exec_id):
+    """
+    Checksum used to deduplicate the Abinit inputs passed to the parser.
+    Based on ``AbinitInput.variable_checksum`` that already includes the md5 of the pseudos.
+    The structure is not stored in the variables so we add the geometry variables written in the input file.
+    """
+    import hashlib
+    sha1 = hashlib.sha1()
+    sha1.update(exec_id.encode("utf-8"))
+    sha1.update(inp.variable_checksum().encode("utf-8"))
+    geo = inp.to_string(sortmode="a", with_mnemonics=False, with_pseudos=False, exclude=list(inp.keys()))
+    sha1.update(geo.encode("utf-8"))
+    return sha1.hexdigest()
+
+
+def _load_abivalidate_cache(path):
+    """Return dict checksum --> timestamp read from the JSON file ``path``. Empty dict if file is not valid."""
+    import json
+    try:
+        with open(path, "rt") as fh:
+            d = json.load(fh)
+        return d if isinstance(d, dict) else {}
+    except (IOError, ValueError):
+        return {}
+
+
+def _update_abivalidate_cache(path, keys):
+    """
+    Add the list of checksums ``keys`` to the cache file.
+    The file is read again inside the lock so that entries added by other processes are not lost.
+    """
+    import json
+    dirname = os.path.dirname(os.path.abspath(path))
+    if not os.path.exists(dirname): os.makedirs(dirname)
+
+    with FileLock(path):
+        d = _load_abivalidate_cache(path)
+        now = time.time()
+        d.update({k: now for k in keys})
+        if len(d) > _ABIVALIDATE_CACHE_MAXSIZE:
+            d = dict(sorted(d.items(), key=lambda t: t[1])[-_ABIVALIDATE_CACHE_MAXSIZE:])
+        with AtomicFile(path, mode="wt") as fh:
+            json.dump(d, fh)
+
+
 class FlowResults(NodeResults):
 
     JSON_SCHEMA = NodeResults.JSON_SCHEMA.copy()
@@ -219,18 +296,8 @@ class Flow(Node, NodeContainer, MSONable):
         if "python" in pyfile or "ipython" in pyfile: pyfile = "<" + pyfile + ">"
         self.set_pyfile(pyfile)
 
-        # TODO
-        # Signal slots: a dictionary with the list
-        # of callbacks indexed by node_id and SIGNAL_TYPE.
-        # When the node changes its status, it broadcast a signal.
-        # The flow is listening to all the nodes of the calculation
-        # [node_id][SIGNAL] = list_of_signal_handlers
-        #self._sig_slots =  slots = {}
-        #for work in self:
-        #    slots[work] = {s: [] for s in work.S_ALL}
-
-        #for task in self.iflat_tasks():
-        #    slots[task] = {s: [] for s in work.S_ALL}
+        # Signals sent by the nodes are dispatched by the event bus.
+        self._event_bus = EventBus()
 
         self.on_all_ok_num_calls = 0
 
@@ -709,34 +776,98 @@ class Flow(Node, NodeContainer, MSONable):
                         else:
                             yield task
 
-    def abivalidate_inputs(self):
+    def abivalidate_inputs(self, max_workers=None, cache=False, manager=None):
         """
         Run ABINIT in dry mode to validate all the inputs of the flow.
 
+        Abinit inputs are deduplicated by checksum so that each distinct input is validated once.
+        The dry runs are executed in parallel, with at most ``max_workers`` Abinit processes at a time.
+
+        Args:
+            max_workers: Max number of Abinit processes running at the same time. None for the number of CPUs.
+            cache: True to skip the inputs that have already been validated successfully
+                with the same Abinit executable. The checksums are saved in ~/.abinit/abipy/abivalidate_cache.json.
+                A string is interpreted as the path of the cache file. False to disable the cache.
+                The cache is not used if the executable run by the manager cannot be found.
+            manager: |TaskManager| used to run Abinit. If None, the manager is initialized from the config file.
+
         Return:
             (isok, tuples)
 
             isok is True if all inputs are ok.
             tuples is List of `namedtuple` objects, one for each task in the flow.
+            Tasks with the same input share the same namedtuple.
             Each namedtuple has the following attributes:
 
                 retcode: Return code. 0 if OK.
                 log_file:  log file of the Abinit run, use log_file.read() to access its content.
                 stderr_file: stderr file of the Abinit run. use stderr_file.read() to access its content.
 
+            log_file, stderr_file and task are None if the result has been taken from the cache.
+
         Raises:
             `RuntimeError` if executable is not in $PATH.
         """
         if not self.allocated:
             self.allocate()
 
-        isok, tuples = True, []
-        for task in self.iflat_tasks():
-            t = task.input.abivalidate()
-            if t.retcode != 0: isok = False
-            tuples.append(t)
+        tasks = list(self.iflat_tasks())
+        cache_path, exec_id = None, ""
+        if cache:
+            if manager is None: manager = TaskManager.from_user_config()
+            exec_id = _abinit_exec_id(manager)
+            if exec_id is not None:
+                cache_path = cache if is_string(cache) else _ABIVALIDATE_CACHE
+            else:
+                warnings.warn("Cannot find the Abinit executable run by the manager. abivalidate cache is disabled.")
+                exec_id = ""
+        validated = _load_abivalidate_cache(cache_path) if cache_path is not None else {}
+
+        # Group the Abinit inputs by checksum. Other inputs are validated directly.
+        results, key2inds = len(tasks) * [None], OrderedDict()
+        for i, task in enumerate(tasks):
+            if not hasattr(task.input, "variable_checksum"):
+                results[i] = task.input.abivalidate()
+                continue
+            key2inds.setdefault(_abivalidate_key(task.input, exec_id), []).append(i)
 
-        return isok, tuples
+        cached = dict2namedtuple(retcode=0, output_file=None, log_file=None, stderr_file=None, task=None)
+        todo = []
+        for key, inds in key2inds.items():
+            if key in validated:
+                for i in inds: results[i] = cached
+            else:
+                todo.append(key)
+
+        if todo:
+            # Temporary tasks are built here because node ids are not thread-safe.
+            # The worker threads only wait for the Abinit subprocesses.
+            from concurrent.futures import ThreadPoolExecutor
+            if manager is None: manager = TaskManager.from_user_config()
+            temp_tasks = [AbinitTask.temp_shell_task(inp=tasks[key2inds[key][0]].input, manager=manager)
+                          for key in todo]
+
+            def dry_run(task):
+                return task.start_and_wait(autoparal=False, exec_args=["--dry-run"])
+
+            max_workers = min(max_workers or os.cpu_count() or 1, len(todo))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                retcodes = list(executor.map(dry_run, temp_tasks))
+
+            for key, task, retcode in zip(todo, temp_tasks, retcodes):
+                t = dict2namedtuple(retcode=retcode, output_file=task.output_file, log_file=task.log_file,
+                                    stderr_file=task.stderr_file, task=task)
+                for i in key2inds[key]: results[i] = t
+
+            new_keys = [key for key, retcode in zip(todo, retcodes) if retcode == 0]
+            if cache_path is not None and new_keys:
+                try:
+                    _update_abivalidate_cache(cache_path, new_keys)
+                except Exception as exc:
+                    warnings.warn("Cannot update abivalidate cache %s:\n%s" % (cache_path, str(exc)))
+
+        isok = all(t.retcode == 0 for t in results)
+        return isok, results
 
     def check_dependencies(self):
         """Test the dependencies of the nodes for possible deadlocks."""
@@ -786,8 +917,14 @@ class Flow(Node, NodeContainer, MSONable):
             show: True to show the status of the flow.
             kwargs: keyword arguments passed to show_status
         """
-        for work in self:
-            work.check_status()
+        # Signals are delivered when all the works have been checked.
+        with self.event_bus.batch():
+            for work in self:
+                work.check_status()
+
+        # Remove the largest files if we are approaching the disk budget.
+        if self.gc is not None:
+            self.gc.check_budget(self)
 
         if kwargs.pop("show", False):
             self.show_status(**kwargs)
@@ -1256,6 +1393,9 @@ class Flow(Node, NodeContainer, MSONable):
                 cprint("Total number of errors: %d" % tot_num_errors, "red", file=stream)
             print("", file=stream)
 
+        if self.gc is not None:
+            print(self.gc, file=stream)
+
         if self.all_ok:
             cprint("\nall_ok reached\n", "green", file=stream)
 
@@ -1566,10 +1706,10 @@ class Flow(Node, NodeContainer, MSONable):
 
         if self.has_db:
             try:
-                self.manager.db_connector.get_collection()
+                self.manager.db_connector.get_store().close()
             except Exception as exc:
                 errors.append("""
-                    ERROR while trying to connect to the MongoDB database:
+                    ERROR while trying to connect to the database:
                         Exception:
                             %s
                         Connector:
@@ -1585,33 +1725,46 @@ class Flow(Node, NodeContainer, MSONable):
 
     def db_insert(self):
         """
-        Insert results in the `MongDB` database.
+        Insert the results of the tasks in the database specified in the db_connector section of the manager.
         """
         assert self.has_db
-        # Connect to MongoDb and get the collection.
-        coll = self.manager.db_connector.get_collection()
-        print("Mongodb collection %s with count %d", coll, coll.count())
-
         start = time.time()
-        for work in self:
-            for task in work:
-                results = task.get_results()
-                pprint(results)
-                results.update_collection(coll)
-            results = work.get_results()
-            pprint(results)
-            results.update_collection(coll)
-        print("MongoDb update done in %s [s]" % time.time() - start)
+        r = self.export_results()
+        self.history.info("Exported %d documents to database in %.1f [s] (%d errors)" % (
+            r.num_docs, time.time() - start, len(r.errors)))
+
+    def export_results(self, store=None, nids=None, max_workers=1, batch_size=500):
+        """
+        Export the results of the tasks to a document store. One JSON document per task
+        with the output of `task.get_results` and a summary of the GSR/DDB files.
+        Documents are identified by "workdir:pos_str" (e.g. "/path/to/flow:w0_t1") and replaced on re-export.
+
+        Args:
+            store: :class:`DocumentStore` (MongoStore, SQLiteStore).
+                None to use the store defined in the db_connector section of the manager.
+            nids: List of node identifiers used to select the tasks. None for all the completed tasks.
+            max_workers: Number of processes used to extract the results. None to use all the CPUs.
+                Each process loads the flow from the pickle file so the flow must be saved with `pickle_dump` first.
+            batch_size: Number of documents per upsert.
+
+        Return: namedtuple with `num_docs` (number of documents written) and
+            `errors` (dict mapping node_id to error message for the tasks that could not be exported).
+        """
+        from .db import export_tasks
+        tasks = self.iflat_tasks(nids=nids) if nids is not None else self.iflat_tasks(status=self.S_DONE, op=">=")
+        tasks = list(tasks)
 
-        results = self.get_results()
-        pprint(results)
-        results.update_collection(coll)
+        if max_workers != 1 and not os.path.exists(self.pickle_file):
+            max_workers = 1
 
-        # Update the pickle file to save the mongo ids.
-        self.pickle_dump()
+        close = store is None
+        if store is None: store = self.manager.db_connector.get_store()
+        try:
+            num_docs, errors = export_tasks(self, tasks, store, max_workers=max_workers, batch_size=batch_size)
+        finally:
+            if close: store.close()
 
-        for d in coll.find():
-            pprint(d)
+        return dict2namedtuple(num_docs=num_docs, errors=errors)
 
     def tasks_from_nids(self, nids):
         """
@@ -1882,8 +2035,18 @@ class Flow(Node, NodeContainer, MSONable):
         self.rmtree()
         self.build()
 
-    def build(self, *args, **kwargs):
-        """Make directories and files of the `Flow`."""
+    def build(self, *args, max_workers=None, **kwargs):
+        """
+        Make directories and files of the `Flow`.
+
+        The paths and the content of the files are computed in memory for all the tasks
+        and then written by a pool of threads. Files that did not change are not rewritten.
+
+        Args:
+            max_workers: Number of threads used to write the files. None for default value.
+
+        Return: namedtuple with the number of files written (num_written) and unchanged (num_skipped).
+        """
         # Allocate here if not done yet!
         if not self.allocated: self.allocate()
 
@@ -1914,8 +2077,16 @@ class Flow(Node, NodeContainer, MSONable):
         if self.pyfile and os.path.isfile(self.pyfile):
             shutil.copy(self.pyfile, self.workdir)
 
+        plan = BuildPlan()
+        for work in self:
+            work.add_to_build_plan(plan)
+        stats = plan.execute(max_workers=max_workers)
+
+        # Connect signals within the works.
         for work in self:
-            work.build(*args, **kwargs)
+            work.connect_signals()
+
+        return stats
 
     def build_and_pickle_dump(self, abivalidate=False):
         """
@@ -1954,9 +2125,11 @@ class Flow(Node, NodeContainer, MSONable):
         protocol = self.pickle_protocol
 
         # Atomic transaction with FileLock.
-        with FileLock(self.pickle_file):
-            with AtomicFile(self.pickle_file, mode="wb") as fh:
-                pmg_pickle_dump(self, fh, protocol=protocol)
+        with phase("pickle_dump"):
+            with FileLock(self.pickle_file):
+                with AtomicFile(self.pickle_file, mode="wb") as fh:
+                    pmg_pickle_dump(self, fh, protocol=protocol)
+            count("bytes_pickled", os.path.getsize(self.pickle_file))
 
         return 0
 
@@ -2115,6 +2288,9 @@ class Flow(Node, NodeContainer, MSONable):
 
         self.check_dependencies()
 
+        # Build the lists of receivers in the event bus.
+        self.connect_signals()
+
         if not hasattr(self, "_allocated"): self._allocated = 0
         self._allocated += 1
 
@@ -2208,12 +2384,11 @@ class Flow(Node, NodeContainer, MSONable):
         """
         return True
 
-    def on_dep_ok(self, signal, sender):
-        # TODO
-        # Replace this callback with dynamic dispatch
-        # on_all_S_OK for work
-        # on_S_OK for task
-        self.history.info("on_dep_ok with sender %s, signal %s" % (str(sender), signal))
+    def on_dep_ok(self, sender):
+        """
+        This callback is called when one of the dependencies of the callbacks reaches S_OK.
+        """
+        self.history.info("on_dep_ok with sender %s" % str(sender))
 
         for i, cbk in enumerate(self._callbacks):
             if not cbk.handle_sender(sender):
@@ -2260,9 +2435,12 @@ class Flow(Node, NodeContainer, MSONable):
             for task in self.iflat_tasks():
                 task.clean_output_files()
 
+        if self.gc is not None:
+            self.history.info(str(self.gc))
+
         return 0
 
-    def set_garbage_collector(self, exts=None, policy="task"):
+    def set_garbage_collector(self, exts=None, policy="task", max_workdir_size=None, asynchronous=True):
         """
         Enable the garbage collector that will remove the big output files that are not needed.
 
@@ -2274,11 +2452,17 @@ class Flow(Node, NodeContainer, MSONable):
                 only when the flow is finalized. This option should be used when we are dealing
                 with a dynamic flow with callbacks generating other tasks since a |Task|
                 might not be aware of its children when it reached S_OK.
+            max_workdir_size: Disk budget for the flow directory in bytes or string with unit e.g. "500 Gb".
+                When the size of the directory approaches this value, the largest files with extension
+                in `exts` that are not needed by unfinished tasks are removed, independently of the policy.
+            asynchronous: True if files should be removed by a background thread so that the
+                scheduler does not wait for the filesystem.
         """
         assert policy in ("task", "flow")
         exts = list_strings(exts) if exts is not None else ("WFK", "SUS", "SCR", "BSR", "BSC")
 
-        gc = GarbageCollector(exts=set(exts), policy=policy)
+        gc = GarbageCollector(exts=set(exts), policy=policy, max_workdir_size=max_workdir_size,
+                              asynchronous=asynchronous)
 
         self.set_gc(gc)
         for work in self:
@@ -2300,28 +2484,7 @@ class Flow(Node, NodeContainer, MSONable):
             #cbk.enable()
             for dep in cbk.deps:
                 self.history.info("Connecting %s \nwith sender %s, signal %s" % (str(cbk), dep.node, dep.node.S_OK))
-                dispatcher.connect(self.on_dep_ok, signal=dep.node.S_OK, sender=dep.node, weak=False)
-
-        # Associate to each signal the callback _on_signal
-        # (bound method of the node that will be called by `Flow`
-        # Each node will set its attribute _done_signal to True to tell
-        # the flow that this callback should be disabled.
-
-        # Register the callbacks for the Work.
-        #for work in self:
-        #    slot = self._sig_slots[work]
-        #    for signal in S_ALL:
-        #        done_signal = getattr(work, "_done_ " + signal, False)
-        #        if not done_sig:
-        #            cbk_name = "_on_" + str(signal)
-        #            cbk = getattr(work, cbk_name, None)
-        #            if cbk is None: continue
-        #            slot[work][signal].append(cbk)
-        #            print("connecting %s\nwith sender %s, signal %s" % (str(cbk), dep.node, dep.node.S_OK))
-        #            dispatcher.connect(self.on_dep_ok, signal=signal, sender=dep.node, weak=False)
-
-        # Register the callbacks for the Tasks.
-        #self.show_receivers()
+                self.event_bus.connect(dep.node, dep.node.S_OK, self, "on_dep_ok")
 
     def disconnect_signals(self):
         """Disable the signals within the `Flow`."""
@@ -2334,13 +2497,22 @@ class Flow(Node, NodeContainer, MSONable):
             cbk.disable()
 
     def show_receivers(self, sender=None, signal=None):
-        sender = sender if sender is not None else dispatcher.Any
-        signal = signal if signal is not None else dispatcher.Any
+        """Print the receivers connected to sender and signal (None means any)."""
         print("*** live receivers ***")
-        for rec in dispatcher.liveReceivers(dispatcher.getReceivers(sender, signal)):
-            print("receiver -->", rec)
+        for receiver, method_name in self.event_bus.get_receivers(sender=sender, signal=signal):
+            print("receiver -->", receiver, method_name)
         print("*** end live receivers ***")
 
+    @property
+    def event_bus(self):
+        """|EventBus| used to dispatch the signals sent by the nodes of the flow."""
+        try:
+            return self._event_bus
+        except AttributeError:
+            # Flow pickled with a previous version. Signals are connected by set_spectator_mode.
+            self._event_bus = EventBus()
+            return self._event_bus
+
     def set_spectator_mode(self, mode=True):
         """
         When the flow is in spectator_mode, we have to disable signals, pickle dump and possible callbacks
@@ -2446,85 +2618,50 @@ class Flow(Node, NodeContainer, MSONable):
         name = os.path.basename(self.workdir) + "-light.tar.gz" if name is None else name
         return self.make_tarfile(name=name, exclude_dirs=["outdata", "indata", "tmpdata"])
 
-    def make_tarfile(self, name=None, max_filesize=None, exclude_exts=None, exclude_dirs=None, verbose=0, **kwargs):
+    def make_tarfile(self, name=None, max_filesize=None, exclude_exts=None, exclude_dirs=None, verbose=0,
+                     nprocs=None, since=None, shard=False, **kwargs):
         """
         Create a tarball file.
 
+        The data is compressed in parallel and the current working directory is not changed.
+        A JSON manifest with size, mtime and md5 of the archived files is written
+        next to the tarball e.g. ``flow_si.manifest.json`` for ``flow_si.tar.gz``.
+        Pass the manifest via ``since`` to archive only the files that have been created or modified.
+
         Args:
             name: Name of the tarball file. Set to os.path.basename(`flow.workdir`) + "tar.gz"` if name is None.
+                A relative path is interpreted with respect to the parent directory of `flow.workdir`.
             max_filesize (int or string with unit): a file is included in the tar file if its size <= max_filesize
                 Can be specified in bytes e.g. `max_files=1024` or with a string with unit e.g. `max_filesize="1 Mb"`.
                 No check is done if max_filesize is None.
             exclude_exts: List of file extensions to be excluded from the tar file.
             exclude_dirs: List of directory basenames to be excluded.
             verbose (int): Verbosity level.
+            nprocs: Number of threads used to compress the data. None to use all the CPUs.
+            since: Path of the manifest written by a previous call. Only new or modified files are archived.
+            shard: True to write the files of each task in a separated tarball e.g. `flow_si-w0_t0.tar.gz`.
+                The other files are stored in ``name``. Tasks without new files are skipped.
             kwargs: keyword arguments passed to the :class:`TarFile` constructor.
 
-        Returns: The name of the tarfile.
+        Returns: The name of the tarfile. List of names if shard is True.
         """
-        def any2bytes(s):
-            """Convert string or number to memory in bytes."""
-            if is_string(s):
-                return int(Memory.from_string(s).to("b"))
-            else:
-                return int(s)
-
-        if max_filesize is not None:
-            max_filesize = any2bytes(max_filesize)
-
-        if exclude_exts:
-            # Add/remove ".nc" so that we can simply pass "GSR" instead of "GSR.nc"
-            # Moreover this trick allows one to treat WFK.nc and WFK file on the same footing.
-            exts = []
-            for e in list_strings(exclude_exts):
-                exts.append(e)
-                if e.endswith(".nc"):
-                    exts.append(e.replace(".nc", ""))
-                else:
-                    exts.append(e + ".nc")
-            exclude_exts = exts
-
-        def filter(tarinfo):
-            """
-            Function that takes a TarInfo object argument and returns the changed TarInfo object.
-            If it instead returns None the TarInfo object will be excluded from the archive.
-            """
-            # Skip links.
-            if tarinfo.issym() or tarinfo.islnk():
-                if verbose: print("Excluding link: %s" % tarinfo.name)
-                return None
-
-            # Check size in bytes
-            if max_filesize is not None and tarinfo.size > max_filesize:
-                if verbose: print("Excluding %s due to max_filesize" % tarinfo.name)
-                return None
-
-            # Filter filenames.
-            if exclude_exts and any(tarinfo.name.endswith(ext) for ext in exclude_exts):
-                if verbose: print("Excluding %s due to extension" % tarinfo.name)
-                return None
-
-            # Exlude directories (use dir basenames).
-            if exclude_dirs and any(dir_name in exclude_dirs for dir_name in tarinfo.name.split(os.path.sep)):
-                if verbose: print("Excluding %s due to exclude_dirs" % tarinfo.name)
-                return None
-
-            return tarinfo
-
-        back = os.getcwd()
-        os.chdir(os.path.join(self.workdir, ".."))
-
-        import tarfile
+        from .archive import FlowArchiver
         name = os.path.basename(self.workdir) + ".tar.gz" if name is None else name
-        with tarfile.open(name=name, mode='w:gz', **kwargs) as tar:
-            tar.add(os.path.basename(self.workdir), arcname=None, recursive=True, filter=filter)
+        path = name if os.path.isabs(name) else os.path.join(self.workdir, "..", name)
+        if since is not None and not os.path.isabs(since):
+            since = os.path.join(self.workdir, "..", since)
+
+        shards = None
+        if shard:
+            shards = OrderedDict([(task.pos_str, task.workdir) for task in self.iflat_tasks()])
 
-            # Add the script used to generate the flow.
-            if self.pyfile is not None and os.path.exists(self.pyfile):
-                tar.add(self.pyfile)
+        archiver = FlowArchiver(self.workdir, max_filesize=max_filesize, exclude_exts=exclude_exts,
+                                exclude_dirs=exclude_dirs, nprocs=nprocs, verbose=verbose, **kwargs)
+        extra_files = [self.pyfile] if self.pyfile is not None and os.path.exists(self.pyfile) else None
+        paths, _ = archiver.make_archives(path, since=since, shards=shards, extra_files=extra_files)
 
-        os.chdir(back)
-        return name
+        if not shard: return name
+        return [os.path.join(os.path.dirname(name), os.path.basename(p)) for p in paths]
 
     def get_graphviz(self, engine="automatic", graph_attr=None, node_attr=None, edge_attr=None):
         """
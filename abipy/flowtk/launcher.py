@@ -17,6 +17,7 @@ from monty.os.path import which
 from monty.collections import AttrDict, dict2namedtuple
 from monty.termcolor import cprint
 from .utils import as_bool, File, Directory
+from .profiling import CycleProfiler, profile_cycle, phase, count
 from . import qutils as qu
 from pymatgen.util.io_utils import ask_yesno
 
@@ -195,10 +196,10 @@ class PyLauncher(object):
         """
         num_launched, do_exit, launched = 0, False, []
 
-        for count in range(max_loops):
+        for iloop in range(max_loops):
             if do_exit:
                 break
-            if count > 0:
+            if iloop > 0:
                 time.sleep(sleep_time)
 
             tasks = self.fetch_tasks_to_run()
@@ -218,6 +219,7 @@ class PyLauncher(object):
                 if fired:
                     launched.append(task)
                     num_launched += 1
+                    count("tasks_launched")
 
                 if num_launched >= max_nlaunch > 0:
                     logger.info('num_launched >= max_nlaunch, going back to sleep')
@@ -312,6 +314,13 @@ class PyFlowScheduler(object):
                 completed successfully. (DEFAULT: "no")
             killjobs_if_errors: "yes" if the scheduler should try to kill all the runnnig jobs
                 before exiting due to an error. (DEFAULT: "yes")
+            profile: "yes" if the time spent in the phases of the scheduler cycles should be recorded
+                in the log file FLOWDIR/_scheduler_profile.jsonl. Use `abirun.py FLOWDIR sched_profile`
+                to analyze the log. (DEFAULT: "no")
+            profile_maxlen: Max number of cycles kept in the log file. (int, DEFAULT: 1000)
+            sampling_interval: Interval in seconds of the sampling profiler. The stacks are written to
+                FLOWDIR/_scheduler_stacks.txt in the collapsed format used by flamegraph.pl.
+                Requires profile. (float, DEFAULT: 0 i.e. disabled)
         """
         # Options passed to the scheduler.
         self.sched_options = AttrDict(
@@ -342,6 +351,10 @@ class PyFlowScheduler(object):
         self.fix_qcritical = as_bool(kwargs.pop("fix_qcritical", False))
         self.rmflow = as_bool(kwargs.pop("rmflow", False))
         self.killjobs_if_errors = as_bool(kwargs.pop("killjobs_if_errors", True))
+        self.profile = as_bool(kwargs.pop("profile", False))
+        self.profile_maxlen = int(kwargs.pop("profile_maxlen", 1000))
+        self.sampling_interval = float(kwargs.pop("sampling_interval", 0))
+        self.profiler = None
 
         self.customer_service_dir = kwargs.pop("customer_service_dir", None)
         if self.customer_service_dir is not None:
@@ -473,6 +486,14 @@ class PyFlowScheduler(object):
         self._pid_file = flow.pid_file
         self._flow = flow
 
+        if self.profile:
+            self.profiler = CycleProfiler(os.path.join(flow.workdir, CycleProfiler.LOG_FNAME),
+                                          maxlen=self.profile_maxlen, sampling_interval=self.sampling_interval)
+
+    def _profile_cycle(self):
+        """Context manager used to profile a cycle of the scheduler. No-op if profile is disabled."""
+        return profile_cycle(self.profiler, nlaunch=self.nlaunch, num_tasks=self.flow.num_tasks)
+
     def _validate_customer_service(self):
         """
         Validate input parameters if customer service is on then
@@ -541,7 +562,8 @@ class PyFlowScheduler(object):
             return 1
 
         # Try to run the job immediately. If something goes wrong return without initializing the scheduler.
-        self._runem_all()
+        with self._profile_cycle():
+            self._runem_all()
 
         if self.exceptions:
             self.cleanup()
@@ -571,15 +593,17 @@ class PyFlowScheduler(object):
 
         # Allow to change the manager at run-time
         if self.use_dynamic_manager:
-            from pymatgen.io.abinit.tasks import TaskManager
-            new_manager = TaskManager.from_user_config()
-            for work in flow:
-                work.set_manager(new_manager)
+            with phase("dynamic_manager"):
+                from pymatgen.io.abinit.tasks import TaskManager
+                new_manager = TaskManager.from_user_config()
+                for work in flow:
+                    work.set_manager(new_manager)
 
         nqjobs = 0
         if self.contact_resource_manager: # and flow.TaskManager.qadapter.QTYPE == "shell":
             # This call is expensive and therefore it's optional (must be activate in manager.yml)
-            nqjobs = flow.get_njobs_in_queue()
+            with phase("njobs_in_queue"):
+                nqjobs = flow.get_njobs_in_queue()
             if nqjobs is None:
                 nqjobs = 0
                 if flow.manager.has_queue:
@@ -593,7 +617,8 @@ class PyFlowScheduler(object):
 
         if nqjobs >= self.max_njobs_inqueue:
             print("Too many jobs in the queue: %s. No job will be submitted." % nqjobs)
-            flow.check_status(show=False)
+            with phase("check_status"):
+                flow.check_status(show=False)
             return
 
         if self.max_nlaunches == -1:
@@ -602,7 +627,8 @@ class PyFlowScheduler(object):
             max_nlaunch = min(self.max_njobs_inqueue - nqjobs, self.max_nlaunches)
 
         # check status.
-        flow.check_status(show=False)
+        with phase("check_status"):
+            flow.check_status(show=False)
 
         # This check is not perfect, we should make a list of tasks to sumbit
         # and select only the subset so that we don't exceeed mac_ncores_used
@@ -617,7 +643,8 @@ class PyFlowScheduler(object):
         for task in self.flow.unconverged_tasks:
             try:
                 logger.info("Flow will try restart task %s" % task)
-                fired = task.restart()
+                with phase("restart"):
+                    fired = task.restart()
                 if fired:
                     self.nlaunch += 1
                     max_nlaunch -= 1
@@ -634,10 +661,12 @@ class PyFlowScheduler(object):
         # reenabled by MsS disable things that do not work at low level
         # fix only prepares for restarting, and sets to ready
         if self.fix_qcritical:
-            nfixed = flow.fix_queue_critical()
+            with phase("fix_qcritical"):
+                nfixed = flow.fix_queue_critical()
             if nfixed: print("Fixed %d QCritical error(s)" % nfixed)
 
-        nfixed = flow.fix_abicritical()
+        with phase("fix_abicritical"):
+            nfixed = flow.fix_abicritical()
         if nfixed: print("Fixed %d AbiCritical error(s)" % nfixed)
 
         # update database
@@ -645,7 +674,8 @@ class PyFlowScheduler(object):
 
         # Submit the tasks that are ready.
         try:
-            nlaunch = PyLauncher(flow).rapidfire(max_nlaunch=max_nlaunch, sleep_time=10)
+            with phase("rapidfire"):
+                nlaunch = PyLauncher(flow).rapidfire(max_nlaunch=max_nlaunch, sleep_time=10)
             self.nlaunch += nlaunch
             if nlaunch:
                 cprint("[%s] Number of launches: %d" % (time.asctime(), nlaunch), "yellow")
@@ -654,7 +684,8 @@ class PyFlowScheduler(object):
             excs.append(straceback())
 
         # check status.
-        flow.show_status()
+        with phase("show_status"):
+            flow.show_status()
 
         if excs:
             logger.critical("*** Scheduler exceptions:\n *** %s" % "\n".join(excs))
@@ -663,7 +694,8 @@ class PyFlowScheduler(object):
     def callback(self):
         """The function that will be executed by the scheduler."""
         try:
-            return self._callback()
+            with self._profile_cycle():
+                return self._callback()
         except Exception:
             # All exceptions raised here will trigger the shutdown!
             s = straceback()
@@ -737,12 +769,15 @@ class PyFlowScheduler(object):
             err_lines.append(boxed(msg))
 
         # Test on the presence of deadlocks.
-        g = self.flow.find_deadlocks()
+        with phase("find_deadlocks"):
+            g = self.flow.find_deadlocks()
         if g.deadlocked:
             # Check the flow again so that status are updated.
-            self.flow.check_status()
+            with phase("check_status"):
+                self.flow.check_status()
 
-            g = self.flow.find_deadlocks()
+            with phase("find_deadlocks"):
+                g = self.flow.find_deadlocks()
             #print("deadlocked:\n", g.deadlocked, "\nrunnables:\n", g.runnables, "\nrunning\n", g.running)
             print("deadlocked:", len(g.deadlocked), ", runnables:", len(g.runnables), ", running:", len(g.running))
             if g.deadlocked and not g.runnables and not g.running:
@@ -750,8 +785,10 @@ class PyFlowScheduler(object):
 
         if not g.runnables and not g.running:
             # Check the flow again so that status are updated.
-            self.flow.check_status()
-            g = self.flow.find_deadlocks()
+            with phase("check_status"):
+                self.flow.check_status()
+            with phase("find_deadlocks"):
+                g = self.flow.find_deadlocks()
             if not g.runnables and not g.running:
                 err_lines.append("No task is running and cannot find other tasks to submit.")
 
@@ -826,12 +863,23 @@ class PyFlowScheduler(object):
                 print("Calling flow.finalize()...")
                 self.flow.finalize()
                 #print("finalized:", self.flow.finalized)
-                if self.rmflow:
-                    app("Flow directory will be removed...")
-                    try:
-                        self.flow.rmtree()
-                    except Exception:
-                        logger.warning("Ignoring exception while trying to remove flow dir.")
+
+            # Wait for the files scheduled for removal by the garbage collector.
+            if self.flow.gc is not None:
+                self.flow.gc.wait()
+                print(self.flow.gc)
+
+            if self.profiler is not None:
+                self.profiler.close()
+                print("Use `abirun.py %s sched_profile` to analyze the timing of the scheduler cycles." %
+                      self.flow.workdir)
+
+            if self.flow.all_ok and self.rmflow:
+                app("Flow directory will be removed...")
+                try:
+                    self.flow.rmtree()
+                except Exception:
+                    logger.warning("Ignoring exception while trying to remove flow dir.")
 
         finally:
             # Shutdown the scheduler thus allowing the process to exit.
@@ -7,16 +7,16 @@ import sys
 import os
 import time
 import collections
+import contextlib
 import abc
 import numpy as np
 
 from collections import OrderedDict
 from pprint import pprint
 from pymatgen.util.io_utils import AtomicFile
-from pydispatch import dispatcher
 from monty.termcolor import colored
 from monty.serialization import loadfn
-from monty.string import is_string
+from monty.string import is_string, list_strings
 from monty.io import FileLock
 from monty.collections import AttrDict, Namespace
 from monty.functools import lazy_property
@@ -731,6 +731,10 @@ class Node(metaclass=abc.ABCMeta):
         for dep in (d for d in deps if d.node.is_file):
             dep.node.add_filechild(self)
 
+        # The reverse dependency index must be rebuilt.
+        bus = self.event_bus
+        if bus is not None: bus.invalidate()
+
     def merge_deps(self):
         """
         Group all extensions associated to the same node in a single list.
@@ -757,6 +761,8 @@ class Node(metaclass=abc.ABCMeta):
         assert all(isinstance(d, Dependency) for d in deps)
 
         self._deps = [d for d in self._deps if d not in deps]
+        bus = self.event_bus
+        if bus is not None: bus.invalidate()
 
         if self.is_work:
             # remove the same list of dependencies from the task in the work
@@ -808,12 +814,10 @@ class Node(metaclass=abc.ABCMeta):
         if self.is_file:
             return self.filechildren
 
-        # Inspect the entire flow to get children.
+        # Use the reverse dependency index of the flow.
         children = []
-        for work in self.flow:
-            if work.depends_on(self): children.append(work)
-            for task in work:
-                if task.depends_on(self): children.append(task)
+        for node, _ in self.event_bus.get_consumers(self):
+            if node not in children: children.append(node)
         return children
 
     def str_deps(self):
@@ -948,19 +952,31 @@ class Node(metaclass=abc.ABCMeta):
     def send_signal(self, signal):
         """
         Send signal from this node to all connected receivers unless the node is in spectator mode.
+        The signal is delivered by the |EventBus| of the flow, see `EventBus.send` for details.
 
-        signal -- (hashable) signal value, see `dispatcher` connect for details
+        signal -- (hashable) signal value e.g. `S_OK`.
 
         Return a list of tuple pairs [(receiver, response), ... ]
-        or None if the node is in spectator mode.
+        (empty list if the signal has been queued because the bus is in batch mode)
+        or None if the node is in spectator mode or does not belong to a flow.
 
         if any receiver raises an error, the error propagates back
         through send, terminating the dispatch loop, so it is quite
         possible to not have all receivers called if a raises an error.
         """
         if self.in_spectator_mode: return None
+        bus = self.event_bus
+        if bus is None: return None
         self.history.debug("Node %s broadcasts signal %s" % (self, signal))
-        dispatcher.send(signal=signal, sender=self)
+        return bus.send(self, signal)
+
+    @property
+    def event_bus(self):
+        """The |EventBus| of the |Flow| containing this node. None if the node does not belong to a flow."""
+        try:
+            return self.flow.event_bus
+        except AttributeError:
+            return None
 
     ##########################
     ### Abstract protocol ####
@@ -1249,10 +1265,380 @@ class NodeCorrections(list):
     #def _find(self, event_class)
 
 
+class EventBus(object):
+    """
+    Dispatch the signals sent by the nodes of a |Flow| e.g. when a |Task| reaches `S_OK`.
+
+    Receivers are stored as (node, method_name) in lists indexed by the node_id of the sender
+    and the signal so that the bus can be pickled together with the flow.
+    The bus also provides the reverse dependency index (node --> nodes depending on it)
+    that is built once and rebuilt only if the number of nodes or the dependencies change.
+
+    Signals sent inside a `batch` block are queued and delivered, without duplicates,
+    when the outermost block exits (e.g. at the end of `Flow.check_status`).
+    Queued signals are never discarded: exceptions raised by the block or by a receiver
+    do not prevent the delivery of the other signals.
+    """
+
+    def __init__(self):
+        # (sender.node_id, signal) --> list of (receiver, method_name)
+        self._receivers = collections.defaultdict(list)
+        self._init_runtime()
+
+    def _init_runtime(self):
+        """Initialize the objects that are not pickled."""
+        self._consumers, self._consumers_key = None, None
+        self._pending = OrderedDict()
+        self._batch_level = 0
+
+    def __getstate__(self):
+        return {"_receivers": self._receivers}
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self._init_runtime()
+
+    def connect(self, sender, signal, receiver, method_name):
+        """
+        Connect sender and receiver. ``receiver.method_name(sender=sender)``
+        will be called when sender broadcasts signal. Connecting twice has no effect.
+        """
+        lst = self._receivers[(sender.node_id, signal)]
+        if (receiver, method_name) not in lst:
+            lst.append((receiver, method_name))
+
+    def disconnect(self, sender, signal, receiver, method_name):
+        """Disconnect sender and receiver. Return True if the connection existed."""
+        lst = self._receivers.get((sender.node_id, signal), [])
+        try:
+            lst.remove((receiver, method_name))
+            return True
+        except ValueError:
+            return False
+
+    def get_receivers(self, sender=None, signal=None):
+        """List of (receiver, method_name) connected to sender and signal. None means any."""
+        return [r for (node_id, sig), lst in self._receivers.items() for r in lst
+                if (sender is None or node_id == sender.node_id) and (signal is None or sig == signal)]
+
+    def send(self, sender, signal):
+        """
+        Send signal to the receivers. The signal is queued if we are inside a `batch` block.
+        Return list of tuple pairs [(receiver, response), ... ]
+        """
+        if self._batch_level > 0:
+            self._pending[(sender.node_id, signal)] = (sender, signal)
+            return []
+
+        return self._deliver(sender, signal)
+
+    def _deliver(self, sender, signal, errors=None):
+        """
+        Call the receivers connected to (sender, signal). If ``errors`` is a list, the exceptions raised
+        by the receivers are appended to it and the other receivers are called. Return list of (receiver, response).
+        """
+        responses = []
+        for receiver, method_name in list(self._receivers.get((sender.node_id, signal), [])):
+            if errors is None:
+                responses.append((receiver, getattr(receiver, method_name)(sender=sender)))
+                continue
+            try:
+                responses.append((receiver, getattr(receiver, method_name)(sender=sender)))
+            except Exception as exc:
+                logger.exception("Exception in %s.%s for signal %s sent by %s" % (receiver, method_name, signal, sender))
+                errors.append(exc)
+        return responses
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Context manager used to queue the signals. The signals are delivered in FIFO order
+        when the outermost block exits, also if an exception is raised in the block.
+        Signals sent by the receivers are delivered in the same loop.
+        A receiver raising an exception does not prevent the delivery of the other signals:
+        the first exception is raised after the delivery of all the signals.
+        """
+        self._batch_level += 1
+        block_ok = False
+        try:
+            yield self
+            block_ok = True
+        finally:
+            if self._batch_level > 1:
+                self._batch_level -= 1
+            else:
+                self._flush(raise_exc=block_ok)
+
+    def _flush(self, raise_exc=True):
+        """Deliver the queued signals and reset the batch level."""
+        errors = []
+        try:
+            # Keep the level > 0 so that the signals sent by the receivers are queued.
+            while self._pending:
+                _, (sender, signal) = self._pending.popitem(last=False)
+                self._deliver(sender, signal, errors=errors)
+        finally:
+            self._batch_level = 0
+
+        if errors and raise_exc:
+            raise errors[0]
+
+    def invalidate(self):
+        """Invalidate the reverse dependency index. Called when the dependencies of a node change."""
+        self._consumers, self._consumers_key = None, None
+
+    def get_consumers(self, node):
+        """
+        Return list of (consumer, exts) where consumer is a node depending on ``node``
+        and exts is the list of file extensions it requires.
+        """
+        flow = node.flow
+        key = (id(flow), len(flow), sum(len(work) for work in flow))
+        if self._consumers is None or self._consumers_key != key:
+            consumers = collections.defaultdict(list)
+            for work in flow:
+                for n in [work] + list(work):
+                    for dep in n.deps:
+                        consumers[dep.node.node_id].append((n, dep.exts))
+            self._consumers, self._consumers_key = consumers, key
+
+        return self._consumers.get(node.node_id, [])
+
+
+def _abiext(basename):
+    """Abinit extension of the file e.g. out_WFK.nc --> WFK."""
+    ext = basename.rsplit("_", 1)[-1]
+    return ext[:-3] if ext.endswith(".nc") else ext
+
+
+def _disk_usage(top):
+    """Size in bytes of the regular files in the directory tree (links are not followed)."""
+    nbytes, stack = 0, [top]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    nbytes += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                pass
+    return nbytes
+
+
 class GarbageCollector(object):
-    """This object stores information on the """
-    def __init__(self, exts, policy):
+    """
+    This object removes the output files that are no longer needed by the nodes of the |Flow|.
+
+    The files are removed by a background thread so that the scheduler does not wait
+    for the unlink calls (set ``asynchronous`` to False to remove files immediately).
+    The nodes requiring the output files of a node are obtained from the reverse dependency
+    index of the |EventBus| so that we don't need to scan the entire flow.
+
+    If ``max_workdir_size`` is specified, the size of the flow directory is monitored and
+    the largest files with extension in ``exts`` that are not needed by unfinished nodes
+    are removed when the size approaches the limit, independently of the policy.
+    """
+    # Files are removed when size > HIGH_WATERMARK * max_workdir_size until size < LOW_WATERMARK * max_workdir_size
+    HIGH_WATERMARK = 0.9
+    LOW_WATERMARK = 0.8
+
+    # Min interval in seconds between two scans of the flow directory.
+    BUDGET_INTERVAL = 60
+
+    def __init__(self, exts, policy, max_workdir_size=None, asynchronous=True):
+        """
+        Args:
+            exts: Set with the Abinit file extensions to be removed.
+            policy: Either `flow` or `task`. See `Flow.set_garbage_collector`.
+            max_workdir_size: Max size of the flow directory. Accept integer (bytes) or string with unit e.g. "200 Gb".
+                None to disable the check.
+            asynchronous: False if files should be removed by the calling thread.
+        """
         self.exts, self.policy = set(exts), policy
+        if is_string(max_workdir_size):
+            from pymatgen.core.units import Memory
+            max_workdir_size = Memory.from_string(max_workdir_size).to("byte")
+        self.max_workdir_size = int(max_workdir_size) if max_workdir_size is not None else None
+        self.asynchronous = asynchronous
+
+        # Statistics saved in the pickle file.
+        self.num_removed = 0
+        self.reclaimed_bytes = 0
+
+        self._init_runtime()
+
+    def _init_runtime(self):
+        """Initialize the objects that are not pickled."""
+        import queue
+        import threading
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._pending = set()
+        self._last_budget_check = 0
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        for k in ("_lock", "_queue", "_worker", "_pending", "_last_budget_check"):
+            d.pop(k, None)
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        # Objects pickled with previous versions.
+        for k, v in dict(max_workdir_size=None, asynchronous=True, num_removed=0, reclaimed_bytes=0).items():
+            self.__dict__.setdefault(k, v)
+        self._init_runtime()
+
+    def __str__(self):
+        return self.to_string()
+
+    def to_string(self, verbose=0):
+        """String representation."""
+        lines = ["GarbageCollector: policy: %s, exts: %s" % (self.policy, sorted(self.exts))]
+        app = lines.append
+        if self.max_workdir_size is not None:
+            app("max_workdir_size: %.1f Gb" % (self.max_workdir_size / 1024**3))
+        app("Removed %d files, reclaimed %.1f Mb, %d files waiting for removal" % (
+            self.num_removed, self.reclaimed_bytes / 1024**2, len(self._pending)))
+        return "\n".join(lines)
+
+    def get_consumers(self, node):
+        """
+        Return list of (consumer, exts) where consumer is a node depending on ``node``
+        and exts is the list of file extensions it requires.
+        """
+        return node.event_bus.get_consumers(node)
+
+    def get_needed_exts(self, node):
+        """Set with the extensions of the files of node that are still needed by unfinished consumers."""
+        needed = set()
+        for consumer, exts in self.get_consumers(node):
+            if consumer.status != consumer.S_OK: needed.update(exts)
+        return needed
+
+    def remove_exts(self, directory, exts):
+        """
+        Remove the files in |Directory| with the given extensions.
+        Return list with the absolute paths of the files.
+        """
+        paths = [directory.has_abiext(ext) for ext in list_strings(sorted(exts))]
+        return self.remove([p for p in paths if p])
+
+    def remove(self, paths):
+        """
+        Remove files. The files are added to the queue of the background thread if asynchronous.
+        Return list with the absolute paths of the files that will be removed.
+        """
+        paths = [p for p in paths if p not in self._pending]
+        if not self.asynchronous:
+            for path in paths:
+                self._unlink(path)
+        else:
+            with self._lock:
+                self._pending.update(paths)
+            for path in paths:
+                self._submit(self._unlink, path)
+
+        return paths
+
+    def check_budget(self, flow):
+        """
+        Schedule the removal of the largest files that are not needed anymore
+        if the size of the flow directory approaches max_workdir_size.
+        The directory is scanned by the background thread at most once every BUDGET_INTERVAL seconds.
+        """
+        if self.max_workdir_size is None: return
+        now = time.time()
+        if now - self._last_budget_check < self.BUDGET_INTERVAL: return
+        self._last_budget_check = now
+
+        # The status of the nodes is only accessed here, the worker receives the list of directories.
+        candidates = []
+        for task in flow.iflat_tasks(status=flow.S_OK):
+            exts = self.exts - self.get_needed_exts(task)
+            if exts: candidates.append((task.outdir.path, exts))
+
+        if self.asynchronous:
+            self._submit(self._enforce_budget, flow.workdir, candidates)
+        else:
+            self._enforce_budget(flow.workdir, candidates)
+
+    def _enforce_budget(self, workdir, candidates):
+        """Remove the largest files in candidates until the size of workdir is below the low watermark."""
+        usage = _disk_usage(workdir)
+        if usage <= self.HIGH_WATERMARK * self.max_workdir_size: return
+
+        files = []
+        for dirpath, exts in candidates:
+            try:
+                entries = list(os.scandir(dirpath))
+            except OSError:
+                continue
+            for entry in entries:
+                if _abiext(entry.name) not in exts or not entry.is_file(follow_symlinks=False): continue
+                try:
+                    files.append((entry.stat(follow_symlinks=False).st_size, entry.path))
+                except OSError:
+                    pass
+
+        target = self.LOW_WATERMARK * self.max_workdir_size
+        for size, path in sorted(files, reverse=True):
+            if usage <= target: break
+            if self._unlink(path): usage -= size
+
+        logger.info("Flow directory size after garbage collection: %.1f Gb" % (usage / 1024**3))
+
+    def _submit(self, func, *args):
+        """Add a job to the queue and start the worker if needed."""
+        import threading
+        with self._lock:
+            self._queue.put((func, args))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="GarbageCollector")
+                self._worker.start()
+
+    def _run(self):
+        """Main loop of the worker. The thread exits when the queue is empty."""
+        while True:
+            with self._lock:
+                if self._queue.empty():
+                    self._worker = None
+                    return
+            func, args = self._queue.get()
+            try:
+                func(*args)
+            except Exception as exc:
+                logger.warning("Exception in garbage collector: %s" % str(exc))
+            finally:
+                self._queue.task_done()
+
+    def _unlink(self, path):
+        """Remove file and update the statistics. Return True if success."""
+        try:
+            size = os.lstat(path).st_size
+            os.remove(path)
+            ok = True
+        except OSError as exc:
+            logger.warning("Exception while trying to remove file %s: %s" % (path, str(exc)))
+            ok = False
+
+        with self._lock:
+            self._pending.discard(path)
+            if ok:
+                self.num_removed += 1
+                self.reclaimed_bytes += size
+
+        return ok
+
+    def wait(self):
+        """Block until all the files in the queue have been removed."""
+        self._queue.join()
 
 
 # The code below initializes a counter from a file when the module is imported
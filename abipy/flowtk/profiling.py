@@ -0,0 +1,438 @@
+# coding: utf-8
+"""
+Instrumentation of the cycles of the |PyFlowScheduler|.
+
+The :class:`CycleProfiler` measures the wall time spent in the different phases of a cycle
+(check_status, restart, fix_abicritical, pickle_dump, rapidfire ...) and collects counters
+(tasks checked, files opened, subprocesses spawned, bytes pickled).
+One JSON record per cycle is appended to a rolling log file in the workdir of the flow.
+The log can be analyzed with :class:`CycleLog` or with `abirun.py FLOWDIR sched_profile`.
+
+Phases and counters are recorded with the module-level functions :func:`phase` and :func:`count`
+that do nothing if there is no cycle in progress or if called from another thread,
+so that they can be used in the code of the flow:
+
+.. code-block:: python
+
+    with phase("check_status"):
+        flow.check_status()
+
+    count("bytes_pickled", nbytes)
+
+Time is measured with exclusive semantics: the time spent in a nested phase is not
+included in the time of the parent phase so that the sum of the phases is the wall time of the cycle.
+"""
+import os
+import sys
+import time
+import json
+import threading
+import collections
+
+from monty.collections import AttrDict
+from pymatgen.util.io_utils import AtomicFile
+from abipy.tools.plotting import add_fig_kwargs, get_ax_fig_plt
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__all__ = [
+    "CycleProfiler",
+    "CycleLog",
+    "phase",
+    "count",
+    "profile_cycle",
+]
+
+
+# The profiler with a cycle in progress. None if profiling is not active.
+_ACTIVE = None
+
+
+class _NullPhase(object):
+    """Context manager that does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name):
+    """
+    Context manager measuring the time spent in phase `name` of the current cycle.
+    No-op if there is no cycle in progress or if called from another thread.
+    """
+    prof = _ACTIVE
+    if prof is None or prof._thread_id != threading.get_ident():
+        return _NULL_PHASE
+    return _Phase(prof, name)
+
+
+def count(name, n=1):
+    """
+    Increment counter `name` of the current cycle.
+    No-op if there is no cycle in progress or if called from another thread.
+    """
+    prof = _ACTIVE
+    if prof is not None and prof._thread_id == threading.get_ident():
+        prof.counters[name] += n
+
+
+def profile_cycle(profiler, **info):
+    """Context manager for a cycle of the :class:`CycleProfiler` profiler. No-op if profiler is None."""
+    if profiler is None:
+        return _NULL_PHASE
+    return profiler.cycle(**info)
+
+
+class _Phase(object):
+
+    __slots__ = ("prof", "name", "start", "child")
+
+    def __init__(self, prof, name):
+        self.prof, self.name = prof, name
+
+    def __enter__(self):
+        self.child = 0.0
+        self.prof._stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start
+        stack = self.prof._stack
+        stack.pop()
+        self.prof.phases[self.name] += elapsed - self.child
+        if stack: stack[-1].child += elapsed
+        return False
+
+
+_AUDIT_HOOK_INSTALLED = False
+
+
+def _audit_hook(event, args):
+    prof = _ACTIVE
+    # Events raised by other threads (sampler, APScheduler ...) are not part of the cycle.
+    if prof is None or prof._thread_id != threading.get_ident(): return
+    if event == "subprocess.Popen" or event == "os.system":
+        prof.counters["subprocesses"] += 1
+    elif event == "open":
+        prof.counters["files_opened"] += 1
+
+
+def _install_audit_hook():
+    """Audit hooks (py >= 3.8) cannot be removed so the hook is installed once per process."""
+    global _AUDIT_HOOK_INSTALLED
+    if _AUDIT_HOOK_INSTALLED or not hasattr(sys, "addaudithook"): return
+    sys.addaudithook(_audit_hook)
+    _AUDIT_HOOK_INSTALLED = True
+
+
+class _StackSampler(threading.Thread):
+    """
+    Sampling profiler. Collects the stack of the thread executing the cycle every `interval` seconds.
+    Stacks are stored in the "collapsed" format used by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval):
+        super().__init__(name="CycleProfilerSampler", daemon=True)
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.thread_id = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            thread_id = self.thread_id
+            if thread_id is None: continue
+            frame = sys._current_frames().get(thread_id)
+            if frame is None: continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append("%s:%s" % (os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class CycleProfiler(object):
+    """
+    Records the time spent in the phases of the scheduler cycles and the counters.
+    Records are appended to the JSON lines file `filepath`. The file is truncated to the last
+    `maxlen` records when it contains more than 2 * maxlen records.
+
+    Usage example:
+
+    .. code-block:: python
+
+        profiler = CycleProfiler(os.path.join(flow.workdir, CycleProfiler.LOG_FNAME))
+
+        with profiler.cycle():
+            with phase("check_status"):
+                flow.check_status()
+    """
+    # Name of the log file in the workdir of the flow.
+    LOG_FNAME = "_scheduler_profile.jsonl"
+
+    # Name of the file with the stacks collected by the sampling profiler.
+    STACKS_FNAME = "_scheduler_stacks.txt"
+
+    def __init__(self, filepath, maxlen=1000, sampling_interval=0):
+        """
+        Args:
+            filepath: Path of the log file.
+            maxlen: Max number of cycles kept in the log file.
+            sampling_interval: Time in seconds between two samples of the sampling profiler.
+                0 to disable the sampling profiler.
+        """
+        self.filepath = os.path.abspath(filepath)
+        self.maxlen = int(maxlen)
+        self.sampling_interval = float(sampling_interval)
+        self.num_cycles = 0
+        self._thread_id = None
+        self._stack = []
+        self._sampler = None
+        self.phases = collections.Counter()
+        self.counters = collections.Counter()
+
+        self._nlines = 0
+        if os.path.exists(self.filepath):
+            with open(self.filepath, "rt") as fh:
+                self._nlines = sum(1 for _ in fh)
+
+    def __repr__(self):
+        return "<%s: %s, num_cycles: %d>" % (self.__class__.__name__, self.filepath, self.num_cycles)
+
+    @property
+    def stacks_path(self):
+        """Path of the file with the stacks collected by the sampling profiler."""
+        return os.path.join(os.path.dirname(self.filepath), self.STACKS_FNAME)
+
+    def cycle(self, **info):
+        """
+        Context manager for a cycle of the scheduler.
+        `info` is added to the record. Nested cycles are ignored.
+        """
+        return _Cycle(self, info)
+
+    def _start(self):
+        global _ACTIVE
+        self.phases.clear()
+        self.counters.clear()
+        del self._stack[:]
+        self._thread_id = threading.get_ident()
+        _install_audit_hook()
+        _ACTIVE = self
+
+        if self.sampling_interval > 0:
+            if self._sampler is None:
+                self._sampler = _StackSampler(self.sampling_interval)
+                self._sampler.start()
+            self._sampler.thread_id = self._thread_id
+
+    def _stop(self, info, start, cpu_start):
+        global _ACTIVE
+        _ACTIVE = None
+        if self._sampler is not None: self._sampler.thread_id = None
+
+        wall = time.perf_counter() - start
+        phases = {k: round(v, 6) for k, v in self.phases.items()}
+        phases["other"] = round(max(wall - sum(self.phases.values()), 0.0), 6)
+        record = dict(start=time.time() - wall, wall=round(wall, 6), cpu=round(time.process_time() - cpu_start, 6),
+                      phases=phases, counters=dict(self.counters))
+        record.update(info)
+        self.num_cycles += 1
+
+        try:
+            self._write(record)
+        except Exception as exc:
+            logger.warning("Cannot write scheduler profile %s: %s" % (self.filepath, str(exc)))
+
+        return record
+
+    def _write(self, record):
+        with open(self.filepath, "at") as fh:
+            fh.write(json.dumps(record) + "\n")
+        self._nlines += 1
+
+        if self._nlines > 2 * self.maxlen:
+            # Keep the last maxlen records.
+            with open(self.filepath, "rt") as fh:
+                lines = collections.deque(fh, maxlen=self.maxlen)
+            with AtomicFile(self.filepath, mode="wt") as fh:
+                fh.write("".join(lines))
+            self._nlines = len(lines)
+
+        if self._sampler is not None:
+            stacks = self._sampler.stacks.copy()
+            with AtomicFile(self.stacks_path, mode="wt") as fh:
+                for stack, num in stacks.most_common():
+                    fh.write("%s %d\n" % (stack, num))
+
+    def close(self):
+        """Stop the sampling profiler."""
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._sampler = None
+
+
+class _Cycle(object):
+
+    def __init__(self, prof, info):
+        self.prof, self.info = prof, info
+        self.record = None
+
+    def __enter__(self):
+        # Nested cycles are ignored.
+        self.nested = _ACTIVE is not None
+        if not self.nested:
+            self.prof._start()
+            self.cpu_start = time.process_time()
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.nested:
+            self.record = self.prof._stop(self.info, self.start, self.cpu_start)
+        return False
+
+
+class CycleLog(object):
+    """
+    The records of the cycles read from the log file produced by :class:`CycleProfiler`.
+
+    Usage example:
+
+    .. code-block:: python
+
+        log = CycleLog.from_flowdir(flow.workdir)
+        print(log.to_string())
+    """
+
+    @classmethod
+    def from_file(cls, filepath):
+        """Read the records from the JSON lines file. Invalid lines are ignored."""
+        records = []
+        with open(filepath, "rt") as fh:
+            for line in fh:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # This may happen if the scheduler is writing the file.
+                    continue
+        return cls(records)
+
+    @classmethod
+    def from_flowdir(cls, workdir):
+        """Read the log file in the workdir of the flow."""
+        return cls.from_file(os.path.join(workdir, CycleProfiler.LOG_FNAME))
+
+    def __init__(self, records):
+        self.records = [AttrDict(r) for r in records]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __str__(self):
+        return self.to_string()
+
+    @property
+    def phase_names(self):
+        """List with the names of the phases sorted by total time."""
+        totals = collections.Counter()
+        for r in self.records:
+            totals.update(r.phases)
+        return [k for k, _ in totals.most_common()]
+
+    @property
+    def counter_names(self):
+        """List with the names of the counters."""
+        return sorted(set(k for r in self.records for k in r.counters))
+
+    def get_dataframe(self):
+        """
+        |pandas-DataFrame| with one row per cycle. Columns: start time, wall, cpu, the time spent
+        in each phase and the counters.
+        """
+        import pandas as pd
+        rows = []
+        for r in self.records:
+            row = collections.OrderedDict(start=pd.Timestamp(r.start, unit="s"), wall=r.wall, cpu=r.get("cpu"))
+            for name in self.phase_names:
+                row[name] = r.phases.get(name, 0.0)
+            for name in self.counter_names:
+                row[name] = r.counters.get(name, 0)
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def to_string(self, last=None, verbose=0):
+        """
+        String with a summary of the cycles: statistics of the phases and of the counters.
+
+        Args:
+            last: Use only the last `last` cycles. None for all the cycles in the log.
+            verbose: Verbosity level. If > 0 the table with all the cycles is shown.
+        """
+        from tabulate import tabulate
+        log = self if last is None else self.__class__(self.records[-last:])
+        if not log.records: return "No scheduler cycle found in the log."
+
+        df = log.get_dataframe()
+        lines = []
+        app = lines.append
+        app("Number of cycles: %d, from %s to %s" % (len(df), df["start"].iloc[0], df["start"].iloc[-1]))
+        app("Wall time per cycle [s]: mean %.3f, max %.3f, last %.3f" % (
+            df["wall"].mean(), df["wall"].max(), df["wall"].iloc[-1]))
+        app("")
+
+        total = df["wall"].sum()
+        rows = []
+        for name in log.phase_names:
+            s = df[name]
+            rows.append([name, s.sum(), 100 * s.sum() / total if total else 0.0, s.mean(), s.max(), s.iloc[-1]])
+        app(tabulate(rows, headers=["Phase", "Total [s]", "%", "Mean [s]", "Max [s]", "Last [s]"], floatfmt=".3f"))
+        app("")
+
+        if log.counter_names:
+            rows = [[name, df[name].sum(), df[name].mean(), df[name].max(), df[name].iloc[-1]]
+                    for name in log.counter_names]
+            app(tabulate(rows, headers=["Counter", "Total", "Mean", "Max", "Last"], floatfmt=".1f"))
+
+        if verbose:
+            app("")
+            app(df.to_string())
+
+        return "\n".join(lines)
+
+    @add_fig_kwargs
+    def plot(self, last=None, ax=None, fontsize=8, **kwargs):
+        """
+        Plot the time spent in the phases as a function of the cycle index (stacked areas).
+
+        Args:
+            last: Use only the last `last` cycles. None for all the cycles in the log.
+            ax: |matplotlib-Axes| or None if a new figure should be created.
+            fontsize: Legend and label fontsize.
+
+        Returns: |matplotlib-Figure|
+        """
+        log = self if last is None else self.__class__(self.records[-last:])
+        df = log.get_dataframe()
+        ax, fig, plt = get_ax_fig_plt(ax=ax)
+        names = log.phase_names
+        ax.stackplot(range(len(df)), [df[name].values for name in names], labels=names)
+        ax.set_xlabel("Cycle", fontsize=fontsize)
+        ax.set_ylabel("Wall time [s]", fontsize=fontsize)
+        ax.grid(True)
+        ax.legend(loc="best", fontsize=fontsize, shadow=True)
+
+        return fig
@@ -1,2 +1,344 @@
-# flake8: noqa
-from pymatgen.io.abinit.pseudos import Pseudo, PseudoTable, PseudoParser
+# coding: utf-8
+"""
+Pseudopotential objects with a persistent cache of the parsed files.
+
+Parsing a pseudopotential file requires reading the entire file to compute the md5
+and, for PAW XML files, parsing the XML tree and the radial grids. The parsed objects
+(without the XML tree that is parsed again only if needed) are saved in a
+pickle file (~/.abinit/abipy/pseudos_cache.pickle) together with the modification time,
+the size and the md5 of the file so that the next processes (abirun.py, AbinitInput, ...)
+can reuse them without reading the pseudopotential files.
+Entries are validated with the modification time and the size of the file. If they changed,
+the md5 is recomputed and the file is parsed again only if the content changed.
+The cache file is discarded if it has been produced with different versions of python, pymatgen or abipy.
+Cold loads of many files are executed in parallel with a pool of processes.
+"""
+import os
+import sys
+import time
+import pickle
+import hashlib
+import collections
+
+from concurrent.futures import ProcessPoolExecutor
+from monty.io import FileLock
+from monty.os.path import find_exts
+from monty.string import is_string, list_strings
+from pymatgen.util.io_utils import AtomicFile
+from pymatgen.io.abinit.pseudos import Pseudo, PseudoParser
+from pymatgen.io.abinit.pseudos import PseudoTable as _PmgPseudoTable
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__all__ = [
+    "Pseudo",
+    "PseudoParser",
+    "PseudoTable",
+    "PseudoCache",
+    "get_pseudo_cache",
+    "load_pseudos",
+]
+
+
+def _compute_md5(path):
+    """md5 of the file computed as in Pseudo.compute_md5."""
+    with open(path, "rt") as fh:
+        return hashlib.md5(fh.read().encode("utf-8")).hexdigest()
+
+
+def _parse_entry(path, md5=None):
+    """
+    Compute the md5 of the file and parse it if md5 differs from the one given in input.
+
+    Return: (mtime_ns, size, md5, data) where data is the pickled pseudo (None if the file is not
+    a pseudopotential, "" if the content of the file did not change) or the exception raised by the parser.
+    """
+    stat = os.stat(path)
+    try:
+        new_md5 = _compute_md5(path)
+    except Exception as exc:
+        # e.g. binary files.
+        return stat.st_mtime_ns, stat.st_size, None, exc
+    if new_md5 == md5:
+        return stat.st_mtime_ns, stat.st_size, new_md5, ""
+
+    try:
+        pseudo = PseudoParser().parse(path)
+    except Exception as exc:
+        return stat.st_mtime_ns, stat.st_size, new_md5, exc
+
+    if pseudo is not None:
+        pseudo.__dict__["md5"] = new_md5
+        # PawXmlSetup stores the XML tree in the root lazy property. The tree is parsed again on demand.
+        pseudo.__dict__.pop("root", None)
+        pseudo = pickle.dumps(pseudo, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return stat.st_mtime_ns, stat.st_size, new_md5, pseudo
+
+
+def _cache_version():
+    """String with the versions of python, pymatgen and abipy used to pickle the objects."""
+    import pymatgen
+    from abipy.core.release import __version__
+    return "python %d.%d, pymatgen %s, abipy %s" % (
+        sys.version_info[0], sys.version_info[1], getattr(pymatgen, "__version__", "unknown"), __version__)
+
+
+def _parse_entries(args):
+    return [_parse_entry(path, md5) for path, md5 in args]
+
+
+class PseudoCache(object):
+    """
+    Persistent cache of parsed pseudopotentials indexed by the absolute path of the file.
+    Each entry stores the modification time, the size and the md5 of the file and the pickled |Pseudo|.
+    Pseudos are unpickled on demand, and new objects are returned at each call.
+
+    Usage example:
+
+    .. code-block:: python
+
+        cache = get_pseudo_cache()
+        pseudos = cache.get_pseudos(paths)
+    """
+
+    # Max number of entries kept in the cache file (the oldest entries are removed first).
+    MAXSIZE = 20000
+
+    def __init__(self, filepath=None, maxsize=None):
+        """
+        Args:
+            filepath: Path of the pickle file. None for an in-memory cache.
+            maxsize: Max number of entries saved in the file.
+        """
+        self.filepath = filepath
+        self.maxsize = maxsize if maxsize is not None else self.MAXSIZE
+        # path --> (mtime_ns, size, md5, pickled pseudo, timestamp)
+        self._entries = None
+        self._dirty = {}
+        self.num_hits, self.num_misses = 0, 0
+
+    def __repr__(self):
+        return "<%s: %s, entries: %d, hits: %d, misses: %d>" % (
+            self.__class__.__name__, self.filepath, len(self.entries), self.num_hits, self.num_misses)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def entries(self):
+        """Dictionary with the entries. The file is read at the first access."""
+        if self._entries is None:
+            self._entries = self._read_file()
+        return self._entries
+
+    def _read_file(self):
+        if self.filepath is None or not os.path.exists(self.filepath): return {}
+        try:
+            with open(self.filepath, "rb") as fh:
+                d = pickle.load(fh)
+        except Exception as exc:
+            logger.warning("Ignoring invalid pseudo cache %s: %s" % (self.filepath, str(exc)))
+            return {}
+
+        if not isinstance(d, dict) or d.get("version") != _cache_version():
+            logger.info("Ignoring pseudo cache %s produced with different versions" % self.filepath)
+            return {}
+        return d["entries"]
+
+    def get_pseudo(self, path):
+        """
+        Return the |Pseudo| object associated to the file path.
+        None if the file is not a valid pseudopotential file.
+        """
+        return self.get_pseudos([path])[0]
+
+    def get_pseudos(self, paths, max_workers=None, raise_exc=True, save=True, retry=True):
+        """
+        Return the list of |Pseudo| objects associated to the list of file paths.
+        None is returned for the files that are not valid pseudopotential files.
+
+        Args:
+            paths: List of paths.
+            max_workers: Number of processes used to parse the files that are not in the cache.
+                None to use os.cpu_count(). Small lists are always parsed serially.
+            raise_exc: If False, files that cannot be parsed are logged and None is returned.
+            save: True if the new entries should be written to the cache file.
+            retry: True if the files whose entries cannot be unpickled should be parsed again.
+        """
+        paths = [os.path.abspath(p) for p in list_strings(paths)]
+        todo = collections.OrderedDict()
+        for path in paths:
+            if path in todo: continue
+            stat = os.stat(path)
+            entry = self.entries.get(path)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                continue
+            todo[path] = entry[2] if entry is not None else None
+
+        self.num_hits += len(set(paths)) - len(todo)
+        self.num_misses += len(todo)
+
+        errors = {}
+        if todo:
+            args = list(todo.items())
+            max_workers = max_workers or os.cpu_count()
+            if max_workers == 1 or len(args) < 8:
+                results = _parse_entries(args)
+            else:
+                chunksize = max(1, len(args) // (4 * max_workers))
+                chunks = [args[i:i + chunksize] for i in range(0, len(args), chunksize)]
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    results = [r for rs in executor.map(_parse_entries, chunks) for r in rs]
+
+            now = time.time()
+            for (path, _), (mtime_ns, size, md5, data) in zip(args, results):
+                if isinstance(data, Exception):
+                    errors[path] = data
+                    continue
+                if isinstance(data, str):
+                    # Same content, only the modification time changed.
+                    data = self.entries[path][3]
+                self.entries[path] = self._dirty[path] = (mtime_ns, size, md5, data, now)
+
+            if save: self.save()
+
+        pseudos, stale = [], []
+        for path in paths:
+            if path in errors:
+                if raise_exc: raise errors[path]
+                logger.critical("Error in %s:\n%s" % (path, errors[path]))
+                pseudos.append(None)
+                continue
+
+            data = self.entries[path][3]
+            try:
+                pseudos.append(pickle.loads(data) if data is not None else None)
+            except Exception as exc:
+                # Stale entry e.g. class changed in pymatgen. Treat it as a cache miss.
+                logger.warning("Cannot unpickle cached pseudo %s: %s" % (path, str(exc)))
+                pseudos.append(None)
+                stale.append(path)
+
+        if stale and retry:
+            for path in stale:
+                self.entries.pop(path, None)
+                self._dirty.pop(path, None)
+            path2pseudo = dict(zip(stale, self.get_pseudos(stale, max_workers=max_workers, raise_exc=raise_exc,
+                                                           save=save, retry=False)))
+            pseudos = [path2pseudo.get(path, p) for path, p in zip(paths, pseudos)]
+
+        return pseudos
+
+    def save(self):
+        """
+        Write the new entries to the cache file.
+        The file is read again inside the lock so that entries added by other processes are not lost.
+        """
+        if self.filepath is None or not self._dirty: return
+        try:
+            dirname = os.path.dirname(os.path.abspath(self.filepath))
+            if not os.path.exists(dirname): os.makedirs(dirname)
+
+            with FileLock(self.filepath):
+                d = self._read_file()
+                d.update(self._dirty)
+                if len(d) > self.maxsize:
+                    d = dict(sorted(d.items(), key=lambda t: t[1][4])[-self.maxsize:])
+                with AtomicFile(self.filepath, mode="wb") as fh:
+                    pickle.dump(dict(version=_cache_version(), entries=d), fh, protocol=pickle.HIGHEST_PROTOCOL)
+            self._dirty = {}
+
+        except Exception as exc:
+            logger.warning("Cannot save pseudo cache %s: %s" % (self.filepath, str(exc)))
+
+    def clear(self):
+        """Remove all the entries and the cache file."""
+        self._entries, self._dirty = {}, {}
+        if self.filepath is not None and os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+
+_PSEUDO_CACHE = None
+
+
+def get_pseudo_cache():
+    """
+    Return the :class:`PseudoCache` used by AbiPy.
+    The cache file is located in ~/.abinit/abipy/pseudos_cache.pickle.
+    """
+    global _PSEUDO_CACHE
+    if _PSEUDO_CACHE is None:
+        _PSEUDO_CACHE = PseudoCache(os.path.join(os.path.expanduser("~"), ".abinit", "abipy", "pseudos_cache.pickle"))
+    return _PSEUDO_CACHE
+
+
+def load_pseudos(paths, max_workers=None):
+    """
+    Return the list of |Pseudo| objects associated to the list of file paths.
+    Use the persistent cache and parse the new files in parallel.
+    """
+    return get_pseudo_cache().get_pseudos(paths, max_workers=max_workers)
+
+
+class PseudoTable(_PmgPseudoTable):
+    """
+    Extends the pymatgen PseudoTable. The pseudopotential files are loaded via the :class:`PseudoCache`.
+    """
+
+    @classmethod
+    def as_table(cls, items):
+        """
+        Return an instance of :class:`PseudoTable` from the iterable items.
+        """
+        if isinstance(items, _PmgPseudoTable):
+            return items
+        return cls(items)
+
+    @classmethod
+    def from_dir(cls, top, exts=None, exclude_dirs="_*", max_workers=None):
+        """
+        Find all pseudos in the directory tree starting from top.
+        The files that are not in the cache are parsed in parallel.
+
+        Args:
+            top: Top of the directory tree
+            exts: List of files extensions. if exts == "all_files"
+                    we try to open all files in top
+            exclude_dirs: Wildcard used to exclude directories.
+            max_workers: Number of processes used to parse the files. None to use all the CPUs.
+
+        return: :class:`PseudoTable` sorted by atomic number Z.
+        """
+        if exts == "all_files":
+            paths = [os.path.join(top, fn) for fn in os.listdir(top)]
+            paths = [p for p in paths if os.path.isfile(p)]
+        else:
+            paths = find_exts(top, exts if exts is not None else ("psp8",), exclude_dirs=exclude_dirs)
+
+        pseudos = [p for p in get_pseudo_cache().get_pseudos(paths, max_workers=max_workers, raise_exc=False)
+                   if p is not None]
+
+        if exts == "all_files" and not pseudos:
+            logger.warning('No pseudopotentials parsed from folder %s' % top)
+            return None
+
+        return cls(pseudos).sort_by_z()
+
+    def __init__(self, pseudos):
+        """
+        Args:
+            pseudos: List of pseudopotentials or filepaths
+        """
+        if is_string(pseudos) or not isinstance(pseudos, collections.abc.Iterable):
+            pseudos = [pseudos]
+
+        pseudos = list(pseudos)
+        paths = [p for p in pseudos if is_string(p)]
+        if paths:
+            path2pseudo = dict(zip(paths, load_pseudos(paths)))
+            pseudos = [path2pseudo[p] if is_string(p) else p for p in pseudos]
+
+        super().__init__([p for p in pseudos if p is not None])
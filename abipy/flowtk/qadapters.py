@@ -405,6 +405,9 @@ job:
 queue:
     qtype:                # String defining the qapapter type e.g. slurm, shell ...
     qname:                # Name of the submission queue (string, MANDATORY)
+    snapshot_ttl:         # Time-to-live in seconds of the table with the jobs in the queue (DEFAULT: 30).
+                          # The table is obtained with a single call to the resource manager and
+                          # shared by all the tasks e.g. to get the status of the jobs.
     qparams:              # Dictionary with values used to generate the header of the job script
                           # We use the *normalized* version of the options i.e dashes in the official name
                           # are replaced by underscores e.g. ``--mail-type`` becomes ``mail_type``
@@ -515,6 +518,7 @@ limits:
                 'queue': {'qtype': self.QTYPE,
                           'qname': self._qname,
                           'qnodes': self.qnodes,
+                          'snapshot_ttl': self.snapshot_ttl,
                           'qparams': self._qparams},
                 'limits': {'timelimit_hard': self._timelimit_hard,
                            'timelimit': self._timelimit,
@@ -644,6 +648,7 @@ limits:
         self._qparams = copy.deepcopy(qparams) if qparams is not None else {}
 
         self.set_qname(d.pop("qname", ""))
+        self.snapshot_ttl = float(d.pop("snapshot_ttl", QueueJob.snapshot_ttl))
         self.qnodes = d.pop("qnodes", "standard")
         if self.qnodes not in ["standard", "shared", "exclusive"]:
             raise ValueError("Nodes must be either in standard, shared or exclusive mode "
@@ -1079,8 +1084,14 @@ limits:
                              "The error response reads:\n %s \n " % s.err +
                              "The out response reads:\n %s \n" % s.out)
 
+        # The snapshot of the queue does not contain the new job.
+        # Invalidate it so that get_njobs_in_queue does not return a stale count.
+        QueueJob.class_from_qtype(self.QTYPE).invalidate_queue_snapshots()
+
         # Here we create a concrete instance of QueueJob
-        return QueueJob.from_qtype_and_id(self.QTYPE, s.qid, self.qname), s.process
+        qjob = QueueJob.from_qtype_and_id(self.QTYPE, s.qid, self.qname)
+        qjob.snapshot_ttl = self.snapshot_ttl
+        return qjob, s.process
 
     @abc.abstractmethod
     def _submit_to_queue(self, script_file):
@@ -1104,7 +1115,12 @@ limits:
             username: (str) the username of the jobs to count (default is to autodetect)
         """
         if username is None: username = getpass.getuser()
-        njobs, process = self._get_njobs_in_queue(username=username)
+
+        snapshot = self.get_queue_snapshot(username=username)
+        if snapshot is not None:
+            njobs, process = snapshot.njobs, None
+        else:
+            njobs, process = self._get_njobs_in_queue(username=username)
 
         if process is not None and process.returncode != 0:
             # there's a problem talking to squeue server?
@@ -1117,6 +1133,19 @@ limits:
 
         return njobs
 
+    def get_queue_snapshot(self, username=None, refresh=False):
+        """
+        Return :class:`QueueSnapshot` with the jobs of ``username`` in the queue.
+        The resource manager is contacted at most once every ``snapshot_ttl`` seconds
+        and the table is shared by all the jobs. None if bulk queries are not supported.
+
+        Args:
+            username: (str) the username of the jobs (default is to autodetect)
+            refresh: True to contact the resource manager even if the snapshot is still valid.
+        """
+        ttl = getattr(self, "snapshot_ttl", QueueJob.snapshot_ttl)
+        return QueueJob.class_from_qtype(self.QTYPE).get_queue_snapshot(username=username, ttl=ttl, refresh=refresh)
+
     @abc.abstractmethod
     def _get_njobs_in_queue(self, username):
         """
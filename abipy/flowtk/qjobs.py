@@ -8,6 +8,8 @@ having to rely on external libraries.
 """
 
 import shlex
+import time
+import getpass
 
 from collections import OrderedDict, defaultdict
 from subprocess import Popen, PIPE
@@ -79,6 +81,70 @@ class JobStatus(int):
             return cls.from_string("UNKNOWN")
 
 
+# Snapshots of the queue shared by all the jobs: (qtype, username) --> QueueSnapshot
+_SNAPSHOTS = {}
+
+
+class QueueSnapshot(object):
+    """
+    Table with the jobs of a user obtained with a single call to the resource manager
+    e.g. ``squeue --user username``. The jobs read their status from the snapshot
+    instead of calling the resource manager one by one.
+    """
+    def __init__(self, qtype, username, jobs, ok=True):
+        """
+        Args:
+            qtype: String specifying the Resource manager type.
+            username: Name of the user.
+            jobs: Dictionary mapping the job identifier to :class:`AttrDict` with the
+                ``status`` (:class:`JobStatus`), the ``state`` reported by the resource manager
+                and the estimated ``start_time`` (None if not available).
+            ok: False if the resource manager could not be contacted.
+        """
+        self.qtype, self.username = qtype, username
+        self.jobs = jobs
+        self.ok = ok
+        self.time = time.time()
+
+    def __repr__(self):
+        return "<%s, qtype=%s, username=%s, njobs=%s, age=%.1f s>" % (
+            self.__class__.__name__, self.qtype, self.username, self.njobs, self.age)
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def __contains__(self, qid):
+        return qid in self.jobs
+
+    def get(self, qid):
+        """Return :class:`AttrDict` with the info on job ``qid``. None if the job is not in the table."""
+        return self.jobs.get(qid)
+
+    @property
+    def age(self):
+        """Seconds elapsed since the resource manager has been contacted."""
+        return time.time() - self.time
+
+    @property
+    def njobs(self):
+        """Number of jobs in the queue. None if the resource manager could not be contacted."""
+        return len(self.jobs) if self.ok else None
+
+
+def _run_command(cmd):
+    """
+    Execute command ``cmd`` (list of strings). Return (returncode, out, err).
+    returncode is None if the command cannot be executed.
+    """
+    try:
+        process = Popen(cmd, stdout=PIPE, stderr=PIPE, universal_newlines=True)
+    except OSError as exc:
+        return None, "", str(exc)
+
+    out, err = process.communicate()
+    return process.returncode, out, err
+
+
 class QueueJob(object):
     """
     This object provides methods to contact the resource manager to get info on the status
@@ -86,6 +152,10 @@ class QueueJob(object):
     """
     QTYPE = None
 
+    # Time-to-live (seconds) of the snapshot of the queue shared by the jobs.
+    # The QueueAdapter sets the value specified in the configuration file.
+    snapshot_ttl = 30.0
+
     # Used to handle other resource managers.
     S_UNKNOWN = JobStatus.from_string("UNKNOWN")
     # Slurm status
@@ -110,13 +180,59 @@ class QueueJob(object):
             queue_id: Job identifier.
             qname: Name of the queue (optional).
         """
+        return QueueJob.class_from_qtype(qtype)(queue_id, qname=qname)
+
+    @staticmethod
+    def class_from_qtype(qtype):
+        """Return the subclass associated to ``qtype``."""
         for cls in all_subclasses(QueueJob):
-            if cls.QTYPE == qtype: break
-        else:
-            logger.critical("Cannot find QueueJob subclass registered for qtype %s" % qtype)
-            cls = QueueJob
+            if cls.QTYPE == qtype: return cls
+
+        logger.critical("Cannot find QueueJob subclass registered for qtype %s" % qtype)
+        return QueueJob
+
+    @classmethod
+    def get_queue_snapshot(cls, username=None, ttl=None, refresh=False):
+        """
+        Return :class:`QueueSnapshot` with the jobs of ``username``. The snapshot is shared by
+        all the jobs and the resource manager is contacted again only if the snapshot
+        is older than ``ttl`` seconds or ``refresh``. None if bulk queries are not supported.
+        """
+        if username is None: username = getpass.getuser()
+        if ttl is None: ttl = cls.snapshot_ttl
+
+        key = (cls.QTYPE, username)
+        snapshot = _SNAPSHOTS.get(key)
+        if refresh or snapshot is None or snapshot.age > ttl:
+            snapshot = cls._query_queue(username)
+            if snapshot is None: return None
+            _SNAPSHOTS[key] = snapshot
+
+        return snapshot
+
+    @classmethod
+    def invalidate_queue_snapshots(cls):
+        """
+        Remove the snapshots of the queue of this resource manager so that the next call to
+        :meth:`get_queue_snapshot` contacts the resource manager. Called after a successful submission.
+        """
+        for key in [k for k in _SNAPSHOTS if k[0] == cls.QTYPE]:
+            _SNAPSHOTS.pop(key, None)
+
+    @classmethod
+    def _query_queue(cls, username):
+        """
+        Get the jobs of ``username`` with a single call to the resource manager.
+        Return :class:`QueueSnapshot`, None if not supported.
+        Subclasses supporting bulk queries should implement this method.
+        """
+        return None
 
-        return cls(queue_id, qname=qname)
+    def _get_snapshot_entry(self):
+        """Return the entry of the job in the snapshot of the queue. None if not found."""
+        snapshot = self.get_queue_snapshot(ttl=self.snapshot_ttl)
+        if snapshot is None: return None
+        return snapshot.get(self.qid)
 
     def __init__(self, queue_id, qname="UnknownQueue"):
         """
@@ -249,32 +365,65 @@ class SlurmJob(QueueJob):
     """Handler for Slurm jobs."""
     QTYPE = "slurm"
 
-    def estimated_start_time(self):
-        #squeue  --start -j  116791
-        #  JOBID PARTITION     NAME     USER  ST           START_TIME  NODES NODELIST(REASON)
-        # 116791      defq gs6q2wop username  PD  2014-11-04T09:27:15     16 (QOSResourceLimit)
-        cmd = "squeue" "--start", "--job %d" % self.qid
-        process = Popen(shlex.split(cmd), stdout=PIPE, stderr=PIPE)
-        out, err = process.communicate()
+    # Slurm states that are not in JobStatus.
+    STATE_ALIASES = {
+        "CONFIGURING": "PENDING",
+        "COMPLETING": "RUNNING",
+        "NODE_FAIL": "NODEFAIL",
+    }
 
-        if process.returncode != 0:
+    @classmethod
+    def _query_queue(cls, username):
+        #squeue --noheader --user username --format "%i|%T|%S"
+        # 116791|PENDING|2014-11-04T09:27:15
+        # 116792|RUNNING|2014-11-03T17:02:11
+        returncode, out, err = _run_command(["squeue", "--noheader", "--user", username, "--format", "%i|%T|%S"])
+        if returncode != 0:
             logger.critical(err)
-            return None
+            return QueueSnapshot(cls.QTYPE, username, OrderedDict(), ok=False)
+
+        jobs = OrderedDict()
+        for line in out.splitlines():
+            tokens = line.strip().split("|")
+            if len(tokens) != 3: continue
+            try:
+                qid = int(tokens[0])
+            except ValueError:
+                # Job arrays e.g. 116791_[1-5]
+                continue
+            state = tokens[1]
+            status = JobStatus.from_string(cls.STATE_ALIASES.get(state, state))
+            start_time = tokens[2] if tokens[2] not in ("N/A", "") else None
+            jobs[qid] = AttrDict(status=status, state=state, start_time=start_time)
+
+        return QueueSnapshot(cls.QTYPE, username, jobs)
 
-        lines = out.splitlines()
-        if len(lines) <= 2: return None
+    def estimated_start_time(self):
+        """Return date with estimated start time. None if it cannot be detected"""
+        entry = self._get_snapshot_entry()
+        if entry is None or entry.start_time is None: return None
 
         from datetime import datetime
-        for line in lines:
-            tokens = line.split()
-            if int(tokens[0]) == self.qid:
-                date_string = tokens[5]
-                if date_string == "N/A": return None
-                return datetime.strptime(date_string, "%Y-%m-%dT%H:%M:%S")
-
-        return None
+        try:
+            return datetime.strptime(entry.start_time, "%Y-%m-%dT%H:%M:%S")
+        except ValueError:
+            return None
 
     def get_info(self, **kwargs):
+        """
+        Set the status of the job. The status is taken from the snapshot of the queue.
+        ``scontrol`` is called only for the jobs that are not in the queue anymore
+        to get the exit code.
+        """
+        if self.status in (self.S_COMPLETED, self.S_FAILED, self.S_CANCELLED, self.S_TIMEOUT, self.S_NODEFAIL):
+            # Final status, don't contact the resource manager again.
+            return AttrDict(exitcode=self.exitcode, signal=self.signal, status=str(self.status))
+
+        entry = self._get_snapshot_entry()
+        if entry is not None:
+            self.set_status_exitcode_signal(entry.status, None, None)
+            return AttrDict(exitcode=None, signal=None, status=str(entry.status))
+
         # See https://computing.llnl.gov/linux/slurm/sacct.html
         #If SLURM job ids are reset, some job numbers will
         #probably appear more than once refering to different jobs.
@@ -295,21 +444,17 @@ class SlurmJob(QueueJob):
         #login1$ scontrol show job 1676354
 
         #cmd = "sacct --job %i --format=jobid,exitcode,state --allocations --parsable2" % self.qid
-        cmd = "scontrol show job %i --oneliner" % self.qid
-        process = Popen(shlex.split(cmd), stdout=PIPE, stderr=PIPE)
-        out, err = process.communicate()
-
-        if process.returncode != 0:
+        returncode, out, err = _run_command(["scontrol", "show", "job", str(self.qid), "--oneliner"])
+        if returncode != 0:
             logger.critical(err)
             return None
 
-        tokens = out.splitlines()
+        # JobId=800197 JobName=run.sh ... JobState=COMPLETED Reason=None Dependency=(null) ... ExitCode=0:0
         info = AttrDict()
-        for line in tokens:
-            #print(line)
-            k, v = line.split("=")
+        for tok in out.split():
+            if "=" not in tok: continue
+            k, v = tok.split("=", 1)
             info[k] = v
-            #print(info)
 
         qid = int(info.JobId)
         assert qid == self.qid
@@ -323,6 +468,7 @@ class SlurmJob(QueueJob):
 
         i = status.find("+")
         if i != -1: status = status[:i]
+        status = self.STATE_ALIASES.get(status, status)
 
         self.set_status_exitcode_signal(JobStatus.from_string(status), exitcode, signal)
         return AttrDict(exitcode=exitcode, signal=signal, status=status)
@@ -366,7 +512,7 @@ class PbsProJob(QueueJob):
     #      W  Job is waiting for its submitter-assigned start time to be reached.
     #      X  Subjob has completed execution or has been deleted.
 
-    PBSSTAT_TO_SLURM = defaultdict(lambda x: QueueJob.S_UNKNOWN, [
+    PBSSTAT_TO_SLURM = defaultdict(lambda: QueueJob.S_UNKNOWN, [
         ("E", QueueJob.S_FAILED),
         ("F", QueueJob.S_COMPLETED),
         ("Q", QueueJob.S_PENDING),
@@ -397,32 +543,52 @@ class PbsProJob(QueueJob):
         # TODO One should convert to datetime
         return sdate
 
-    def get_info(self, **kwargs):
-
-        # See also qstat -f
-        #http://sc.tamu.edu/help/origins/batch.shtml#qstat
-
-        #$> qstat 5666289
+    @classmethod
+    def _query_queue(cls, username):
+        #$> qstat -a -u username
         #frontal1:
         #                                                            Req'd  Req'd   Elap
         #Job ID          Username Queue    Jobname    SessID NDS TSK Memory Time  S Time
         #--------------- -------- -------- ---------- ------ --- --- ------ ----- - -----
         #5666289.frontal username main_ivy MorfeoTChk  57546   1   4    --  08:00 R 00:17
+        returncode, out, err = _run_command(["qstat", "-a", "-u", username])
+        if returncode != 0:
+            logger.critical(err)
+            return QueueSnapshot(cls.QTYPE, username, OrderedDict(), ok=False)
 
-        cmd = "qstat %d" % self.qid
-        process = Popen(shlex.split(cmd), stdout=PIPE, stderr=PIPE)
-        out, err = process.communicate()
+        jobs = OrderedDict()
+        for line in out.splitlines():
+            tokens = line.split()
+            # Skip header. Note that qstat may truncate the username.
+            if len(tokens) < 3 or not tokens[0][0].isdigit(): continue
+            try:
+                qid = int(tokens[0].split(".")[0])
+            except ValueError:
+                continue
+            state = tokens[-2]
+            jobs[qid] = AttrDict(status=cls.PBSSTAT_TO_SLURM[state], state=state, start_time=None)
 
-        if process.returncode != 0:
-            # qstat: 5904257.frontal1 Job has finished, use -x or -H to obtain historical job information\n
-            cmd = "qstat %d -x" % self.qid
-            process = Popen(shlex.split(cmd), stdout=PIPE, stderr=PIPE)
-            out, err = process.communicate()
+        return QueueSnapshot(cls.QTYPE, username, jobs)
+
+    def get_info(self, **kwargs):
+        """
+        Set the status of the job. The status is taken from the snapshot of the queue.
+        ``qstat -x`` is called only for the jobs that are not in the queue anymore.
+        """
+        entry = self._get_snapshot_entry()
+        if entry is not None:
+            self.set_status_exitcode_signal(entry.status, None, None)
+            return AttrDict(exitcode=None, signal=None, status=str(entry.status))
 
-            if process.returncode != 0:
-                logger.critical(out)
-                logger.critical(err)
-                return None
+        # See also qstat -f
+        #http://sc.tamu.edu/help/origins/batch.shtml#qstat
+
+        # qstat: 5904257.frontal1 Job has finished, use -x or -H to obtain historical job information\n
+        returncode, out, err = _run_command(["qstat", str(self.qid), "-x"])
+        if returncode != 0:
+            logger.critical(out)
+            logger.critical(err)
+            return None
 
         # Here I don't know what's happeing but I get an output that differs from the one obtained in the terminal.
         # Job id            Name             User              Time Use S Queue
@@ -438,6 +604,7 @@ class PbsProJob(QueueJob):
         # Once could use tracejob....
         # See also http://docs.adaptivecomputing.com/torque/3-0-5/a.gprologueepilogue.php
         self.set_status_exitcode_signal(status, None, None)
+        return AttrDict(exitcode=None, signal=None, status=str(status))
 
 
 #################################
@@ -21,7 +21,7 @@ from monty.json import MSONable
 from monty.fnmatch import WildCard
 from pymatgen.core.units import Memory
 from pymatgen.util.serialization import json_pretty_dump, pmg_serialize
-from .utils import File, Directory, irdvars_for_ext, abi_splitext, FilepathFixer, Condition, SparseHistogram
+from .utils import File, Directory, BuildPlan, irdvars_for_ext, abi_splitext, FilepathFixer, Condition, SparseHistogram
 from .qadapters import make_qadapter, QueueAdapter, QueueAdapterError
 from . import qutils as qu
 from .db import DBConnector
@@ -29,6 +29,7 @@ from .nodes import Status, Node, NodeError, NodeResults, FileNode #, check_spect
 from . import abiinspect
 from . import events
 from .abitimer import AbinitTimerParser
+from .profiling import count
 
 
 __author__ = "Matteo Giantomassi"
@@ -906,19 +907,11 @@ batch_adapter:
         """Cancel the job. Returns exit status."""
         return self.qadapter.cancel(job_id)
 
-    def write_jobfile(self, task, **kwargs):
+    def get_jobfile_string(self, task, **kwargs):
         """
-        Write the submission script. Return the path of the script
-
-        ================  ============================================
-        kwargs            Meaning
-        ================  ============================================
-        exec_args         List of arguments passed to task.executable.
-                          Default: no arguments.
-
-        ================  ============================================
+        Return string with the submission script. See `write_jobfile` for the meaning of kwargs.
         """
-        script = self.qadapter.get_script_str(
+        return self.qadapter.get_script_str(
             job_name=task.name,
             launch_dir=task.workdir,
             executable=task.executable,
@@ -930,6 +923,20 @@ batch_adapter:
             exec_args=kwargs.pop("exec_args", []),
         )
 
+    def write_jobfile(self, task, **kwargs):
+        """
+        Write the submission script. Return the path of the script
+
+        ================  ============================================
+        kwargs            Meaning
+        ================  ============================================
+        exec_args         List of arguments passed to task.executable.
+                          Default: no arguments.
+
+        ================  ============================================
+        """
+        script = self.get_jobfile_string(task, **kwargs)
+
         # Write the script.
         with open(task.job_file.path, "w") as fh:
             fh.write(script)
@@ -1910,6 +1917,8 @@ class Task(Node, metaclass=abc.ABCMeta):
         This function checks the status of the task by inspecting the output and the
         error files produced by the application and by the queue manager.
         """
+        count("tasks_checked")
+
         # 1) see it the job is blocked
         # 2) see if an error occured at submitting the job the job was submitted, TODO these problems can be solved
         # 3) see if there is output
@@ -2308,17 +2317,25 @@ class Task(Node, metaclass=abc.ABCMeta):
         Creates the working directory and the input files of the |Task|.
         It does not overwrite files if they already exist.
         """
-        # Create dirs for input, output and tmp data.
-        self.indir.makedirs()
-        self.outdir.makedirs()
-        self.tmpdir.makedirs()
+        plan = BuildPlan()
+        self.add_to_build_plan(plan)
+        plan.execute(max_workers=1)
 
-        # Write files file and input file.
-        if not self.files_file.exists:
-            self.files_file.write(self.filesfile_string)
+    def add_to_build_plan(self, plan):
+        """
+        Add the directories and the files of the |Task| to the |BuildPlan| ``plan``.
+        The files file is not overwritten if it already exists.
+        """
+        # Dirs for input, output and tmp data.
+        plan.add_dirs(self.indir.path, self.outdir.path, self.tmpdir.path)
 
-        self.input_file.write(self.make_input())
-        self.manager.write_jobfile(self)
+        # Files file, input file and submission script.
+        def nl(s):
+            return s if s.endswith("\n") else s + "\n"
+
+        plan.add_file(self.files_file.path, nl(self.filesfile_string), overwrite=False)
+        plan.add_file(self.input_file.path, nl(self.make_input()))
+        plan.add_file(self.job_file.path, self.manager.get_jobfile_string(self), mode=0o740)
 
     #@check_spectator
     def rmtree(self, exclude_wildcard=""):
@@ -2357,52 +2374,34 @@ class Task(Node, metaclass=abc.ABCMeta):
         This method is called when the task reaches S_OK. It removes all the output files
         produced by the task that are not needed by its children as well as the output files
         produced by its parents if no other node needs them.
+        Files are removed by the garbage collector, in a background thread if gc.asynchronous.
 
         Args:
             follow_parents: If true, the output files of the parents nodes will be removed if possible.
 
         Return:
-            list with the absolute paths of the files that have been removed.
+            list with the absolute paths of the files that have been removed (or scheduled for removal).
         """
         paths = []
         if self.status != self.S_OK:
             self.history.warning("Calling task.clean_output_files on a task whose status != S_OK")
 
+        gc = self.gc
+
         # Remove all files in tmpdir.
-        self.tmpdir.clean()
-
-        # Find the file extensions that should be preserved since these files are still
-        # needed by the children who haven't reached S_OK
-        except_exts = set()
-        for child in self.get_children():
-            if child.status == self.S_OK: continue
-            # Find the position of self in child.deps and add the extensions.
-            i = [dep.node for dep in child.deps].index(self)
-            except_exts.update(child.deps[i].exts)
-
-        # Remove the files in the outdir of the task but keep except_exts.
-        exts = self.gc.exts.difference(except_exts)
-        #print("Will remove its extensions: ", exts)
-        paths += self.outdir.remove_exts(exts)
+        gc.remove(self.tmpdir.list_filepaths())
+
+        # Remove the files in the outdir of the task but keep the extensions
+        # still needed by the children who haven't reached S_OK
+        exts = gc.exts.difference(gc.get_needed_exts(self))
+        paths += gc.remove_exts(self.outdir, exts)
         if not follow_parents: return paths
 
         # Remove the files in the outdir of my parents if all the possible dependencies have been fulfilled.
         for parent in self.get_parents():
-
-            # Here we build a dictionary file extension --> list of child nodes requiring this file from parent
-            # e.g {"WFK": [node1, node2]}
-            ext2nodes = collections.defaultdict(list)
-            for child in parent.get_children():
-                if child.status == child.S_OK: continue
-                i = [d.node for d in child.deps].index(parent)
-                for ext in child.deps[i].exts:
-                    ext2nodes[ext].append(child)
-
             # Remove extension only if no node depends on it!
-            except_exts = [k for k, lst in ext2nodes.items() if lst]
-            exts = self.gc.exts.difference(except_exts)
-            #print("%s removes extensions %s from parent node %s" % (self, exts, parent))
-            paths += parent.outdir.remove_exts(exts)
+            exts = gc.exts.difference(gc.get_needed_exts(parent))
+            paths += gc.remove_exts(parent.outdir, exts)
 
         self.history.info("Removed files: %s" % paths)
         return paths
@@ -0,0 +1,119 @@
+# coding: utf-8
+"""Tests for archive module."""
+import os
+import gzip
+import json
+import time
+import shutil
+import tarfile
+import tempfile
+
+from abipy.core.testing import AbipyTest
+from abipy.flowtk.archive import ParallelGzipWriter, FlowArchiver, load_manifest, md5sum
+
+
+class ParallelGzipWriterTest(AbipyTest):
+
+    def test_multimember(self):
+        """Testing ParallelGzipWriter."""
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, "data.gz")
+        data = b"".join(b"line %d with some text\n" % i for i in range(20000))
+        with ParallelGzipWriter(path, nprocs=3, chunksize=1000) as gz:
+            for i in range(0, len(data), 777):
+                gz.write(data[i:i+777])
+            assert gz.tell() == len(data)
+
+        with gzip.open(path, "rb") as fh:
+            assert fh.read() == data
+        shutil.rmtree(tmpdir)
+
+
+class FlowArchiverTest(AbipyTest):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.workdir = os.path.join(self.tmpdir, "flow_test")
+        for task in ("w0/t0", "w0/t1", "w1/t0"):
+            for dirname in ("indata", "outdata", "tmpdata"):
+                os.makedirs(os.path.join(self.workdir, task, dirname))
+            self.write(os.path.join(task, "run.abi"), "ecut 10\n" + task)
+            self.write(os.path.join(task, "outdata", "out_GSR.nc"), 1000 * task)
+            self.write(os.path.join(task, "outdata", "out_WFK"), 5000 * task)
+            os.symlink(os.path.join(self.workdir, "w0/t0/outdata/out_WFK"),
+                       os.path.join(self.workdir, task, "indata", "in_WFK"))
+        self.write("__AbinitFlow__.pickle", "pickle")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, relpath, text):
+        with open(os.path.join(self.workdir, relpath), "wt") as fh:
+            fh.write(text)
+
+    def members(self, path):
+        with tarfile.open(path, "r:gz") as tar:
+            return {m.name: (tar.extractfile(m).read() if m.isfile() else None) for m in tar.getmembers()}
+
+    def test_archive(self):
+        """Testing FlowArchiver with filters, manifest and incremental archives."""
+        cwd = os.getcwd()
+        archiver = FlowArchiver(self.workdir, exclude_exts="WFK", nprocs=2)
+        name = os.path.join(self.tmpdir, "flow_test.tar.gz")
+        paths, manifest_path = archiver.make_archives(name)
+        assert os.getcwd() == cwd
+        assert paths == [name]
+        assert manifest_path == os.path.join(self.tmpdir, "flow_test.manifest.json")
+
+        members = self.members(name)
+        assert "flow_test/w0/t1/outdata/out_GSR.nc" in members
+        assert "flow_test/w1/t0/outdata" in members
+        # Links and excluded extensions are not archived.
+        assert not any(k.endswith("WFK") for k in members)
+        with open(os.path.join(self.workdir, "w0/t1/run.abi"), "rb") as fh:
+            assert members["flow_test/w0/t1/run.abi"] == fh.read()
+
+        manifest = load_manifest(manifest_path)
+        files = manifest["files"]
+        assert set(files.keys()) == set(members.keys())
+        entry = files["flow_test/w0/t1/run.abi"]
+        assert entry["archive"] == "flow_test.tar.gz"
+        assert entry["md5"] == md5sum(os.path.join(self.workdir, "w0/t1/run.abi"))
+
+        # Incremental archive with a modified file, a new file and a touched file.
+        self.write("w0/t1/run.abi", "ecut 20\n")
+        self.write("w1/t0/run.abo", "output")
+        touched = os.path.join(self.workdir, "w0/t0/run.abi")
+        os.utime(touched, (time.time() + 10, time.time() + 10))
+
+        name2 = os.path.join(self.tmpdir, "flow_test_2.tar.gz")
+        paths, manifest_path2 = archiver.make_archives(name2, since=manifest_path)
+        assert set(self.members(name2).keys()) == {"flow_test/w0/t1/run.abi", "flow_test/w1/t0/run.abo"}
+        files2 = load_manifest(manifest_path2)["files"]
+        assert set(files2.keys()) == set(files.keys()) | {"flow_test/w1/t0/run.abo"}
+        assert files2["flow_test/w0/t1/run.abi"]["archive"] == "flow_test_2.tar.gz"
+        assert files2["flow_test/w0/t0/run.abi"]["archive"] == "flow_test.tar.gz"
+        assert files2["flow_test/w0/t0/run.abi"]["mtime"] == os.stat(touched).st_mtime
+
+    def test_shards(self):
+        """Testing FlowArchiver with one archive per task."""
+        archiver = FlowArchiver(self.workdir, max_filesize="10 Kb", exclude_dirs="tmpdata", nprocs=1)
+        shards = {"w0_t0": os.path.join(self.workdir, "w0/t0"), "w1_t0": os.path.join(self.workdir, "w1/t0")}
+        name = os.path.join(self.tmpdir, "flow_test.tar.gz")
+        paths, manifest_path = archiver.make_archives(name, shards=shards)
+        assert paths == [name] + [os.path.join(self.tmpdir, "flow_test-%s.tar.gz" % s) for s in ("w0_t0", "w1_t0")]
+
+        main = self.members(name)
+        assert "flow_test/__AbinitFlow__.pickle" in main and "flow_test/w0/t1/run.abi" in main
+        assert not any(k.startswith("flow_test/w0/t0") for k in main)
+        shard = self.members(paths[1])
+        assert "flow_test/w0/t0/run.abi" in shard and "flow_test/w0/t0/outdata/out_GSR.nc" in shard
+        # max_filesize and exclude_dirs.
+        assert "flow_test/w0/t0/outdata/out_WFK" not in shard
+        assert not any("tmpdata" in k for k in shard)
+
+        # Nothing changed: the shards are not written again.
+        paths, _ = archiver.make_archives(os.path.join(self.tmpdir, "new.tar.gz"), since=manifest_path,
+                                          shards=shards)
+        assert paths == [os.path.join(self.tmpdir, "new.tar.gz")]
+        assert not self.members(paths[0])
@@ -0,0 +1,60 @@
+# coding: utf-8
+"""Tests for db module."""
+import os
+import tempfile
+
+from abipy.core.testing import AbipyTest
+from abipy.flowtk.db import DBConnector, SQLiteStore, mongo_getattr
+
+
+class DbTest(AbipyTest):
+
+    def test_mongo_getattr(self):
+        """Testing mongo_getattr."""
+        d = {"a": {"b": 1}, "x": 2}
+        assert mongo_getattr(d, "a.b") == 1
+        assert mongo_getattr(d, "x") == 2
+        with self.assertRaises(KeyError):
+            mongo_getattr(d, "a.b.c")
+
+    def test_sqlite_store(self):
+        """Testing SQLiteStore."""
+        path = os.path.join(tempfile.mkdtemp(), "results.sqlite")
+        docs = [dict(_id="w0_t%d" % i, out={"ecut": 10 + i}, node_class="ScfTask") for i in range(5)]
+        with SQLiteStore(path) as store:
+            assert store.count() == 0 and store.find_one() is None
+            assert store.upsert_many(docs) == 5
+            docs[0]["out"]["ecut"] = 100
+            assert store.upsert_many(docs[:1]) == 1
+            assert store.count() == 5
+            # The last document wins if the same _id appears more than once in the batch.
+            new = [dict(_id="w1_t0", out={"ecut": ecut}, node_class="ScfTask") for ecut in (0, 20)]
+            assert store.upsert_many(new) == 2
+            assert store.find({"_id": "w1_t0"}) == new[1:]
+            assert store.count() == 6
+
+        # Documents are saved in the file.
+        docs.append(new[1])
+        with SQLiteStore(path) as store:
+            assert store.find() == docs
+            assert store.find({"_id": "w0_t0"}) == docs[:1]
+            assert store.find({"out.ecut": 12}) == [docs[2]]
+            assert len(store.find({"node_class": "ScfTask"})) == 6
+            assert store.find({"out.foo": 1}) == []
+            with self.assertRaises(ValueError):
+                store.find({"$or": []})
+
+        with self.assertRaises(ValueError):
+            SQLiteStore(path, table="drop table")
+
+    def test_connector(self):
+        """Testing DBConnector with sqlite backend."""
+        assert not DBConnector()
+        path = os.path.join(tempfile.mkdtemp(), "abinit.sqlite")
+        connector = DBConnector(backend="sqlite", path=path, collection="flows")
+        assert connector and connector.backend == "sqlite"
+        with connector.get_store() as store:
+            assert isinstance(store, SQLiteStore) and store.table == "flows"
+
+        with self.assertRaises(ValueError):
+            DBConnector(backend="foo")
@@ -101,6 +101,21 @@ batch_adapter: *batch
 
 class FlowTest(FlowUnitTest):
 
+    def test_build(self):
+        """Testing Flow.build and rebuild with unchanged files."""
+        flow = Flow(workdir=self.workdir, manager=self.manager)
+        flow.register_task(self.fake_input)
+        flow.register_task(self.fake_input)
+        stats = flow.build()
+        assert stats.num_written == 6 and stats.num_skipped == 0
+        task = flow[1][0]
+        assert task.files_file.exists and task.input_file.exists and task.job_file.exists
+        assert task.indir.exists and task.outdir.exists and task.tmpdir.exists and flow[1].outdir.exists
+        assert task.input_file.read() == task.make_input() + "\n"
+
+        stats = flow.build(max_workers=1)
+        assert stats.num_written == 0 and stats.num_skipped == 6
+
     def test_base(self):
         """Testing Flow..."""
         aequal = self.assertEqual
@@ -415,3 +430,321 @@ class TestBatchLauncher(FlowUnitTest):
         batch.pickle_dump()
         batch_from_pickle = BatchLauncher.pickle_load(batch.workdir)
         assert all(f1 == f2 for f1, f2 in zip(batch.flows, batch_from_pickle.flows))
+
+
+MOCK_ABINIT = """\
+#!/bin/sh
+# Mock abinit: log the input file read from the files file and reject negative ecut.
+read abi_input
+echo "$abi_input" >> {logfile}
+grep -q "^ *ecut -" "$abi_input" && exit 1
+exit 0
+"""
+
+
+class AbivalidateInputsTest(AbipyTest):
+    """Test Flow.abivalidate_inputs with a mock abinit executable."""
+
+    MANAGER = """\
+qadapters:
+    - priority: 1
+      queue: {qtype: shell, qname: localhost}
+      job: {}
+      limits: {timelimit: 1:00:00, min_cores: 1, max_cores: 1}
+      hardware: {num_nodes: 1, sockets_per_node: 1, cores_per_socket: 1, mem_per_node: 4 Gb}
+"""
+
+    def setUp(self):
+        self.bindir = tempfile.mkdtemp()
+        self.logfile = os.path.join(self.bindir, "calls.log")
+        path = os.path.join(self.bindir, "abinit")
+        with open(path, "wt") as fh:
+            fh.write(MOCK_ABINIT.format(logfile=self.logfile))
+        os.chmod(path, 0o755)
+        self.old_path = os.environ.get("PATH", "")
+        os.environ["PATH"] = self.bindir + os.pathsep + self.old_path
+
+        self.workdir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.bindir, "abivalidate_cache.json")
+        self.manager = TaskManager.from_string(self.MANAGER)
+
+    def tearDown(self):
+        os.environ["PATH"] = self.old_path
+        shutil.rmtree(self.bindir)
+        shutil.rmtree(self.workdir)
+
+    def num_runs(self):
+        """Number of times the mock abinit has been executed."""
+        if not os.path.exists(self.logfile): return 0
+        with open(self.logfile, "rt") as fh:
+            return len(fh.readlines())
+
+    def make_flow(self, ecuts):
+        """Flow with one task for each value of ecut."""
+        flow = Flow(workdir=self.workdir, manager=self.manager)
+        for ecut in ecuts:
+            inp = abilab.AbinitInput(structure=abidata.cif_file("si.cif"), pseudos=abidata.pseudos("14si.pspnc"))
+            inp.set_vars(ecut=ecut, nband=4, ngkpt=[2, 2, 2], tolvrs=1e-8)
+            flow.register_scf_task(inp)
+        flow.allocate()
+        return flow
+
+    def test_abivalidate_inputs(self):
+        """Testing deduplication and cache in Flow.abivalidate_inputs."""
+        kws = dict(max_workers=2, cache=self.cache_path, manager=self.manager)
+        flow = self.make_flow([4, 6, 4, 4, 6])
+        isok, results = flow.abivalidate_inputs(**kws)
+        assert isok and len(results) == 5
+        # Two distinct inputs --> two dry runs. Equal inputs share the result.
+        assert self.num_runs() == 2
+        assert results[0] is results[2] and results[1] is results[4]
+        assert all(r.task is not None for r in results)
+
+        # Rebuild the flow: everything is in the cache.
+        flow = self.make_flow([4, 6, 4, 4, 6])
+        isok, results = flow.abivalidate_inputs(**kws)
+        assert isok and self.num_runs() == 2
+        assert all(r.retcode == 0 and r.task is None for r in results)
+
+        # Extend the flow: only the new inputs are validated. Failures are not cached.
+        flow = self.make_flow([4, 6, 8, -1])
+        isok, results = flow.abivalidate_inputs(**kws)
+        assert not isok and self.num_runs() == 4
+        assert [r.retcode for r in results[:3]] == [0, 0, 0] and results[3].retcode != 0
+        assert results[2].task is not None and results[3].log_file is not None
+        isok, results = flow.abivalidate_inputs(**kws)
+        assert not isok and self.num_runs() == 5
+
+        # Without cache, all the distinct inputs are validated again.
+        isok, results = flow.abivalidate_inputs(max_workers=1, cache=False, manager=self.manager)
+        assert not isok and self.num_runs() == 9
+
+        # A different executable in the environment of the manager invalidates the cache.
+        flow = self.make_flow([4, 6])
+        assert flow.abivalidate_inputs(**kws)[0] and self.num_runs() == 9
+        otherdir = os.path.join(self.bindir, "other")
+        os.makedirs(otherdir)
+        shutil.copy(os.path.join(self.bindir, "abinit"), otherdir)
+        manager = TaskManager.from_string(self.MANAGER.replace(
+            "job: {}", "job: {pre_run: 'export PATH=%s:$PATH'}" % otherdir))
+        assert flow.abivalidate_inputs(max_workers=1, cache=self.cache_path, manager=manager)[0]
+        assert self.num_runs() == 11
+
+        # The cache is not used if the executable cannot be found.
+        os.remove(os.path.join(otherdir, "abinit"))
+        manager = TaskManager.from_string(self.MANAGER.replace(
+            "job: {}", "job: {pre_run: 'export PATH=%s'}" % otherdir))
+        with self.assertWarns(UserWarning):
+            flow.abivalidate_inputs(max_workers=1, cache=self.cache_path, manager=manager)
+
+
+class GarbageCollectorTest(FlowUnitTest):
+
+    def make_files(self, flow):
+        """Create fake output files of 1000 bytes."""
+        for task in flow.iflat_tasks():
+            task.outdir.makedirs()
+            task.tmpdir.makedirs()
+            for fname in ("out_WFK", "out_DEN", "out_GSR.nc", "tmp_WFK"):
+                dirpath = task.tmpdir.path if fname.startswith("tmp") else task.outdir.path
+                with open(os.path.join(dirpath, fname), "wb") as fh:
+                    fh.write(1000 * b"x")
+
+    def test_garbage_collector(self):
+        """Testing asynchronous garbage collector with consumer map."""
+        flow = Flow(workdir=self.workdir, manager=self.manager)
+        task0 = flow.register_task(self.fake_input)[0]
+        work = Work()
+        work.register(self.fake_input)
+        work.register(self.fake_input)
+        flow.register_work(work, deps={task0: "WFK"})
+        flow.allocate()
+        flow.set_garbage_collector(exts=["WFK", "DEN"])
+        gc = flow.gc
+        assert gc.asynchronous and gc.max_workdir_size is None
+        self.make_files(flow)
+
+        assert [c for c, _ in gc.get_consumers(task0)] == [work, work[0], work[1]]
+        assert gc.get_needed_exts(task0) == {"WFK"}
+        assert gc.get_consumers(work[0]) == []
+
+        # task0 is completed. WFK is still needed by the children.
+        task0._status = task0.S_OK
+        paths = task0.clean_output_files()
+        gc.wait()
+        assert paths == [task0.outdir.path_in("out_DEN")]
+        assert not task0.tmpdir.list_filepaths()
+        assert task0.outdir.has_abiext("WFK") and task0.outdir.has_abiext("GSR")
+        assert gc.num_removed == 2 and gc.reclaimed_bytes == 2000
+
+        # The children are completed: the WFK file of the parent can be removed.
+        for task in work:
+            task._status = task.S_OK
+            task.clean_output_files()
+        gc.wait()
+        assert not task0.outdir.has_abiext("WFK")
+        assert not work[1].outdir.has_abiext("WFK") and work[1].outdir.has_abiext("GSR")
+        assert gc.num_removed == 2 + 2 * 3 + 1
+        assert "reclaimed" in str(gc)
+
+        # The consumer map is rebuilt when new nodes are added.
+        task3 = flow.register_task(self.fake_input, deps={work[0]: "DEN"})[0]
+        flow.allocate()
+        assert gc.get_consumers(work[0]) == [(task3, ["DEN"])]
+
+        # Runtime objects are not pickled, statistics are saved.
+        flow.build_and_pickle_dump()
+        new_gc = Flow.pickle_load(self.workdir).gc
+        assert new_gc.reclaimed_bytes == gc.reclaimed_bytes and new_gc.exts == gc.exts
+        assert new_gc._pending == set() and new_gc._worker is None
+
+    def test_disk_budget(self):
+        """Testing garbage collector with max_workdir_size."""
+        flow = Flow(workdir=self.workdir, manager=self.manager)
+        task0 = flow.register_task(self.fake_input)[0]
+        task1 = flow.register_task(self.fake_input, deps={task0: "WFK"})[0]
+        flow.allocate()
+        flow.set_garbage_collector(exts="WFK", policy="flow", max_workdir_size=10000, asynchronous=False)
+        self.make_files(flow)
+        with open(task0.outdir.path_in("out_WFK"), "wb") as fh:
+            fh.write(3000 * b"x")
+        # 10000 bytes > 0.9 * max_workdir_size
+        task0._status = task0.S_OK
+        gc = flow.gc
+
+        # WFK of task0 is needed by task1.
+        flow.check_status()
+        assert gc.num_removed == 0 and task0.outdir.has_abiext("WFK")
+
+        # Budget is checked at most every BUDGET_INTERVAL seconds.
+        task1._status = task1.S_OK
+        flow.check_status()
+        assert gc.num_removed == 0
+        gc._last_budget_check = 0
+        flow.check_status()
+        # The largest file is removed first and this is enough to go below the low watermark.
+        assert gc.num_removed == 1 and gc.reclaimed_bytes == 3000
+        assert not task0.outdir.has_abiext("WFK") and task1.outdir.has_abiext("WFK")
+
+
+class CountingWork(Work):
+    """Work that records the senders passed to on_ok."""
+
+    def on_ok(self, sender):
+        self.__dict__.setdefault("senders", []).append(sender)
+        return super().on_ok(sender)
+
+
+class EventBusTest(FlowUnitTest):
+
+    def test_event_bus(self):
+        """Testing EventBus and reverse dependency index."""
+        flow = Flow(workdir=self.workdir, manager=self.manager)
+        work0 = CountingWork()
+        t0, t1 = work0.register_scf_task(self.fake_input), work0.register_scf_task(self.fake_input)
+        flow.register_work(work0)
+        work1 = flow.register_task(self.fake_input, deps={t0: "DEN", work0: "WFK"})
+        flow.allocate()
+        bus = flow.event_bus
+
+        # Receivers are connected at allocation time and connecting twice has no effect.
+        assert bus.get_receivers(sender=t0) == [(work0, "on_ok")]
+        flow.connect_signals()
+        assert len(bus.get_receivers(signal=t0.S_OK)) == 3
+        assert t0.get_children() == [work1[0]] and work0.get_children() == [work1[0]]
+        assert not t1.get_children() and not work1[0].get_children()
+        assert bus.get_consumers(t0) == [(work1[0], ["DEN"])]
+
+        # Signals are delivered immediately outside of a batch block.
+        t0.finalized = True
+        t0.set_status(t0.S_OK, "done")
+        assert work0.senders == [t0] and not work0.finalized
+
+        # Signals are queued and deduplicated inside a batch block.
+        t1.finalized = True
+        with bus.batch():
+            t1.set_status(t1.S_OK, "done")
+            t1.set_status(t1.S_OK, "done")
+            with bus.batch():
+                t0.send_signal(t0.S_OK)
+            assert work0.senders == [t0]
+        assert work0.senders == [t0, t1, t0] and work0.finalized
+
+        # Queued signals are delivered also if an exception is raised in the block.
+        with self.assertRaises(RuntimeError):
+            with bus.batch():
+                with bus.batch():
+                    t1.send_signal(t1.S_OK)
+                    raise RuntimeError("foo")
+        assert work0.senders == [t0, t1, t0, t1] and bus._batch_level == 0
+
+        # A receiver raising an exception does not prevent the delivery of the other signals.
+        def on_ok_error(sender):
+            raise ValueError("bar")
+
+        work0.on_ok_error = on_ok_error
+        bus.connect(t0, t0.S_OK, work0, "on_ok_error")
+        with self.assertRaises(ValueError):
+            with bus.batch():
+                t0.send_signal(t0.S_OK)
+                t1.send_signal(t1.S_OK)
+        assert work0.senders == [t0, t1, t0, t1, t0, t1] and bus._batch_level == 0 and not bus._pending
+        assert bus.disconnect(t0, t0.S_OK, work0, "on_ok_error")
+        del work0.on_ok_error
+
+        # The index is rebuilt when the dependencies change.
+        work1[0].remove_deps(work1[0].deps[0])
+        assert not t0.get_children()
+
+        work0.disconnect_signals()
+        assert not bus.get_receivers(sender=t0)
+        assert t0.send_signal(t0.S_OK) == []
+
+        # The bus is saved in the pickle file.
+        work0.connect_signals()
+        flow.build_and_pickle_dump()
+        new_flow = Flow.pickle_load(self.workdir, spectator_mode=False)
+        assert new_flow.event_bus.get_receivers(sender=new_flow[0][1]) == [(new_flow[0], "on_ok")]
+        assert new_flow[0][0].get_children() == []
+        assert new_flow.event_bus._batch_level == 0 and not new_flow.event_bus._pending
+
+
+class ResultsExportTest(FlowUnitTest):
+
+    def test_export_results(self):
+        """Testing the export of the results to a SQLite document store."""
+        from abipy.flowtk.db import SQLiteStore
+        flow = Flow(workdir=self.workdir, manager=self.manager)
+        work = flow.register_task(self.fake_input)
+        work.register(self.fake_input)
+        work.register(self.fake_input)
+        flow.allocate()
+        flow.build_and_pickle_dump()
+
+        for task in work[:2]:
+            task._status = task.S_OK
+            task._returncode = 0
+        # Fake GSR file: the summary reports the error but the task is exported.
+        with open(work[0].outdir.path_in("out_GSR.nc"), "wb") as fh:
+            fh.write(b"foo")
+
+        store = SQLiteStore(":memory:")
+        r = flow.export_results(store=store, batch_size=1)
+        assert r.num_docs == 2 and not r.errors and store.count() == 2
+        doc = store.find_one({"node_key": "w0_t0"})
+        assert doc["_id"] == "%s:w0_t0" % flow.workdir and doc["flow_id"] == flow.workdir
+        assert doc["node_id"] == work[0].node_id and doc["node_status"] == "Completed"
+        assert "error" in doc["summary"]["gsr"]
+        assert store.find_one({"node_key": "w0_t1"})["summary"] == {}
+
+        # Re-export replaces the documents. Tasks that are not completed are reported in errors.
+        r = flow.export_results(store=store, nids=[task.node_id for task in work])
+        assert r.num_docs == 2 and list(r.errors.keys()) == [work[2].node_id]
+        assert store.count() == 2
+
+        # Parallel extraction: the processes read the flow from the pickle file.
+        flow.pickle_dump()
+        r = flow.export_results(store=store, max_workers=2, batch_size=1)
+        assert r.num_docs == 2 and not r.errors
+        assert store.find_one({"_id": "%s:w0_t1" % flow.workdir})["node_id"] == work[1].node_id
+        store.close()
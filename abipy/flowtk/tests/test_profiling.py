@@ -0,0 +1,154 @@
+# coding: utf-8
+"""Tests for profiling module."""
+import os
+import time
+import json
+import shutil
+import tempfile
+import threading
+
+import abipy.data as abidata
+import abipy.abilab as abilab
+
+from abipy.core.testing import AbipyTest
+from abipy.flowtk import Flow, TaskManager, PyLauncher
+from abipy.flowtk.profiling import CycleProfiler, CycleLog, phase, count, profile_cycle
+
+
+class CycleProfilerTest(AbipyTest):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.tmpdir, CycleProfiler.LOG_FNAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_cycle_profiler(self):
+        """Testing CycleProfiler."""
+        # No cycle in progress.
+        with phase("check_status"):
+            count("tasks_checked")
+        with profile_cycle(None):
+            pass
+        assert not os.path.exists(self.filepath)
+
+        prof = CycleProfiler(self.filepath)
+        assert repr(prof)
+        with prof.cycle(nlaunch=3) as cycle:
+            with phase("check_status"):
+                time.sleep(0.02)
+                with phase("pickle_dump"):
+                    time.sleep(0.02)
+                for _ in range(5): count("tasks_checked")
+                count("bytes_pickled", 100)
+            # Nested cycles are ignored.
+            with prof.cycle():
+                with phase("rapidfire"):
+                    pass
+            # Phases and counters of other threads are ignored.
+            def target():
+                with phase("thread"):
+                    count("tasks_checked")
+                    time.sleep(0.01)
+            thread = threading.Thread(target=target)
+            thread.start()
+            thread.join()
+
+        r = cycle.record
+        assert prof.num_cycles == 1
+        assert r["nlaunch"] == 3
+        assert set(r["phases"]) == {"check_status", "pickle_dump", "rapidfire", "other"}
+        # Exclusive semantics: the time of pickle_dump is not included in check_status.
+        assert 0.015 < r["phases"]["check_status"] < 0.035
+        assert r["phases"]["pickle_dump"] >= 0.015
+        self.assert_almost_equal(sum(r["phases"].values()), r["wall"], decimal=3)
+        assert r["counters"]["tasks_checked"] == 5
+        assert r["counters"]["bytes_pickled"] == 100
+
+        with open(self.filepath, "rt") as fh:
+            assert json.loads(fh.readline())["counters"]["tasks_checked"] == 5
+
+        # Exceptions are propagated and the record is written.
+        with self.assertRaises(RuntimeError):
+            with prof.cycle():
+                with phase("restart"):
+                    raise RuntimeError("restart failed")
+        assert prof.num_cycles == 2
+
+        log = CycleLog.from_flowdir(self.tmpdir)
+        assert len(log) == 2
+        assert log.phase_names[0] in ("check_status", "pickle_dump")
+        assert "restart" in log.phase_names
+        assert log.counter_names == ["bytes_pickled", "tasks_checked"]
+        df = log.get_dataframe()
+        assert len(df) == 2 and "check_status" in df and "tasks_checked" in df
+        assert df["tasks_checked"].tolist() == [5, 0]
+        s = log.to_string(verbose=1)
+        assert "check_status" in s and "tasks_checked" in s
+        assert "Number of cycles: 1" in log.to_string(last=1)
+        assert "No scheduler cycle" in CycleLog([]).to_string()
+
+        if self.has_matplotlib():
+            assert log.plot(show=False)
+
+    def test_rolling_log(self):
+        """Testing truncation of the log file."""
+        prof = CycleProfiler(self.filepath, maxlen=3)
+        for i in range(7):
+            with prof.cycle(index=i):
+                pass
+        log = CycleLog.from_file(self.filepath)
+        assert [r.index for r in log.records] == [4, 5, 6]
+
+        # The number of lines is read from the file.
+        prof = CycleProfiler(self.filepath, maxlen=3)
+        assert prof._nlines == 3
+
+        # Invalid lines are ignored.
+        with open(self.filepath, "at") as fh:
+            fh.write('{"wall": ')
+        assert len(CycleLog.from_file(self.filepath)) == 3
+
+    def test_sampling_profiler(self):
+        """Testing CycleProfiler with sampling profiler."""
+        prof = CycleProfiler(self.filepath, sampling_interval=0.001)
+        try:
+            with prof.cycle():
+                with phase("check_status"):
+                    end = time.time() + 0.1
+                    while time.time() < end:
+                        pass
+        finally:
+            prof.close()
+
+        with open(prof.stacks_path, "rt") as fh:
+            lines = fh.readlines()
+        assert lines
+        stack, num = lines[0].rsplit(" ", 1)
+        assert "test_sampling_profiler" in stack and int(num) > 0
+
+    def test_rapidfire(self):
+        """Testing PyLauncher.rapidfire with an active CycleProfiler."""
+        manager = TaskManager.from_string("""\
+qadapters:
+    - priority: 1
+      queue: {qtype: shell, qname: localhost}
+      job: {pre_run: "exit 0"}
+      limits: {timelimit: 1:00:00, min_cores: 1, max_cores: 1}
+      hardware: {num_nodes: 1, sockets_per_node: 1, cores_per_socket: 1, mem_per_node: 4 Gb}
+""")
+        flow = Flow(workdir=os.path.join(self.tmpdir, "flow"), manager=manager)
+        inp = abilab.AbinitInput(structure=abidata.cif_file("si.cif"), pseudos=abidata.pseudos("14si.pspnc"))
+        inp.set_vars(ecut=4, nband=4, ngkpt=[2, 2, 2], tolvrs=1e-8)
+        for _ in range(2):
+            flow.register_scf_task(inp)
+        flow.build_and_pickle_dump()
+
+        prof = CycleProfiler(self.filepath)
+        with prof.cycle() as cycle:
+            with phase("rapidfire"):
+                assert PyLauncher(flow).rapidfire(max_nlaunch=-1, max_loops=1) == 2
+
+        assert cycle.record["counters"]["tasks_launched"] == 2
+        assert all(task.status == task.S_SUB for task in flow.iflat_tasks())
@@ -0,0 +1,111 @@
+# coding: utf-8
+"""Tests for pseudos module."""
+import os
+import pickle
+import shutil
+import tempfile
+import abipy.data as abidata
+
+from abipy.core.testing import AbipyTest
+from abipy.flowtk import pseudos as pseudos_module
+from abipy.flowtk.pseudos import Pseudo, PseudoTable, PseudoCache
+
+
+class PseudoCacheTest(AbipyTest):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for fname in ("14si.pspnc", "Si.GGA_PBE-JTH-paw.xml", "O.psp8", "8o.pspnc"):
+            shutil.copy(os.path.join(abidata.pseudo_dir, fname), self.tmpdir)
+        self.paths = [os.path.join(self.tmpdir, f) for f in ("14si.pspnc", "Si.GGA_PBE-JTH-paw.xml", "O.psp8")]
+        # Don't touch the cache in $HOME.
+        self.old_cache = pseudos_module._PSEUDO_CACHE
+        pseudos_module._PSEUDO_CACHE = PseudoCache(os.path.join(self.tmpdir, "cache", "global_cache.pickle"))
+
+    def tearDown(self):
+        pseudos_module._PSEUDO_CACHE = self.old_cache
+        shutil.rmtree(self.tmpdir)
+
+    def test_pseudo_cache(self):
+        """Testing PseudoCache."""
+        filepath = os.path.join(self.tmpdir, "cache", "pseudos_cache.pickle")
+        cache = PseudoCache(filepath)
+        pseudos = cache.get_pseudos(self.paths)
+        assert cache.num_misses == 3 and cache.num_hits == 0 and len(cache) == 3
+        assert os.path.exists(filepath)
+        for pseudo, path in zip(pseudos, self.paths):
+            ref = Pseudo.from_file(path)
+            assert pseudo == ref and pseudo.filepath == ref.filepath
+            assert "md5" in pseudo.__dict__ and pseudo.md5 == ref.compute_md5()
+            assert pseudo.Z_val == ref.Z_val and type(pseudo) is type(ref)
+
+        # New process: entries are read from file and new objects are returned.
+        cache = PseudoCache(filepath)
+        new_pseudos = cache.get_pseudos(self.paths + self.paths[:1])
+        assert cache.num_misses == 0 and cache.num_hits == 3
+        assert new_pseudos[:3] == pseudos and new_pseudos[0] is not new_pseudos[3]
+        assert new_pseudos[1].paw_radius == pseudos[1].paw_radius
+        # The XML tree is not stored in the cache and it is parsed on demand.
+        assert "root" not in new_pseudos[1].__dict__ and new_pseudos[1].root is not None
+
+        # Touched file: md5 is recomputed, the entry is reused.
+        path = self.paths[0]
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert cache.get_pseudo(path) == pseudos[0]
+        assert cache.entries[path][0] == stat.st_mtime_ns + 10**9
+
+        # Modified file: the file is parsed again.
+        shutil.copy(os.path.join(self.tmpdir, "8o.pspnc"), path)
+        assert cache.get_pseudo(path).Z == 8
+        assert PseudoCache(filepath).get_pseudo(path).Z == 8
+
+        # Invalid files.
+        wrong = os.path.join(self.tmpdir, "wrong.pspnc")
+        with open(wrong, "wt") as fh:
+            fh.write("foo\nbar\n1 2 3")
+        with self.assertRaises(Exception):
+            cache.get_pseudo(wrong)
+        assert cache.get_pseudos([wrong], raise_exc=False) == [None]
+
+        # Entries that cannot be unpickled are treated as cache misses.
+        cache = PseudoCache(filepath)
+        path = self.paths[2]
+        cache.entries[path] = cache.entries[path][:3] + (b"foo",) + cache.entries[path][4:]
+        assert cache.get_pseudo(path) == Pseudo.from_file(path)
+        assert cache.num_misses == 1 and PseudoCache(filepath).get_pseudo(path) == Pseudo.from_file(path)
+
+        # The file is discarded if it has been produced with different versions.
+        cache = PseudoCache(filepath)
+        assert len(cache) > 0
+        with open(filepath, "rb") as fh:
+            d = pickle.load(fh)
+        d["version"] = "python 2.7, pymatgen 0.0, abipy 0.0"
+        with open(filepath, "wb") as fh:
+            pickle.dump(d, fh)
+        assert len(PseudoCache(filepath)) == 0
+
+        # The cache file is limited to maxsize entries.
+        cache = PseudoCache(filepath, maxsize=2)
+        cache.get_pseudos(self.paths)
+        cache.get_pseudo(os.path.join(self.tmpdir, "8o.pspnc"))
+        assert len(PseudoCache(filepath)) == 2
+
+        cache.clear()
+        assert len(cache) == 0 and not os.path.exists(filepath)
+
+    def test_pseudo_table(self):
+        """Testing PseudoTable with cache."""
+        table = PseudoTable(self.paths)
+        assert pseudos_module.get_pseudo_cache().filepath.startswith(self.tmpdir)
+        assert len(pseudos_module.get_pseudo_cache()) == 3
+        assert len(table) == 3 and table.zlist == [8, 14]
+        assert PseudoTable.as_table(table) is table
+        assert len(PseudoTable(self.paths[0])) == 1
+
+        table = PseudoTable.from_dir(self.tmpdir, exts=("psp8", "pspnc"), max_workers=1)
+        assert isinstance(table, PseudoTable) and len(table) == 3
+        assert [p.Z for p in table] == [8, 8, 14]
+
+        table = PseudoTable.from_dir(self.tmpdir, exts="all_files", max_workers=1)
+        assert len(table) == 4
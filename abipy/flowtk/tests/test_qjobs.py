@@ -0,0 +1,163 @@
+# coding: utf-8
+"""Tests for qjobs module."""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from abipy.core.testing import AbipyTest
+from abipy.flowtk import qjobs
+from abipy.flowtk.qjobs import QueueJob, SlurmJob, PbsProJob, ShellJob, JobStatus
+
+
+SQUEUE = """\
+#!/bin/sh
+echo "squeue $@" >> {logfile}
+echo "116791|PENDING|2014-11-04T09:27:15"
+echo "116792|RUNNING|2014-11-03T17:02:11"
+echo "116793|COMPLETING|2014-11-03T16:02:11"
+echo "116794_[1-5]|PENDING|N/A"
+"""
+
+SCONTROL = """\
+#!/bin/sh
+echo "scontrol $@" >> {logfile}
+echo "JobId=$3 JobName=run.sh UserId=user(1) JobState=FAILED Reason=NonZeroExitCode ExitCode=1:8"
+"""
+
+SBATCH = """\
+#!/bin/sh
+echo "sbatch $@" >> {logfile}
+echo "Submitted batch job 116795"
+"""
+
+QSTAT = """\
+#!/bin/sh
+echo "qstat $@" >> {logfile}
+if [ "$1" = "-a" ]; then
+echo "frontal1:"
+echo "                                                            Req'd  Req'd   Elap"
+echo "Job ID          Username Queue    Jobname    SessID NDS TSK Memory Time  S Time"
+echo "--------------- -------- -------- ---------- ------ --- --- ------ ----- - -----"
+echo "5666289.frontal username main_ivy MorfeoTChk  57546   1   4    --  08:00 R 00:17"
+echo "5666290.frontal username main_ivy MorfeoTChk     --   1   4    --  08:00 Q    --"
+else
+echo "Job id            Name             User              Time Use S Queue"
+echo "----------------  ---------------- ----------------  -------- - -----"
+echo "$1.frontal1  t0               username           01:37:08 F main_wes"
+fi
+"""
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "Skipping for Windows")
+class QueueSnapshotTest(AbipyTest):
+    """Test the snapshot of the queue with fake squeue/qstat executables."""
+
+    def setUp(self):
+        self.bindir = tempfile.mkdtemp()
+        self.logfile = os.path.join(self.bindir, "calls.log")
+        for name, template in [("squeue", SQUEUE), ("scontrol", SCONTROL), ("sbatch", SBATCH), ("qstat", QSTAT)]:
+            path = os.path.join(self.bindir, name)
+            with open(path, "wt") as fh:
+                fh.write(template.format(logfile=self.logfile))
+            os.chmod(path, 0o755)
+
+        self.old_path = os.environ.get("PATH", "")
+        os.environ["PATH"] = self.bindir + os.pathsep + self.old_path
+        qjobs._SNAPSHOTS.clear()
+
+    def tearDown(self):
+        os.environ["PATH"] = self.old_path
+        qjobs._SNAPSHOTS.clear()
+        shutil.rmtree(self.bindir)
+
+    def count_calls(self, cmd):
+        """Number of times the fake command has been executed."""
+        if not os.path.exists(self.logfile): return 0
+        with open(self.logfile, "rt") as fh:
+            return sum(1 for line in fh if line.split()[:len(cmd.split())] == cmd.split())
+
+    def test_slurm_snapshot(self):
+        """Testing SlurmJob with snapshot of the queue."""
+        jobs = [QueueJob.from_qtype_and_id("slurm", qid) for qid in (116791, 116792, 116793)]
+        assert all(isinstance(job, SlurmJob) for job in jobs)
+        for job in jobs:
+            job.get_info()
+            job.estimated_start_time()
+
+        # A single call to squeue for all the jobs.
+        assert self.count_calls("squeue") == 1
+        assert jobs[0].status == QueueJob.S_PENDING
+        assert jobs[1].is_running and jobs[2].is_running
+        assert jobs[0].estimated_start_time().year == 2014
+
+        snapshot = SlurmJob.get_queue_snapshot(username="username")
+        assert snapshot.njobs == 3 and 116791 in snapshot and 116794 not in snapshot
+        assert snapshot.get(116793).state == "COMPLETING"
+        assert "squeue --noheader --user username" in open(self.logfile).read()
+        repr(snapshot)
+
+        # Job not in the queue anymore --> scontrol to get the exit code (only once).
+        job = SlurmJob(116799)
+        info = job.get_info()
+        assert info.exitcode == 1 and info.signal == 8
+        assert job.is_failed and job.received_signal("SIGFPE")
+        job.get_info()
+        assert self.count_calls("scontrol") == 1
+        assert self.count_calls("squeue") == 2
+
+        # ttl = 0 or refresh=True --> new call to squeue
+        SlurmJob.get_queue_snapshot(ttl=0)
+        SlurmJob.get_queue_snapshot(refresh=True)
+        assert self.count_calls("squeue") == 4
+
+        # Resource manager not available.
+        os.remove(os.path.join(self.bindir, "squeue"))
+        snapshot = SlurmJob.get_queue_snapshot(refresh=True)
+        assert not snapshot.ok and snapshot.njobs is None
+
+    def test_pbspro_snapshot(self):
+        """Testing PbsProJob with snapshot of the queue."""
+        jobs = [PbsProJob(5666289), PbsProJob(5666290)]
+        for job in jobs:
+            job.get_info()
+        assert self.count_calls("qstat") == 1
+        assert jobs[0].is_running and jobs[1].status == QueueJob.S_PENDING
+
+        assert len(PbsProJob.get_queue_snapshot(username="username")) == 2
+
+        job = PbsProJob(5904257)
+        job.get_info()
+        assert job.is_completed
+        assert self.count_calls("qstat 5904257 -x") == 1
+
+    def test_unsupported(self):
+        """Resource managers without bulk queries."""
+        assert ShellJob.get_queue_snapshot() is None
+        assert QueueJob.class_from_qtype("shell") is ShellJob
+        assert str(JobStatus.from_string("NODEFAIL")) == "NODEFAIL"
+
+    def test_adapter_snapshot(self):
+        """Testing QueueAdapter.get_njobs_in_queue with snapshot of the queue."""
+        from abipy.flowtk.qadapters import make_qadapter
+        qad = make_qadapter(priority=1, queue=dict(qtype="slurm", qname="Oban", snapshot_ttl=100),
+                            limits=dict(timelimit="2:00", min_cores=1, max_cores=24), job={},
+                            hardware=dict(num_nodes=3, sockets_per_node=2, cores_per_socket=4, mem_per_node="8 Gb"))
+        assert qad.snapshot_ttl == 100
+        assert qad.as_dict()["queue"]["snapshot_ttl"] == 100
+
+        assert qad.get_njobs_in_queue(username="username") == 3
+        assert qad.get_njobs_in_queue(username="username") == 3
+        assert self.count_calls("squeue") == 1
+        assert qad.get_queue_snapshot(username="username", refresh=True).njobs == 3
+        assert self.count_calls("squeue") == 2
+
+        # A successful submission invalidates the snapshot.
+        script = os.path.join(self.bindir, "job.sh")
+        with open(script, "wt") as fh:
+            fh.write("#!/bin/sh\n")
+        qjob, process = qad.submit_to_queue(script)
+        assert qjob.qid == 116795 and self.count_calls("sbatch") == 1
+        assert qad.get_njobs_in_queue(username="username") == 3
+        assert self.count_calls("squeue") == 3
@@ -70,3 +70,117 @@ class SparseHistogramTest(AbipyTest):
         hist = SparseHistogram([iv for iv in enumerate(items)], key=lambda t: t[1], step=1)
         assert hist.binvals == [1.0, 2.0, 3.0]
         assert hist.values == [[(0, 1)], [(1, 2), (2, 2.9)], [(3, 4)]]
+
+
+class DirectoryTest(AbipyTest):
+
+    def test_has_abiext_with_file_index(self):
+        """Testing Directory.has_abiext and the cached list of files."""
+        import os
+        import pickle
+        import tempfile
+        workdir = tempfile.mkdtemp()
+        d = Directory(workdir)
+
+        def touch(*basenames):
+            for bname in basenames:
+                with open(os.path.join(workdir, bname), "wt") as fh:
+                    fh.write("data")
+            # Move mtime to the past so that the list of files can be cached.
+            os.utime(workdir, (1e9 + len(os.listdir(workdir)),) * 2)
+
+        touch("out_DEN", "out_GSR.nc", "out_DDB", "out_DDB.nc", "out_GW_NLF_MDF", "out_MDF.nc",
+              "out_DDK", "out_DDK.nc", "out_1WF7", "out_1WF9.nc", "out_DEN3.nc", "run.abo")
+        os.mkdir(os.path.join(workdir, "subdir_DEN"))
+        touch()
+
+        assert d.has_abiext("DEN") == d.path_join("out_DEN")
+        assert d._file_index is not None
+        assert d.has_abiext("_GSR") == d.path_join("out_GSR.nc")
+        assert d.has_abiext("GSR.nc") == d.path_join("out_GSR.nc")
+        assert d.has_abiext("DDB") == d.path_join("out_DDB")
+        assert d.has_abiext("MDF") == d.path_join("out_MDF.nc")
+        assert d.has_abiext("DDK") == d.path_join("out_DDK")
+        assert d.has_abiext("abo") == d.path_join("run.abo")
+        assert d.has_abiext("WFK") == ""
+        with self.assertRaises(ValueError):
+            d.has_abiext("1WF")
+        assert len(d.has_abiext("1WF", single_file=False)) == 2
+        assert [t.pertcase for t in d.find_1wf_files()] == [7, 9]
+        assert [t.pertcase for t in d.find_1den_files()] == [3]
+        assert len(d.list_filepaths()) == 12
+        assert len(d.list_filepaths(wildcard="*.nc")) == 6
+
+        # New files are detected through the mtime of the directory.
+        touch("out_WFK")
+        assert d.has_abiext("WFK") == d.path_join("out_WFK")
+        assert d.remove_exts(["WFK", "SCR"]) == [d.path_join("out_WFK")]
+        assert d.has_abiext("WFK") == ""
+
+        # Dangling symbolic links are ignored until the target is created.
+        target = os.path.join(tempfile.mkdtemp(), "out_WFK")
+        os.symlink(target, d.path_join("in_WFK"))
+        touch()
+        assert d.has_abiext("WFK") == ""
+        with open(target, "wt") as fh:
+            fh.write("data")
+        assert d.has_abiext("WFK") == d.path_join("in_WFK")
+
+        # Recently modified directories are not cached and refresh invalidates the index.
+        touch("out_POT")
+        os.utime(workdir)
+        assert d.has_abiext("POT") and d._file_index is None
+        touch()
+        d.has_abiext("POT")
+        assert d._file_index is not None
+        d.refresh()
+        assert d._file_index is None
+
+        # The list of files is not pickled.
+        d.has_abiext("POT")
+        new = pickle.loads(pickle.dumps(d))
+        assert new._file_index is None and new == d
+        assert new.has_abiext("POT") == d.path_join("out_POT")
+
+
+class BuildPlanTest(AbipyTest):
+
+    def test_build_plan(self):
+        """Testing BuildPlan."""
+        import os
+        import tempfile
+        workdir = tempfile.mkdtemp()
+        pj = os.path.join
+
+        def make_plan(input_string):
+            plan = BuildPlan()
+            for i in range(4):
+                tdir = pj(workdir, "w0", "t%d" % i)
+                plan.add_dirs(pj(workdir, "w0", "indata"), pj(tdir, "indata"), pj(tdir, "outdata"))
+                plan.add_file(pj(tdir, "run.files"), "files %d\n" % i, overwrite=False)
+                plan.add_file(pj(tdir, "run.abi"), input_string % i)
+                plan.add_file(pj(tdir, "job.sh"), "#!/bin/bash\n", mode=0o740)
+            return plan
+
+        plan = make_plan("ecut %d\n")
+        assert len(plan) == 12
+        leaf_dirs = plan.get_leaf_dirs()
+        assert pj(workdir, "w0") not in leaf_dirs and pj(workdir, "w0", "t0") not in leaf_dirs
+        assert pj(workdir, "w0", "t0", "outdata") in leaf_dirs and len(leaf_dirs) == 9
+
+        stats = plan.execute(max_workers=3)
+        assert stats.num_written == 12 and stats.num_skipped == 0
+        assert os.path.isdir(pj(workdir, "w0", "t3", "indata"))
+        with open(pj(workdir, "w0", "t1", "run.abi"), "rt") as fh:
+            assert fh.read() == "ecut 1\n"
+        assert os.stat(pj(workdir, "w0", "t0", "job.sh")).st_mode & 0o777 == 0o740
+
+        # Unchanged files are not rewritten, existing files with overwrite=False are preserved.
+        with open(pj(workdir, "w0", "t0", "run.files"), "wt") as fh:
+            fh.write("user files")
+        stats = make_plan("ecut %d\n").execute(max_workers=1)
+        assert stats.num_written == 0 and stats.num_skipped == 12
+        stats = make_plan("ecut  %d\n").execute()
+        assert stats.num_written == 4 and stats.num_skipped == 8
+        with open(pj(workdir, "w0", "t0", "run.files"), "rt") as fh:
+            assert fh.read() == "user files"
@@ -5,6 +5,7 @@ import re
 import collections
 import shutil
 import operator
+import time
 import numpy as np
 
 from fnmatch import fnmatch
@@ -150,13 +151,40 @@ class File(object):
         return os.path.getsize(self.path)
 
 
+# Cached list of files in a Directory.
+#   mtime: st_mtime_ns of the directory when the index was built.
+#   filepaths: list with the absolute paths of the files (os.listdir order).
+#   ext2inds: mapping string after the last underscore in the basename --> indices in filepaths.
+#   links: list of (path, isfile) tuples for the symbolic links (target may change without touching mtime).
+_FileIndex = collections.namedtuple("_FileIndex", "mtime, filepaths, ext2inds, links")
+
+
 class Directory(object):
     """
     Very simple class that provides helper functions
     wrapping the most commonly used functions defined in os.path.
+
+    The list of files is cached and rebuilt only when the mtime of the directory changes
+    so that the methods used to find ABINIT files by extension do not call `os.listdir` each time.
     """
+    # Directories whose mtime is closer than this value (in seconds) to the time of the scan
+    # are not cached as modifications performed within the resolution of the filesystem clock
+    # (e.g. 1 s on NFS) may not change the mtime.
+    MTIME_RESOLUTION = 2.0
+
     def __init__(self, path):
         self._path = os.path.abspath(path)
+        self._file_index = None
+
+    def __getstate__(self):
+        # Don't pickle the list of files.
+        d = self.__dict__.copy()
+        d["_file_index"] = None
+        return d
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "_file_index" not in state: self._file_index = None
 
     def __repr__(self):
         return "<%s at %s, %s>" % (self.__class__.__name__, id(self), self.path)
@@ -223,6 +251,46 @@ class Directory(object):
                 os.remove(path)
             except Exception:
                 pass
+        self.refresh()
+
+    def refresh(self):
+        """
+        Invalidate the cached list of files. The list is rebuilt at the next access.
+        Useful if files are created by external processes within the resolution of the filesystem clock.
+        """
+        self._file_index = None
+
+    def _get_file_index(self):
+        """
+        Return the :class:`_FileIndex` with the files in the directory.
+        Files are listed again only if the mtime of the directory or the status of the symbolic links changed.
+        """
+        mtime = os.stat(self.path).st_mtime_ns
+        index = self._file_index
+        if (index is not None and index.mtime == mtime and
+            all(os.path.isfile(path) == isfile for path, isfile in index.links)):
+            return index
+
+        filepaths, ext2inds, links = [], {}, []
+        for entry in os.scandir(self.path):
+            if entry.is_symlink():
+                # isfile follows the link.
+                isfile = os.path.isfile(entry.path)
+                links.append((entry.path, isfile))
+                if not isfile: continue
+            elif not entry.is_file():
+                continue
+
+            i = entry.name.rfind("_")
+            if i != -1:
+                ext2inds.setdefault(entry.name[i+1:], []).append(len(filepaths))
+            filepaths.append(entry.path)
+
+        index = _FileIndex(mtime=mtime, filepaths=filepaths, ext2inds=ext2inds, links=links)
+        # Cache the index only if the directory has not been modified recently.
+        self._file_index = index if time.time() - mtime / 1e9 > self.MTIME_RESOLUTION else None
+
+        return index
 
     def path_in(self, file_basename):
         """Return the absolute path of filename in the directory."""
@@ -240,8 +308,7 @@ class Directory(object):
                   wildcard="*.nc|*.pdf" selects only those files that end with .nc or .pdf
         """
         # Select the files in the directory.
-        fnames = [f for f in os.listdir(self.path)]
-        filepaths = filter(os.path.isfile, [os.path.join(self.path, f) for f in fnames])
+        filepaths = list(self._get_file_index().filepaths)
 
         if wildcard is not None:
             # Filter using shell patterns.
@@ -265,8 +332,17 @@ class Directory(object):
         if ext != "abo":
             ext = ext if ext.startswith('_') else '_' + ext
 
+        index = self._get_file_index()
+        if ext != "abo" and "_" not in ext[1:]:
+            # Files ending with ext or ext.nc have the same string after the last underscore.
+            key = ext[1:]
+            inds = sorted(index.ext2inds.get(key, []) + index.ext2inds.get(key + ".nc", []))
+            candidates = [index.filepaths[i] for i in inds]
+        else:
+            candidates = index.filepaths
+
         files = []
-        for f in self.list_filepaths():
+        for f in candidates:
             # For the time being, we ignore DDB files in nc format.
             if ext == "_DDB" and f.endswith(".nc"): continue
             # Ignore BSE text files e.g. GW_NLF_MDF
@@ -281,7 +357,7 @@ class Directory(object):
 
         # This should fix the problem with the 1WF files in which the file extension convention is broken
         if not files:
-            files = [f for f in self.list_filepaths() if fnmatch(f, "*%s*" % ext)]
+            files = [f for f in index.filepaths if fnmatch(f, "*%s*" % ext)]
 
         if not files:
             return ""
@@ -333,6 +409,7 @@ class Directory(object):
                 raise RuntimeError('Expecting link at `%s` but found file.' % outfile)
 
         os.symlink(infile, outfile)
+        self.refresh()
 
         return 0
 
@@ -350,6 +427,7 @@ class Directory(object):
 
         outfile = infile[:i] + '_' + outext
         shutil.move(infile, outfile)
+        self.refresh()
         return 0
 
     def copy_abiext(self, inext, outext):
@@ -366,6 +444,7 @@ class Directory(object):
 
         outfile = infile[:i] + '_' + outext
         shutil.copy(infile, outfile)
+        self.refresh()
         return 0
 
     def remove_exts(self, exts):
@@ -384,6 +463,7 @@ class Directory(object):
             except IOError:
                 logger.warning("Exception while trying to remove file %s" % path)
 
+        if paths: self.refresh()
         return paths
 
     def find_last_timden_file(self):
@@ -397,7 +477,7 @@ class Directory(object):
         """
         regex = re.compile(r"out_TIM(\d+)_DEN(.nc)?$")
 
-        timden_paths = [f for f in self.list_filepaths() if regex.match(os.path.basename(f))]
+        timden_paths = [f for f in self._get_file_index().filepaths if regex.match(os.path.basename(f))]
         if not timden_paths: return None
 
         # Build list of (step, path) tuples.
@@ -420,7 +500,7 @@ class Directory(object):
         """
         regex = re.compile(r"out_1WF(\d+)(\.nc)?$")
 
-        wf_paths = [f for f in self.list_filepaths() if regex.match(os.path.basename(f))]
+        wf_paths = [f for f in self._get_file_index().filepaths if regex.match(os.path.basename(f))]
         if not wf_paths: return None
 
         # Build list of (pertcase, path) tuples.
@@ -442,7 +522,7 @@ class Directory(object):
         Each named tuple gives the `path` of the 1DEN file and the `pertcase` index.
         """
         regex = re.compile(r"out_DEN(\d+)(\.nc)?$")
-        den_paths = [f for f in self.list_filepaths() if regex.match(os.path.basename(f))]
+        den_paths = [f for f in self._get_file_index().filepaths if regex.match(os.path.basename(f))]
         if not den_paths: return None
 
         # Build list of (pertcase, path) tuples.
@@ -458,6 +538,136 @@ class Directory(object):
         return [dict2namedtuple(pertcase=item[0], path=item[1]) for item in pertfile_list]
 
 
+class BuildPlan(object):
+    """
+    Directories and files to be created on disk.
+
+    The plan is first computed in memory (see e.g. `Task.add_to_build_plan`) and then
+    materialized by `execute` that creates the directories and writes the files with a pool of threads.
+    Files whose content did not change are not rewritten so that rebuilding a flow
+    only touches the files that have been modified.
+    """
+
+    def __init__(self):
+        self.dirs = set()
+        self.files = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.files)
+
+    def add_dirs(self, *paths):
+        """Add directories (absolute paths) to the plan."""
+        self.dirs.update(paths)
+
+    def add_file(self, path, string, mode=None, overwrite=True):
+        """
+        Add file to the plan.
+
+        Args:
+            path: Absolute path of the file.
+            string: Content of the file.
+            mode: Access permissions. None to use the default of the system.
+            overwrite: False if an existing file should not be modified.
+        """
+        self.files[path] = (string, mode, overwrite)
+        self.dirs.add(os.path.dirname(path))
+
+    def get_leaf_dirs(self):
+        """
+        List with the directories that are not parents of other directories in the plan.
+        Intermediate directories are created by `os.makedirs` hence we don't need to call it for each entry.
+        """
+        dirs = sorted(self.dirs, key=lambda p: p.split(os.sep))
+        return [d for i, d in enumerate(dirs)
+                if i + 1 == len(dirs) or not dirs[i + 1].startswith(d + os.sep)]
+
+    def execute(self, max_workers=None):
+        """
+        Create the directories and write the files.
+
+        Args:
+            max_workers: Number of threads. None to use a default value suitable for I/O-bound jobs, 1 for serial execution.
+
+        Return: namedtuple with the number of files written and the number of unchanged files that have been skipped.
+        """
+        leaf_dirs = self.get_leaf_dirs()
+        items = list(self.files.items())
+        if max_workers is None:
+            max_workers = min(32, 4 * (os.cpu_count() or 1))
+
+        # Files in directories created by execute cannot exist hence we don't need to call stat.
+        created = set()
+
+        def write(item):
+            path, (string, mode, overwrite) = item
+            return self._write_file(path, string, mode, overwrite, os.path.dirname(path) not in created)
+
+        if max_workers <= 1 or len(items) <= 1:
+            for path in leaf_dirs:
+                self._makedirs(path, created)
+            written = [write(item) for item in items]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            def pmap(func, seq):
+                # Submit chunks to reduce the overhead of the futures. map re-raises the exceptions of the workers.
+                size = max(1, len(seq) // (4 * max_workers))
+                chunks = [seq[i:i + size] for i in range(0, len(seq), size)]
+                return [r for res in executor.map(lambda chunk: [func(o) for o in chunk], chunks) for r in res]
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Directories must exist before writing files.
+                pmap(lambda p: self._makedirs(p, created), leaf_dirs)
+                written = pmap(write, items)
+
+        num_written = sum(written)
+        return dict2namedtuple(num_written=num_written, num_skipped=len(written) - num_written)
+
+    @classmethod
+    def _makedirs(cls, path, created):
+        """
+        Equivalent to `os.makedirs(path, exist_ok=True)` but the directories that
+        have been created are added to the set ``created``. Can be called by different threads.
+        """
+        try:
+            os.mkdir(path)
+        except FileExistsError:
+            return
+        except FileNotFoundError:
+            cls._makedirs(os.path.dirname(path), created)
+            try:
+                os.mkdir(path)
+            except FileExistsError:
+                return
+        created.add(path)
+
+    @staticmethod
+    def _write_file(path, string, mode, overwrite, may_exist):
+        """Write file if content changed. Return True if the file has been written."""
+        data = string.encode("utf-8")
+        st = None
+        if may_exist:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                pass
+
+        if st is not None:
+            if not overwrite: return False
+            # Read the file only if the size is the same.
+            if st.st_size == len(data):
+                with open(path, "rb") as fh:
+                    unchanged = fh.read() == data
+                if unchanged:
+                    if mode is not None and (st.st_mode & 0o7777) != mode: os.chmod(path, mode)
+                    return False
+
+        with open(path, "wb") as fh:
+            fh.write(data)
+        if mode is not None: os.chmod(path, mode)
+        return True
+
+
 # This dictionary maps ABINIT file extensions to the variables that must be used to read the file in input.
 #
 # TODO: In Abinit9, it's possible to specify absolute paths with e.g., getden_path
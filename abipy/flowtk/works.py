@@ -14,7 +14,6 @@ from monty.collections import AttrDict
 from monty.itertools import chunks
 from monty.functools import lazy_property
 from monty.fnmatch import WildCard
-from pydispatch import dispatcher
 from pymatgen.core.units import EnergyArray
 from . import wrappers
 from .nodes import Dependency, Node, NodeError, NodeResults, FileNode #, check_spectator
@@ -22,7 +21,7 @@ from .tasks import (Task, AbinitTask, ScfTask, NscfTask, DfptTask, PhononTask, E
                     BseTask, RelaxTask, DdeTask, BecTask, ScrTask, SigmaTask, TaskManager,
                     DteTask, EphTask, CollinearThenNonCollinearScfTask)
 
-from .utils import Directory
+from .utils import Directory, BuildPlan
 from .netcdf import ETSF_Reader, NetcdfReader
 from .abitimer import AbinitTimerParser
 
@@ -184,18 +183,20 @@ class BaseWork(Node, metaclass=abc.ABCMeta):
         The |Work| is responsible for catching the important signals raised from
         its task and raise new signals when some particular condition occurs.
         """
+        bus = self.event_bus
+        if bus is None: return
         for task in self:
-            dispatcher.connect(self.on_ok, signal=task.S_OK, sender=task)
+            bus.connect(task, task.S_OK, self, "on_ok")
 
     def disconnect_signals(self):
         """
         Disable the signals within the work. This function reverses the process of `connect_signals`
         """
+        bus = self.event_bus
+        if bus is None: return
         for task in self:
-            try:
-                dispatcher.disconnect(self.on_ok, signal=task.S_OK, sender=task)
-            except dispatcher.errors.DispatcherKeyError as exc:
-                self.history.debug(str(exc))
+            if not bus.disconnect(task, task.S_OK, self, "on_ok"):
+                self.history.debug("%s was not connected to %s" % (self, task))
 
     @property
     def all_ok(self):
@@ -725,20 +726,26 @@ class Work(BaseWork, NodeContainer):
         The default implementation is empty.
         """
 
-    def build(self, *args, **kwargs):
-        """Creates the top level directory."""
-        # Create the directories of the work.
-        self.indir.makedirs()
-        self.outdir.makedirs()
-        self.tmpdir.makedirs()
+    def build(self, *args, max_workers=None, **kwargs):
+        """
+        Creates the top level directory and the directories and files of the tasks.
 
-        # Build dirs and files of each task.
-        for task in self:
-            task.build(*args, **kwargs)
+        Args:
+            max_workers: Number of threads used to write the files. None for default value.
+        """
+        plan = BuildPlan()
+        self.add_to_build_plan(plan)
+        plan.execute(max_workers=max_workers)
 
         # Connect signals within the work.
         self.connect_signals()
 
+    def add_to_build_plan(self, plan):
+        """Add the directories of the work and the directories and files of each task to ``plan``."""
+        plan.add_dirs(self.indir.path, self.outdir.path, self.tmpdir.path)
+        for task in self:
+            task.add_to_build_plan(plan)
+
     @property
     def status(self):
         """
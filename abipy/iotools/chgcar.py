@@ -0,0 +1,62 @@
+# coding: utf-8
+"""
+Tools for writing CHGCAR files.
+See http://cms.mpi.univie.ac.at/vasp/vasp/CHGCAR_file.html
+"""
+import itertools
+
+from abipy.iotools.chunkio import write_fortran_floats, iter_zplanes
+
+
+__all__ = [
+    "chgcar_write",
+]
+
+
+def chgcar_write(file, structure, data_dict):
+    """
+    Write volumetric data in the CHGCAR format. The output is identical to the one
+    produced by ``pymatgen.io.vasp.Chgcar.write_file`` but values are formatted in chunks
+    and data are accessed plane by plane so that memory does not depend on the size of the mesh.
+
+    Args:
+        file: file-like object.
+        structure: :class:`Structure` object.
+        data_dict: Dictionary with the data in C-order i.e. arrays of shape [nx, ny, nz]
+            (multiplied by the volume of the unit cell as required by the CHGCAR format).
+            Possible keys: "total", "diff" (spin-polarized case) or "diff_x", "diff_y", "diff_z"
+            for non-collinear magnetism. Any array-like object supporting ``data[:, :, iz]``
+            indexing (e.g. a view of a netcdf variable) can be used.
+    """
+    fwrite = file.write
+
+    # Header with the structure (Poscar in direct coordinates).
+    symbols = [site.specie.symbol for site in structure]
+    site_symbols = [a[0] for a in itertools.groupby(symbols)]
+    natoms = [len(tuple(a[1])) for a in itertools.groupby(symbols)]
+
+    lines = structure.formula + "\n"
+    lines += "   1.00000000000000\n"
+    latt = structure.lattice.matrix
+    for i in range(3):
+        lines += " %12.6f%12.6f%12.6f\n" % tuple(latt[i, :])
+    lines += "".join(["%5s" % s for s in site_symbols]) + "\n"
+    lines += "".join(["%6d" % x for x in natoms]) + "\n"
+    lines += "Direct\n"
+    for site in structure:
+        lines += "%10.6f%10.6f%10.6f\n" % tuple(site.frac_coords)
+    lines += " \n"
+    fwrite(lines)
+
+    if "diff_x" in data_dict:
+        keys = ["total", "diff_x", "diff_y", "diff_z"]
+    elif "diff" in data_dict:
+        keys = ["total", "diff"]
+    else:
+        keys = ["total"]
+
+    for key in keys:
+        data = data_dict[key]
+        fwrite("   {}   {}   {}\n".format(*data.shape[-3:]))
+        # Fortran order: x is the fastest index.
+        write_fortran_floats(file, (plane.ravel() for plane in iter_zplanes(data)))
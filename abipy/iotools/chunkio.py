@@ -0,0 +1,175 @@
+# coding: utf-8
+"""
+Tools to write large arrays to text files in chunks.
+
+Values are formatted in bulk with a single %-format operation per chunk instead
+of one Python string operation per value, and the data are accessed slab-by-slab
+so that the memory required to write a volumetric file does not depend on the size of the mesh.
+"""
+import numpy as np
+
+
+__all__ = [
+    "write_rows",
+    "fortran_float_bytes",
+    "write_fortran_floats",
+    "iter_zplanes",
+]
+
+
+# Max number of values formatted in a single chunk.
+CHUNK_SIZE = 2 ** 16
+
+
+def write_rows(file, rows, fmt, sep=" ", prefix="", end="\n", chunk_size=None):
+    """
+    Write a 2d array to file. Each row is written on a line using:
+
+        prefix + sep.join(fmt % v for v in row) + end
+
+    Args:
+        file: file-like object.
+        rows: [nrows, ncols] array.
+        fmt: Format for a single value e.g. "%f"
+        sep: Separator between values.
+        prefix: String written at the beginning of each line.
+        end: String written at the end of each line.
+        chunk_size: Approximate number of values formatted in a single operation.
+    """
+    rows = np.asarray(rows)
+    if rows.ndim == 1: rows = np.reshape(rows, (-1, 1))
+    nrows, ncols = rows.shape
+    if nrows == 0: return
+    line_fmt = prefix + sep.join(ncols * [fmt]) + end
+    chunk_size = CHUNK_SIZE if chunk_size is None else chunk_size
+    step = max(1, chunk_size // max(ncols, 1))
+
+    fwrite = file.write
+    for start in range(0, nrows, step):
+        chunk = rows[start:start + step]
+        fwrite((line_fmt * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def _fortran_float_str(f):
+    """
+    Format float with a leading zero in scientific notation as done by Fortran codes
+    e.g. 0.12345678901E+01 for 1.2345678901.
+    """
+    s = "{:.10E}".format(f)
+    if f >= 0:
+        return "0." + s[0] + s[2:12] + 'E' + "{:+03}".format(int(s[13:]) + 1)
+    else:
+        return "-." + s[1] + s[3:13] + 'E' + "{:+03}".format(int(s[14:]) + 1)
+
+
+def fortran_float_bytes(values):
+    """
+    Format values with a leading zero in scientific notation and 11 significant digits
+    as done by Fortran codes e.g. 0.12345678901E+01 for 1.2345678901.
+
+    Return:
+        [nvals, 17] uint8 array with the ASCII characters or None if some values cannot be
+        represented with 17 characters (3-digit exponents, nan, inf).
+    """
+    values = np.ravel(values).astype(np.float64)
+    n = len(values)
+    if n == 0: return np.empty((0, 17), dtype=np.uint8)
+    s = (("%+.10E" * n) % tuple(values.tolist())).encode("ascii")
+    # All strings should have 17 characters e.g. +1.2345678901E+02
+    if len(s) != 17 * n: return None
+
+    b = np.frombuffer(s, dtype=np.uint8).reshape(n, 17)
+    exp = (b[:, 15].astype(np.int64) - 48) * 10 + (b[:, 16] - 48)
+    exp = np.where(b[:, 14] == ord("-"), -exp, exp) + 1
+    if np.any(exp >= 100): return None
+
+    # Positive values: 0.ddddddddddd, negative values: -.ddddddddddd
+    # Note that "%+.10E" gives -0.0000000000E+00 for -0.0 while we want 0.00000000000E+01
+    out = np.empty((n, 17), dtype=np.uint8)
+    out[:, 0] = np.where(values < 0, ord("-"), ord("0"))
+    out[:, 1] = ord(".")
+    out[:, 2] = b[:, 1]
+    out[:, 3:13] = b[:, 3:13]
+    out[:, 13] = ord("E")
+    out[:, 14] = np.where(exp < 0, ord("-"), ord("+"))
+    aexp = np.abs(exp)
+    out[:, 15] = aexp // 10 + 48
+    out[:, 16] = aexp % 10 + 48
+
+    return out
+
+
+def write_fortran_floats(file, chunks, per_line=5):
+    """
+    Write values in Fortran format with ``per_line`` values per line.
+    Each line starts with a blank and values are separated by one blank.
+    The last incomplete line (if any) ends with two blanks.
+    This is the format used for the volumetric data in the CHGCAR file.
+
+    Args:
+        file: file-like object.
+        chunks: Iterable with 1d arrays of values.
+        per_line: Number of values per line.
+    """
+    fwrite = file.write
+    # List of strings for the current incomplete line.
+    pending = []
+
+    def write_str_values(strs):
+        for v in strs:
+            pending.append(v)
+            if len(pending) == per_line:
+                fwrite(" " + " ".join(pending) + "\n")
+                pending.clear()
+
+    for values in chunks:
+        values = np.ravel(values)
+        if pending:
+            # Complete the current line.
+            nfill = min(per_line - len(pending), len(values))
+            write_str_values(_fortran_float_str(v) for v in values[:nfill])
+            values = values[nfill:]
+
+        nfull = (len(values) // per_line) * per_line
+        arr = fortran_float_bytes(values[:nfull])
+        if arr is None:
+            write_str_values(_fortran_float_str(v) for v in values[:nfull])
+        elif nfull:
+            # Add the blank before each value and the newline at the end of each line.
+            nlines = nfull // per_line
+            cols = np.empty((nlines, per_line, 18), dtype=np.uint8)
+            cols[..., 0] = ord(" ")
+            cols[..., 1:] = arr.reshape(nlines, per_line, 17)
+            lines = np.empty((nlines, per_line * 18 + 1), dtype=np.uint8)
+            lines[:, :-1] = cols.reshape(nlines, -1)
+            lines[:, -1] = ord("\n")
+            fwrite(lines.tobytes().decode("ascii"))
+
+        write_str_values(_fortran_float_str(v) for v in values[nfull:])
+
+    if pending:
+        fwrite(" " + " ".join(pending) + "  \n")
+
+
+def iter_zplanes(data, idt=None, add_replicas=False):
+    """
+    Iterate over the planes at fixed z of a 3d array-like object data[nx, ny, nz].
+    Yield [ny, nx] arrays in Fortran order (x is the fastest index).
+
+    Args:
+        data: Array-like object in C-order supporting ``data[:, :, iz]`` indexing
+            (``data[idt, :, :, iz]`` if idt is not None) e.g. numpy array or a view of a netcdf variable.
+        idt: Index of the sub-array if data has shape [ndt, nx, ny, nz].
+        add_replicas: If True, the periodic replicas at x = nx, y = ny, z = nz are added.
+    """
+    nx, ny, nz = data.shape[-3:]
+    get_plane = (lambda iz: data[:, :, iz]) if idt is None else (lambda iz: data[idt, :, :, iz])
+
+    if add_replicas:
+        ix, iy = np.arange(nx + 1) % nx, np.arange(ny + 1) % ny
+        for iz in range(nz + 1):
+            plane = np.asarray(get_plane(iz % nz))
+            yield plane[ix][:, iy].T
+    else:
+        for iz in range(nz):
+            yield np.asarray(get_plane(iz)).T
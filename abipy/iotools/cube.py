@@ -9,6 +9,7 @@ import numpy as np
 from pymatgen.core.lattice import Lattice
 from pymatgen.core.sites import PeriodicSite
 from pymatgen.core.units import bohr_to_angstrom
+from abipy.iotools.chunkio import write_rows
 
 
 __all__ = [
@@ -34,12 +35,14 @@ def cube_write_structure_mesh(file, structure, mesh):
 
 
 def cube_write_data(file, data, mesh):
-    fwrite = file.write
-    data_bohrs = data * (bohr_to_angstrom ** 3)
+    """
+    Write data[nx, ny, nz] in the cube format. Values are converted to bohr^-3 and written
+    slab by slab (one value per line) so that memory does not depend on the size of the mesh.
+    ``data`` can be any array-like object supporting ``data[ix]`` indexing e.g. a view of a netcdf variable.
+    """
     for ix in range(mesh.nx):
-        for iy in range(mesh.ny):
-            for iz in range(mesh.nz):
-                fwrite('{:.5e}\n'.format(data_bohrs[ix, iy, iz]))
+        slab_bohrs = np.asarray(data[ix]) * (bohr_to_angstrom ** 3)
+        write_rows(file, slab_bohrs.ravel(), "%.5e")
 
 
 def cube_read_structure_mesh_data(file):
@@ -0,0 +1,128 @@
+"""Tests for chunkio module and the volumetric writers."""
+import io
+import numpy as np
+import abipy.data as abidata
+
+from abipy.core.testing import AbipyTest
+from abipy.core.mesh3d import Mesh3D
+from abipy.iotools.chunkio import *
+from abipy.iotools.xsf import xsf_write_data, bxsf_write
+from abipy.iotools.cube import cube_write_data
+from abipy.iotools.chgcar import chgcar_write
+
+
+def legacy_xsf_write_data(file, data):
+    """Reference implementation (one string operation per value, no replicas)."""
+    fdata = np.transpose(data)
+    for z in range(fdata.shape[0]):
+        for y in range(fdata.shape[1]):
+            file.write(' '.join(['%f' % d for d in fdata[z, y]]))
+            file.write('\n')
+        file.write('\n')
+
+
+class TestChunkio(AbipyTest):
+
+    def test_write_rows(self):
+        """Testing write_rows."""
+        rows = np.random.rand(7, 3)
+        for chunk_size in (1, 4, 100):
+            stream = io.StringIO()
+            write_rows(stream, rows, "%f", sep=" ", prefix=">", end="\n", chunk_size=chunk_size)
+            ref = "".join(">" + " ".join("%f" % v for v in row) + "\n" for row in rows)
+            assert stream.getvalue() == ref
+
+        stream = io.StringIO()
+        write_rows(stream, np.arange(3), "%d")
+        assert stream.getvalue() == "0\n1\n2\n"
+
+    def test_fortran_floats(self):
+        """Testing fortran_float_bytes and write_fortran_floats."""
+        values = np.concatenate([np.random.rand(50) * 10.0 ** np.random.randint(-30, 30, size=50),
+                                 -np.random.rand(50) * 10.0 ** np.random.randint(-30, 30, size=50),
+                                 [0.0, 1.0, -1.0, 9.99999999999, 0.099999999999, 1e-98, 1e99, -1e150]])
+
+        def fortran_str(f):
+            # Implementation used by pymatgen.
+            s = "{:.10E}".format(f)
+            if f >= 0:
+                return "0." + s[0] + s[2:12] + 'E' + "{:+03}".format(int(s[13:]) + 1)
+            else:
+                return "-." + s[1] + s[3:13] + 'E' + "{:+03}".format(int(s[14:]) + 1)
+
+        arr = fortran_float_bytes(values[:-3])
+        assert arr.shape == (len(values) - 3, 17)
+        assert [bytes(row).decode() for row in arr] == [fortran_str(v) for v in values[:-3]]
+        assert fortran_float_bytes([1e99]) is None
+
+        # Lines with 5 values. The last incomplete line ends with two blanks.
+        ref = []
+        for i in range(0, len(values), 5):
+            chunk = [fortran_str(v) for v in values[i:i+5]]
+            ref.append(" " + " ".join(chunk) + ("\n" if len(chunk) == 5 else "  \n"))
+        ref = "".join(ref)
+
+        for splits in ([len(values)], [3, 17, 100], [1] * len(values)):
+            stream = io.StringIO()
+            write_fortran_floats(stream, np.split(values, np.cumsum(splits)[:-1]))
+            assert stream.getvalue() == ref
+
+    def test_volumetric_writers(self):
+        """Testing byte-for-byte equivalence of the volumetric writers with the previous implementations."""
+        from pymatgen.io.vasp.inputs import Poscar
+        from pymatgen.io.vasp.outputs import Chgcar
+        structure = abidata.structure_from_ucell("MgB2")
+        nx, ny, nz = 5, 4, 3
+        data = np.random.rand(2, nx, ny, nz) - 0.5
+
+        # XSF without replicas.
+        stream = io.StringIO()
+        xsf_write_data(stream, structure, data[0], add_replicas=False)
+        ref = io.StringIO()
+        legacy_xsf_write_data(ref, data[0])
+        assert ref.getvalue() in stream.getvalue()
+
+        # XSF with replicas and several grids.
+        from abipy.tools.numtools import add_periodic_replicas
+        stream = io.StringIO()
+        xsf_write_data(stream, structure, data, add_replicas=True)
+        padded = add_periodic_replicas(data)
+        for dg in range(2):
+            ref = io.StringIO()
+            legacy_xsf_write_data(ref, padded[dg])
+            assert ref.getvalue() in stream.getvalue()
+        assert "%d %d %d\n" % (nx + 1, ny + 1, nz + 1) in stream.getvalue()
+
+        # Complex data.
+        stream = io.StringIO()
+        xsf_write_data(stream, structure, data[0] * 1j, add_replicas=False, cplx_mode="im")
+        ref = io.StringIO()
+        legacy_xsf_write_data(ref, data[0])
+        assert ref.getvalue() in stream.getvalue()
+
+        # CUBE
+        mesh = Mesh3D((nx, ny, nz), structure.lattice.matrix)
+        stream = io.StringIO()
+        cube_write_data(stream, data[0], mesh)
+        from pymatgen.core.units import bohr_to_angstrom
+        data_bohrs = data[0] * (bohr_to_angstrom ** 3)
+        ref = "".join('{:.5e}\n'.format(data_bohrs[ix, iy, iz])
+                      for ix in range(nx) for iy in range(ny) for iz in range(nz))
+        assert stream.getvalue() == ref
+
+        # BXSF
+        fermie = 0.1
+        stream = io.StringIO()
+        bxsf_write(stream, structure, 2, 3, (nx, ny, nz), np.random.rand(2, 3, nx, ny, nz), fermie, unit="Ha")
+        lines = stream.getvalue().splitlines()
+        assert lines.count(" BAND: 6") == 1
+        assert len(lines[lines.index(" BAND: 1") + 1]) == len("%.18e" % 0.5)
+
+        # CHGCAR compared with pymatgen.
+        for data_dict in ({"total": data[0]}, {"total": data[0], "diff": data[1]}):
+            chgcar_path = self.get_tmpname(text=True)
+            Chgcar(Poscar(structure), data_dict).write_file(chgcar_path)
+            stream = io.StringIO()
+            chgcar_write(stream, structure, data_dict)
+            with open(chgcar_path, "rt") as fh:
+                assert stream.getvalue() == fh.read()
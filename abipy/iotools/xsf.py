@@ -4,7 +4,7 @@
 import numpy as np
 
 from pymatgen.core.units import Energy, EnergyArray #, ArrayWithUnit
-from abipy.tools.numtools import transpose_last3dims, add_periodic_replicas
+from abipy.iotools.chunkio import write_rows, iter_zplanes
 
 
 __all__ = [
@@ -76,10 +76,13 @@ def xsf_write_data(file, structure, data, add_replicas=True, cplx_mode=None):
     """
     Write data in the Xcrysden format (XSF)
 
+    Data are formatted and written plane by plane so that memory does not depend on the size of the mesh.
+
     Args:
         file: file-like object.
         structure: :class:`Structure` object.
-        data: array-like object in C-order, i.e data[nx, ny, nz]
+        data: array-like object in C-order, i.e data[nx, ny, nz] or data[ngrids, nx, ny, nz]
+            Any object supporting ``data[..., iz]`` indexing (e.g. a view of a netcdf variable) can be used.
         add_replicas: If True, data is padded with redundant data points.
             in order to have a periodic 3D array of shape: (nx+1, ny+1, nz+1).
         cplx_mode: string defining the data to print when data is a complex array.
@@ -91,38 +94,30 @@ def xsf_write_data(file, structure, data, add_replicas=True, cplx_mode=None):
     """
     fwrite = file.write
 
-    # Check this one
-    if add_replicas:
-        data = add_periodic_replicas(data)
-
+    convert = np.asarray
     if np.iscomplexobj(data):
         if cplx_mode is None:
             raise TypeError("cplx_mode must be specified when data is a complex array.")
         cplx_mode = cplx_mode.lower()
         if cplx_mode == "re":
-            data = data.real
+            convert = np.real
         elif cplx_mode == "im":
-            data = data.imag
+            convert = np.imag
         elif cplx_mode == "abs":
-            data = np.abs(data)
+            convert = np.abs
         else:
             raise ValueError("Wrong value for cplx_mode: %s" % cplx_mode)
 
-    shape, ndim = data.shape, data.ndim
+    shape, ndim = tuple(data.shape), len(data.shape)
 
     if ndim == 3:
         ngrids = 1
-        data = np.asarray([data])
     elif ndim == 4:
         ngrids = shape[0]
     else:
         raise ValueError("ndim %d is not supported" % ndim)
 
-    # Xcrysden uses Fortran-order.
-    # Transpose (...,x,y,z) --> (...,z,y,x) to speed up the write below.
-    fdata = transpose_last3dims(data)
-    fgrid = fdata.shape[-3:]
-
+    fgrid = tuple(n + 1 for n in shape[-3:]) if add_replicas else shape[-3:]
     cell = structure.lattice_vectors(space="r")
     origin = np.zeros(3)
 
@@ -131,17 +126,15 @@ def xsf_write_data(file, structure, data, add_replicas=True, cplx_mode=None):
 
     for dg in range(ngrids):
         fwrite(" BEGIN_DATAGRID_3Dgrid#" + str(dg+1) + "\n")
-        fwrite('%d %d %d\n' % shape[-3:])
+        fwrite('%d %d %d\n' % fgrid)
 
         fwrite('%f %f %f\n' % tuple(origin))
         for i in range(3):
             fwrite('%f %f %f\n' % tuple(cell[i]))
 
-        for z in range(fgrid[0]):
-            for y in range(fgrid[1]):
-                slice_x = fdata[dg,z,y]
-                fwrite(' '.join(['%f' % d for d in slice_x]))
-                fwrite('\n')
+        # Xcrysden uses Fortran-order: one line for each (z, y), x is the fastest index.
+        for plane in iter_zplanes(data, idt=dg if ndim == 4 else None, add_replicas=add_replicas):
+            write_rows(file, convert(plane), "%f")
             fwrite('\n')
 
         fwrite(' END_DATAGRID_3D\n')
@@ -214,10 +207,9 @@ def bxsf_write(file, structure, nsppol, nband, ndivs, ucdata_sbk, fermie, unit="
     for band in range(nband):
         for spin in range(nsppol):
             idx += 1
-            enes = ucdata_sbk[spin, band, :]
+            enes = np.asarray(ucdata_sbk[spin, band, :])
             fw(" BAND: %d\n" % idx)
-            fw("\n".join("%.18e" % v for v in enes))
-            fw("\n")
+            write_rows(file, enes, "%.18e")
 
     fw(' END_BANDGRID_3D\n')
     fw('END_BLOCK_BANDGRID_3D\n')
@@ -287,6 +287,7 @@ Usage example:
   abirun.py FLOWDIR debug                 => Analyze error files and log files for possible error messages.
   abirun.py FLOWDIR corrections           => Show AbiPy corrections performed at runtime.
   abirun.py FLOWDIR handlers              => Show event handlers installed in the flow.
+  abirun.py FLOWDIR sched_profile -p      => Summarize (and plot) the time spent in the cycles of the scheduler.
 
 ##########
 # Analysis
@@ -568,6 +569,15 @@ Default: o
         help=("Plot multiple cycles on the same figure if arg is specified. Use `-p` for gridplot. "
               "Use `-p slideshow` to iterate."))
 
+    # Subparser for sched_profile.
+    p_sched_profile = subparsers.add_parser('sched_profile', parents=[copts_parser],
+        help=("Summarize the time spent in the phases of the scheduler cycles and the counters "
+              "recorded in FLOWDIR/_scheduler_profile.jsonl. Use -v to print all the cycles."))
+    p_sched_profile.add_argument("-l", "--last", type=int, default=None,
+        help="Analyze only the last N cycles. Default: all the cycles in the log.")
+    p_sched_profile.add_argument("-p", "--plot", action="store_true", default=False,
+        help="Plot the time spent in the phases as a function of the cycle index.")
+
     # Subparser for dims.
     p_dims = subparsers.add_parser('dims', parents=[copts_parser, flow_selector_parser],
         help="Print table with dimensions extracted from the output of the tasks.")
@@ -657,6 +667,10 @@ Default: o
         help="Exclude directories. Accept string or comma-separated strings. Ex: --exlude-dirs=indir,outdir")
     p_tar.add_argument("-l", "--light", default=False, action="store_true",
         help="Create light-weight version of the tarball for debugging purposes. Other options are ignored.")
+    p_tar.add_argument("--since", default=None,
+        help="Manifest file written by a previous tar command. Only new or modified files are archived.")
+    p_tar.add_argument("--shard", default=False, action="store_true",
+        help="Write the files of each task in a separated tarball.")
 
     # Subparser for tricky.
     p_tricky = subparsers.add_parser('tricky', parents=[copts_parser],
@@ -1115,6 +1129,18 @@ def main():
                     cprint("Exception while invoking %s method of %s.\n%s" % (
                            options.plot_mode, plotter.__class__.__name__, str(exc)), "red")
 
+    elif options.command == "sched_profile":
+        from abipy.flowtk.profiling import CycleProfiler, CycleLog
+        path = os.path.join(flow.workdir, CycleProfiler.LOG_FNAME)
+        if not os.path.exists(path):
+            cprint("Cannot find %s. Run the flow with `profile: yes` in scheduler.yml" % path, "red")
+            return 1
+
+        log = CycleLog.from_file(path)
+        print(log.to_string(last=options.last, verbose=options.verbose))
+        if options.plot and len(log):
+            log.plot(last=options.last)
+
     elif options.command == "dims":
         flow.get_dims_dataframe(nids=select_nids(flow, options),
                                 printout=True, with_colors=not options.no_colors)
@@ -1189,8 +1215,10 @@ def main():
                                         max_filesize=options.max_filesize,
                                         exclude_exts=options.exclude_exts,
                                         exclude_dirs=options.exclude_dirs,
+                                        since=options.since,
+                                        shard=options.shard,
                                         verbose=options.verbose)
-            print("Created tarball file %s" % tarfile)
+            print("Created tarball file(s) %s" % tarfile)
         else:
             tarfile = flow.make_light_tarfile()
             print("Created light tarball file %s" % tarfile)
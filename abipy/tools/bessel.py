@@ -10,6 +10,31 @@ from scipy.integrate import simps # cumtrapz, quad
 _DEFAULTS = {"numq": 3001, "numr": 3001}
 
 
+def int_r2j0qr(q, rcut):
+    r"""
+    Compute :math:`\int_0^{rcut} r^2 j_0(qr) dr = (\sin(q r_c) - q r_c \cos(q r_c)) / q^3`
+    with the analytic expression. A Taylor expansion is used for small :math:`q r_c`.
+
+    Args:
+        q: Scalar or array with :math:`|q|` in Ang-1
+        rcut: Sphere radius in Angstrom. Broadcasted with q.
+
+    Return:
+        Array with the values of the integral.
+    """
+    q, rcut = np.broadcast_arrays(np.asarray(q, dtype=np.float), np.asarray(rcut, dtype=np.float))
+    x = q * rcut
+    small = np.abs(x) < 1e-2
+    values = np.empty(x.shape)
+    # r_c^3/3 (1 - x^2/10 + x^4/280)
+    xs, rs = x[small], rcut[small]
+    values[small] = rs ** 3 / 3 * (1 - xs ** 2 / 10 + xs ** 4 / 280)
+    xl, ql = x[~small], q[~small]
+    values[~small] = (np.sin(xl) - xl * np.cos(xl)) / ql ** 3
+
+    return values
+
+
 def spline_int_jlqr(l, qmax, rcut, numq=None, numr=None):
     r"""
     Compute :math:`j_n(z) = \int_0^{rcut} r^2 j_l(qr) dr`
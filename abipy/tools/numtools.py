@@ -337,38 +337,44 @@ def find_convindex(values, tol, min_numpts=1, mode="abs", vinf=None):
 class BlochRegularGridInterpolator(object):
     """
     This object interpolates the periodic part of a Bloch state in real space.
+
+    All the ``ndt`` components are interpolated at once with a periodic kernel that operates
+    on wrapped indices so that no padded copy of the input data is needed.
+    Both trilinear (default) and tricubic (Catmull-Rom) interpolation are supported.
     """
 
-    def __init__(self, structure, datar, add_replicas=True):
+    # Default number of points evaluated in a single batch by eval_points.
+    chunk_size = 65536
+
+    def __init__(self, structure, datar, add_replicas=True, method="linear"):
         """
         Args:
             structure: :class:`Structure` object.
             datar: [ndt, nx, ny, nz] array.
-            add_replicas: If True, data is padded with redundant data points.
-                in order to have a periodic 3D array of shape=[ndt, nx+1, ny+1, nz+1].
+            add_replicas: True if datar does not contain the redundant periodic points (default).
+                If False, datar is assumed to have shape [ndt, nx+1, ny+1, nz+1] with the periodic
+                replicas already included. Note that data are never copied, replicas are handled
+                by wrapping the indices.
+            method: "linear" for trilinear interpolation, "cubic" for tricubic Catmull-Rom interpolation.
         """
-        from scipy.interpolate import RegularGridInterpolator
+        if method not in ("linear", "cubic"):
+            raise ValueError("Invalid method: `%s`. Use `linear` or `cubic`" % str(method))
         self.structure = structure
+        self.method = method
 
-        if add_replicas:
-            datar = add_periodic_replicas(datar)
+        if not add_replicas:
+            # Use a view and drop the redundant points.
+            datar = datar[..., :-1, :-1, :-1]
 
         self.dtype = datar.dtype
         # We want a 4d array (ndt arrays of shape (nx, ny, nz)
         nx, ny, nz = datar.shape[-3:]
+        self.ngfft = np.array((nx, ny, nz))
         datar = np.reshape(datar, (-1,) + (nx, ny, nz))
         self.ndt = len(datar)
-        x = np.linspace(0, 1, num=nx)
-        y = np.linspace(0, 1, num=ny)
-        z = np.linspace(0, 1, num=nz)
-
-        # Build `ndt` interpolators. Note that RegularGridInterpolator supports
-        # [nx, ny, nz, ...] arrays but then each call operates on the full set of
-        # ndt components and this complicates the declation of callbacks
-        # operating on a single component.
-        self._interpolators = [None] * self.ndt
-        for i in range(self.ndt):
-            self._interpolators[i] = RegularGridInterpolator((x, y, z), datar[i])
+        # Store data as [ndt, nx*ny*nz] so that all components can be gathered with a single take.
+        # reshape returns a view if datar is C-contiguous.
+        self._flat_datar = np.reshape(datar, (self.ndt, -1))
 
     def eval_line(self, point1, point2, num=200, cartesian=False, kpoint=None):
         """
@@ -413,14 +419,14 @@ class BlochRegularGridInterpolator(object):
             point2 = np.dot(red_from_cart, point2)
 
         p21 = point2 - point1
-        line_points = np.reshape([alpha * p21 for alpha in np.linspace(0, 1, num=num)], (-1, 3))
+        line_points = np.outer(np.linspace(0, 1, num=num), p21)
         dist = self.structure.lattice.norm(line_points)
         line_points += point1
 
         return dict2namedtuple(site1=site1, site2=site2, points=line_points, dist=dist,
                                values=self.eval_points(line_points, kpoint=kpoint))
 
-    def eval_points(self, frac_coords, idt=None, cartesian=False, kpoint=None):
+    def eval_points(self, frac_coords, idt=None, cartesian=False, kpoint=None, chunk_size=None):
         """
         Interpolate values on an arbitrary list of points.
 
@@ -429,30 +435,76 @@ class BlochRegularGridInterpolator(object):
             idt: Index of the sub-array to interpolate. If None, all sub-arrays are interpolated.
             cartesian: True if points are in cartesian coordinates.
             kpoint: k-point in reduced coordinates. If not None, the phase-factor e^{ikr} is included.
+            chunk_size: Number of points interpolated in a single batch. Bounds the size
+                of the temporary arrays. None to use the default value `self.chunk_size`.
 
         Return:
-            [ndt, npoints] array or [1, npoints] if idt is not None
+            [ndt, npoints] array or [npoints] array if idt is not None
         """
         frac_coords = np.reshape(frac_coords, (-1, 3))
         if cartesian:
-            red_from_cart = self.structure.lattice.inv_matrix.T
-            frac_coords = [np.dot(red_from_cart, v) for v in frac_coords]
+            frac_coords = np.dot(frac_coords, self.structure.lattice.inv_matrix)
 
-        uc_coords = np.reshape(frac_coords, (-1, 3)) % 1
+        npts = len(frac_coords)
+        chunk_size = self.chunk_size if chunk_size is None else int(chunk_size)
+        chunk_size = max(chunk_size, 1)
+        data = self._flat_datar if idt is None else self._flat_datar[idt:idt+1]
 
-        if idt is None:
-            values = np.empty((self.ndt, len(uc_coords)), dtype=self.dtype)
-            for idt in range(self.ndt):
-                values[idt] = self._interpolators[idt](uc_coords)
-        else:
-            values = self._interpolators[idt](uc_coords)
+        values = np.empty((len(data), npts), dtype=self.dtype)
+        for start in range(0, npts, chunk_size):
+            stop = min(start + chunk_size, npts)
+            values[:, start:stop] = self._eval_chunk(data, frac_coords[start:stop])
 
         if kpoint is not None:
             if hasattr(kpoint, "frac_coords"): kpoint = kpoint.frac_coords
             kpoint = np.reshape(kpoint, (3,))
-            values *= np.exp(2j * np.pi * np.dot(frac_coords, kpoint))
+            values = values * np.exp(2j * np.pi * np.dot(frac_coords, kpoint))
 
-        return values
+        return values if idt is None else values[0]
+
+    def _eval_chunk(self, data, frac_coords):
+        """
+        Interpolate data on a chunk of points. Return [len(data), npts] array.
+        """
+        ngfft = self.ngfft
+        # Position in units of the grid spacing. Indices are wrapped inside the unit cell below.
+        u = frac_coords * ngfft
+        i0 = np.floor(u)
+        t = u - i0
+        i0 = i0.astype(np.int64)
+
+        if self.method == "linear":
+            offsets = (0, 1)
+            w = [1.0 - t, t]
+        else:
+            # Catmull-Rom weights for the 4 points at offsets -1, 0, 1, 2
+            offsets = (-1, 0, 1, 2)
+            t2 = t * t
+            t3 = t2 * t
+            w = [0.5 * (-t3 + 2 * t2 - t),
+                 0.5 * (3 * t3 - 5 * t2 + 2),
+                 0.5 * (-3 * t3 + 4 * t2 + t),
+                 0.5 * (t3 - t2)]
+
+        # Wrapped indices and weights along each direction: lists of [npts] arrays.
+        nx, ny, nz = ngfft
+        ix = [(i0[:, 0] + o) % nx for o in offsets]
+        iy = [((i0[:, 1] + o) % ny) * nz for o in offsets]
+        iz = [(i0[:, 2] + o) % nz for o in offsets]
+        wx = [wo[:, 0] for wo in w]
+        wy = [wo[:, 1] for wo in w]
+        wz = [wo[:, 2] for wo in w]
+
+        out = np.zeros((len(data), len(frac_coords)), dtype=np.result_type(data.dtype, np.float64))
+        for xa, wxa in zip(ix, wx):
+            xa = xa * (ny * nz)
+            for yb, wyb in zip(iy, wy):
+                xy = xa + yb
+                wxy = wxa * wyb
+                for zc, wzc in zip(iz, wz):
+                    out += np.take(data, xy + zc, axis=1) * (wxy * wzc)
+
+        return out
 
 
 def find_degs_sk(enesb, atol):
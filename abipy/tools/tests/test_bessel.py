@@ -21,3 +21,16 @@ class TestBessels(AbipyTest):
         def primitive(x):
             return -x * np.cos(x) + np.sin(x)
         self.assert_almost_equal(fq[-1], (1 / qmax**3) * (primitive(qmax*rcut) - primitive(0)))
+
+    def test_int_r2j0qr(self):
+        """Testing int_r2j0qr."""
+        rcut, qmax = 1.3, 3
+        qvals = np.linspace(0, qmax, num=200)
+        spline = bessel.spline_int_jlqr(0, qmax, rcut, numq=1024, numr=1024)
+        values = bessel.int_r2j0qr(qvals, rcut)
+        assert values.shape == qvals.shape
+        self.assert_almost_equal(values, spline(qvals))
+        self.assert_almost_equal(bessel.int_r2j0qr(0, rcut), rcut ** 3 / 3)
+        self.assert_almost_equal(bessel.int_r2j0qr(1e-4, rcut), spline(1e-4))
+        # Broadcasting over radii.
+        assert bessel.int_r2j0qr(qvals[:, None], [1.0, 2.0]).shape == (200, 2)
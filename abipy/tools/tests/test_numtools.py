@@ -67,3 +67,55 @@ class TestNumTools(AbipyTest):
 
         assert lorentzian(x=0.0, width=1.0, center=0.0, height=1.0) == 1.0
         self.assert_almost_equal(lorentzian(x=0.0, width=1.0, center=0.0, height=None), 1/np.pi)
+
+    def test_bloch_regular_grid_interpolator(self):
+        """Testing BlochRegularGridInterpolator."""
+        from scipy.interpolate import RegularGridInterpolator
+        import abipy.data as abidata
+        from abipy.core.structure import Structure
+        structure = Structure.from_file(abidata.cif_file("si.cif"))
+
+        np.random.seed(1)
+        nx, ny, nz = 12, 10, 14
+        datar = np.random.rand(2, nx, ny, nz) + 1j * np.random.rand(2, nx, ny, nz)
+        points = 3 * np.random.rand(500, 3) - 1
+
+        # Reference values computed with scipy on the padded array.
+        padded = add_periodic_replicas(datar)
+        axes = [np.linspace(0, 1, num=n + 1) for n in (nx, ny, nz)]
+        ref = np.array([RegularGridInterpolator(axes, padded[i])(points % 1) for i in range(2)])
+
+        interp = BlochRegularGridInterpolator(structure, datar)
+        values = interp.eval_points(points)
+        assert values.shape == (2, 500)
+        self.assert_almost_equal(values, ref)
+        self.assert_almost_equal(interp.eval_points(points, chunk_size=7), values)
+        self.assert_almost_equal(interp.eval_points(points, idt=1), values[1])
+
+        # Data with replicas gives the same results.
+        same = BlochRegularGridInterpolator(structure, padded, add_replicas=False)
+        self.assert_almost_equal(same.eval_points(points), values)
+
+        # Cartesian coordinates.
+        cart_points = structure.lattice.get_cartesian_coords(points)
+        self.assert_almost_equal(interp.eval_points(cart_points, cartesian=True), values)
+
+        # Line between the first two atoms.
+        r = interp.eval_line(0, 1, num=50)
+        assert r.values.shape == (2, 50)
+        assert r.site1 == structure[0] and r.site2 == structure[1]
+
+        # Tricubic interpolation of a smooth periodic function is more accurate than trilinear.
+        x, y, z = np.meshgrid(*[np.arange(n) / n for n in (nx, ny, nz)], indexing="ij")
+        func = lambda x, y, z: np.cos(2 * np.pi * x) * np.sin(2 * np.pi * y) + np.cos(2 * np.pi * z)
+        smooth_data = func(x, y, z)
+        exact = func(*points.T)
+        err_linear = np.abs(BlochRegularGridInterpolator(structure, smooth_data).eval_points(points)[0] - exact).max()
+        cubic = BlochRegularGridInterpolator(structure, smooth_data, method="cubic")
+        err_cubic = np.abs(cubic.eval_points(points)[0] - exact).max()
+        assert err_cubic < err_linear / 5
+        # Cubic interpolation goes through the grid points.
+        self.assert_almost_equal(cubic.eval_points([3 / nx, 4 / ny, 5 / nz])[0], smooth_data[3, 4, 5])
+
+        with self.assertRaises(ValueError):
+            BlochRegularGridInterpolator(structure, smooth_data, method="foo")
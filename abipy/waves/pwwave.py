@@ -289,12 +289,15 @@ class PWWaveFunction(WaveFunction):
         else:
             raise ValueError("Wrong space: %s" % str(space))
 
-    def get_interpolator(self):
+    def get_interpolator(self, method="linear"):
         """
         Return an interpolator object that interpolates periodic functions in real space.
+
+        Args:
+            method: "linear" for trilinear interpolation, "cubic" for tricubic interpolation.
         """
         from abipy.tools.numtools import BlochRegularGridInterpolator
-        return BlochRegularGridInterpolator(self.structure, self.ur)
+        return BlochRegularGridInterpolator(self.structure, self.ur, method=method)
 
     #def pww_translation(self, gvector, rprimd):
     #    """Returns the pwwave of the kpoint translated by one gvector."""
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Benchmark for the parsing of the main output file produced by Abinit.
+Compares the single-pass index built by AbinitOutputFile with the previous approach
+that read the file twice, stored all the sections in memory and rescanned the
+file to extract dimensions, SCF cycles and timer data.
+A large multi-dataset output file is generated by replicating the datasets of gs_dfpt.abo.
+
+Usage: bench_abo_parser.py [ncopies]
+"""
+import sys
+import os
+import time
+import tempfile
+import abipy.data as abidata
+
+from abipy.abio.outputs import AbinitOutputFile
+from abipy.abio.timer import AbinitTimerParser
+from abipy.flowtk import GroundStateScfCycle, D2DEScfCycle
+
+
+def make_big_output(ncopies):
+    """Replicate the datasets of gs_dfpt.abo ncopies times. Return path of the new file."""
+    with AbinitOutputFile(abidata.ref_file("refs/gs_dfpt.abo")) as abo:
+        header, footer, datasets = abo.header, abo.footer, list(abo.datasets.values())
+
+    _, path = tempfile.mkstemp(suffix=".abo", text=True)
+    with open(path, "wt") as fh:
+        fh.write(header)
+        idt = 0
+        for i in range(ncopies):
+            for data in datasets:
+                idt += 1
+                lines = data.splitlines(True)
+                lines[0] = "== DATASET %2d %s\n" % (idt, (80 - 15) * "=")
+                fh.write("".join(lines))
+        fh.write(footer)
+
+    return path
+
+
+def legacy_parse(path):
+    """Previous implementation: two passes over the file, all the sections are stored in memory."""
+    version, run_completed = None, False
+    with open(path) as fh:
+        for line in fh:
+            if version is None and line.startswith(".Version"): version = line.split()[1]
+            if " Calculation completed." in line: run_completed = True
+
+    header, footer, datasets = [], [], {}
+    where = "in_header"
+    with open(path, "rt") as fh:
+        for line in fh:
+            if "== DATASET" in line:
+                where = int(line.replace("=", "").split()[-1])
+                datasets[where] = []
+            elif "== END DATASET(S) " in line:
+                where = "in_footer"
+            if where == "in_header":
+                header.append(line)
+            elif where == "in_footer":
+                footer.append(line)
+            else:
+                datasets[where].append(line)
+
+    datasets = {k: "".join(v) for k, v in datasets.items()}
+    return "".join(header), "".join(footer), datasets
+
+
+def legacy_accessors(path):
+    """Previous implementation: each accessor rescans the file."""
+    magic_exit = "------------- Echo of variables that govern the present computation"
+    with open(path, "rt") as fh:
+        for line in fh:
+            if line.strip().startswith(magic_exit): break
+
+    ncycles = 0
+    for cls in (GroundStateScfCycle, D2DEScfCycle):
+        with open(path, "rt") as fh:
+            while cls.from_stream(fh) is not None:
+                ncycles += 1
+
+    timer = AbinitTimerParser()
+    timer.parse(path)
+    return ncycles
+
+
+def main():
+    ncopies = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    path = make_big_output(ncopies)
+    print("File size: %.1f Mb" % (os.path.getsize(path) / 1024**2))
+
+    start = time.time()
+    header, footer, datasets = legacy_parse(path)
+    t_ref_open = time.time() - start
+    start = time.time()
+    ncycles_ref = legacy_accessors(path)
+    t_ref_acc = time.time() - start
+
+    start = time.time()
+    abo = AbinitOutputFile(path)
+    t_new_open = time.time() - start
+    start = time.time()
+    abo.get_dims_spginfo_dataset()
+    ncycles = len(abo.get_all_gs_scf_cycles()) + len(abo.get_all_d2de_scf_cycles())
+    abo.get_timer()
+    t_new_acc = time.time() - start
+
+    assert ncycles == ncycles_ref
+    assert abo.ndtset == len(datasets) and abo.datasets[abo.ndtset] == datasets[abo.ndtset]
+    print("ndtset: %d, number of SCF cycles: %d" % (abo.ndtset, ncycles))
+    print("Previous parser:   open %.3f [s], accessors %.3f [s]" % (t_ref_open, t_ref_acc))
+    print("Single-pass index: open %.3f [s], accessors %.3f [s] (speedup: %.1f, %.1f)" % (
+          t_new_open, t_new_acc, t_ref_open / t_new_open, t_ref_acc / t_new_acc))
+
+    abo.close()
+    os.remove(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
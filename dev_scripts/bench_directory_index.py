@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Benchmark for the lookup of ABINIT files in the directories of a flow.
+Counts the filesystem calls (listdir, scandir, stat) performed in a scheduler-like cycle
+over a synthetic flow tree with the previous implementation of Directory.has_abiext
+(one listdir + one stat per file for each call) and with the cached list of files.
+
+Usage: bench_directory_index.py [ntasks] [ncycles]
+"""
+import sys
+import os
+import re
+import time
+import shutil
+import tempfile
+import collections
+
+from fnmatch import fnmatch
+from abipy.flowtk.utils import Directory
+
+# Extensions queried for each task in a cycle (dependencies, restart, results).
+EXTS = ["DEN", "WFK", "DDB", "GSR", "1WF", "SCR"]
+FILES = ["out_DEN", "out_WFK", "out_GSR.nc", "out_EIG", "out_EBANDS.agr", "out_DDB", "out_1WF7", "out_1WF8"]
+
+
+class LegacyDirectory(Directory):
+    """Previous implementation: list the directory at each call."""
+
+    def list_filepaths(self, wildcard=None):
+        fnames = [f for f in os.listdir(self.path)]
+        return list(filter(os.path.isfile, [os.path.join(self.path, f) for f in fnames]))
+
+    def has_abiext(self, ext, single_file=True):
+        if ext != "abo":
+            ext = ext if ext.startswith('_') else '_' + ext
+
+        files = []
+        for f in self.list_filepaths():
+            if ext == "_DDB" and f.endswith(".nc"): continue
+            if ext == "_MDF" and not f.endswith(".nc"): continue
+            if ext == "_DDK" and f.endswith(".nc"): continue
+            if f.endswith(ext) or f.endswith(ext + ".nc"):
+                files.append(f)
+
+        if not files:
+            files = [f for f in self.list_filepaths() if fnmatch(f, "*%s*" % ext)]
+
+        if not files: return ""
+        return files[0] if single_file else files
+
+    def find_1wf_files(self):
+        regex = re.compile(r"out_1WF(\d+)(\.nc)?$")
+        wf_paths = [f for f in self.list_filepaths() if regex.match(os.path.basename(f))]
+        return sorted(wf_paths)
+
+
+def make_tree(ntasks):
+    """Build synthetic flow tree with ntasks output directories. Return list of paths."""
+    top = tempfile.mkdtemp()
+    paths = []
+    for i in range(ntasks):
+        path = os.path.join(top, "w%d" % (i // 100), "t%d" % (i % 100), "outdata")
+        os.makedirs(path)
+        for fname in FILES:
+            with open(os.path.join(path, fname), "wt") as fh:
+                fh.write("data")
+        # Tasks completed a while ago.
+        os.utime(path, (time.time() - 3600,) * 2)
+        paths.append(path)
+
+    return top, paths
+
+
+class SyscallCounter(object):
+    """Wrap the functions of the os module and count the number of calls."""
+
+    def __init__(self, names=("listdir", "scandir", "stat")):
+        self.counts = collections.Counter()
+        self.orig = {name: getattr(os, name) for name in names}
+
+    def __enter__(self):
+        for name, func in self.orig.items():
+            def wrapper(*args, _name=name, _func=func, **kwargs):
+                self.counts[_name] += 1
+                return _func(*args, **kwargs)
+            setattr(os, name, wrapper)
+        return self
+
+    def __exit__(self, *exc):
+        for name, func in self.orig.items():
+            setattr(os, name, func)
+
+
+def run_cycles(dirs, ncycles):
+    """Emulate the scheduler: query the files of each task ncycles times."""
+    with SyscallCounter() as counter:
+        start = time.time()
+        for cycle in range(ncycles):
+            for d in dirs:
+                for ext in EXTS:
+                    d.has_abiext(ext, single_file=False)
+                d.find_1wf_files()
+        elapsed = time.time() - start
+
+    return counter.counts, elapsed
+
+
+def main():
+    ntasks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    ncycles = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    top, paths = make_tree(ntasks)
+
+    for cls in (LegacyDirectory, Directory):
+        dirs = [cls(p) for p in paths]
+        counts, elapsed = run_cycles(dirs, ncycles)
+        print("%s: %.1f syscalls per cycle %s, %.3f [s] per cycle" % (
+              cls.__name__, sum(counts.values()) / ncycles,
+              {k: v / ncycles for k, v in counts.items()}, elapsed / ncycles))
+
+    shutil.rmtree(top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Benchmark for the EventBus of the Flow on a large synthetic flow.
+Measures the time needed to connect the signals, the event throughput (immediate and batched delivery),
+the time to find the children of a node and the time to load the flow from the pickle file.
+If pydispatch is installed, the results are compared with the previous implementation based on pydispatch
+and on Node.get_children scanning the entire flow.
+
+Usage: bench_event_bus.py [nworks] [tasks_per_work]
+"""
+import sys
+import os
+import time
+import random
+import shutil
+import tempfile
+import abipy.data as abidata
+import abipy.abilab as abilab
+import abipy.flowtk as flowtk
+
+try:
+    from pydispatch import dispatcher
+except ImportError:
+    dispatcher = None
+
+MANAGER = """\
+qadapters:
+    - priority: 1
+      queue:
+        qtype: shell
+        qname: localhost
+      job: {}
+      limits:
+        timelimit: 1:00:00
+        max_cores: 1
+      hardware:
+        num_nodes: 1
+        sockets_per_node: 1
+        cores_per_socket: 1
+        mem_per_node: 4 Gb
+"""
+
+
+def make_flow(workdir, nworks, tasks_per_work):
+    """Chain of works. The first task of each work depends on the last task of the previous work."""
+    inp = abilab.AbinitInput(structure=abidata.cif_file("si.cif"), pseudos=abidata.pseudos("14si.pspnc"))
+    inp.set_vars(ecut=8, nband=8, toldfe=1e-8)
+
+    flow = flowtk.Flow(workdir=workdir, manager=flowtk.TaskManager.from_string(MANAGER))
+    prev = None
+    for i in range(nworks):
+        work = flowtk.Work()
+        for j in range(tasks_per_work):
+            deps = {prev: "DEN"} if (prev is not None and j == 0) else None
+            prev_task = work.register_scf_task(inp, deps=deps)
+        prev = prev_task
+        flow.register_work(work)
+    return flow
+
+
+def legacy_get_children(node):
+    """Previous implementation of Node.get_children."""
+    children = []
+    for work in node.flow:
+        if work.depends_on(node): children.append(work)
+        for task in work:
+            if task.depends_on(node): children.append(task)
+    return children
+
+
+def timeit(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def main():
+    nworks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    tasks_per_work = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    topdir = tempfile.mkdtemp()
+    flow = make_flow(os.path.join(topdir, "flow"), nworks, tasks_per_work)
+    t = timeit(flow.allocate)
+    tasks = list(flow.iflat_tasks())
+    print("nworks: %d, ntasks: %d, pydispatch: %s" % (nworks, len(tasks), dispatcher is not None))
+    print("%-40s %8.3f [s]" % ("allocate (includes connect_signals)", t))
+
+    def report(label, t, t_ref=None, nevents=None):
+        line = "%-40s %8.3f [s]" % (label, t)
+        if nevents is not None: line += "  %9.0f events/s" % (nevents / t)
+        if t_ref is not None: line += "  speedup: %.1f" % (t_ref / t)
+        print(line)
+
+    # Connect signals.
+    bus = flow.event_bus
+    bus._receivers.clear()
+    t = timeit(flow.connect_signals)
+    t_ref = None
+    if dispatcher is not None:
+        def legacy_connect():
+            for work in flow:
+                for task in work:
+                    dispatcher.connect(work.on_ok, signal=task.S_OK, sender=task)
+        t_ref = timeit(legacy_connect)
+        report("pydispatch connect", t_ref)
+    report("EventBus connect", t, t_ref)
+
+    # Event throughput. Tasks are not OK so that on_ok returns immediately.
+    nrep = 5
+    t_ref = None
+    if dispatcher is not None:
+        def legacy_send():
+            for _ in range(nrep):
+                for task in tasks:
+                    dispatcher.send(signal=task.S_OK, sender=task)
+        t_ref = timeit(legacy_send)
+        report("pydispatch send", t_ref, nevents=nrep * len(tasks))
+        for work in flow:
+            for task in work:
+                dispatcher.disconnect(work.on_ok, signal=task.S_OK, sender=task)
+
+    def send():
+        for _ in range(nrep):
+            for task in tasks:
+                bus.send(task, task.S_OK)
+
+    def send_batched():
+        with bus.batch():
+            send()
+
+    report("EventBus send", timeit(send), t_ref, nevents=nrep * len(tasks))
+    report("EventBus send (batch, deduplicated)", timeit(send_batched), t_ref, nevents=nrep * len(tasks))
+
+    # Children of the nodes.
+    sample = random.Random(0).sample(tasks, min(100, len(tasks)))
+    t_ref = timeit(lambda: [legacy_get_children(task) for task in sample])
+    report("legacy get_children (%d nodes)" % len(sample), t_ref)
+    bus.invalidate()
+    report("reverse index build", timeit(bus.get_consumers, tasks[0]))
+    report("get_children (%d nodes)" % len(sample), timeit(lambda: [task.get_children() for task in sample]), t_ref)
+    assert all(legacy_get_children(task) == task.get_children() for task in sample)
+
+    # Flow load time.
+    flow.build_and_pickle_dump()
+    t = timeit(flowtk.Flow.pickle_load, flow.workdir, False)
+    size = os.path.getsize(os.path.join(flow.workdir, flow.PICKLE_FNAME))
+    report("pickle_load (spectator_mode=False)", t)
+    print("%-40s %8.1f [Mb]" % ("pickle file", size / 1024**2))
+
+    shutil.rmtree(topdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Wall-time benchmark for Flow.build on a synthetic flow with many tasks.
+Compares the previous implementation (directories and files created serially, task by task)
+with the BuildPlan engine (in-memory plan, thread pool, unchanged files skipped on rebuild).
+
+Usage: bench_flow_build.py [ntasks] [tasks_per_work] [workdir]
+
+Use workdir to run the benchmark on a network filesystem (default: temporary directory).
+"""
+import sys
+import os
+import time
+import shutil
+import tempfile
+import abipy.data as abidata
+import abipy.abilab as abilab
+import abipy.flowtk as flowtk
+
+MANAGER = """\
+qadapters:
+    - priority: 1
+      queue:
+        qtype: shell
+        qname: localhost
+      job: {}
+      limits:
+        timelimit: 1:00:00
+        max_cores: 1
+      hardware:
+        num_nodes: 1
+        sockets_per_node: 1
+        cores_per_socket: 1
+        mem_per_node: 4 Gb
+"""
+
+
+def make_flow(workdir, ntasks, tasks_per_work):
+    """Convergence study with ntasks ScfTasks with different ecut."""
+    inp = abilab.AbinitInput(structure=abidata.cif_file("si.cif"), pseudos=abidata.pseudos("14si.pspnc"))
+    inp.set_vars(ecut=8, nband=8, toldfe=1e-8)
+    inp.set_kmesh(ngkpt=[4, 4, 4], shiftk=[0, 0, 0])
+
+    manager = flowtk.TaskManager.from_string(MANAGER)
+    flow = flowtk.Flow(workdir=workdir, manager=manager)
+    for start in range(0, ntasks, tasks_per_work):
+        work = flowtk.Work()
+        for i in range(start, min(start + tasks_per_work, ntasks)):
+            work.register_scf_task(inp.new_with_vars(ecut=8 + 0.001 * i))
+        flow.register_work(work)
+    flow.allocate()
+    return flow
+
+
+def legacy_build(flow):
+    """Previous implementation of Flow.build: directories and files are created serially."""
+    for d in (flow.indir, flow.outdir, flow.tmpdir):
+        d.makedirs()
+    for work in flow:
+        for d in (work.indir, work.outdir, work.tmpdir):
+            d.makedirs()
+        for task in work:
+            for d in (task.indir, task.outdir, task.tmpdir):
+                d.makedirs()
+            if not task.files_file.exists:
+                task.files_file.write(task.filesfile_string)
+            task.input_file.write(task.make_input())
+            task.manager.write_jobfile(task)
+        work.connect_signals()
+
+
+def main():
+    ntasks = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tasks_per_work = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    topdir = tempfile.mkdtemp(dir=sys.argv[3] if len(sys.argv) > 3 else None)
+    print("ntasks: %d, tasks_per_work: %d, cpus: %d, topdir: %s" % (ntasks, tasks_per_work, os.cpu_count(), topdir))
+
+    ref_flow = make_flow(os.path.join(topdir, "legacy"), ntasks, tasks_per_work)
+    start = time.time()
+    legacy_build(ref_flow)
+    t_ref = time.time() - start
+    print("%-36s %7.2f [s]" % ("Legacy serial build", t_ref))
+
+    flow = make_flow(os.path.join(topdir, "plan"), ntasks, tasks_per_work)
+    start = time.time()
+    stats = flow.build()
+    t = time.time() - start
+    print("%-36s %7.2f [s]  speedup: %.1f  written: %d" % ("BuildPlan (cold)", t, t_ref / t, stats.num_written))
+
+    # The input files produced by the two implementations must be identical.
+    for task_ref, task in zip(ref_flow.iflat_tasks(), flow.iflat_tasks()):
+        assert task_ref.input_file.read() == task.input_file.read()
+
+    # Rebuild with one modified task.
+    flow[0][0].input.set_vars(ecut=20)
+    start = time.time()
+    stats = flow.build()
+    t = time.time() - start
+    print("%-36s %7.2f [s]  speedup: %.1f  written: %d, unchanged: %d" % (
+          "BuildPlan (rebuild)", t, t_ref / t, stats.num_written, stats.num_skipped))
+
+    shutil.rmtree(topdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Throughput benchmark for the archiving of a flow directory.
+Compares FlowArchiver (parallel gzip, no chdir) with the previous implementation of
+Flow.make_tarfile based on a single-threaded tarfile in "w:gz" mode.
+The benchmark is executed on a synthetic flow tree created in a temporary directory.
+
+Usage: bench_flow_tarfile.py [ntasks] [mb_per_task]
+"""
+import sys
+import os
+import time
+import shutil
+import tarfile
+import tempfile
+import numpy as np
+
+from abipy.flowtk.archive import FlowArchiver
+
+
+def make_tree(workdir, ntasks, mb_per_task):
+    """Synthetic flow with ntasks tasks. Output files contain formatted numbers (compressible) and raw floats."""
+    rng = np.random.RandomState(0)
+    nvals = int(mb_per_task * 2**20 / 2 / 20)
+    for i in range(ntasks):
+        tdir = os.path.join(workdir, "w%d" % (i // 10), "t%d" % (i % 10))
+        for d in ("indata", "outdata", "tmpdata"):
+            os.makedirs(os.path.join(tdir, d))
+        with open(os.path.join(tdir, "run.abi"), "wt") as fh:
+            fh.write("ecut %d\nnband 8\n" % i)
+        with open(os.path.join(tdir, "run.abo"), "wt") as fh:
+            fh.write("\n".join("%19.12e" % v for v in rng.rand(nvals)))
+        with open(os.path.join(tdir, "outdata", "out_DEN"), "wb") as fh:
+            fh.write(rng.rand(nvals * 20 // 8).astype(np.float32).tobytes())
+        os.symlink(os.path.join(tdir, "outdata", "out_DEN"), os.path.join(tdir, "indata", "in_DEN"))
+
+
+def legacy_make_tarfile(workdir, name):
+    """Previous implementation: chdir and single-threaded tarfile with filter."""
+    def filter(tarinfo):
+        if tarinfo.issym() or tarinfo.islnk(): return None
+        return tarinfo
+
+    back = os.getcwd()
+    os.chdir(os.path.join(workdir, ".."))
+    with tarfile.open(name=name, mode='w:gz') as tar:
+        tar.add(os.path.basename(workdir), arcname=None, recursive=True, filter=filter)
+    os.chdir(back)
+    return name
+
+
+def read_members(path):
+    with tarfile.open(path, "r:gz") as tar:
+        return {m.name: (tar.extractfile(m).read() if m.isfile() else None) for m in tar.getmembers()}
+
+
+def main():
+    ntasks = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    mb_per_task = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    tmpdir = tempfile.mkdtemp()
+    workdir = os.path.join(tmpdir, "flow_bench")
+    make_tree(workdir, ntasks, mb_per_task)
+    nbytes = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(workdir) for f in files
+                 if not os.path.islink(os.path.join(d, f)))
+    print("ntasks: %d, data: %.1f Mb, cpus: %d" % (ntasks, nbytes / 2**20, os.cpu_count()))
+
+    def report(label, path, t):
+        print("%-32s %7.2f [s] %8.1f Mb/s  size: %.1f Mb" % (
+              label, t, nbytes / 2**20 / t, os.path.getsize(path) / 2**20))
+
+    start = time.time()
+    ref = legacy_make_tarfile(workdir, os.path.join(tmpdir, "legacy.tar.gz"))
+    t_ref = time.time() - start
+    report("Legacy tarfile w:gz", ref, t_ref)
+
+    # Legacy mode uses compresslevel 9, FlowArchiver uses 6 (gzip default).
+    runs = [(1, 9), (1, 6)] + ([(os.cpu_count(), 6)] if os.cpu_count() > 1 else [])
+    for nprocs, level in runs:
+        path = os.path.join(tmpdir, "new%d.tar.gz" % nprocs)
+        start = time.time()
+        FlowArchiver(workdir, nprocs=nprocs, compresslevel=level).make_archives(path)
+        t = time.time() - start
+        report("FlowArchiver nprocs=%d level=%d" % (nprocs, level), path, t)
+        print("%-32s speedup: %.1f" % ("", t_ref / t))
+
+    assert read_members(ref) == read_members(path)
+    print("Members of the archives are identical.")
+
+    # Incremental archive after modifying two tasks.
+    for i in (0, ntasks - 1):
+        with open(os.path.join(workdir, "w%d" % (i // 10), "t%d" % (i % 10), "run.abo"), "at") as fh:
+            fh.write("\nEND")
+    manifest = os.path.join(tmpdir, "new%d.manifest.json" % os.cpu_count())
+    start = time.time()
+    paths, _ = FlowArchiver(workdir).make_archives(os.path.join(tmpdir, "incr.tar.gz"), since=manifest)
+    report("Incremental (2 files)", paths[0], time.time() - start)
+
+    shutil.rmtree(tmpdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
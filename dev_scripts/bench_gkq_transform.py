@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark for the transformation of the e-ph matrix elements stored in a GKQ.nc file
+from the atomic to the phonon representation.
+Compares the einsum-based transform (full array and k-chunks) with the previous
+implementation that looped over spin, k-points and phonon modes.
+A synthetic file with the same layout as GKQ.nc is generated in a temporary directory.
+
+Usage: bench_gkq_transform.py [natom] [nkpt] [mband]
+"""
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import netCDF4
+
+from abipy.eph.gkq import GkqReader
+from abipy.eph.common import EPH_WTOL
+
+
+def gkq_atm2nu_loop(gkq_atm, phfreqs_ha, phdispl_red):
+    """Previous implementation with explicit loops over spin, k-points and modes."""
+    nband = gkq_atm.shape[-1]
+    nb2 = nband ** 2
+    natom3 = len(phfreqs_ha)
+    gkq_nu = np.empty_like(gkq_atm)
+    cwork = np.empty((natom3, nb2), dtype=np.complex)
+    for spin in range(gkq_atm.shape[0]):
+        for ik in range(gkq_atm.shape[1]):
+            g = np.reshape(gkq_atm[spin, ik], (-1, nb2))
+            for nu in range(natom3):
+                if phfreqs_ha[nu] > EPH_WTOL:
+                    cwork[nu] = np.dot(phdispl_red[nu], g) / np.sqrt(2.0 * phfreqs_ha[nu])
+                else:
+                    cwork[nu] = 0.0
+            gkq_nu[spin, ik] = np.reshape(cwork, (natom3, nband, nband))
+
+    return gkq_nu
+
+
+def write_synthetic_gkq(filepath, nsppol, nkpt, natom3, mband):
+    """Write netcdf file with random e-ph matrix elements."""
+    rng = np.random.RandomState(0)
+    with netCDF4.Dataset(filepath, mode="w") as root:
+        root.createDimension("number_of_spins", nsppol)
+        root.createDimension("number_of_kpoints", nkpt)
+        root.createDimension("number_of_phonon_modes", natom3)
+        root.createDimension("max_number_of_states", mband)
+        root.createDimension("complex", 2)
+        var = root.createVariable("gkq", "f8", ("number_of_spins", "number_of_kpoints", "number_of_phonon_modes",
+                                               "max_number_of_states", "max_number_of_states", "complex"))
+        for spin in range(nsppol):
+            var[spin] = rng.normal(size=(nkpt, natom3, mband, mband, 2))
+
+
+def main():
+    natom = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    nkpt = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    mband = int(sys.argv[3]) if len(sys.argv) > 3 else 12
+    nsppol, natom3 = 1, 3 * natom
+
+    rng = np.random.RandomState(1)
+    phfreqs_ha = np.concatenate([np.zeros(3), rng.uniform(1e-4, 1e-2, size=natom3 - 3)])
+    phdispl_red = rng.normal(size=(natom3, natom3)) + 1j * rng.normal(size=(natom3, natom3))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, "synthetic_GKQ.nc")
+        write_synthetic_gkq(filepath, nsppol, nkpt, natom3, mband)
+        print("natom3: %d, nkpt: %d, mband: %d, size of gkq: %.1f Mb" % (
+              natom3, nkpt, mband, nsppol * nkpt * natom3 * mband ** 2 * 16 / 1024 ** 2))
+
+        with GkqReader(filepath) as reader:
+            start = time.time()
+            ref = gkq_atm2nu_loop(reader.read_value("gkq", cmode="c"), phfreqs_ha, phdispl_red)
+            t_ref = time.time() - start
+
+            start = time.time()
+            gkq_nu = reader.read_gkq_nu(phfreqs_ha, phdispl_red)
+            t_new = time.time() - start
+
+            kchunk = max(nkpt // 10, 1)
+            start = time.time()
+            gkq_chunk = reader.read_gkq_nu(phfreqs_ha, phdispl_red, kchunk=kchunk)
+            t_chunk = time.time() - start
+
+    print("Loop over spin, k-points and modes: %.3f [s]" % t_ref)
+    print("einsum transform:                   %.3f [s] (speedup: %.1f)" % (t_new, t_ref / t_new))
+    print("einsum transform, kchunk %5d:      %.3f [s] (speedup: %.1f)" % (kchunk, t_chunk, t_ref / t_chunk))
+    print("Max abs diff:", max(np.abs(ref - gkq_nu).max(), np.abs(ref - gkq_chunk).max()))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
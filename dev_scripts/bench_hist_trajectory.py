@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Benchmark for the analysis of long MD trajectories stored in HIST.nc files.
+Generates a synthetic HIST file and compares the vectorized HistTrajectory
+with the previous approach based on one Structure object per step.
+
+Usage: bench_hist_trajectory.py [nsteps] [natom]
+"""
+import sys
+import os
+import tempfile
+import time
+import numpy as np
+
+from abipy.dynamics.hist import HistFile, RunningAverages, MsdAccumulator
+
+
+def write_synthetic_hist(filepath, nsteps, natom):
+    """Write a HIST.nc file with a random walk of ``natom`` Si atoms in a fluctuating cubic cell."""
+    import netCDF4
+    rng = np.random.RandomState(0)
+    with netCDF4.Dataset(filepath, mode="w") as nc:
+        nc.createDimension("natom", natom)
+        nc.createDimension("ntypat", 1)
+        nc.createDimension("npsp", 1)
+        nc.createDimension("xyz", 3)
+        nc.createDimension("time", None)
+        nc.createDimension("six", 6)
+
+        nc.createVariable("typat", "f8", ("natom",))[:] = np.ones(natom)
+        nc.createVariable("znucl", "f8", ("npsp",))[:] = [14.0]
+        nc.createVariable("amu", "f8", ("ntypat",))[:] = [28.0855]
+        nc.createVariable("dtion", "f8", ())[...] = 100.0
+
+        acell = 10.26 * (1 + 0.01 * rng.randn(nsteps))
+        rprimd = acell[:, None, None] * np.eye(3)[None]
+        xred = (rng.rand(natom, 3) + np.cumsum(0.001 * rng.randn(nsteps, natom, 3), axis=0)) % 1
+        fcart = 0.01 * rng.randn(nsteps, natom, 3)
+        for name, dims, values in [
+            ("xred", ("time", "natom", "xyz"), xred),
+            ("xcart", ("time", "natom", "xyz"), np.einsum("sai,sij->saj", xred, rprimd)),
+            ("fcart", ("time", "natom", "xyz"), fcart),
+            ("fred", ("time", "natom", "xyz"), fcart),
+            ("vel", ("time", "natom", "xyz"), np.zeros((nsteps, natom, 3))),
+            ("acell", ("time", "xyz"), np.ones((nsteps, 3))),
+            ("rprimd", ("time", "xyz", "xyz"), rprimd),
+            ("etotal", ("time",), -8 * natom + 0.01 * rng.randn(nsteps)),
+            ("ekin", ("time",), np.zeros(nsteps)),
+            ("entropy", ("time",), np.zeros(nsteps)),
+            ("mdtime", ("time",), np.arange(nsteps, dtype=np.float)),
+            ("strten", ("time", "six"), 1e-5 * rng.randn(nsteps, 6)),
+        ]:
+            nc.createVariable(name, "f8", dims)[:] = values
+
+
+def per_structure_analysis(hist):
+    """Previous approach: build all the structures and loop over them."""
+    structures = hist.reader.read_all_structures()
+    abc = [s.lattice.abc for s in structures]
+    angles = [s.lattice.angles for s in structures]
+    volumes = [s.lattice.volume for s in structures]
+    forces_hist = hist.reader.read_cart_forces()
+    fmax = [np.sqrt([np.dot(f, f) for f in forces]).max() for forces in forces_hist]
+    return np.array(abc), np.array(angles), np.array(volumes), np.array(fmax)
+
+
+def main():
+    nsteps = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    natom = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    workdir = tempfile.mkdtemp()
+    filepath = os.path.join(workdir, "synthetic_HIST.nc")
+    write_synthetic_hist(filepath, nsteps, natom)
+    print("Synthetic HIST file with nsteps: %d, natom: %d" % (nsteps, natom))
+
+    with HistFile(filepath) as hist:
+        start = time.time()
+        ref = per_structure_analysis(hist)
+        t_ref = time.time() - start
+
+    with HistFile(filepath) as hist:
+        start = time.time()
+        traj = hist.trajectory
+        res = traj.abc, traj.angles, traj.volumes, traj.fstats.fmax
+        t_new = time.time() - start
+
+        xdatcar = os.path.join(workdir, "XDATCAR")
+        start = time.time()
+        hist.write_xdatcar(filepath=xdatcar, overwrite=True)
+        t_xdatcar = time.time() - start
+
+    with HistFile(filepath) as hist:
+        # Streaming analysis: memory is bounded by the size of the chunk.
+        start = time.time()
+        hist.accumulate([RunningAverages(), MsdAccumulator()], chunk=500)
+        t_stream = time.time() - start
+
+    diff = max(np.abs(r - n).max() for r, n in zip(ref, res))
+    print("Per-structure analysis: %.3f [s]" % t_ref)
+    print("HistTrajectory:         %.3f [s] (speedup: %.1f, max_absdiff: %.2e)" % (t_new, t_ref / t_new, diff))
+    print("write_xdatcar:          %.3f [s]" % t_xdatcar)
+    print("Streaming averages+MSD: %.3f [s] (chunk: 500)" % t_stream)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
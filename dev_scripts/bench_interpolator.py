@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Benchmark BlochRegularGridInterpolator against the previous implementation
+based on one scipy RegularGridInterpolator per component and padded data.
+
+Usage: bench_interpolator.py [ngfft] [ndt] [npoints]
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from scipy.interpolate import RegularGridInterpolator
+from abipy.core.structure import Structure
+from abipy.tools.numtools import BlochRegularGridInterpolator, add_periodic_replicas
+
+
+def scipy_eval_points(datar, frac_coords):
+    """Reference implementation: padding + ndt scipy interpolators."""
+    datar = add_periodic_replicas(datar)
+    axes = [np.linspace(0, 1, num=n) for n in datar.shape[-3:]]
+    interpolators = [RegularGridInterpolator(axes, d) for d in datar]
+    uc_coords = frac_coords % 1
+    values = np.empty((len(datar), len(uc_coords)), dtype=datar.dtype)
+    for idt, interp in enumerate(interpolators):
+        values[idt] = interp(uc_coords)
+    return values
+
+
+def measure(func, *args):
+    """Return wall-time in seconds, peak memory in Mb and result of func(*args)."""
+    tracemalloc.start()
+    start = time.time()
+    result = func(*args)
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024**2
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    ngfft = int(sys.argv[1]) if len(sys.argv) > 1 else 96
+    ndt = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    npoints = int(sys.argv[3]) if len(sys.argv) > 3 else 10**6
+
+    structure = Structure.fcc(10.26, ["Si"], units="bohr")
+    datar = np.random.rand(ndt, ngfft, ngfft, ngfft)
+    frac_coords = np.random.rand(npoints, 3)
+    print("ngfft: %d, ndt: %d, npoints: %d, data size: %.1f Mb" % (ngfft, ndt, npoints, datar.nbytes / 1024**2))
+
+    t_old, m_old, ref = measure(scipy_eval_points, datar, frac_coords)
+    print("scipy + replicas:     %8.3f s, peak memory %8.1f Mb" % (t_old, m_old))
+
+    for method in ("linear", "cubic"):
+        interp = BlochRegularGridInterpolator(structure, datar, method=method)
+        t_new, m_new, values = measure(interp.eval_points, frac_coords)
+        print("periodic %-6s:      %8.3f s, peak memory %8.1f Mb" % (method, t_new, m_new))
+        if method == "linear":
+            print("max abs difference wrt scipy: %.3e, speedup: %.1f" % (np.abs(values - ref).max(), t_old / t_new))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Benchmark for the matching of the phonon branches along a q-path.
+Compares match_eigenvectors_batch with the previous approach that computed
+the overlaps and solved the greedy assignment for each pair of consecutive q-points.
+The eigenvectors are obtained from synthetic dynamical matrices made of
+decoupled blocks so that the branches cross along the path.
+
+Usage: bench_phonon_matching.py [natom] [nqpt]
+"""
+import sys
+import time
+import numpy as np
+
+from abipy.dfpt.phtk import match_eigenvectors_batch
+
+
+def match_per_pair(v1, v2):
+    """Previous implementation: greedy assignment for a single pair of q-points."""
+    prod = np.absolute(np.dot(v1, v2.transpose().conjugate()))
+
+    indices = np.zeros(len(v1), dtype=np.int)
+    missing_v1 = [True] * len(v1)
+    missing_v2 = [True] * len(v1)
+    for m in reversed(np.argsort(prod, axis=None)):
+        i, j = np.unravel_index(m, prod.shape)
+        if missing_v1[i] and missing_v2[j]:
+            indices[i] = j
+            missing_v1[i] = missing_v2[j] = False
+            if not any(missing_v1):
+                break
+
+    return indices
+
+
+def synthetic_eigenvectors(natom, nqpt, nblocks=6, seed=0):
+    """Eigenvectors of H(t) = A + t B along the path with A, B block-diagonal."""
+    rng = np.random.RandomState(seed)
+    nb = 3 * natom
+    mask = np.zeros((nb, nb))
+    for chunk in np.array_split(np.arange(nb), nblocks):
+        mask[np.ix_(chunk, chunk)] = 1
+    a = rng.randn(nb, nb) + 1j * rng.randn(nb, nb)
+    b = rng.randn(nb, nb) + 1j * rng.randn(nb, nb)
+    a = (a + a.T.conj()) * mask
+    b = (b + b.T.conj()) * mask
+    ts = np.linspace(0, 1, nqpt)
+    return np.array([np.linalg.eigh(a + t * b)[1].T for t in ts])
+
+
+def main():
+    natom = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    nqpt = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    eigvecs = synthetic_eigenvectors(natom, nqpt)
+    print("natom: %d, nbranches: %d, nqpt: %d" % (natom, 3 * natom, nqpt))
+
+    start = time.time()
+    ref = np.array([match_per_pair(eigvecs[j - 1], eigvecs[j]) for j in range(1, nqpt)])
+    t_ref = time.time() - start
+
+    start = time.time()
+    matches = match_eigenvectors_batch(eigvecs[:-1], eigvecs[1:])
+    t_new = time.time() - start
+
+    print("Per-pair greedy assignment: %.3f [s]" % t_ref)
+    print("Batched matching:           %.3f [s] (speedup: %.1f)" % (t_new, t_ref / t_new))
+    print("Identical indices:", np.array_equal(ref, matches))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
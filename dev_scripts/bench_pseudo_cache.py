@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Benchmark for the loading of a large directory of pseudopotentials.
+Compares the pymatgen parser (serial, full parse of each file + md5) with the PseudoCache
+(cold load with a pool of processes, warm load from the cache file in a new cache instance).
+The directory is populated with copies of the pseudopotentials in abipy/data/pseudos.
+
+Usage: bench_pseudo_cache.py [ncopies]
+"""
+import sys
+import os
+import time
+import shutil
+import tempfile
+import abipy.data as abidata
+
+from abipy.flowtk.pseudos import Pseudo, PseudoCache
+
+EXTS = ("psp8", "pspnc", "xml", "fhi", "oncvpsp")
+
+
+def make_dir(workdir, ncopies):
+    fnames = [f for f in os.listdir(abidata.pseudo_dir) if f.split(".")[-1] in EXTS]
+    paths = []
+    for i in range(ncopies):
+        for fname in fnames:
+            path = os.path.join(workdir, "%d_%s" % (i, fname))
+            shutil.copy(os.path.join(abidata.pseudo_dir, fname), path)
+            paths.append(path)
+    return paths
+
+
+def legacy_load(paths):
+    """Previous implementation: files are parsed serially and md5 is computed on demand."""
+    pseudos = []
+    for path in paths:
+        try:
+            pseudo = Pseudo.from_file(path)
+        except Exception:
+            continue
+        pseudo.md5
+        pseudos.append(pseudo)
+    return pseudos
+
+
+def main():
+    ncopies = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    topdir = tempfile.mkdtemp()
+    paths = make_dir(topdir, ncopies)
+    filepath = os.path.join(topdir, "pseudos_cache.pickle")
+    print("nfiles: %d, cpus: %d" % (len(paths), os.cpu_count()))
+
+    def report(label, t, t_ref=None):
+        line = "%-36s %7.3f [s]" % (label, t)
+        if t_ref is not None: line += "  speedup: %.1f" % (t_ref / t)
+        print(line)
+
+    start = time.time()
+    ref = legacy_load(paths)
+    t_ref = time.time() - start
+    report("Legacy serial parse", t_ref)
+
+    start = time.time()
+    pseudos = PseudoCache(filepath).get_pseudos(paths, raise_exc=False)
+    report("PseudoCache (cold)", time.time() - start, t_ref)
+
+    start = time.time()
+    cache = PseudoCache(filepath)
+    new_pseudos = cache.get_pseudos(paths, raise_exc=False)
+    report("PseudoCache (warm, new process)", time.time() - start, t_ref)
+    assert cache.num_misses == 0
+    assert [p for p in new_pseudos if p is not None] == ref
+    assert all(p.md5 == q.md5 for p, q in zip([p for p in pseudos if p is not None], ref))
+    print("%-36s %7.1f [Mb]" % ("cache file", os.path.getsize(filepath) / 1024**2))
+
+    shutil.rmtree(topdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
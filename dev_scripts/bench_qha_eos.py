@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""
+Benchmark for the EOS fits performed in the quasi-harmonic approximation.
+Compares the batched fit of all the temperatures with the previous approach
+that called pymatgen EOS.fit for each temperature.
+Synthetic free energies F(V, T) are generated from a Vinet EOS with temperature-dependent parameters.
+
+Usage: bench_qha_eos.py [ntemp] [nvols] [eos_name]
+"""
+import sys
+import time
+import numpy as np
+
+from pymatgen.analysis.eos import EOS, Vinet
+from abipy.dfpt.qha import fit_eos_batch
+
+
+def main():
+    ntemp = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    nvols = int(sys.argv[2]) if len(sys.argv) > 2 else 9
+    eos_name = sys.argv[3] if len(sys.argv) > 3 else "vinet"
+
+    volumes = np.linspace(38, 44, nvols)
+    tmesh = np.linspace(0, 1000, ntemp)
+    rng = np.random.RandomState(0)
+    energies = np.empty((nvols, ntemp))
+    for it, temp in enumerate(tmesh):
+        params = (-230 - 1e-4 * temp, 0.6 - 1e-4 * temp, 4.2, 40.8 + 5e-4 * temp)
+        energies[:, it] = Vinet(volumes, None)._func(volumes, params)
+    energies += 1e-5 * rng.uniform(size=energies.shape)
+    print("ntemp: %d, nvols: %d, eos: %s" % (ntemp, nvols, eos_name))
+
+    start = time.time()
+    fits = [EOS(eos_name).fit(volumes, e) for e in energies.T]
+    t_ref = time.time() - start
+    ref = np.array([[f.e0, f.b0, f.b1, f.v0] for f in fits])
+
+    start = time.time()
+    params = fit_eos_batch(eos_name, volumes, energies)
+    t_new = time.time() - start
+
+    print("pymatgen fit for each temperature: %.3f [s]" % t_ref)
+    print("Batched fit:                       %.3f [s] (speedup: %.1f)" % (t_new, t_ref / t_new))
+    print("Max relative diff in v0: %.2E, e0: %.2E, b0: %.2E" % tuple(
+          np.abs((params[:, i] - ref[:, i]) / ref[:, i]).max() for i in (3, 0, 1)))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
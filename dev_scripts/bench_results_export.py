@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark for the export of the results of a large synthetic flow to a SQLite document store.
+Compares the task-by-task export (one get_results and one insertion per task)
+with Flow.export_results (batched upserts, serial and parallel extraction).
+
+Usage: bench_results_export.py [ntasks] [tasks_per_work]
+"""
+import sys
+import os
+import time
+import shutil
+import tempfile
+import abipy.data as abidata
+import abipy.abilab as abilab
+import abipy.flowtk as flowtk
+
+from abipy.flowtk.db import SQLiteStore, task_to_document
+
+MANAGER = """\
+qadapters:
+    - priority: 1
+      queue:
+        qtype: shell
+        qname: localhost
+      job: {}
+      limits:
+        timelimit: 1:00:00
+        max_cores: 1
+      hardware:
+        num_nodes: 1
+        sockets_per_node: 1
+        cores_per_socket: 1
+        mem_per_node: 4 Gb
+"""
+
+
+def make_flow(workdir, ntasks, tasks_per_work):
+    """Flow with ntasks completed tasks."""
+    inp = abilab.AbinitInput(structure=abidata.cif_file("si.cif"), pseudos=abidata.pseudos("14si.pspnc"))
+    inp.set_vars(ecut=8, nband=8, toldfe=1e-8)
+
+    flow = flowtk.Flow(workdir=workdir, manager=flowtk.TaskManager.from_string(MANAGER))
+    for start in range(0, ntasks, tasks_per_work):
+        work = flowtk.Work()
+        for i in range(start, min(start + tasks_per_work, ntasks)):
+            work.register(inp)
+        flow.register_work(work)
+
+    flow.build_and_pickle_dump()
+    for task in flow.iflat_tasks():
+        task._status = task.S_OK
+        task._returncode = 0
+    flow.pickle_dump()
+    return flow
+
+
+def legacy_export(flow, store):
+    """Task-by-task export: one document and one transaction per task."""
+    for task in flow.iflat_tasks():
+        store.upsert_many([task_to_document(task, flow.workdir)])
+
+
+def main():
+    ntasks = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tasks_per_work = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    topdir = tempfile.mkdtemp()
+    flow = make_flow(os.path.join(topdir, "flow"), ntasks, tasks_per_work)
+    print("ntasks: %d, cpus: %d" % (ntasks, os.cpu_count()))
+
+    def run(label, func, t_ref=None):
+        path = os.path.join(topdir, label.replace(" ", "_") + ".sqlite")
+        with SQLiteStore(path) as store:
+            start = time.time()
+            func(store)
+            t = time.time() - start
+            assert store.count() == ntasks
+        line = "%-36s %7.2f [s] %9.0f docs/s" % (label, t, ntasks / t)
+        if t_ref is not None: line += "  speedup: %.1f" % (t_ref / t)
+        print(line)
+        return t
+
+    t_ref = run("Task by task", lambda store: legacy_export(flow, store))
+    run("export_results (serial)", lambda store: flow.export_results(store=store), t_ref)
+    if os.cpu_count() > 1:
+        run("export_results (max_workers=%d)" % os.cpu_count(),
+            lambda store: flow.export_results(store=store, max_workers=None), t_ref)
+
+    shutil.rmtree(topdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
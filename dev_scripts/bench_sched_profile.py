@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Benchmark for the overhead of the CycleProfiler on the cycles of the scheduler.
+Executes the main steps of a cycle of the PyFlowScheduler (check_status, find_deadlocks, pickle_dump)
+on a large synthetic flow with submitted tasks without profiling, with profiling and with the
+sampling profiler, then prints the median time per cycle and the summary of the log produced by the profiler.
+
+Usage: bench_sched_profile.py [ntasks] [tasks_per_work] [ncycles]
+"""
+import sys
+import os
+import time
+import shutil
+import statistics
+import tempfile
+import abipy.data as abidata
+import abipy.abilab as abilab
+import abipy.flowtk as flowtk
+
+from abipy.flowtk.profiling import CycleProfiler, CycleLog, profile_cycle, phase
+
+MANAGER = """\
+qadapters:
+    - priority: 1
+      queue:
+        qtype: shell
+        qname: localhost
+      job: {}
+      limits:
+        timelimit: 1:00:00
+        max_cores: 1
+      hardware:
+        num_nodes: 1
+        sockets_per_node: 1
+        cores_per_socket: 1
+        mem_per_node: 4 Gb
+"""
+
+
+def make_flow(workdir, ntasks, tasks_per_work):
+    """Flow with ntasks submitted tasks."""
+    inp = abilab.AbinitInput(structure=abidata.cif_file("si.cif"), pseudos=abidata.pseudos("14si.pspnc"))
+    inp.set_vars(ecut=8, nband=8, toldfe=1e-8)
+
+    flow = flowtk.Flow(workdir=workdir, manager=flowtk.TaskManager.from_string(MANAGER))
+    for start in range(0, ntasks, tasks_per_work):
+        work = flowtk.Work()
+        for i in range(start, min(start + tasks_per_work, ntasks)):
+            work.register(inp)
+        flow.register_work(work)
+
+    flow.build_and_pickle_dump()
+    for task in flow.iflat_tasks():
+        task.set_status(task.S_SUB, "Submitted by the benchmark")
+    return flow
+
+
+def run_cycle(flow):
+    """Main steps of PyFlowScheduler._callback."""
+    with phase("check_status"):
+        flow.check_status(show=False)
+    with phase("find_deadlocks"):
+        flow.find_deadlocks()
+    flow.pickle_dump()
+
+
+def main():
+    ntasks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    tasks_per_work = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    ncycles = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+    topdir = tempfile.mkdtemp()
+    flow = make_flow(os.path.join(topdir, "flow"), ntasks, tasks_per_work)
+    print("ntasks: %d, ncycles: %d" % (ntasks, ncycles))
+
+    # The modes are interleaved and the median is reported to reduce the noise due to the filesystem.
+    logpath = os.path.join(flow.workdir, CycleProfiler.LOG_FNAME)
+    modes = [("No profiling", None),
+             ("CycleProfiler", CycleProfiler(logpath)),
+             ("CycleProfiler + sampling", CycleProfiler(logpath + ".sampling", sampling_interval=0.01))]
+    run_cycle(flow)
+    times = [[] for _ in modes]
+    for _ in range(ncycles):
+        for i, (_, profiler) in enumerate(modes):
+            start = time.perf_counter()
+            with profile_cycle(profiler):
+                run_cycle(flow)
+            times[i].append(time.perf_counter() - start)
+
+    t_ref = statistics.median(times[0])
+    for (label, profiler), ts in zip(modes, times):
+        if profiler is not None: profiler.close()
+        t = statistics.median(ts)
+        print("%-30s %8.3f [s/cycle]  overhead: %+.1f%%" % (label, t, 100 * (t - t_ref) / t_ref))
+
+    print("")
+    print(CycleLog.from_file(logpath).to_string())
+
+    shutil.rmtree(topdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Benchmark for the reading of the QP results stored in a SIGEPH.nc file.
+Compares the columnar QpTempTable with the previous approach that accessed
+the netcdf variables for each (spin, kpoint, band).
+
+Usage: bench_sigeph_qps.py [SIGEPH.nc]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+import abipy.data as abidata
+import abipy.core.abinit_units as abu
+
+from abipy.eph.sigeph import SigmaPhReader, QpTempState
+
+
+def read_qp_per_state(reader, spin, ikc, band):
+    """Previous implementation: slice the netcdf variables for each state."""
+    ibc = band - reader.bstart_sk[spin, ikc]
+    var = reader.read_variable("qp_enes")
+    qpe = (var[spin, ikc, ibc, :, 0] + 1j * var[spin, ikc, ibc, :, 1]) * abu.Ha_eV
+    try:
+        var = reader.read_variable("qpoms_enes")
+    except Exception:
+        var = reader.read_variable("qpadb_enes")
+    qpe_oms = var[spin, ikc, ibc, :, 0] * abu.Ha_eV
+    dw = reader.read_variable("dw_vals")[spin, ikc, ibc, :] * abu.Ha_eV
+    var = reader.read_variable("vals_e0ks")
+    fan0 = (var[spin, ikc, ibc, :, 0] + 1j * var[spin, ikc, ibc, :, 1]) * abu.Ha_eV - dw
+    e0 = reader.read_variable("ks_enes")[spin, ikc, ibc] * abu.Ha_eV
+    ze0 = reader.read_variable("ze0_vals")[spin, ikc, ibc]
+    return QpTempState(spin=spin, kpoint=reader.sigma_kpoints[ikc], band=band, tmesh=reader.tmesh,
+                       e0=e0, qpe=qpe, ze0=ze0, fan0=fan0, dw=dw, qpe_oms=qpe_oms)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else abidata.ref_file("diamond_444q_SIGEPH.nc")
+
+    with SigmaPhReader(path) as reader:
+        nstates = reader.nbcalc_sk.sum()
+        print("nsppol: %d, nkcalc: %d, nstates: %d, ntemp: %d" % (
+              reader.nsppol, reader.nkcalc, nstates, reader.ntemp))
+
+        start = time.time()
+        rows = []
+        for spin in range(reader.nsppol):
+            for ikc in range(reader.nkcalc):
+                for band in range(reader.bstart_sk[spin, ikc], reader.bstop_sk[spin, ikc]):
+                    rows.append(read_qp_per_state(reader, spin, ikc, band).get_dataframe())
+        df_ref = pd.concat(rows)
+        t_ref = time.time() - start
+
+        start = time.time()
+        df = reader.read_qp_table().get_dataframe()
+        t_new = time.time() - start
+
+    print("Per-state reads + dataframe: %.3f [s]" % t_ref)
+    print("QpTempTable + dataframe:     %.3f [s] (speedup: %.1f)" % (t_new, t_ref / t_new))
+    print("Max abs diff:", np.abs(df_ref.values - df.values).max())
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Benchmark for the analysis of the QP results stored in a SIGRES.nc file.
+Compares the columnar QPTable with the previous approach that built
+one QPState object for each (spin, kpoint, band) via index lookups.
+
+Usage: bench_sigres_qps.py [SIGRES.nc] [nrepeat]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+import abipy.data as abidata
+
+from abipy.electrons.gw import SigresReader, QPState, QPList
+
+
+def read_qp_per_state(reader, spin, kpoint, band):
+    """Previous implementation: lookup of the k-point and band indices for each state."""
+    ik_file = reader.kpt2fileindex(kpoint)
+    ib_gw = band - reader.min_gwbstart
+    return QPState(spin=spin, kpoint=kpoint, band=band,
+                   e0=reader.read_e0(spin, ik_file, band),
+                   qpe=reader._egw[spin, ik_file, band],
+                   qpe_diago=reader._en_qp_diago[spin, ik_file, band],
+                   vxcme=reader._vxcme[spin, ik_file, ib_gw],
+                   sigxme=reader._sigxme[spin, ik_file, ib_gw],
+                   sigcmee0=reader._sigcmee0[spin, ik_file, ib_gw],
+                   vUme=reader._vUme[spin, ik_file, ib_gw],
+                   ze0=reader._ze0[spin, ik_file, ib_gw])
+
+
+def per_state_analysis(reader):
+    """Build QPList objects, dataframe and e0-sorted corrections from QPState objects."""
+    qps_spin, rows = [], []
+    for spin in range(reader.nsppol):
+        qps = QPList()
+        for gwkpoint in reader.gwkpoints:
+            ik = reader.gwkpt2seqindex(gwkpoint)
+            for band in range(reader.gwbstart_sk[spin, ik], reader.gwbstop_sk[spin, ik]):
+                qp = read_qp_per_state(reader, spin, gwkpoint, band)
+                qps.append(qp)
+                rows.append(qp.as_dict())
+        qps_spin.append(qps)
+
+    df = pd.DataFrame(rows, columns=list(rows[0].keys()))
+    qps = qps_spin[0].sort_by_e0()
+    return df, qps.get_e0mesh(), qps.get_qpeme0()
+
+
+def table_analysis(reader):
+    """Same quantities computed from the QPTable arrays."""
+    table = reader.read_qp_table()
+    df = table.get_dataframe()
+    e0mesh, perm = table.get_e0sorted(spin=0)
+    return df, e0mesh, table.get_field("qpeme0", spin=0)[perm]
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else abidata.ref_file("QPSC_SIGRES.nc")
+    nrepeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    with SigresReader(path) as reader:
+        nstates = (reader.gwbstop_sk - reader.gwbstart_sk).sum()
+        print("nsppol: %d, nkcalc: %d, nstates: %d" % (reader.nsppol, len(reader.gwkpoints), nstates))
+
+        start = time.time()
+        for i in range(nrepeat):
+            df_ref, e0_ref, corr_ref = per_state_analysis(reader)
+        t_ref = (time.time() - start) / nrepeat
+
+        start = time.time()
+        for i in range(nrepeat):
+            df, e0mesh, qpcorrs = table_analysis(reader)
+        t_new = (time.time() - start) / nrepeat
+
+    keys = [k for k in df_ref.columns if k != "kpoint"]
+    diff = max(np.abs(df_ref[keys].values.astype(np.complex) - df[keys].values.astype(np.complex)).max(),
+               np.abs(e0_ref - e0mesh).max(), np.abs(corr_ref - qpcorrs).max())
+
+    print("Per-state QPState objects: %.4f [s]" % t_ref)
+    print("QPTable arrays:            %.4f [s] (speedup: %.1f)" % (t_new, t_ref / t_new))
+    print("Max abs diff:", diff)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
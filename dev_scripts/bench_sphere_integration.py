@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Scaling benchmark for the integration of fields inside atom-centered spheres.
+Compares Mesh3D.integrate_in_spheres_g with the previous per-atom algorithm
+(full e^{iGR} phase array for each site + splined Bessel integrals).
+
+Usage: bench_sphere_integration.py [rcut]
+"""
+import sys
+import time
+import numpy as np
+
+from abipy.core.mesh3d import Mesh3D
+from abipy.tools import bessel
+
+
+def per_atom_integration(mesh, datag, frac_coords, rcut):
+    """Reference implementation: loop over atoms."""
+    datag = np.reshape(datag, (len(datag), -1))
+    gmods = mesh.gmods
+    spline = bessel.spline_int_jlqr(0, gmods.max(), rcut)
+    kernel = spline(gmods)
+    res = np.empty((len(datag), len(frac_coords)), dtype=np.complex)
+    for iatom, fcoords in enumerate(frac_coords):
+        phases = np.exp(2j * np.pi * np.dot(mesh.gvecs, fcoords))
+        res[:, iatom] = np.sum(datag * phases * kernel, axis=1) * (4 * np.pi)
+    return res
+
+
+def main():
+    rcut = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    ndt = 2
+    print("%8s %8s %12s %12s %10s %12s" % ("natom", "nfft", "per_atom[s]", "batched[s]", "speedup", "max_reldiff"))
+
+    for ncell, nfft in [(1, 24), (2, 48), (3, 72), (4, 96)]:
+        # Simple cubic supercell with 8 atoms per unit cell.
+        acell = 5.43 * ncell
+        mesh = Mesh3D((nfft, nfft, nfft), acell * np.eye(3))
+        frac_coords = np.random.rand(8 * ncell ** 3, 3)
+        datag = mesh.crandom(extra_dims=(ndt,))
+        # Warm-up lazy properties (gvecs, gmods) that are shared by the two algorithms.
+        mesh.gvecs, mesh.gmods
+
+        start = time.time()
+        ref = per_atom_integration(mesh, datag, frac_coords, rcut)
+        t_ref = time.time() - start
+
+        start = time.time()
+        res = mesh.integrate_in_spheres_g(datag, frac_coords, np.full(len(frac_coords), rcut))
+        t_new = time.time() - start
+
+        diff = np.abs(res - ref).max() / np.abs(ref).max()
+        print("%8d %8d %12.3f %12.3f %10.1f %12.2e" % (len(frac_coords), nfft, t_ref, t_new, t_ref / t_new, diff))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
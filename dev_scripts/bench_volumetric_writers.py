@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Throughput benchmark for the writers of volumetric data (XSF, CUBE, CHGCAR).
+Compares the chunked writers of abipy.iotools with the previous implementations
+(one Python string operation per value and full copies of the input array).
+
+Usage: bench_volumetric_writers.py [ngfft]
+"""
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+
+from pymatgen.core.units import bohr_to_angstrom
+from pymatgen.io.vasp.inputs import Poscar
+from pymatgen.io.vasp.outputs import Chgcar
+from abipy.core.structure import Structure
+from abipy.core.mesh3d import Mesh3D
+from abipy.tools.numtools import add_periodic_replicas, transpose_last3dims
+from abipy.iotools.xsf import xsf_write_data
+from abipy.iotools.cube import cube_write_data
+from abipy.iotools.chgcar import chgcar_write
+
+
+def legacy_xsf(fh, structure, data):
+    fdata = transpose_last3dims(add_periodic_replicas(data))
+    for z in range(fdata.shape[0]):
+        for y in range(fdata.shape[1]):
+            fh.write(' '.join(['%f' % d for d in fdata[z, y]]))
+            fh.write('\n')
+        fh.write('\n')
+
+
+def legacy_cube(fh, data, mesh):
+    data_bohrs = data * (bohr_to_angstrom ** 3)
+    for ix in range(mesh.nx):
+        for iy in range(mesh.ny):
+            for iz in range(mesh.nz):
+                fh.write('{:.5e}\n'.format(data_bohrs[ix, iy, iz]))
+
+
+def run(label, func, path):
+    start = time.time()
+    with open(path, "wt") as fh:
+        func(fh)
+    elapsed = time.time() - start
+    size = os.path.getsize(path) / 1024**2
+    print("%-20s %8.2f s %10.1f Mb/s" % (label, elapsed, size / elapsed))
+    return elapsed
+
+
+def main():
+    ngfft = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    structure = Structure.fcc(10.26, ["Si"], units="bohr")
+    mesh = Mesh3D((ngfft, ngfft, ngfft), structure.lattice.matrix)
+    data = np.random.rand(ngfft, ngfft, ngfft)
+    print("ngfft: %d, npoints: %d" % (ngfft, data.size))
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, "out")
+
+    run("xsf (legacy)", lambda fh: legacy_xsf(fh, structure, data), path)
+    run("xsf (chunked)", lambda fh: xsf_write_data(fh, structure, data), path)
+    run("cube (legacy)", lambda fh: legacy_cube(fh, data, mesh), path)
+    run("cube (chunked)", lambda fh: cube_write_data(fh, data, mesh), path)
+
+    start = time.time()
+    Chgcar(Poscar(structure), {"total": data}).write_file(path)
+    elapsed = time.time() - start
+    print("%-20s %8.2f s %10.1f Mb/s" % ("chgcar (pymatgen)", elapsed, os.path.getsize(path) / 1024**2 / elapsed))
+    run("chgcar (chunked)", lambda fh: chgcar_write(fh, structure, {"total": data}), path)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -141,7 +141,6 @@ install_requires = [
     "monty",
     "tabulate",
     "apscheduler==2.1.0",
-    "pydispatcher>=2.0.5",
     "tqdm",
     "pyyaml>=3.11",
     "pandas",